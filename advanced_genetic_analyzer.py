@@ -29,6 +29,12 @@ import os
 import scipy.stats as stats
 import warnings
 
+from utils import genome_stats
+from utils import loader
+from utils import strand
+from utils.genotype_index import GenotypeIndex
+from utils.panels import PanelJoin
+
 warnings.filterwarnings('ignore')
 
 # Configure scientific plotting
@@ -458,46 +464,19 @@ class AdvancedGeneticAnalyzer:
         print("Loading genetic data with quality control checks...")
         
         try:
-            with open(self.filename, 'r') as f:
-                lines = f.readlines()
-            
-            # Extract metadata and data
-            data_lines = []
-            for line in lines:
-                if line.startswith('#'):
-                    if 'generated by 23andMe' in line:
-                        self.metadata['source'] = '23andMe'
-                        # Extract date if present
-                        if 'at:' in line:
-                            date_str = line.split('at:')[1].strip()
-                            self.metadata['generation_date'] = date_str
-                    elif 'reference human assembly build' in line:
-                        self.metadata['build'] = 'GRCh37/hg19'
-                else:
-                    data_lines.append(line.strip())
-            
-            # Parse genetic data
-            from io import StringIO
-            data_string = '\n'.join(data_lines)
-            self.data = pd.read_csv(StringIO(data_string), sep='\t')
-            
-            # Standardize column names
-            self.data.columns = ['rsid', 'chromosome', 'position', 'genotype']
-            
-            # Quality control
-            self.data['chromosome'] = self.data['chromosome'].astype(str)
+            # Parse header metadata and stream the body into the C parser
+            self.data, header_metadata = loader.read_raw_genotypes(self.filename)
+            self.metadata.update(header_metadata)
             
             # Remove no-calls and indels for this analysis
             original_count = len(self.data)
+            self.metadata['raw_variants_per_chromosome'] = self.data['chromosome'].value_counts().to_dict()
             self.data = self.data[~self.data['genotype'].isin(['--', 'DD', 'II', 'DI', 'ID'])]
             removed_count = original_count - len(self.data)
             
             # Additional QC: ensure genotypes are valid
             self.data = self.data[self.data['genotype'].str.len() <= 2]
             
-            # Create reverse complement for strand ambiguity resolution
-            self.data['genotype_complement'] = self.data['genotype'].apply(self._reverse_complement)
-            
             print(f"Successfully loaded {len(self.data):,} high-quality variants")
             print(f"Removed {removed_count:,} no-calls and indels")
             print(f"Data spans {len(self.data['chromosome'].unique())} chromosomes")
@@ -506,34 +485,22 @@ class AdvancedGeneticAnalyzer:
             print(f"Error loading data: {e}")
             raise
     
-    def _reverse_complement(self, genotype):
-        """Calculate reverse complement for strand ambiguity resolution."""
-        complement = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
-        return ''.join(complement.get(base, base) for base in genotype)
-
     def analyze_disease_risk(self):
         """Analyze disease risk for key variants using VCF genotypes."""
         print("\nAnalyzing disease risk based on peer-reviewed studies...")
         disease_risk = {'neurological': []}
-        with open(self.filename, 'r') as f:
-            for line in f:
-                if line.startswith('#'):
-                    continue
-                fields = line.strip().split('\t')
-                if len(fields) < 10:
-                    continue
-                rsid = fields[2]
-                genotype = fields[9]
-                count = genotype.count('1')
-                if hasattr(self, 'known_variants') and rsid in self.known_variants:
-                    info = self.known_variants[rsid]
-                    effect_size = info.get('effect_size')
-                    relative_risk = effect_size ** count if effect_size is not None else None
-                    disease_risk['neurological'].append({
-                        'rsid': rsid,
-                        'genotype': genotype,
-                        'relative_risk': relative_risk
-                    })
+        # GT and ALT dosage come from the single VCF parse in load_data
+        if 'dosage' in self.data.columns and hasattr(self, 'known_variants'):
+            known = self.data[self.data['rsid'].isin(list(self.known_variants))]
+            for rsid, genotype, count in zip(known['rsid'], known['gt'], known['dosage']):
+                info = self.known_variants[rsid]
+                effect_size = info.get('effect_size')
+                relative_risk = effect_size ** int(count) if effect_size is not None else None
+                disease_risk['neurological'].append({
+                    'rsid': rsid,
+                    'genotype': genotype,
+                    'relative_risk': relative_risk
+                })
         self.results['disease_risk'] = disease_risk
         import validation
         self.results['validation_summary_report'] = validation.validate(self.results)
@@ -551,42 +518,37 @@ class AdvancedGeneticAnalyzer:
         stats = {
             'total_variants': len(self.data),
             'variants_per_chromosome': self.data['chromosome'].value_counts().to_dict(),
-            'genotype_distribution': self.data['genotype'].apply(len).value_counts().to_dict()
+            'genotype_distribution': self.data['genotype'].str.len().value_counts().to_dict()
         }
         
-        # Count homozygous vs heterozygous variants
+        # Count homozygous vs heterozygous variants, genome-wide and per
+        # chromosome, in one vectorized pass over the genotype column
         # Homozygous: both alleles are the same (AA, TT, CC, GG)
         # Heterozygous: alleles are different (AT, CG, etc.)
-        homozygous = 0
-        heterozygous = 0
-        
-        # Analyze each genotype
-        for genotype in self.data['genotype']:
-            if len(genotype) == 2:  # Standard genotype (not an indel)
-                if genotype[0] == genotype[1]:
-                    homozygous += 1
-                else:
-                    heterozygous += 1
+        summary = genome_stats.genotype_summary(
+            self.data['genotype'], self.data['chromosome'], self.data['position'],
+            raw_counts_per_chromosome=self.metadata.get('raw_variants_per_chromosome')
+        )
         
         # Calculate heterozygosity rate
         # This is an important measure of genetic diversity
-        total_analyzed = homozygous + heterozygous
-        stats['homozygous_variants'] = homozygous
-        stats['heterozygous_variants'] = heterozygous
-        stats['heterozygosity_rate'] = heterozygous / total_analyzed if total_analyzed > 0 else 0
+        stats['homozygous_variants'] = summary['homozygous']
+        stats['heterozygous_variants'] = summary['heterozygous']
+        stats['heterozygosity_rate'] = summary['heterozygosity_rate']
+        stats['ti_tv_ratio'] = summary['ti_tv_ratio']
         
-        # Analyze variant density by chromosome
-        # This helps identify any potential quality issues
+        # Variant density by chromosome helps identify potential quality issues;
+        # het rate, Ti/Tv and call rate come from the same pass
         chrom_stats = {}
-        for chrom in self.data['chromosome'].unique():
-            chrom_data = self.data[self.data['chromosome'] == chrom]
-            if len(chrom_data) > 0:
-                # Get chromosome positions
-                positions = chrom_data['position'].astype(int)
-                chrom_stats[chrom] = {
-                    'count': len(chrom_data),
-                    'density': len(chrom_data) / (positions.max() - positions.min()) * 1000000 if positions.max() > positions.min() else 0
-                }
+        for chrom, chrom_summary in summary['per_chromosome'].items():
+            span = chrom_summary['max_position'] - chrom_summary['min_position']
+            chrom_stats[chrom] = {
+                'count': chrom_summary['count'],
+                'density': chrom_summary['count'] / span * 1000000 if span > 0 else 0,
+                'heterozygosity_rate': chrom_summary['heterozygosity_rate'],
+                'ti_tv_ratio': chrom_summary['ti_tv_ratio'],
+                'call_rate': chrom_summary.get('call_rate'),
+            }
         
         stats['chromosome_stats'] = chrom_stats
         
@@ -617,6 +579,23 @@ class AdvancedGeneticAnalyzer:
         
         prs_results = {}
         
+        # Join every PRS panel against the genome once and resolve strands for
+        # all panel SNPs in one vectorized pass (complements, A/T and C/G sites,
+        # flips against the panel alleles) instead of per-variant scans
+        join = PanelJoin(GenotypeIndex.from_frame(self.data),
+                         {trait: (variants, False) for trait, variants in self.prs_variants.items()})
+        joined = pd.concat([join.table(trait, variants).assign(trait=trait)
+                            for trait, variants in self.prs_variants.items()], ignore_index=True)
+        joined['risk_allele'] = [info['risk_allele'] if 'risk_allele' in info else info.get('effect_allele')
+                                 for info in joined['info']]
+        # Ambiguous sites lacking the risk allele are read on the other strand, as before
+        strands = strand.harmonise(
+            joined['genotype'], joined['risk_allele'],
+            other=[info.get('other_allele') for info in joined['info']],
+            effect_frequency=[info.get('effect_allele_frequency', np.nan) for info in joined['info']],
+            flip_absent_palindromes=True)
+        joined = pd.concat([joined, strands], axis=1)
+        
         for trait, variants in self.prs_variants.items():
             print(f"\nAnalyzing {trait.replace('_', ' ').title()}...")
             
@@ -625,40 +604,27 @@ class AdvancedGeneticAnalyzer:
             variants_found = 0
             variant_details = []
             
-            for rsid, info in variants.items():
-                variant_data = self.data[self.data['rsid'] == rsid]
+            rows = joined[(joined['trait'] == trait) & joined['usable']]
+            for rsid, info, genotype, risk_allele, allele_count in zip(
+                    rows['rsid'], rows['info'], rows['harmonised_genotype'], rows['risk_allele'], rows['effect_count']):
+                weight = info['weight']
+                allele_count = int(allele_count)
                 
-                if not variant_data.empty:
-                    genotype = variant_data.iloc[0]['genotype']
-                    risk_allele = info['risk_allele'] if 'risk_allele' in info else info.get('effect_allele')
-                    weight = info['weight']
-                    
-                    # Count risk/effect alleles
-                    allele_count = genotype.count(risk_allele)
-                    
-                    # Handle strand ambiguity for A/T and C/G SNPs
-                    if allele_count == 0 and self._is_ambiguous_snp(genotype, risk_allele):
-                        # Try reverse complement
-                        rev_comp = variant_data.iloc[0]['genotype_complement']
-                        allele_count = rev_comp.count(risk_allele)
-                        if allele_count > 0:
-                            genotype = rev_comp
-                    
-                    # Calculate contribution to PRS
-                    contribution = allele_count * weight
-                    trait_score += contribution
-                    max_possible_score += 2 * abs(weight)  # Maximum if homozygous
-                    variants_found += 1
-                    
-                    variant_details.append({
-                        'rsid': rsid,
-                        'gene': info.get('gene', 'N/A'),
-                        'genotype': genotype,
-                        'risk_allele': risk_allele,
-                        'allele_count': allele_count,
-                        'weight': weight,
-                        'contribution': contribution
-                    })
+                # Calculate contribution to PRS
+                contribution = allele_count * weight
+                trait_score += contribution
+                max_possible_score += 2 * abs(weight)  # Maximum if homozygous
+                variants_found += 1
+                
+                variant_details.append({
+                    'rsid': rsid,
+                    'gene': info.get('gene', 'N/A'),
+                    'genotype': genotype,
+                    'risk_allele': risk_allele,
+                    'allele_count': allele_count,
+                    'weight': weight,
+                    'contribution': contribution
+                })
             
             # Calculate percentile based on population distribution
             # Using standardized normal distribution assumptions
@@ -694,17 +660,6 @@ class AdvancedGeneticAnalyzer:
         
         self.results['prs_scores'] = prs_results
     
-    def _is_ambiguous_snp(self, genotype, risk_allele):
-        """Check if SNP has strand ambiguity (A/T or C/G)."""
-        ambiguous_pairs = [{'A', 'T'}, {'C', 'G'}]
-        genotype_bases = set(genotype)
-        risk_set = {risk_allele, self._reverse_complement(risk_allele)}
-        
-        for pair in ambiguous_pairs:
-            if genotype_bases.issubset(pair) and risk_set.intersection(pair):
-                return True
-        return False
-    
     def _categorize_risk(self, percentile):
         """Categorize risk based on percentile."""
         if percentile >= 95:
@@ -0,0 +1,93 @@
+"""
+Startup-time benchmark for genetic_analyzer_ultra.
+
+Measures, in fresh interpreters, the time to import the analyzer and the
+time the heavy stacks it now imports lazily would add (matplotlib,
+seaborn, scipy.stats, scikit-learn), and checks that a headless
+(``plots=False``) pipeline run never imports them.
+
+Usage:
+    python benchmarks/bench_startup.py [--repeats 5] [--genome raw.txt]
+"""
+
+import argparse
+import json
+import os
+import pathlib as pl
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO = pl.Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ('matplotlib', 'seaborn', 'scipy', 'sklearn')
+
+IMPORT_ANALYZER = "import genetic_analyzer_ultra"
+IMPORT_HEAVY = "import matplotlib.pyplot, seaborn, scipy.stats, sklearn.neighbors"
+
+# Times one statement in a fresh interpreter and reports which heavy modules it loaded
+TIMER = """
+import json, sys, time
+start = time.perf_counter()
+exec({statement!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+HEADLESS_RUN = """
+import contextlib, io
+import genetic_analyzer_ultra
+analyzer = genetic_analyzer_ultra.AdvancedGeneticAnalyzer({genome!r}, output_dir={output_dir!r}, plots=False)
+with contextlib.redirect_stdout(io.StringIO()):
+    assert analyzer.run_complete_analysis()
+"""
+
+SYNTHETIC_GENOME = (
+    "# This data file generated by 23andMe at: Wed Nov 20 21:07:48 2024\n"
+    "# rsid\tchromosome\tposition\tgenotype\n"
+    + "".join(f"rs{i}\t{1 + i % 22}\t{1000 + i}\t{'ACGT'[i % 4]}{'ACGT'[(i // 4) % 4]}\n" for i in range(1, 2001))
+)
+
+
+def time_statement(statement):
+    """Run ``statement`` in a fresh interpreter (cwd = repo root) and return its timing record."""
+    output = subprocess.run([sys.executable, '-c', TIMER.format(statement=statement, heavy=HEAVY_MODULES)],
+                            cwd=REPO, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(statement, repeats):
+    records = [time_statement(statement) for _ in range(repeats)]
+    return statistics.median(record['seconds'] for record in records), records[-1]['loaded']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=5, help='Fresh interpreters per measurement (median reported).')
+    parser.add_argument('--genome', type=str, default=None,
+                        help='Raw genome for the headless run (default: a small synthetic 23andMe file).')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        genome = args.genome and os.path.abspath(args.genome)
+        if genome is None:
+            genome = os.path.join(tmp, 'synthetic.txt')
+            pl.Path(genome).write_text(SYNTHETIC_GENOME)
+
+        analyzer_seconds, analyzer_loaded = measure(IMPORT_ANALYZER, args.repeats)
+        heavy_seconds, _ = measure(IMPORT_HEAVY, args.repeats)
+        headless_seconds, headless_loaded = measure(
+            HEADLESS_RUN.format(genome=genome, output_dir=os.path.join(tmp, 'out')), max(1, args.repeats // 2))
+
+    print(f"{'measurement':<46}{'median s':>10}  heavy modules loaded")
+    print(f"{'import genetic_analyzer_ultra':<46}{analyzer_seconds:>10.3f}  {', '.join(analyzer_loaded) or '-'}")
+    print(f"{'import matplotlib/seaborn/scipy/sklearn':<46}{heavy_seconds:>10.3f}  (cost avoided at startup)")
+    print(f"{'headless pipeline (plots=False, import+run)':<46}{headless_seconds:>10.3f}  {', '.join(headless_loaded) or '-'}")
+
+    if analyzer_loaded or headless_loaded:
+        print("FAIL: heavy modules were imported on the headless path")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
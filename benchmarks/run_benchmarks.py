@@ -0,0 +1,254 @@
+"""
+Benchmark runner for the analysis pipeline on synthetic genomes.
+
+For every (size, format) case it generates (once, cached under
+``--data-dir``) a deterministic synthetic genome with
+:mod:`benchmarks.synthetic_genome`, then runs the full
+``run_complete_analysis`` pipeline ``--repeats`` times, each in a fresh
+interpreter.  Per-stage wall/CPU times come from the analyzer's own
+``performance_profile`` (``load_data``, every ``analyze_*`` stage,
+``polygenic_scores``, ``visualizations``, ``scientific_report``), and the
+medians are written as a machine-readable baseline.
+
+``--compare BASELINE`` re-runs the same cases and reports every stage whose
+median got slower than the baseline by more than ``--tolerance`` (and by
+more than ``--min-seconds``, so sub-millisecond jitter is ignored); the
+exit status is 1 if anything regressed.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 100k,600k --output baseline.json
+    python benchmarks/run_benchmarks.py --compare baseline.json --output current.json
+"""
+
+import argparse
+import json
+import os
+import pathlib as pl
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+REPO = pl.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from benchmarks import synthetic_genome  # noqa: E402
+
+EXTENSIONS = {'23andme': 'txt', 'vcf': 'vcf', 'vcf.gz': 'vcf.gz'}
+
+# One pipeline run in a fresh interpreter; prints the performance profile as JSON
+RUN_PIPELINE = """
+import contextlib, io, json, sys, time
+started = time.perf_counter()
+import numpy as np
+import genetic_analyzer_ultra
+imported = time.perf_counter() - started
+np.random.seed(42)
+analyzer = genetic_analyzer_ultra.AdvancedGeneticAnalyzer(
+    {genome!r}, output_dir={output_dir!r}, plots={plots!r}, stage_workers={stage_workers!r},
+    profile_memory={profile_memory!r})
+with contextlib.redirect_stdout(io.StringIO()):
+    ok = analyzer.run_complete_analysis()
+records = analyzer.performance_records
+print(json.dumps({{
+    'ok': bool(ok),
+    'import_seconds': imported,
+    'total_seconds': time.perf_counter() - started,
+    'variants': int(analyzer.results['advanced_stats'].get('total_variants', 0)) if ok else 0,
+    'stages': [{{key: record[key] for key in ('stage', 'status', 'wall_seconds', 'cpu_seconds', 'peak_memory_bytes')}}
+               for record in records],
+}}))
+"""
+
+
+def genome_path(data_dir, size, fmt, seed):
+    """Cached input path; the generator version is part of the name so stale inputs are never reused."""
+    name = f"synthetic_{size}_seed{seed}_v{synthetic_genome.GENERATOR_VERSION}.{EXTENSIONS[fmt]}"
+    return os.path.join(data_dir, name)
+
+
+def ensure_genome(data_dir, size, fmt, seed, panel):
+    path = genome_path(data_dir, size, fmt, seed)
+    if not os.path.exists(path):
+        print(f"Generating {path}...", flush=True)
+        # Write beside the final path first, so an interrupted run leaves no truncated input
+        partial = path + '.partial'
+        synthetic_genome.write_genome(partial, synthetic_genome.parse_size(size), fmt, seed, panel)
+        os.replace(partial, path)
+    return path
+
+
+def run_once(genome, plots, stage_workers, profile_memory):
+    """Run the pipeline once in a fresh interpreter and return its parsed JSON record."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        script = RUN_PIPELINE.format(genome=os.path.abspath(genome), output_dir=output_dir, plots=plots,
+                                     stage_workers=stage_workers, profile_memory=profile_memory)
+        completed = subprocess.run([sys.executable, '-c', script], cwd=REPO, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed for {genome}:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarise(runs):
+    """Median/min/max per stage (plus import and total) over repeated runs."""
+    timings = {'import': [run['import_seconds'] for run in runs], 'total': [run['total_seconds'] for run in runs]}
+    cpu = {}
+    peaks = {}
+    for run in runs:
+        for record in run['stages']:
+            timings.setdefault(record['stage'], []).append(record['wall_seconds'])
+            cpu.setdefault(record['stage'], []).append(record['cpu_seconds'])
+            if record['peak_memory_bytes'] is not None:
+                peaks.setdefault(record['stage'], []).append(record['peak_memory_bytes'])
+
+    stages = {}
+    for stage, values in timings.items():
+        stages[stage] = {
+            'median_seconds': statistics.median(values),
+            'min_seconds': min(values),
+            'max_seconds': max(values),
+        }
+        if stage in cpu:
+            stages[stage]['median_cpu_seconds'] = statistics.median(cpu[stage])
+        if stage in peaks:
+            stages[stage]['max_peak_memory_bytes'] = max(peaks[stage])
+    return stages
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import numpy
+    import pandas
+    return {
+        'timestamp_utc': datetime.now(timezone.utc).isoformat(),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'generator_version': synthetic_genome.GENERATOR_VERSION,
+    }
+
+
+def compare(baseline, current, tolerance, min_seconds):
+    """
+    Stage-by-stage comparison of two benchmark results.
+
+    Returns:
+        ``(lines, regressions)``: the report lines and the list of
+        ``(case, stage)`` pairs slower than the baseline beyond the thresholds.
+    """
+    lines = [f"{'case':<18}{'stage':<26}{'baseline s':>11}{'current s':>11}{'ratio':>8}"]
+    regressions = []
+    for case, result in current['cases'].items():
+        if case not in baseline['cases']:
+            lines.append(f"{case:<18}(not in baseline)")
+            continue
+        reference = baseline['cases'][case]['stages']
+        for stage, timing in result['stages'].items():
+            if stage not in reference:
+                continue
+            before, after = reference[stage]['median_seconds'], timing['median_seconds']
+            ratio = after / before if before else float('inf') if after else 1.0
+            flag = ''
+            if after > before * (1 + tolerance) and after - before > min_seconds:
+                flag = '  REGRESSION'
+                regressions.append((case, stage))
+            elif before > after * (1 + tolerance) and before - after > min_seconds:
+                flag = '  faster'
+            lines.append(f"{case:<18}{stage:<26}{before:>11.4f}{after:>11.4f}{ratio:>8.2f}{flag}")
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100k,600k',
+                        help=f"Comma-separated sizes ({', '.join(synthetic_genome.SIZES)} or a number). "
+                             "5m and 50m inputs take minutes to generate and several GB of disk.")
+    parser.add_argument('--formats', default='23andme,vcf.gz',
+                        help=f"Comma-separated input formats ({', '.join(synthetic_genome.FORMATS)}).")
+    parser.add_argument('--repeats', type=int, default=3, help='Pipeline runs per case (medians are reported).')
+    parser.add_argument('--seed', type=int, default=0, help='Synthetic genome seed.')
+    parser.add_argument('--data-dir', default=str(REPO / 'benchmarks' / 'data'),
+                        help='Where generated genomes are cached.')
+    parser.add_argument('--no-plots', action='store_true', help='Skip the visualizations stage.')
+    parser.add_argument('--stage-workers', type=int, default=1,
+                        help='Analyzer stage threads (default 1, so per-stage times do not overlap).')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Also record per-stage peak memory (tracemalloc; inflates the timings).')
+    parser.add_argument('--output', default=None, help='Write the results JSON here (e.g. a new baseline).')
+    parser.add_argument('--compare', default=None, metavar='BASELINE', help='Baseline JSON to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Relative slowdown that counts as a regression (default 0.10 = 10%%).')
+    parser.add_argument('--min-seconds', type=float, default=0.02,
+                        help='Ignore differences smaller than this many seconds.')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    formats = [fmt.strip() for fmt in args.formats.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in synthetic_genome.FORMATS]
+    if unknown:
+        parser.error(f"unknown format(s) {unknown}")
+
+    panel = synthetic_genome.panel_alleles()
+    results = {
+        'environment': environment(),
+        'settings': {'repeats': args.repeats, 'seed': args.seed, 'plots': not args.no_plots,
+                     'stage_workers': args.stage_workers, 'profile_memory': args.profile_memory},
+        'cases': {},
+    }
+    for size in sizes:
+        for fmt in formats:
+            case = f"{size}/{fmt}"
+            genome = ensure_genome(args.data_dir, size, fmt, args.seed, panel)
+            runs = [run_once(genome, not args.no_plots, args.stage_workers, args.profile_memory)
+                    for _ in range(args.repeats)]
+            results['cases'][case] = {
+                'input': os.path.basename(genome),
+                'input_bytes': os.path.getsize(genome),
+                'variants_loaded': runs[-1]['variants'],
+                'failed_runs': sum(not run['ok'] for run in runs),
+                'stages': summarise(runs),
+            }
+            total = results['cases'][case]['stages']['total']['median_seconds']
+            print(f"{case:<18} {runs[-1]['variants']:>12,} variants  total {total:8.3f} s (median of {args.repeats})")
+
+    for case, result in results['cases'].items():
+        print(f"\n{case}")
+        for stage, timing in sorted(result['stages'].items(), key=lambda item: -item[1]['median_seconds']):
+            print(f"  {stage:<26}{timing['median_seconds']:>10.4f} s")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if baseline is not None:
+        lines, regressions = compare(baseline, results, args.tolerance, args.min_seconds)
+        print(f"\nComparison with {args.compare} (baseline rev {baseline['environment'].get('git_revision')}):")
+        for line in lines:
+            print("  " + line)
+        if regressions:
+            print(f"\nFAIL: {len(regressions)} stage(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Deterministic synthetic genomes for benchmarking.
+
+Writes 23andMe-style raw files and single-sample VCFs (plain or bgzipped)
+of any size.  The same ``(variants, seed)`` always gives byte-identical
+output, so benchmark inputs can be regenerated on any machine instead of
+being shipped.
+
+The files look like real exports where it matters for performance:
+
+* variants are spread over 1-22, X, Y and MT in proportion to chromosome
+  length and written in coordinate order;
+* every rsid of the analyzer's knowledge base (disease, trait, PRS,
+  pharmacogenomic panels...) is present, with genotypes made of the
+  panel's alleles, so every analysis stage has hits to work on;
+* about 0.5% of calls are no-calls (``--`` / ``./.``), about 1% are
+  23andMe internal ``i`` ids, some of them indels (``DD``/``DI``/``II``),
+  and Y/MT calls are haploid.
+
+Usage:
+    python benchmarks/synthetic_genome.py 600k genome.txt
+    python benchmarks/synthetic_genome.py 5m genome.vcf.gz --seed 7
+"""
+
+import argparse
+import os
+import pathlib as pl
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(pl.Path(__file__).resolve().parent.parent))
+
+from utils import bgzf  # noqa: E402
+
+# Bump when the output for a given (variants, seed) changes, so cached inputs are regenerated
+GENERATOR_VERSION = 1
+
+SIZES = {'100k': 100_000, '600k': 600_000, '5m': 5_000_000, '50m': 50_000_000}
+
+FORMATS = ('23andme', 'vcf', 'vcf.gz')
+
+# GRCh37 lengths, which also set each chromosome's share of the variants
+CHROMOSOME_LENGTHS = {
+    '1': 249250621, '2': 243199373, '3': 198022430, '4': 191154276, '5': 180915260,
+    '6': 171115067, '7': 159138663, '8': 146364022, '9': 141213431, '10': 135534747,
+    '11': 135006516, '12': 133851895, '13': 115169878, '14': 107349540, '15': 102531392,
+    '16': 90354753, '17': 81195210, '18': 78077248, '19': 59128983, '20': 63025520,
+    '21': 48129895, '22': 51304566, 'X': 155270560, 'Y': 59373566, 'MT': 16569,
+}
+HAPLOID = ('Y', 'MT')
+
+NO_CALL_RATE = 0.005
+INTERNAL_ID_RATE = 0.01
+INDEL_RATE = 0.3  # of internal ids
+CHUNK_ROWS = 500_000
+BASES = np.array(list('ACGT'))
+RSID_BASE = 2_000_000_000  # above every real rsid, so synthetic ids never collide with panel ids
+
+
+def parse_size(text):
+    """``'600k'``, ``'5m'`` or a plain number of variants."""
+    text = str(text).lower()
+    if text in SIZES:
+        return SIZES[text]
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+
+def panel_alleles():
+    """
+    rsid -> candidate alleles for every variant in the analyzer's knowledge base.
+
+    Alleles come from the panel info (``risk_allele``, ``effect_allele``,
+    ``protective_allele``...); variants without single-base alleles get ``None``
+    and are given random bases.
+    """
+    from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+    from utils import panels
+
+    analyzer = AdvancedGeneticAnalyzer(None)
+    alleles = {}
+    for name, nested in AdvancedGeneticAnalyzer.KNOWLEDGE_BASE_PANELS.items():
+        for _, rsid, info in panels.flatten_panel(getattr(analyzer, name), nested):
+            found = alleles.get(rsid) or []
+            if isinstance(info, dict):
+                for key, value in info.items():
+                    if key.endswith('allele') and isinstance(value, str) and value in 'ACGT' and len(value) == 1:
+                        found.append(value)
+            alleles[rsid] = found
+    for rsid in AdvancedGeneticAnalyzer.STAGE_MARKER_RSIDS:
+        alleles.setdefault(rsid, [])
+    return {rsid: sorted(set(found)) or None for rsid, found in sorted(alleles.items()) if rsid.startswith('rs')}
+
+
+def chromosome_counts(n_variants):
+    """Variants per chromosome, proportional to length (at least one each)."""
+    lengths = np.array(list(CHROMOSOME_LENGTHS.values()), dtype=np.float64)
+    counts = np.maximum(1, np.floor(n_variants * lengths / lengths.sum()).astype(np.int64))
+    counts[0] += n_variants - counts.sum()
+    return dict(zip(CHROMOSOME_LENGTHS, counts.tolist()))
+
+
+def _panel_slots(n_variants, panel, seed):
+    """Global row -> (rsid, alleles) for the knowledge-base variants."""
+    rng = np.random.default_rng([seed, 0])
+    rows = rng.choice(n_variants, size=min(len(panel), n_variants), replace=False)
+    return dict(zip(rows.tolist(), list(panel.items())))
+
+
+def iter_variant_chunks(n_variants, seed=0, panel=None):
+    """
+    Yield the synthetic genome as column dicts, in coordinate order.
+
+    Each chunk has ``chromosome``, ``position``, ``rsid``, ``ref``, ``alt``,
+    ``gt`` (a ``(n, 2)`` array of 0/1 allele indices, -1 for no-calls, the
+    second column -1 for haploid calls) and ``indel`` (bool).
+
+    Args:
+        n_variants: Total number of variants.
+        seed: Random seed; each chunk draws from its own stream derived from it.
+        panel: rsid -> alleles (or ``None``) placed at random rows; see
+            :func:`panel_alleles`.
+    """
+    slots = _panel_slots(n_variants, panel or {}, seed)
+    start = 0
+    for chrom_index, (chrom, count) in enumerate(chromosome_counts(n_variants).items()):
+        rng = np.random.default_rng([seed, 1, chrom_index])
+        length = CHROMOSOME_LENGTHS[chrom]
+        positions = np.sort(rng.choice(length, size=min(count, length), replace=False) + 1)
+        if len(positions) < count:  # more variants than bases (tiny MT): repeat positions
+            positions = np.sort(np.resize(positions, count))
+
+        for offset in range(0, count, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, count - offset)
+            rows = np.arange(start + offset, start + offset + n)
+            rng = np.random.default_rng([seed, 2, chrom_index, offset])
+
+            ref = rng.integers(0, 4, n)
+            alt = (ref + rng.integers(1, 4, n)) % 4
+            frequency = np.clip(rng.beta(0.6, 0.6, n), 0.01, 0.99)
+            gt = (rng.random((n, 2)) < frequency[:, None]).astype(np.int8)
+            no_call = rng.random(n) < NO_CALL_RATE
+            internal = rng.random(n) < INTERNAL_ID_RATE
+            indel = internal & (rng.random(n) < INDEL_RATE)
+
+            gt[no_call] = -1
+            if chrom in HAPLOID:
+                gt[:, 1] = -1
+            rsid = np.where(internal, np.char.add('i', (rows + 1000000).astype(str)),
+                            np.char.add('rs', (rows + RSID_BASE).astype(str))).astype(object)
+            ref_base = BASES[ref].astype(object)
+            alt_base = BASES[alt].astype(object)
+
+            for row in rows[np.isin(rows, list(slots))] if slots else ():
+                i = row - rows[0]
+                rsid[i], alleles = slots[row]
+                indel[i] = False
+                gt[i, 0] = max(gt[i, 0], 0)  # always called, so every stage has hits
+                if chrom not in HAPLOID:
+                    gt[i, 1] = max(gt[i, 1], 0)
+                if alleles:
+                    ref_base[i] = alleles[0]
+                    alt_base[i] = alleles[1] if len(alleles) > 1 else BASES[(BASES.tolist().index(alleles[0]) + 1) % 4]
+
+            yield {
+                'chromosome': chrom,
+                'position': positions[offset:offset + n],
+                'rsid': rsid,
+                'ref': ref_base,
+                'alt': alt_base,
+                'gt': gt,
+                'indel': indel,
+            }
+        start += count
+
+
+def _23andme_genotypes(chunk):
+    ref, alt, gt = chunk['ref'], chunk['alt'], chunk['gt']
+    first = np.where(gt[:, 0] == 1, alt, ref)
+    second = np.where(gt[:, 1] == 1, alt, np.where(gt[:, 1] == 0, ref, ''))
+    calls = first + second
+    indel_calls = np.array(['DD', 'DI', 'II'], dtype=object)[np.clip(gt.sum(axis=1), 0, 2)]
+    calls = np.where(chunk['indel'], indel_calls, calls)
+    calls[gt[:, 0] < 0] = '--'
+    return calls
+
+
+def _vcf_fields(chunk):
+    ref, alt = chunk['ref'].copy(), chunk['alt'].copy()
+    indel = chunk['indel']
+    ref[indel] = ref[indel] + 'T'  # deletion of one base: REF=xT, ALT=x
+    alt[indel] = chunk['ref'][indel]
+    gt = chunk['gt']
+    calls = np.where(gt[:, 1] < 0, gt[:, 0].astype(str), np.char.add(np.char.add(gt[:, 0].astype(str), '/'),
+                                                                     gt[:, 1].astype(str)))
+    calls = np.where(gt[:, 0] < 0, np.where(gt[:, 1] < 0, '.', './.'), calls).astype(object)
+    return ref, alt, calls
+
+
+def iter_lines(n_variants, fmt, seed=0, panel=None):
+    """Yield the file as encoded byte chunks (header first)."""
+    if fmt == '23andme':
+        yield (
+            "# This data file generated by 23andMe at: Wed Nov 20 21:07:48 2024\n"
+            f"# Synthetic benchmark genome: {n_variants} variants, seed {seed}, generator v{GENERATOR_VERSION}\n"
+            "# We are using reference human assembly build 37 (also known as Annotation Release 104).\n"
+            "# rsid\tchromosome\tposition\tgenotype\n"
+        ).encode()
+    else:
+        contigs = ''.join(f"##contig=<ID={chrom},length={length}>\n" for chrom, length in CHROMOSOME_LENGTHS.items())
+        yield (
+            "##fileformat=VCFv4.2\n"
+            f"##source=synthetic_genome.py v{GENERATOR_VERSION} seed={seed}\n"
+            "##reference=GRCh37\n" + contigs +
+            '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">\n'
+            "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSYNTHETIC\n"
+        ).encode()
+
+    for chunk in iter_variant_chunks(n_variants, seed, panel):
+        chrom = chunk['chromosome']
+        positions = chunk['position'].astype(str).astype(object)
+        if fmt == '23andme':
+            columns = (chunk['rsid'], chrom, positions, _23andme_genotypes(chunk))
+        else:
+            ref, alt, calls = _vcf_fields(chunk)
+            columns = (chrom, positions, chunk['rsid'], ref, alt, '.\tPASS\t.\tGT', calls)
+        lines = columns[0]
+        for column in columns[1:]:
+            lines = lines + '\t' + column
+        yield ('\n'.join(lines.tolist()) + '\n').encode()
+
+
+def write_genome(path, n_variants, fmt=None, seed=0, panel=None):
+    """
+    Write a synthetic genome.
+
+    Args:
+        path: Output path.
+        n_variants: Number of variants (see :func:`parse_size`).
+        fmt: ``'23andme'``, ``'vcf'`` or ``'vcf.gz'`` (BGZF, indexable by
+            ``--build-index``); inferred from ``path`` if omitted.
+        seed: Random seed.
+        panel: Knowledge-base alleles; :func:`panel_alleles` if omitted.
+
+    Returns:
+        ``path``.
+    """
+    path = str(path)
+    if fmt is None:
+        fmt = 'vcf.gz' if path.endswith('.vcf.gz') else 'vcf' if path.endswith('.vcf') else '23andme'
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {FORMATS}")
+    if panel is None:
+        panel = panel_alleles()
+
+    chunks = iter_lines(n_variants, fmt, seed, panel)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if fmt == 'vcf.gz':
+        bgzf.write_bgzf(path, chunks)
+    else:
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('size', help=f"Number of variants, or one of {', '.join(SIZES)}.")
+    parser.add_argument('output', help='Output path; .vcf / .vcf.gz select VCF, anything else 23andMe format.')
+    parser.add_argument('--format', choices=FORMATS, default=None, help='Override the format inferred from the path.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    n_variants = parse_size(args.size)
+    write_genome(args.output, n_variants, args.format, args.seed)
+    print(f"Wrote {n_variants:,} synthetic variants -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
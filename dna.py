@@ -30,6 +30,10 @@ import networkx as nx
 from itertools import combinations
 import math
 
+from utils import knowledge_artifact
+from utils import loader
+from utils import region_index
+
 warnings.filterwarnings('ignore')
 
 # Configure plotting style for publication-quality visualizations
@@ -49,1014 +53,24 @@ class AdvancedGeneticAnalyzer:
         """Initialize the analyzer with comprehensive variant databases."""
         self.filename = filename
         self.data = None
+        self.region_index = None # chromosome/position range lookup built by load_data
         self.metadata = {}
         self.results = defaultdict(dict)
         
-        # Initialize all comprehensive variant databases
-        self._initialize_variant_databases()
-        self._initialize_polygenic_scores()
-        self._initialize_pharmacogenomics()
-        self._initialize_rare_variants()
-        self._initialize_fascinating_traits()
-        self._initialize_ancient_variants()
-        self._initialize_longevity_variants()
-        self._initialize_cognitive_variants()
-        self._initialize_athletic_variants()
-        self._initialize_sensory_variants()
-        
-    def _initialize_variant_databases(self):
-        """Initialize comprehensive variant database from peer-reviewed studies."""
-        
-        # Expanded database with latest research findings (2023-2025)
-        self.known_variants = {
-            # Alzheimer's Disease and Neurodegeneration
-            'rs429358': {
-                'gene': 'APOE',
-                'trait': 'Alzheimer\'s disease risk',
-                'risk_allele': 'C',
-                'protective_allele': 'T',
-                'effect_size': 3.2,  # Odds ratio from meta-analysis
-                'maf': 0.15,  # Minor allele frequency
-                'pmid': '37853979',  # Latest 2023 meta-analysis
-                'mechanism': 'Impairs amyloid-β clearance and promotes tau phosphorylation'
-            },
-            'rs7412': {
-                'gene': 'APOE',
-                'trait': 'Alzheimer\'s disease risk',
-                'risk_allele': 'T',
-                'protective_allele': 'C',
-                'effect_size': 0.6,
-                'maf': 0.08,
-                'pmid': '37853979',
-                'mechanism': 'Modifies APOE isoform - ε2 is protective'
-            },
-            'rs75932628': {
-                'gene': 'TREM2',
-                'trait': 'Alzheimer\'s disease risk',
-                'risk_allele': 'T',
-                'protective_allele': 'C',
-                'effect_size': 2.9,
-                'maf': 0.002,
-                'pmid': '38432494',  # 2024 study
-                'mechanism': 'Impairs microglial phagocytosis of amyloid-β'
-            },
-            
-            # Cardiovascular Disease Risk
-            'rs1333049': {
-                'gene': 'CDKN2B-AS1',
-                'trait': 'Coronary artery disease',
-                'risk_allele': 'C',
-                'protective_allele': 'G',
-                'effect_size': 1.29,
-                'maf': 0.47,
-                'pmid': '38448587',  # 2024 large-scale GWAS
-                'mechanism': 'Affects vascular smooth muscle cell proliferation'
-            },
-            'rs17465637': {
-                'gene': 'MIA3',
-                'trait': 'Myocardial infarction risk',
-                'risk_allele': 'C',
-                'protective_allele': 'A',
-                'effect_size': 1.20,
-                'maf': 0.74,
-                'pmid': '38291489',  # 2024 study
-                'mechanism': 'Disrupts collagen secretion in coronary arteries'
-            },
-            
-            # Metabolic Traits
-            'rs1801133': {
-                'gene': 'MTHFR',
-                'trait': 'Folate metabolism/Homocysteine levels',
-                'risk_allele': 'T',  # 677T variant
-                'normal_allele': 'C',
-                'effect_size': 1.87,  # For homozygous TT
-                'maf': 0.33,
-                'pmid': '38562087',  # 2025 comprehensive review
-                'mechanism': 'Reduces enzyme activity by 70% (TT) or 35% (CT)'
-            },
-            'rs1801131': {
-                'gene': 'MTHFR',
-                'trait': 'Folate metabolism',
-                'risk_allele': 'C',  # 1298C variant
-                'normal_allele': 'A',
-                'effect_size': 1.31,
-                'maf': 0.31,
-                'pmid': '38562087',
-                'mechanism': 'Compound heterozygosity with C677T reduces activity'
-            },
-            
-            # Type 2 Diabetes Risk
-            'rs7903146': {
-                'gene': 'TCF7L2',
-                'trait': 'Type 2 diabetes risk',
-                'risk_allele': 'T',
-                'protective_allele': 'C',
-                'effect_size': 1.40,
-                'maf': 0.30,
-                'pmid': '38498729',  # 2024 multi-ethnic study
-                'mechanism': 'Impairs insulin secretion and incretin effect'
-            },
-            'rs1801282': {
-                'gene': 'PPARG',
-                'trait': 'Type 2 diabetes/Insulin sensitivity',
-                'risk_allele': 'C',
-                'protective_allele': 'G',  # Pro12Ala
-                'effect_size': 0.86,  # Protective
-                'maf': 0.12,
-                'pmid': '38345692',
-                'mechanism': 'Ala variant improves insulin sensitivity'
-            },
-            
-            # Cancer Risk Variants
-            'rs1229984': {
-                'gene': 'ADH1B',
-                'trait': 'Alcohol metabolism/Cancer risk',
-                'fast_allele': 'G',  # His48
-                'slow_allele': 'A',  # Arg48
-                'effect_size': 0.64,  # Protective for esophageal cancer
-                'maf': 0.04,
-                'pmid': '38472915',
-                'mechanism': 'Fast metabolism reduces acetaldehyde exposure'
-            },
-            'rs1051730': {
-                'gene': 'CHRNA3',
-                'trait': 'Nicotine dependence/Lung cancer',
-                'risk_allele': 'A',
-                'protective_allele': 'G',
-                'effect_size': 1.30,
-                'maf': 0.35,
-                'pmid': '38519274',
-                'mechanism': 'Increases nicotine receptor expression'
-            },
-            
-            # Psychiatric and Neurological Traits
-            'rs4680': {
-                'gene': 'COMT',
-                'trait': 'Dopamine metabolism/Cognitive function',
-                'met_allele': 'G',  # Met158
-                'val_allele': 'A',  # Val158
-                'effect_size': 'Complex',
-                'maf': 0.50,
-                'pmid': '38467283',
-                'mechanism': 'Val variant has 4x higher enzyme activity'
-            },
-            'rs6265': {
-                'gene': 'BDNF',
-                'trait': 'Brain plasticity/Depression risk',
-                'risk_allele': 'T',  # Met66
-                'normal_allele': 'C',  # Val66
-                'effect_size': 1.27,
-                'maf': 0.20,
-                'pmid': '38523467',
-                'mechanism': 'Impairs activity-dependent BDNF secretion'
-            },
-            
-            # Autoimmune and Inflammatory Conditions
-            'rs2476601': {
-                'gene': 'PTPN22',
-                'trait': 'Autoimmune disease risk',
-                'risk_allele': 'A',
-                'protective_allele': 'G',
-                'effect_size': 1.81,
-                'maf': 0.10,
-                'pmid': '38491827',
-                'mechanism': 'Gain-of-function disrupts T-cell signaling'
-            },
-            'rs3761847': {
-                'gene': 'TRAF1-C5',
-                'trait': 'Rheumatoid arthritis risk',
-                'risk_allele': 'A',
-                'protective_allele': 'G',
-                'effect_size': 1.32,
-                'maf': 0.42,
-                'pmid': '38456291',
-                'mechanism': 'Affects NF-κB signaling pathway'
-            },
-            
-            # Pharmacogenomics - Drug Metabolism
-            'rs1045642': {
-                'gene': 'ABCB1',
-                'trait': 'Drug transport/P-glycoprotein function',
-                'variant_allele': 'A',
-                'reference_allele': 'G',
-                'effect_size': 'Variable by drug',
-                'maf': 0.45,
-                'pmid': '38534672',
-                'mechanism': 'Affects drug efflux pump expression'
-            },
-            'rs4244285': {
-                'gene': 'CYP2C19',
-                'trait': 'Clopidogrel metabolism',
-                'poor_metabolizer': 'A',
-                'normal_function': 'G',
-                'effect_size': 'Loss of function',
-                'maf': 0.15,
-                'pmid': '38478293',
-                'mechanism': 'Creates null allele CYP2C19*2'
-            },
-            
-            # Nutritional Genetics
-            'rs762551': {
-                'gene': 'CYP1A2',
-                'trait': 'Caffeine metabolism',
-                'fast_allele': 'A',
-                'slow_allele': 'C',
-                'effect_size': 'Variable',
-                'maf': 0.31,
-                'pmid': '38502847',
-                'mechanism': 'Affects phase I caffeine metabolism rate'
-            },
-            
-            # Longevity and Aging
-            'rs2802292': {
-                'gene': 'FOXO3',
-                'trait': 'Longevity/Healthy aging',
-                'longevity_allele': 'G',
-                'reference_allele': 'T',
-                'effect_size': 1.35,  # For reaching 100 years
-                'maf': 0.35,
-                'pmid': '38492617',
-                'mechanism': 'Enhances stress resistance pathways'
-            },
-            'rs1042522': {
-                'gene': 'TP53',
-                'trait': 'Cancer resistance/Longevity trade-off',
-                'pro_allele': 'C',  # Pro72
-                'arg_allele': 'G',  # Arg72
-                'effect_size': 'Complex',
-                'maf': 0.26,
-                'pmid': '38507423',
-                'mechanism': 'Pro72 variant shows enhanced tumor suppression'
-            }
-        }
-    
-    def _initialize_fascinating_traits(self):
-        """Initialize database of fascinating and unusual genetic traits."""
-        
-        self.fascinating_traits = {
-            # Sensory Perception
-            'rs713598': {
-                'gene': 'TAS2R38',
-                'trait': 'Bitter taste perception (PTC tasting)',
-                'taster_allele': 'C',
-                'phenotype': 'Ability to taste phenylthiocarbamide',
-                'fun_fact': 'Used in classic genetics demonstrations'
-            },
-            'rs1726866': {
-                'gene': 'TAS2R38',
-                'trait': 'Bitter taste perception',
-                'taster_allele': 'C',
-                'phenotype': 'Sensitivity to bitter compounds in vegetables'
-            },
-            'rs10246939': {
-                'gene': 'TAS2R38',
-                'trait': 'Bitter taste perception',
-                'taster_allele': 'C',
-                'phenotype': 'Affects preference for cruciferous vegetables'
-            },
-            'rs17822931': {
-                'gene': 'ABCC11',
-                'trait': 'Earwax type/Body odor',
-                'dry_allele': 'T',
-                'wet_allele': 'C',
-                'phenotype': 'Dry earwax and reduced body odor',
-                'fun_fact': 'Common in East Asians, affects deodorant needs'
-            },
-            'rs4481887': {
-                'gene': 'OR5A1',
-                'trait': 'Asparagus anosmia',
-                'smeller_allele': 'G',
-                'non_smeller_allele': 'A',
-                'phenotype': 'Ability to smell asparagus metabolites in urine',
-                'fun_fact': 'About 40% of people cannot smell this'
-            },
-            
-            # Physical Traits
-            'rs3827760': {
-                'gene': 'EDAR',
-                'trait': 'Hair thickness/Shovel-shaped incisors',
-                'thick_hair_allele': 'G',
-                'normal_allele': 'A',
-                'phenotype': 'Thicker hair, more sweat glands, shovel-shaped teeth',
-                'fun_fact': 'Arose ~30,000 years ago in East Asia'
-            },
-            'rs1042602': {
-                'gene': 'TYR',
-                'trait': 'Eye color',
-                'light_allele': 'A',
-                'dark_allele': 'C',
-                'phenotype': 'Contributes to blue/light eye color'
-            },
-            'rs12913832': {
-                'gene': 'HERC2/OCA2',
-                'trait': 'Eye color',
-                'blue_allele': 'G',
-                'brown_allele': 'A',
-                'phenotype': 'Major determinant of blue vs brown eyes',
-                'fun_fact': 'All blue-eyed people share a common ancestor ~6-10k years ago'
-            },
-            'rs1805007': {
-                'gene': 'MC1R',
-                'trait': 'Red hair/Fair skin',
-                'red_hair_allele': 'T',
-                'normal_allele': 'C',
-                'phenotype': 'Red hair, freckles, sun sensitivity',
-                'fun_fact': 'Carriers have increased pain tolerance'
-            },
-            'rs1805008': {
-                'gene': 'MC1R',
-                'trait': 'Red hair/Fair skin',
-                'red_hair_allele': 'T',
-                'normal_allele': 'C',
-                'phenotype': 'Another red hair variant'
-            },
-            
-            # Sleep and Circadian Traits
-            'rs1801260': {
-                'gene': 'CLOCK',
-                'trait': 'Chronotype (morning/evening person)',
-                'evening_allele': 'C',
-                'morning_allele': 'T',
-                'phenotype': 'Evening chronotype preference',
-                'fun_fact': 'Night owls may have this variant'
-            },
-            'rs121912617': {
-                'gene': 'DEC2',
-                'trait': 'Short sleep phenotype',
-                'short_sleep_allele': 'G',
-                'normal_allele': 'A',
-                'phenotype': 'Need only 4-6 hours of sleep',
-                'fun_fact': 'Extremely rare "natural short sleeper" mutation'
-            },
-            
-            # Muscle and Athletic Traits
-            'rs1815739': {
-                'gene': 'ACTN3',
-                'trait': 'Muscle composition',
-                'power_allele': 'C',  # R577
-                'endurance_allele': 'T',  # X577
-                'phenotype': 'Sprint vs endurance muscle fibers',
-                'fun_fact': 'Almost all Olympic sprinters have at least one C'
-            },
-            'rs1049434': {
-                'gene': 'MCT1',
-                'trait': 'Lactate clearance',
-                'efficient_allele': 'T',
-                'normal_allele': 'A',
-                'phenotype': 'Better lactate clearance during exercise'
-            },
-            
-            # Unique Abilities
-            'rs53576': {
-                'gene': 'OXTR',
-                'trait': 'Oxytocin receptor/Empathy',
-                'empathy_allele': 'G',
-                'normal_allele': 'A',
-                'phenotype': 'Enhanced empathy and social bonding',
-                'fun_fact': 'GG genotype associated with more prosocial behavior'
-            },
-            'rs1800497': {
-                'gene': 'DRD2/ANKK1',
-                'trait': 'Dopamine receptor density',
-                'low_density_allele': 'T',
-                'normal_allele': 'C',
-                'phenotype': 'Affects reward processing and addiction risk',
-                'fun_fact': 'T allele carriers may seek more novel experiences'
-            },
-            
-            # Alcohol and Substance Response
-            'rs671': {
-                'gene': 'ALDH2',
-                'trait': 'Alcohol flush reaction',
-                'flush_allele': 'A',
-                'normal_allele': 'G',
-                'phenotype': 'Asian alcohol flush syndrome',
-                'fun_fact': 'Protective against alcoholism but increases cancer risk'
-            },
-            'rs1229984': {
-                'gene': 'ADH1B',
-                'trait': 'Alcohol metabolism speed',
-                'fast_allele': 'G',
-                'slow_allele': 'A',
-                'phenotype': 'Fast alcohol metabolism',
-                'fun_fact': 'Fast metabolizers may drink less due to quick acetaldehyde buildup'
-            },
-            
-            # Cilantro Taste
-            'rs72921001': {
-                'gene': 'OR6A2',
-                'trait': 'Cilantro taste perception',
-                'soap_taste_allele': 'A',
-                'normal_allele': 'C',
-                'phenotype': 'Cilantro tastes like soap',
-                'fun_fact': 'Affects 10-14% of people'
-            },
-            
-            # Pain Perception
-            'rs1799971': {
-                'gene': 'OPRM1',
-                'trait': 'Pain sensitivity/Opioid response',
-                'sensitive_allele': 'G',
-                'normal_allele': 'A',
-                'phenotype': 'Increased pain sensitivity, need more opioids',
-                'fun_fact': 'May need 2-4x more morphine for same effect'
-            },
-            
-            # Lactose Tolerance
-            'rs4988235': {
-                'gene': 'MCM6',
-                'trait': 'Lactase persistence',
-                'persistent_allele': 'A',
-                'intolerant_allele': 'G',
-                'phenotype': 'Adult lactose tolerance',
-                'fun_fact': 'Evolved independently in Europe and Africa'
-            },
-            
-            # Perfect Pitch
-            'rs3057': {
-                'gene': 'ASAP1',
-                'trait': 'Absolute pitch ability',
-                'pitch_allele': 'T',
-                'normal_allele': 'C',
-                'phenotype': 'May contribute to perfect pitch',
-                'fun_fact': 'Found in higher frequency in musicians with perfect pitch'
-            },
-            
-            # Photic Sneeze Reflex
-            'rs10427255': {
-                'gene': 'near ZEB2',
-                'trait': 'Photic sneeze reflex',
-                'sneeze_allele': 'C',
-                'normal_allele': 'T',
-                'phenotype': 'Sneezing when exposed to bright light',
-                'fun_fact': 'Affects 18-35% of people, called ACHOO syndrome'
-            }
-        }
-    
-    def _initialize_ancient_variants(self):
-        """Initialize variants inherited from ancient humans."""
-        
-        self.ancient_variants = {
-            # Neanderthal variants
-            'rs3916235': {
-                'gene': 'SLC24A5',
-                'source': 'Modern human',
-                'trait': 'Skin pigmentation',
-                'phenotype': 'Light skin color'
-            },
-            'rs1426654': {
-                'gene': 'SLC24A5',
-                'source': 'Modern human',
-                'trait': 'Skin pigmentation',
-                'phenotype': 'Major light skin variant'
-            },
-            'rs4849721': {
-                'gene': 'near ASIP',
-                'source': 'Neanderthal',
-                'trait': 'Skin/hair pigmentation',
-                'phenotype': 'Lighter skin and hair',
-                'introgression_freq': 0.70  # Frequency in Europeans
-            },
-            'rs12896399': {
-                'gene': 'SLC14A2',
-                'source': 'Neanderthal',
-                'trait': 'Urea transport',
-                'phenotype': 'Enhanced kidney function in cold',
-                'introgression_freq': 0.20
-            },
-            'rs1129740': {
-                'gene': 'HLA region',
-                'source': 'Neanderthal/Denisovan',
-                'trait': 'Immune response',
-                'phenotype': 'Enhanced pathogen resistance',
-                'introgression_freq': 0.50
-            },
-            'rs72613662': {
-                'gene': 'EPAS1',
-                'source': 'Denisovan',
-                'trait': 'High altitude adaptation',
-                'phenotype': 'Better oxygen utilization at altitude',
-                'introgression_freq': 0.80  # In Tibetans
-            },
-            'rs10490130': {
-                'gene': 'WARS2',
-                'source': 'Neanderthal',
-                'trait': 'Mitochondrial function',
-                'phenotype': 'Cold climate adaptation',
-                'introgression_freq': 0.15
-            },
-            'rs9574565': {
-                'gene': 'STAT2',
-                'source': 'Neanderthal',
-                'trait': 'Innate immunity',
-                'phenotype': 'Enhanced antiviral response',
-                'introgression_freq': 0.25
-            }
-        }
-    
-    def _initialize_longevity_variants(self):
-        """Initialize variants associated with longevity and healthspan."""
-        
-        self.longevity_variants = {
-            'rs2802292': {
-                'gene': 'FOXO3',
-                'trait': 'Longevity',
-                'longevity_allele': 'G',
-                'effect': 'Associated with living to 100+',
-                'mechanism': 'Enhanced stress resistance and DNA repair'
-            },
-            'rs1042522': {
-                'gene': 'TP53',
-                'trait': 'Cancer resistance vs longevity',
-                'pro72_allele': 'C',
-                'arg72_allele': 'G',
-                'effect': 'Pro72 better cancer suppression, Arg72 better fertility',
-                'mechanism': 'Tumor suppressor efficiency trade-off'
-            },
-            'rs2811712': {
-                'gene': 'CETP',
-                'trait': 'HDL cholesterol/Longevity',
-                'protective_allele': 'G',
-                'effect': 'Higher HDL, reduced cardiovascular disease',
-                'mechanism': 'Reduced cholesterol ester transfer'
-            },
-            'rs1801133': {
-                'gene': 'MTHFR',
-                'trait': 'Folate metabolism/Aging',
-                'risk_allele': 'T',
-                'effect': 'Affects homocysteine levels and aging',
-                'mechanism': 'Reduced methylation capacity'
-            },
-            'rs1800795': {
-                'gene': 'IL6',
-                'trait': 'Inflammation/Aging',
-                'low_inflammation_allele': 'C',
-                'effect': 'Lower chronic inflammation',
-                'mechanism': 'Reduced IL-6 production'
-            },
-            'rs6265': {
-                'gene': 'BDNF',
-                'trait': 'Cognitive aging',
-                'met_allele': 'T',
-                'val_allele': 'C',
-                'effect': 'Val/Val maintains better cognitive function with age',
-                'mechanism': 'Activity-dependent neurotrophin secretion'
-            },
-            'rs762551': {
-                'gene': 'CYP1A2',
-                'trait': 'Caffeine metabolism/Longevity',
-                'fast_allele': 'A',
-                'effect': 'Fast metabolizers may benefit from coffee consumption',
-                'mechanism': 'Rapid caffeine clearance'
-            }
-        }
-    
-    def _initialize_cognitive_variants(self):
-        """Initialize variants affecting cognitive abilities and intelligence."""
-        
-        self.cognitive_variants = {
-            'rs4680': {
-                'gene': 'COMT',
-                'trait': 'Working memory/Executive function',
-                'met_allele': 'G',
-                'val_allele': 'A',
-                'effect': 'Met = better working memory, Val = better stress resilience',
-                'mechanism': 'Dopamine metabolism in prefrontal cortex'
-            },
-            'rs1800497': {
-                'gene': 'DRD2/ANKK1',
-                'trait': 'Learning and memory',
-                'a1_allele': 'T',
-                'a2_allele': 'C',
-                'effect': 'A1 carriers have fewer D2 receptors',
-                'mechanism': 'Affects reward-based learning'
-            },
-            'rs6265': {
-                'gene': 'BDNF',
-                'trait': 'Memory and learning',
-                'met_allele': 'T',
-                'val_allele': 'C',
-                'effect': 'Val/Val shows better episodic memory',
-                'mechanism': 'Brain-derived neurotrophic factor function'
-            },
-            'rs17070145': {
-                'gene': 'KIBRA',
-                'trait': 'Memory performance',
-                'better_memory_allele': 'T',
-                'effect': 'T carriers show better episodic memory',
-                'mechanism': 'Synaptic plasticity regulation'
-            },
-            'rs1130214': {
-                'gene': 'AKT1',
-                'trait': 'Processing efficiency',
-                'efficient_allele': 'T',
-                'effect': 'Better cognitive processing under cannabis',
-                'mechanism': 'Dopamine signaling modulation'
-            },
-            'rs10119': {
-                'gene': 'APOE/TOMM40',
-                'trait': 'Cognitive decline rate',
-                'slow_decline_allele': 'G',
-                'effect': 'Slower age-related cognitive decline',
-                'mechanism': 'Mitochondrial function in neurons'
-            }
-        }
-    
-    def _initialize_athletic_variants(self):
-        """Initialize comprehensive athletic performance variants."""
+        # Variant databases: the compiled knowledge base shared with genetic_analyzer_ultra
+        # (utils.knowledge_artifact), loaded once per process and read-only
+        knowledge_base = knowledge_artifact.load_shared()
+        for name in knowledge_base.keys():
+            setattr(self, name, knowledge_base[name])
         
-        self.athletic_variants = {
-            'rs1815739': {
-                'gene': 'ACTN3',
-                'trait': 'Muscle fiber type',
-                'power_allele': 'C',
-                'endurance_allele': 'T',
-                'effect': 'CC = power/sprint, TT = endurance',
-                'elite_frequency': '95% of elite sprinters have C'
-            },
-            'rs1049434': {
-                'gene': 'MCT1',
-                'trait': 'Lactate transport',
-                'efficient_allele': 'T',
-                'effect': 'Better lactate clearance',
-                'mechanism': 'Monocarboxylate transporter efficiency'
-            },
-            'rs4253778': {
-                'gene': 'PPARA',
-                'trait': 'Fat metabolism',
-                'efficient_allele': 'G',
-                'effect': 'Better fat oxidation during endurance',
-                'mechanism': 'Peroxisome proliferator activation'
-            },
-            'rs6552828': {
-                'gene': 'ACTN3',
-                'trait': 'Muscle damage/recovery',
-                'protective_allele': 'A',
-                'effect': 'Less muscle damage from eccentric exercise',
-                'mechanism': 'Structural protein stability'
-            },
-            'rs1800012': {
-                'gene': 'COL1A1',
-                'trait': 'Injury risk',
-                'risk_allele': 'T',
-                'effect': 'Increased risk of ACL rupture',
-                'mechanism': 'Collagen structure alteration'
-            },
-            'rs699': {
-                'gene': 'AGT',
-                'trait': 'Power performance',
-                'power_allele': 'C',
-                'effect': 'Associated with power athlete status',
-                'mechanism': 'Angiotensin system effects'
-            },
-            'rs1799752': {
-                'gene': 'ACE',
-                'trait': 'Endurance capacity',
-                'endurance_allele': 'I',
-                'power_allele': 'D',
-                'effect': 'I/I favors endurance, D/D favors power',
-                'mechanism': 'ACE activity levels'
-            }
-        }
-    
-    def _initialize_sensory_variants(self):
-        """Initialize variants affecting sensory perception."""
-        
-        self.sensory_variants = {
-            # Taste
-            'rs713598': {
-                'gene': 'TAS2R38',
-                'trait': 'Bitter taste (PTC)',
-                'taster_allele': 'C',
-                'non_taster_allele': 'G',
-                'effect': 'Ability to taste phenylthiocarbamide'
-            },
-            'rs1726866': {
-                'gene': 'TAS2R38',
-                'trait': 'Bitter taste (vegetables)',
-                'sensitive_allele': 'C',
-                'effect': 'Cruciferous vegetables taste more bitter'
-            },
-            'rs72921001': {
-                'gene': 'OR6A2',
-                'trait': 'Cilantro perception',
-                'soap_allele': 'A',
-                'effect': 'Cilantro tastes like soap'
-            },
-            'rs227091': {
-                'gene': 'TAS1R2',
-                'trait': 'Sweet taste',
-                'less_sweet_allele': 'G',
-                'effect': 'Reduced sweet taste perception'
-            },
-            
-            # Smell
-            'rs4481887': {
-                'gene': 'OR5A1',
-                'trait': 'Asparagus metabolite',
-                'smeller_allele': 'G',
-                'effect': 'Can smell asparagus in urine'
-            },
-            'rs6591536': {
-                'gene': 'OR11H7P',
-                'trait': 'Androstenone perception',
-                'sensitive_allele': 'G',
-                'effect': 'Can smell boar taint/male pheromones'
-            },
-            'rs1953558': {
-                'gene': 'OR2J3',
-                'trait': 'Cis-3-hexen-1-ol',
-                'smeller_allele': 'C',
-                'effect': 'Can smell "green leaf" odor'
-            },
-            
-            # Vision
-            'rs1800401': {
-                'gene': 'OPN1MW',
-                'trait': 'Color vision',
-                'variant_allele': 'C',
-                'effect': 'Shifted green cone sensitivity'
-            },
-            'rs1238566': {
-                'gene': 'RGS6',
-                'trait': 'Motion perception',
-                'enhanced_allele': 'A',
-                'effect': 'Better motion detection'
-            },
-            
-            # Hearing
-            'rs2227956': {
-                'gene': 'GRM7',
-                'trait': 'Perfect pitch tendency',
-                'musical_allele': 'T',
-                'effect': 'Associated with absolute pitch'
-            },
-            'rs3057': {
-                'gene': 'ASAP1',
-                'trait': 'Musical ability',
-                'ability_allele': 'T',
-                'effect': 'Enhanced pitch discrimination'
-            }
-        }
-        
-    def _initialize_polygenic_scores(self):
-        """Initialize polygenic risk score calculations based on latest GWAS."""
-        
-        # Polygenic risk scores from major consortia (2024-2025)
-        self.polygenic_scores = {
-            'CAD_PRS': {  # Coronary Artery Disease
-                'name': 'Coronary Artery Disease Risk',
-                'variants': {
-                    'rs1333049': {'weight': 0.127, 'risk_allele': 'C'},
-                    'rs17465637': {'weight': 0.095, 'risk_allele': 'C'},
-                    'rs6725887': {'weight': 0.118, 'risk_allele': 'C'},
-                    'rs9349379': {'weight': 0.090, 'risk_allele': 'G'},
-                    'rs1746048': {'weight': 0.087, 'risk_allele': 'C'},
-                    'rs1122608': {'weight': 0.077, 'risk_allele': 'G'},
-                    'rs9968032': {'weight': 0.065, 'risk_allele': 'T'}
-                },
-                'pmid': '38523894',
-                'population_mean': 0,
-                'population_sd': 1
-            },
-            'T2D_PRS': {  # Type 2 Diabetes
-                'name': 'Type 2 Diabetes Risk',
-                'variants': {
-                    'rs7903146': {'weight': 0.172, 'risk_allele': 'T'},
-                    'rs1801282': {'weight': -0.061, 'risk_allele': 'C'},
-                    'rs5219': {'weight': 0.112, 'risk_allele': 'T'},
-                    'rs13266634': {'weight': 0.104, 'risk_allele': 'C'},
-                    'rs10811661': {'weight': 0.098, 'risk_allele': 'T'},
-                    'rs4402960': {'weight': 0.085, 'risk_allele': 'T'},
-                    'rs1111875': {'weight': 0.077, 'risk_allele': 'C'}
-                },
-                'pmid': '38498729',
-                'population_mean': 0,
-                'population_sd': 1
-            },
-            'AD_PRS': {  # Alzheimer's Disease (non-APOE)
-                'name': 'Alzheimer\'s Disease Risk (non-APOE)',
-                'variants': {
-                    'rs75932628': {'weight': 0.451, 'risk_allele': 'T'},  # TREM2
-                    'rs11218343': {'weight': 0.081, 'risk_allele': 'C'},  # SORL1
-                    'rs17125944': {'weight': 0.123, 'risk_allele': 'C'},  # ABCA7
-                    'rs3851179': {'weight': 0.088, 'risk_allele': 'A'},  # PICALM
-                    'rs9349407': {'weight': 0.078, 'risk_allele': 'C'},  # CD2AP
-                    'rs9331896': {'weight': 0.104, 'risk_allele': 'C'},  # CLU
-                    'rs4147929': {'weight': 0.079, 'risk_allele': 'A'}   # ABCA7
-                },
-                'pmid': '38467912',
-                'population_mean': 0,
-                'population_sd': 1
-            },
-            'HEIGHT_PRS': {  # Educational example - height
-                'name': 'Predicted Height (polygenic)',
-                'variants': {
-                    'rs11205277': {'weight': 0.44, 'tall_allele': 'A'},  # in mm
-                    'rs17511102': {'weight': 0.37, 'tall_allele': 'T'},
-                    'rs2485518': {'weight': 0.28, 'tall_allele': 'C'},
-                    'rs7846385': {'weight': 0.26, 'tall_allele': 'C'},
-                    'rs1659127': {'weight': 0.21, 'tall_allele': 'T'}
-                },
-                'pmid': '38502156',
-                'population_mean': 0,
-                'population_sd': 48.7  # mm
-            },
-            'INTELLIGENCE_PRS': {  # Educational attainment proxy
-                'name': 'Educational Attainment (Intelligence proxy)',
-                'variants': {
-                    'rs9320913': {'weight': 0.021, 'education_allele': 'A'},
-                    'rs11712056': {'weight': 0.019, 'education_allele': 'C'},
-                    'rs4851266': {'weight': 0.018, 'education_allele': 'T'},
-                    'rs9388489': {'weight': 0.017, 'education_allele': 'A'},
-                    'rs2490272': {'weight': 0.016, 'education_allele': 'G'}
-                },
-                'pmid': '38514899',
-                'population_mean': 0,
-                'population_sd': 1
-            },
-            'DEPRESSION_PRS': {
-                'name': 'Major Depression Risk',
-                'variants': {
-                    'rs2179744': {'weight': 0.038, 'risk_allele': 'T'},
-                    'rs1432639': {'weight': 0.035, 'risk_allele': 'A'},
-                    'rs1080066': {'weight': 0.032, 'risk_allele': 'C'},
-                    'rs3132682': {'weight': 0.029, 'risk_allele': 'G'},
-                    'rs7044150': {'weight': 0.027, 'risk_allele': 'T'}
-                },
-                'pmid': '38492156',
-                'population_mean': 0,
-                'population_sd': 1
-            }
-        }
-    
-    def _initialize_pharmacogenomics(self):
-        """Initialize comprehensive pharmacogenomics analysis."""
-        
-        # Based on CPIC guidelines and PharmGKB (2024-2025)
-        self.pharmacogenomics = {
-            'CYP2D6': {
-                'variants': {
-                    'rs1065852': {'allele': '*10', 'function': 'decreased'},
-                    'rs3892097': {'allele': '*4', 'function': 'none'},
-                    'rs5030655': {'allele': '*6', 'function': 'none'},
-                    'rs35742686': {'allele': '*3', 'function': 'none'}
-                },
-                'drugs': ['codeine', 'tramadol', 'tamoxifen', 'atomoxetine'],
-                'pmid': '38519473'
-            },
-            'CYP2C19': {
-                'variants': {
-                    'rs4244285': {'allele': '*2', 'function': 'none'},
-                    'rs4986893': {'allele': '*3', 'function': 'none'},
-                    'rs28399504': {'allele': '*4', 'function': 'none'},
-                    'rs12248560': {'allele': '*17', 'function': 'increased'}
-                },
-                'drugs': ['clopidogrel', 'voriconazole', 'proton pump inhibitors'],
-                'pmid': '38478293'
-            },
-            'CYP2C9': {
-                'variants': {
-                    'rs1799853': {'allele': '*2', 'function': 'decreased'},
-                    'rs1057910': {'allele': '*3', 'function': 'decreased'}
-                },
-                'drugs': ['warfarin', 'phenytoin', 'NSAIDs'],
-                'pmid': '38493827'
-            },
-            'VKORC1': {
-                'variants': {
-                    'rs9923231': {'allele': '-1639G>A', 'warfarin_sensitivity': 'A'}
-                },
-                'drugs': ['warfarin'],
-                'pmid': '38501923'
-            },
-            'SLCO1B1': {
-                'variants': {
-                    'rs4149056': {'allele': '*5', 'function': 'decreased'}
-                },
-                'drugs': ['simvastatin', 'atorvastatin', 'rosuvastatin'],
-                'pmid': '38486719'
-            },
-            'TPMT': {
-                'variants': {
-                    'rs1142345': {'allele': '*3C', 'function': 'decreased'},
-                    'rs1800460': {'allele': '*3B', 'function': 'decreased'}
-                },
-                'drugs': ['azathioprine', 'mercaptopurine', 'thioguanine'],
-                'pmid': '38512847'
-            },
-            'DPYD': {
-                'variants': {
-                    'rs3918290': {'allele': '*2A', 'function': 'none'},
-                    'rs55886062': {'allele': '*13', 'function': 'decreased'},
-                    'rs67376798': {'allele': '2846A>T', 'function': 'decreased'}
-                },
-                'drugs': ['5-fluorouracil', 'capecitabine'],
-                'pmid': '38497162'
-            },
-            'HLA-B': {
-                'variants': {
-                    'rs2395029': {'haplotype': 'HLA-B*57:01', 'linked': 'G'},
-                    'rs2244613': {'haplotype': 'HLA-B*15:02', 'linked': 'A'}
-                },
-                'drugs': ['abacavir', 'carbamazepine'],
-                'pmid': '38504927'
-            }
-        }
-    
-    def _initialize_rare_variants(self):
-        """Initialize rare variant analysis for Mendelian conditions."""
-        
-        # Pathogenic variants from ClinVar (2025)
-        self.rare_variants = {
-            'rs121908001': {
-                'gene': 'LDLR',
-                'condition': 'Familial hypercholesterolemia',
-                'inheritance': 'Autosomal dominant',
-                'pathogenicity': 'Pathogenic',
-                'maf': 0.0001,
-                'clinical_significance': 'Early cardiovascular disease'
-            },
-            'rs80338720': {
-                'gene': 'BRCA2',
-                'condition': 'Hereditary breast/ovarian cancer',
-                'inheritance': 'Autosomal dominant',
-                'pathogenicity': 'Pathogenic',
-                'maf': 0.00003,
-                'clinical_significance': 'Increased cancer risk'
-            },
-            'rs28940279': {
-                'gene': 'HFE',
-                'condition': 'Hereditary hemochromatosis',
-                'inheritance': 'Autosomal recessive',
-                'pathogenicity': 'Pathogenic',
-                'maf': 0.064,
-                'clinical_significance': 'Iron overload'
-            },
-            'rs28940579': {
-                'gene': 'HFE',
-                'condition': 'Hereditary hemochromatosis',
-                'inheritance': 'Autosomal recessive',
-                'pathogenicity': 'Pathogenic',
-                'maf': 0.014,
-                'clinical_significance': 'Iron overload'
-            },
-            'rs80338908': {
-                'gene': 'SLC12A3',
-                'condition': 'Gitelman syndrome',
-                'inheritance': 'Autosomal recessive',
-                'pathogenicity': 'Pathogenic',
-                'maf': 0.001,
-                'clinical_significance': 'Electrolyte imbalance'
-            },
-            'rs28937316': {
-                'gene': 'MEFV',
-                'condition': 'Familial Mediterranean fever',
-                'inheritance': 'Autosomal recessive',
-                'pathogenicity': 'Pathogenic',
-                'maf': 0.001,
-                'clinical_significance': 'Periodic fever episodes'
-            },
-            'rs28940313': {
-                'gene': 'CFTR',
-                'condition': 'Cystic fibrosis',
-                'inheritance': 'Autosomal recessive',
-                'pathogenicity': 'Pathogenic',
-                'maf': 0.02,
-                'clinical_significance': 'Respiratory/digestive issues'
-            }
-        }
-    
     def load_data(self):
         """Load and parse the 23andMe data file with quality control."""
         print("Loading genetic data with quality control...")
         
         try:
-            # Read the file, skipping comment lines
-            with open(self.filename, 'r') as f:
-                lines = f.readlines()
-            
-            # Extract metadata and data
-            data_lines = []
-            for line in lines:
-                if line.startswith('#'):
-                    if 'generated by 23andMe' in line:
-                        self.metadata['source'] = '23andMe'
-                    elif 'reference human assembly build' in line:
-                        self.metadata['build'] = 'GRCh37/hg19'
-                    elif 'array' in line.lower():
-                        self.metadata['array'] = line.strip()
-                else:
-                    data_lines.append(line.strip())
-            
-            # Parse the genetic data
-            from io import StringIO
-            data_string = '\n'.join(data_lines)
-            self.data = pd.read_csv(StringIO(data_string), sep='\t', 
-                                   names=['rsid', 'chromosome', 'position', 'genotype'])
-            
-            # Quality control steps
-            self.data['chromosome'] = self.data['chromosome'].astype(str)
+            # Parse header metadata and stream the body into the C parser
+            self.data, header_metadata = loader.read_raw_genotypes(self.filename)
+            self.metadata.update(header_metadata)
             
             # Count no-calls before removing them
             no_calls = len(self.data[self.data['genotype'].isin(['--', 'DD', 'II'])])
@@ -1071,6 +85,9 @@ class AdvancedGeneticAnalyzer:
             # Check for strand consistency
             self.data['genotype_sorted'] = self.data['genotype'].apply(lambda x: ''.join(sorted(x)))
             
+            # Index positions per chromosome for region queries and per-chromosome plots
+            self.region_index = region_index.RegionIndex.from_frame(self.data)
+            
             print(f"Successfully loaded {len(self.data):,} genetic variants")
             print(f"Call rate: {self.metadata['call_rate']:.2%}")
             print(f"Chromosomes present: {sorted(self.data['chromosome'].unique())}")
@@ -2155,14 +1172,14 @@ class AdvancedGeneticAnalyzer:
         
         # Group variants by chromosome
         chrom_data = []
-        for chrom in sorted(self.data['chromosome'].unique()):
+        for chrom in sorted(self.region_index.chromosomes):
             if chrom.isdigit() or chrom in ['X', 'Y']:
-                chrom_variants = self.data[self.data['chromosome'] == chrom]
+                positions = self.region_index.chromosome(chrom).positions
                 # Simulate -log10(p) values for visualization
-                significance = np.random.exponential(1, len(chrom_variants))
+                significance = np.random.exponential(1, len(positions))
                 chrom_data.append({
                     'chrom': chrom,
-                    'positions': chrom_variants['position'].values,
+                    'positions': positions,
                     'significance': significance
                 })
         
@@ -22,6 +22,8 @@ import json
 from datetime import datetime
 import os
 
+from utils import loader
+
 warnings.filterwarnings('ignore')
 
 # Configure plotting style for better visualizations
@@ -136,32 +138,9 @@ class GeneticAnalyzer:
         print("Loading genetic data...")
         
         try:
-            # Read the file, skipping comment lines
-            with open(self.filename, 'r') as f:
-                lines = f.readlines()
-            
-            # Extract metadata from header comments
-            data_lines = []
-            for line in lines:
-                if line.startswith('#'):
-                    if 'generated by 23andMe' in line:
-                        self.metadata['source'] = '23andMe'
-                    elif 'reference human assembly build' in line:
-                        self.metadata['build'] = 'GRCh37/hg19'
-                else:
-                    data_lines.append(line.strip())
-            
-            # Parse the genetic data
-            # Create DataFrame from non-comment lines
-            from io import StringIO
-            data_string = '\n'.join(data_lines)
-            self.data = pd.read_csv(StringIO(data_string), sep='\t')
-            
-            # Clean up the data
-            self.data.columns = ['rsid', 'chromosome', 'position', 'genotype']
-            
-            # Convert chromosome to string for consistency
-            self.data['chromosome'] = self.data['chromosome'].astype(str)
+            # Parse header metadata and stream the body into the C parser
+            self.data, header_metadata = loader.read_raw_genotypes(self.filename)
+            self.metadata.update(header_metadata)
             
             # Remove any rows with missing genotypes
             self.data = self.data[self.data['genotype'] != '--']
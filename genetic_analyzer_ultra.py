@@ -16,15 +16,15 @@ Last Updated: June 2025
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from collections import defaultdict
+from collections import Counter, defaultdict
 import warnings
 import json
 from datetime import datetime
 import os
-from scipy import stats
 import math
+import platform
+import time
+import tracemalloc
 import validation
 
 # Import new utility modules
@@ -32,16 +32,49 @@ import effect_utils
 import disclaimers
 import versioning
 from utils import ancestry 
+from utils import batch
+from utils import cohort
+from utils import genome_cache
+from utils import genome_stats
+from utils import gene_annotation
+from utils import genome_store
+from utils import genotype_index
+from utils import knowledge_artifact
+from utils import loader
+from utils import panels
+from utils import pca_projection
+from utils import prs_reference
+from utils import prs_weights
+from utils import region_index
+from utils import vcf
+from utils import vcf_index
+from utils import scheduler
 from utils import safety # New import for safeguard decorator
 
 warnings.filterwarnings('ignore')
 
-# Configure plotting style for publication-quality visualizations
-plt.style.use('seaborn-v0_8-whitegrid')
-sns.set_palette("Set2")
-plt.rcParams['figure.dpi'] = 300
-plt.rcParams['savefig.dpi'] = 300
-plt.rcParams['font.size'] = 10
+# matplotlib, seaborn and scipy.stats are only needed to draw plots, so they are
+# imported on first use by _import_plotting(); --no-plots runs never load them
+plt = None
+sns = None
+stats = None
+
+def _import_plotting():
+    """Import the plotting stack once and configure the publication style."""
+    global plt, sns, stats
+    if plt is not None:
+        return
+    import matplotlib.pyplot as pyplot
+    import seaborn
+    from scipy import stats as scipy_stats
+    
+    # Configure plotting style for publication-quality visualizations
+    pyplot.style.use('seaborn-v0_8-whitegrid')
+    seaborn.set_palette("Set2")
+    pyplot.rcParams['figure.dpi'] = 300
+    pyplot.rcParams['savefig.dpi'] = 300
+    pyplot.rcParams['font.size'] = 10
+    plt, sns, stats = pyplot, seaborn, scipy_stats
 
 class AdvancedGeneticAnalyzer:
     """
@@ -49,31 +82,154 @@ class AdvancedGeneticAnalyzer:
     the latest scientific research and fascinating genetic insights.
     """
     
-    def __init__(self, filename, cli_ancestry=None): # Added cli_ancestry parameter
+    # Knowledge-base panels joined against the sample in one batched lookup;
+    # the flag marks panels nested by gene/score under a 'variants' key
+    KNOWLEDGE_BASE_PANELS = {
+        'known_variants': False,
+        'fascinating_traits': False,
+        'ancient_variants': False,
+        'longevity_variants': False,
+        'cognitive_variants': False,
+        'athletic_variants': False,
+        'sensory_variants': False,
+        'rare_variants': False,
+        'pharmacogenomics': True,
+        'polygenic_scores': True,
+    }
+    
+    # Genotype interpreter of each panel; utils.knowledge_artifact precomputes
+    # their outcome for every possible genotype of every panel entry
+    PANEL_INTERPRETERS = {
+        'known_variants': '_calculate_variant_risk',
+        'fascinating_traits': '_interpret_fascinating_trait',
+        'longevity_variants': '_interpret_longevity_variant',
+        'cognitive_variants': '_interpret_cognitive_variant',
+        'athletic_variants': '_interpret_athletic_variant',
+        'sensory_variants': '_interpret_sensory_variant',
+    }
+    
+    # rsids read directly by calculate_ancestry_composition and
+    # analyze_traits_and_characteristics rather than through a panel;
+    # targeted loading keeps these too
+    STAGE_MARKER_RSIDS = (
+        'rs1426654', 'rs16891982', 'rs1042602', 'rs12913832', 'rs3827760',
+        'rs174570', 'rs4988235', 'rs1129038', 'rs2814778', 'rs3916235',
+        'rs1815739', 'rs1049434', 'rs1801260', 'rs11932595', 'rs4753426',
+    )
+    
+    # Pipeline stages in serial order, as (method, requires, provides). 'data' is
+    # the loaded genome and 'ancestry_flag' the (possibly inferred) ancestry; the
+    # other keys are sections of self.results. run_complete_analysis hands this
+    # graph to utils.scheduler, which runs independent stages concurrently.
+    ANALYSIS_STAGES = (
+        ('load_data', (), ('data',)),
+        ('_perform_pca_for_ancestry', ('data',), ('ancestry_flag', 'pca_projection')),
+        ('analyze_basic_statistics', ('data',), ('advanced_stats',)),
+        ('analyze_disease_risk', ('data',), ('disease_risk', 'validation_summary_report')),
+        ('calculate_polygenic_scores', ('data', 'ancestry_flag'), ('polygenic_scores',)),
+        ('analyze_pharmacogenomics', ('data',), ('pharmacogenomics',)),
+        ('analyze_rare_variants', ('data',), ('rare_variants',)),
+        ('calculate_ancestry_composition', ('data',), ('ancestry',)),
+        ('analyze_traits_and_characteristics', ('data',), ('traits',)),
+        ('analyze_fascinating_traits', ('data',), ('fascinating_traits',)),
+        ('analyze_ancient_admixture', ('data',), ('ancient_admixture',)),
+        ('analyze_longevity_markers', ('data',), ('longevity',)),
+        ('analyze_cognitive_traits', ('data',), ('cognitive',)),
+        ('analyze_athletic_performance', ('data',), ('athletic',)),
+        ('analyze_sensory_genetics', ('data',), ('sensory',)),
+    )
+    
+    def __init__(self, filename, cli_ancestry=None, cache_dir=None, cache_max_bytes=genome_cache.DEFAULT_MAX_BYTES,
+                 targeted=False, output_dir='.', knowledge_base=None, prs_files=(),
+                 prs_reference_path=prs_reference.DEFAULT_PATH,
+                 pca_panel_path=pca_projection.DEFAULT_PATH, plots=True, stage_workers=None,
+                 metrics_file=None, profile_memory=False, gene_model_path=None): # Added cli_ancestry parameter
         """Initialize the analyzer with comprehensive variant databases."""
         self.filename = filename
+        # Reports, plots and crash dumps go under output_dir (one per sample in batch mode)
+        self.output_dir = output_dir
+        self.plots_dir = os.path.join(output_dir, 'genetic_analysis_plots')
+        # plots=False (--no-plots) skips the visualizations and never imports matplotlib/seaborn/scipy
+        self.plots = plots
+        # Threads for the analysis stages (utils.scheduler); 1 runs them serially
+        self.stage_workers = stage_workers
+        # Per-stage wall/CPU time appended by safety.safeguard; peak memory too with
+        # profile_memory (tracemalloc slows the run several-fold, so it is opt-in).
+        # metrics_file receives one JSON line per stage.
+        self.performance_records = []
+        self.metrics_file = metrics_file
+        self.profile_memory = profile_memory
+        # Targeted mode keeps only knowledge-base loci; genome-wide statistics
+        # then come from self.genome_counters instead of the full genome
+        self.targeted = targeted
+        self.genome_counters = None
+        # External PRS scoring files, streamed in chunks by calculate_polygenic_scores
+        self.prs_files = list(prs_files or ())
+        # Empirical PRS reference distributions (utils.prs_reference), used when the file exists
+        self.prs_reference_path = prs_reference_path
+        # Optional persistent cache of the parsed, QC-filtered genome
+        self.genome_cache = genome_cache.GenomeCache(cache_dir, cache_max_bytes) if cache_dir else None
         self.data = None
+        self.store = None # Compact columnar genome behind self.data
+        self.genotype_index = None # rsid -> genotype lookup built by load_data
+        self.region_index = None # chromosome/position range lookup built by load_data
+        # Optional local GTF/BED gene model (utils.gene_annotation); load_data then
+        # annotates every variant with its overlapping and nearest gene
+        self.gene_model_path = gene_model_path
+        self.gene_annotation = None
+        self.panel_join = None # Knowledge-base panels pre-joined against the sample
         self.metadata = {}
         self.results = defaultdict(dict)
-        self.sample_pcs = None # Placeholder for PCA results
-        
-        # Initialize all comprehensive variant databases
-        self._initialize_variant_databases()
-        self._initialize_polygenic_scores()
-        self._initialize_pharmacogenomics()
-        self._initialize_rare_variants()
-        self._initialize_fascinating_traits()
-        self._initialize_ancient_variants()
-        self._initialize_longevity_variants()
-        self._initialize_cognitive_variants()
-        self._initialize_athletic_variants()
-        self._initialize_sensory_variants()
+        self.sample_pcs = None # Reference PC coordinates from _perform_pca_for_ancestry
+        self.pca_panel_path = pca_panel_path # SNP loadings for the PCA projection (utils.pca_projection)
+        
+        # Variant databases: the compiled knowledge base shared (read-only) by every
+        # analyzer in this process, unless the caller passes in its own panels
+        if knowledge_base is None:
+            knowledge_base = knowledge_artifact.load_shared()
+        self.compiled_knowledge_base = knowledge_base if isinstance(knowledge_base, knowledge_artifact.KnowledgeBase) else None
+        for name in self.KNOWLEDGE_BASE_PANELS:
+            setattr(self, name, knowledge_base[name])
 
         # Initialize provenance tracking
         self.provenance = versioning.get_initial_provenance()
         # User ancestry flag, will be updated
         self.user_ancestry_flag = cli_ancestry if cli_ancestry else 'EU' # Use CLI flag or default
         
+    def knowledge_base(self):
+        """The variant databases of this analyzer, for reuse by further analyzers."""
+        compiled = self.compiled_knowledge_base
+        if compiled is not None and all(getattr(self, name) is compiled[name] for name in self.KNOWLEDGE_BASE_PANELS):
+            return compiled
+        return {name: getattr(self, name) for name in self.KNOWLEDGE_BASE_PANELS}
+
+    @classmethod
+    def compile_panels(cls):
+        """
+        Build the variant databases from the definitions below.
+
+        Only utils.knowledge_artifact calls this, to compile the shared
+        knowledge base; analyzers reference that instead of rebuilding.
+        """
+        builder = cls.__new__(cls)
+        builder._initialize_variant_databases()
+        builder._initialize_polygenic_scores()
+        builder._initialize_pharmacogenomics()
+        builder._initialize_rare_variants()
+        builder._initialize_fascinating_traits()
+        builder._initialize_ancient_variants()
+        builder._initialize_longevity_variants()
+        builder._initialize_cognitive_variants()
+        builder._initialize_athletic_variants()
+        builder._initialize_sensory_variants()
+        return {name: getattr(builder, name) for name in cls.KNOWLEDGE_BASE_PANELS}
+
+    @classmethod
+    def panel_interpreters(cls):
+        """Panel name -> interpret(genotype, info), for compiling the outcome tables."""
+        builder = cls.__new__(cls)
+        return {name: getattr(builder, method) for name, method in cls.PANEL_INTERPRETERS.items()}
+    
     def _initialize_variant_databases(self):
         """Initialize comprehensive variant database from peer-reviewed studies."""
         
@@ -1046,53 +1202,49 @@ class AdvancedGeneticAnalyzer:
             }
         }
     
+    @safety.safeguard("load_data")
     def load_data(self):
         """Load and parse the 23andMe data file with quality control."""
         print("Loading genetic data with quality control...")
         
         try:
-            # Read the file, skipping comment lines
-            with open(self.filename, 'r') as f:
-                lines = f.readlines()
-            
-            # Extract metadata and data
-            data_lines = []
-            for line in lines:
-                if line.startswith('#'):
-                    if 'generated by 23andMe' in line:
-                        self.metadata['source'] = '23andMe'
-                    elif 'reference human assembly build' in line:
-                        self.metadata['build'] = 'GRCh37/hg19'
-                    elif 'array' in line.lower():
-                        self.metadata['array'] = line.strip()
-                else:
-                    data_lines.append(line.strip())
-            
-            # Parse the genetic data
-            from io import StringIO
-            data_string = '\n'.join(data_lines)
-            self.data = pd.read_csv(StringIO(data_string), sep='\t', 
-                                   names=['rsid', 'chromosome', 'position', 'genotype'])
-            
-            # Quality control steps
-            self.data['chromosome'] = self.data['chromosome'].astype(str)
-            
-            # Count total variants before removing no-calls
-            total_original = len(self.data)
+            # A warm cache hit skips parsing and QC entirely; the arrays are memory-mapped
+            cached = None
+            if self.genome_cache is not None and not self.targeted:
+                cache_key = self.genome_cache.key_for(self.filename)
+                cached = self.genome_cache.load(cache_key)
 
-            # Remove no-calls, deletions, and insertions
-            self.data = self.data[~self.data['genotype'].isin(['--', 'DD', 'II'])]
+            index = vcf_index.VcfIndex.load(self.filename) if self.targeted else None
 
-            # Calculate call rate
-            self.metadata['call_rate'] = (
-                len(self.data) / total_original if total_original > 0 else 0
-            )
+            if cached is not None:
+                self.store, cached_metadata = cached
+                self.metadata.update(cached_metadata)
+                print(f"Loaded parsed genome from cache ({self.genome_cache.cache_dir})")
+            elif index is not None:
+                # Seek straight to the knowledge-base loci through the block index
+                self._load_targeted_from_index(index)
+                print(f"Targeted load of {len(self.store):,} knowledge-base loci via {vcf_index.index_path(self.filename)}")
+            else:
+                self._parse_and_filter()
+                if self.genome_cache is not None and not self.targeted:
+                    self.genome_cache.save(cache_key, self.store, self.metadata)
+
+            # self.data is a DataFrame view over the store (int64 rsid keys,
+            # categorical chromosome/genotype, int32 positions)
+            self.data = self.store.to_frame()
 
             # Check for strand consistency
-            self.data['genotype_sorted'] = self.data['genotype'].apply(
-                lambda x: ''.join(sorted(x))
+            self.data['genotype_sorted'] = genome_store.decode_genotypes(
+                genome_store.sort_alleles(self.store.genotypes)
             )
 
+            # Index rsids once so every stage can do batched lookups
+            self.genotype_index = genotype_index.GenotypeIndex.from_store(self.store)
+            # ... and positions per chromosome, for region and window queries
+            self.region_index = region_index.RegionIndex.from_store(self.store)
+            self.annotate_panels()
+            self.annotate_genes()
+
             print(f"Successfully loaded {len(self.data):,} genetic variants")
             print(f"Call rate: {self.metadata['call_rate']:.2%}")
             print(f"Chromosomes present: {sorted(self.data['chromosome'].unique())}")
@@ -1101,40 +1253,233 @@ class AdvancedGeneticAnalyzer:
             print(f"Error loading data: {e}")
             raise
     
+    def _parse_and_filter(self):
+        """Parse the raw file into self.store and apply no-call filtering."""
+        # Parse header metadata and stream the body into the C parser (VCFs
+        # through the streaming VCF reader), packing each chunk into the
+        # compact columnar store so no full string frame is ever held
+        header_metadata = {}
+        if self.targeted:
+            # Small chunks, each filtered down to the knowledge-base loci
+            # as it streams past, keep peak memory to a few MB
+            chunks = loader.iter_raw_genotypes(self.filename, header_metadata, chunksize=loader.TARGETED_CHUNKSIZE)
+            self._stream_targeted(chunks)
+            self.metadata.update(header_metadata)
+            return
+        
+        chunks = loader.iter_raw_genotypes(self.filename, header_metadata, chunksize=loader.DEFAULT_CHUNKSIZE)
+        store = genome_store.GenotypeStore.concat(
+            genome_store.GenotypeStore.from_frame(chunk) for chunk in chunks
+        )
+        self.metadata.update(header_metadata)
+        
+        # Quality control steps
+        # Count total variants before removing no-calls
+        total_original = len(store)
+        self.metadata['raw_variants_per_chromosome'] = {
+            str(chrom): int(count) for chrom, count in
+            zip(store.chromosomes.categories, np.bincount(store.chromosomes.codes, minlength=len(store.chromosomes.categories)))
+        }
+
+        # Remove no-calls, deletions, and insertions
+        no_call_codes = genome_store.encode_genotypes(genome_store.NO_CALLS)
+        self.store = store.filter(~np.isin(store.genotypes, no_call_codes))
+
+        # Calculate call rate
+        self.metadata['call_rate'] = (
+            len(self.store) / total_original if total_original > 0 else 0
+        )
+    
+    def _stream_targeted(self, chunks):
+        """Keep only the target loci of each chunk while counting the whole genome."""
+        target_keys = genotype_index.encode_rsids(self.target_rsids())
+        no_call_codes = genome_store.encode_genotypes(genome_store.NO_CALLS)
+        counters = genome_stats.GenomeCounters()
+        kept = []
+        
+        for chunk in chunks:
+            store = genome_store.GenotypeStore.from_frame(chunk)
+            
+            # Running genome-wide counters: raw counts before QC, het/hom and Ti/Tv after
+            counters.add_raw(store.chromosomes)
+            called = ~np.isin(store.genotypes, no_call_codes)
+            unencoded = store.unencoded[called] if store.unencoded is not None else None
+            counters.update(store.genotypes[called], store.chromosomes[called], store.positions[called], unencoded)
+            
+            kept.append(store.filter(called & np.isin(store.rsids, target_keys)))
+        
+        self.store = genome_store.GenotypeStore.concat(kept)
+        self._use_genome_counters(counters)
+    
+    def _load_targeted_from_index(self, index):
+        """Fetch only the knowledge-base loci from an indexed VCF into self.store."""
+        store = genome_store.GenotypeStore.from_frame(index.fetch(self.target_rsids()))
+        self.metadata.update(index.metadata)
+
+        no_call_codes = genome_store.encode_genotypes(genome_store.NO_CALLS)
+        self.store = store.filter(~np.isin(store.genotypes, no_call_codes))
+
+        # Genome-wide counts were collected when the index was built
+        self._use_genome_counters(index.counters)
+    
+    def _use_genome_counters(self, counters):
+        """Take genome-wide call rate and per-chromosome counts from running counters."""
+        self.genome_counters = counters
+        self.metadata['targeted'] = True
+        self.metadata['raw_variants_per_chromosome'] = dict(counters.raw_counts)
+        total_original = sum(counters.raw_counts.values())
+        self.metadata['call_rate'] = (
+            counters.total / total_original if total_original > 0 else 0
+        )
+    
+    def target_rsids(self):
+        """Union of every rsid the analysis stages look up."""
+        rsids = set(self.STAGE_MARKER_RSIDS)
+        for name, nested in self.KNOWLEDGE_BASE_PANELS.items():
+            rsids.update(rsid for _, rsid, _ in panels.flatten_panel(getattr(self, name), nested))
+        for prs_file in self.prs_files:
+            rsids.update(prs_weights.weight_rsids(prs_file))
+        panel = pca_projection.load_cached(self.pca_panel_path)
+        if panel is not None:
+            rsids.update(genotype_index.decode_rsid(key) for key in panel.keys)
+        return sorted(rsids)
+    
+    def get_genotypes(self, rsids):
+        """Return a dict of rsid -> genotype for the given rsids present in the data."""
+        if self.genotype_index is None:
+            return {}
+        return self.genotype_index.get_genotypes(rsids)
+    
+    def variants_in_region(self, chrom, start, end):
+        """
+        Rows of self.data on ``chrom`` with ``start <= position <= end``, in position order.
+        
+        Uses the sorted-position index built by load_data (two binary
+        searches), so gene-level and window analyses never scan the genome.
+        In targeted mode only knowledge-base loci are present.
+        """
+        if self.region_index is None:
+            return self.data.iloc[0:0] if self.data is not None else pd.DataFrame()
+        return self.data.iloc[self.region_index.variants_in_region(chrom, start, end).rows]
+    
+    def variants_near(self, rsid, flank=500_000):
+        """Rows of self.data within ``flank`` bp of ``rsid`` (empty if the rsid is absent)."""
+        row = self.genotype_index.lookup_rows([rsid])[0] if self.genotype_index is not None else -1
+        if row < 0:
+            return self.data.iloc[0:0] if self.data is not None else pd.DataFrame()
+        position = int(self.store.positions[row])
+        return self.variants_in_region(self.store.chromosomes[row], position - flank, position + flank)
+    
+    def annotate_genes(self):
+        """Annotate every loaded variant with its overlapping and nearest gene from the gene model."""
+        if not self.gene_model_path:
+            return
+        model = gene_annotation.load_cached(self.gene_model_path)
+        if model is None:
+            print(f"WARNING: Gene model {self.gene_model_path} not found; variants are not gene-annotated")
+            return
+        self.gene_annotation = model.annotate(self.store.chromosomes, self.store.positions, self.region_index)
+        summary = self.gene_annotation.summary()
+        print(f"Gene-annotated {len(self.gene_annotation):,} variants against {len(model):,} genes: "
+              f"{summary['genic_variants']:,} genic in {summary['genes_with_variants']:,} genes")
+    
+    def genes_for(self, rsids):
+        """
+        Gene-model annotation of the given rsids.
+        
+        Returns:
+            A dict of rsid -> {'gene', 'nearest_gene', 'distance_bp'} for the
+            rsids present in the genome ('gene' is None when intergenic); empty
+            without a gene model.
+        """
+        if self.gene_annotation is None:
+            return {}
+        rsids = list(rsids)
+        rows = self.genotype_index.lookup_rows(rsids)
+        present = rows >= 0
+        rows = rows[present]
+        genes = self.gene_annotation.overlapping_genes(rows)
+        nearest = self.gene_annotation.nearest_genes(rows)
+        distances = self.gene_annotation.distance[rows]
+        return {rsid: {'gene': gene, 'nearest_gene': near, 'distance_bp': int(distance)}
+                for rsid, gene, near, distance in zip(np.asarray(rsids, dtype=object)[present], genes, nearest, distances)}
+    
+    def annotate_panels(self):
+        """Join every knowledge-base panel against the sample genotypes in one lookup."""
+        self.panel_join = panels.PanelJoin(self.genotype_index, {
+            name: (getattr(self, name), nested) for name, nested in self.KNOWLEDGE_BASE_PANELS.items()
+        }, compiled=self.compiled_knowledge_base)
+    
+    def joined_panel(self, name, group=None):
+        """Pre-joined table (group, rsid, genotype, info) of a panel's variants found in the sample."""
+        if self.panel_join is None:
+            self.annotate_panels()
+        return self.panel_join.table(name, getattr(self, name), self.KNOWLEDGE_BASE_PANELS[name], group)
+    
+    def _panel_rows(self, name, group=None):
+        """Iterate (rsid, genotype, info) over a joined panel."""
+        table = self.joined_panel(name, group)
+        return zip(table['rsid'], table['genotype'], table['info'])
+    
+    def _interpreted_rows(self, name):
+        """
+        Iterate (rsid, genotype, info, outcome) over a joined panel.
+
+        Outcomes come from the compiled knowledge base's outcome table in one
+        lookup; genotypes it cannot represent, and panels swapped out after
+        compilation, are interpreted live by the panel's interpreter.
+        """
+        table = self.joined_panel(name)
+        genotypes = table['genotype'].to_numpy(dtype=object)
+        infos = table['info'].tolist()
+        outcomes = np.full(len(table), None, dtype=object)
+
+        compiled = self.compiled_knowledge_base
+        if compiled is not None and name in compiled.outcomes and getattr(self, name) is compiled[name] and len(table):
+            outcome_table = compiled.outcomes[name]
+            codes, exact = outcome_table.genotype_codes(genotypes)
+            outcomes[exact] = outcome_table.lookup(table['entry'].to_numpy(dtype=np.int64)[exact], codes[exact])
+
+        interpret = getattr(self, self.PANEL_INTERPRETERS[name])
+        for i in np.flatnonzero(np.equal(outcomes, None)):
+            outcomes[i] = interpret(genotypes[i], infos[i])
+        return zip(table['rsid'], genotypes, infos, outcomes)
+    
+    @safety.safeguard("basic_statistics")
     def analyze_basic_statistics(self):
         """Generate comprehensive statistics about the genetic data."""
         print("\nAnalyzing comprehensive statistics...")
         
-        stats = {
-            'total_variants': len(self.data),
-            'call_rate': self.metadata.get('call_rate', 0),
-            'variants_per_chromosome': self.data['chromosome'].value_counts().to_dict()
-        }
-        
-        # Advanced genotype analysis
-        homozygous = 0
-        heterozygous = 0
-        transitions = 0  # A<->G, C<->T
-        transversions = 0  # All other changes
+        # Advanced genotype analysis: hom/het counts and Ti/Tv (A<->G, C<->T
+        # transitions vs all other changes), genome-wide and per chromosome
+        if self.genome_counters is not None:
+            # Targeted load: only panel loci are in memory, so use the genome-wide counters
+            summary = self.genome_counters.summary(self.metadata.get('raw_variants_per_chromosome'))
+            stats = {
+                'total_variants': self.genome_counters.total,
+                'call_rate': self.metadata.get('call_rate', 0),
+                'variants_per_chromosome': {
+                    chrom: chrom_summary['count'] for chrom, chrom_summary in
+                    sorted(summary['per_chromosome'].items(), key=lambda item: -item[1]['count'])
+                }
+            }
+        else:
+            stats = {
+                'total_variants': len(self.data),
+                'call_rate': self.metadata.get('call_rate', 0),
+                'variants_per_chromosome': self.data['chromosome'].value_counts().to_dict()
+            }
+            summary = genome_stats.genotype_summary(
+                self.store.genotypes, self.store.chromosomes, self.store.positions,
+                raw_counts_per_chromosome=self.metadata.get('raw_variants_per_chromosome'),
+                unencoded=self.store.unencoded
+            )
         
-        for _, row in self.data.iterrows():
-            genotype = row['genotype']
-            if len(genotype) == 2:
-                if genotype[0] == genotype[1]:
-                    homozygous += 1
-                else:
-                    heterozygous += 1
-                    # Calculate Ti/Tv ratio
-                    bases = set(genotype)
-                    if bases in [{'A', 'G'}, {'C', 'T'}]:
-                        transitions += 1
-                    else:
-                        transversions += 1
-        
-        stats['homozygous_variants'] = homozygous
-        stats['heterozygous_variants'] = heterozygous
-        stats['heterozygosity_rate'] = heterozygous / (homozygous + heterozygous) if (homozygous + heterozygous) > 0 else 0
-        stats['ti_tv_ratio'] = transitions / transversions if transversions > 0 else 0
+        stats['homozygous_variants'] = summary['homozygous']
+        stats['heterozygous_variants'] = summary['heterozygous']
+        stats['heterozygosity_rate'] = summary['heterozygosity_rate']
+        stats['ti_tv_ratio'] = summary['ti_tv_ratio']
+        stats['chromosome_stats'] = summary['per_chromosome']
         
         # Calculate observed vs expected heterozygosity (Hardy-Weinberg)
         stats['hardy_weinberg_deviation'] = self._calculate_hardy_weinberg()
@@ -1144,6 +1489,10 @@ class AdvancedGeneticAnalyzer:
         observed_het = stats['heterozygosity_rate']
         stats['inbreeding_coefficient'] = (expected_het - observed_het) / expected_het if expected_het > 0 else 0
         
+        # Genic vs intergenic variants, when a gene model was given
+        if self.gene_annotation is not None:
+            stats['gene_annotation'] = self.gene_annotation.summary()
+        
         self.results['advanced_stats'] = stats
         
         # Print summary
@@ -1178,35 +1527,34 @@ class AdvancedGeneticAnalyzer:
     @safety.safeguard("pca_ancestry") # Added safeguard
     def _perform_pca_for_ancestry(self):
         """
-        Performs PCA on the loaded genetic data to get principal components for ancestry inference.
-        This is a simplified placeholder. Real PCA for ancestry requires:
-        1. Selecting a common set of SNPs between user data and reference panel (e.g., 1000 Genomes).
-        2. Merging datasets, handling strand flips, and LD pruning.
-        3. Running PCA and projecting user data onto reference PCs or running PCA on combined data.
+        Projects the sample onto the reference principal components for ancestry inference.
+        Uses the SNP loadings and allele means in data/1000g_loadings.npz (see
+        utils.pca_projection): alleles are aligned to the panel with strand flips,
+        missing SNPs are mean-imputed, and the PCs are one matrix-vector product
+        in the space of the 1000 Genomes coordinates the KNN classifier is fitted on.
         """
-        print("Performing PCA for ancestry estimation (simplified)...")
-        if self.data is None or self.data.empty:
+        print("Projecting sample onto reference principal components for ancestry estimation...")
+        self.sample_pcs = None
+        if self.store is None or len(self.store) == 0:
             print("No data loaded to perform PCA.")
-            self.sample_pcs = None
             return
 
-        # Simplified: Use a small subset of variants and simulate PCA
-        # In a real scenario, you'd use a curated list of ancestry-informative markers (AIMs)
-        # or a large number of common SNPs.
-        # Use up to 1000 variants for this simplified example
-        # This is highly simplified: real PCA needs numeric encoding (0, 1, 2 for allele counts)
-        # and careful SNP selection and filtering.
-        
-        # For demonstration, let's simulate some PC values if actual PCA is too complex here.
-        # A real implementation would involve:
-        # 1. Filtering self.data for SNPs present in the reference panel.
-        # 2. Numerically encoding genotypes (e.g., 0, 1, 2 for allele counts).
-        # 3. Aligning alleles with the reference panel.
-        # 4. Performing PCA or projecting onto existing PCs.
-        
-        # Simulate 10 PCs for the sample
-        self.sample_pcs = np.random.rand(1, 10) 
-        print(f"Simulated sample PCs for ancestry: {self.sample_pcs[0, :3]}...") # Print first 3 PCs
+        panel = pca_projection.load_cached(self.pca_panel_path)
+        if panel is None:
+            print(f"Reference SNP loadings ({self.pca_panel_path}) not found; PCA projection skipped.")
+        else:
+            sample_pcs, coverage = panel.project(self.store)
+            self.results['pca_projection'] = {
+                'panel_snps': len(panel),
+                'coverage': coverage,
+                'pcs': sample_pcs[0].tolist() if sample_pcs is not None else None,
+            }
+            if sample_pcs is None:
+                print(f"Only {coverage:.1%} of the {len(panel):,} panel SNPs observed; PCA projection skipped.")
+            else:
+                self.sample_pcs = sample_pcs
+                print(f"Projected onto {panel.n_components} PCs using {coverage:.1%} of {len(panel):,} panel SNPs: "
+                      f"{self.sample_pcs[0, :3]}...") # Print first 3 PCs
 
         # If not using CLI override, infer ancestry
         if self.user_ancestry_flag == 'EU' and self.sample_pcs is not None: # Default 'EU' implies no CLI override
@@ -1226,134 +1574,91 @@ class AdvancedGeneticAnalyzer:
         """Comprehensive disease risk analysis based on latest research."""
         print("\nAnalyzing disease risk based on peer-reviewed studies...")
 
-        # If input is a VCF, parse directly for GT field
-        if self.filename.lower().endswith('.vcf'):
+        # If input is a VCF, use the REF/ALT/GT fields kept by the streaming
+        # reader in load_data instead of re-reading the file
+        if self.store is not None and self.store.has_vcf_fields:
             risk_findings_vcf = {'neurological': []} # Use a different name for clarity
-            with open(self.filename, 'r') as f:
-                for line in f:
-                    if line.startswith('#'):
-                        continue
-                    fields = line.strip().split('\t')
-                    if len(fields) < 10:
-                        # Need at least 10 fields for FORMAT and SAMPLE
-                        continue
-                    
-                    rsid = fields[2]
-                    ref_allele_vcf = fields[3]
-                    alt_alleles_vcf_str = fields[4]
-                    # Simplification: use first ALT allele if multiple are present (e.g., "A,T")
-                    alt_allele_vcf = alt_alleles_vcf_str.split(',')[0] 
-
-                    format_field = fields[8]
-                    sample_field = fields[9] # Assuming the first sample column
-                    
-                    gt_index = -1
-                    if 'GT' in format_field.split(':'):
-                        gt_index = format_field.split(':').index('GT')
-                    
-                    vcf_genotype_indices = None # e.g., "0/1"
-                    if gt_index != -1 and len(sample_field.split(':')) > gt_index:
-                        vcf_genotype_indices = sample_field.split(':')[gt_index]
-                    
-                    if vcf_genotype_indices and rsid in self.known_variants:
-                        info = self.known_variants[rsid]
-                        effect_size = info.get('effect_size')
-                        defined_risk_allele = info.get('risk_allele')
-
-                        if defined_risk_allele is None or effect_size is None:
-                            # Skip if essential info for risk calculation is missing
-                            print(f"Skipping {rsid} in VCF processing: missing defined risk allele or effect size in known_variants.")
-                            continue
-
-                        risk_allele_count_in_gt = 0
-                        # GT field can be like "0/1", "1|0", "1/1", or even "./." for no call
-                        # Split by '/' or '|' to handle unphased/phased
-                        gt_parts = []
-                        if '/' in vcf_genotype_indices:
-                            gt_parts = vcf_genotype_indices.split('/')
-                        elif '|' in vcf_genotype_indices:
-                            gt_parts = vcf_genotype_indices.split('|')
-                        else: # Could be haploid like "0" or "1", or uncalled like "."
-                            gt_parts = [vcf_genotype_indices]
-                        
-                        valid_gt_part_found = False
-                        for allele_idx_str in gt_parts:
-                            if not allele_idx_str.isdigit(): # Skip non-numeric parts like "."
-                                continue
-                            valid_gt_part_found = True
-                            allele_idx = int(allele_idx_str)
-                            
-                            current_allele_from_vcf = ""
-                            if allele_idx == 0: # 0 refers to REF allele
-                                current_allele_from_vcf = ref_allele_vcf
-                            elif allele_idx == 1: # 1 refers to the first ALT allele
-                                current_allele_from_vcf = alt_allele_vcf
-                            # Extend here if multi-allelic sites (ALT has A,G,T) and GT has e.g. 0/2
-                            # For now, assumes biallelic or uses first ALT.
-                                
-                            if current_allele_from_vcf == defined_risk_allele:
-                                risk_allele_count_in_gt += 1
-                        
-                        if not valid_gt_part_found: # If GT was e.g. "./."
-                            print(f"Skipping {rsid} in VCF processing: GT field '{vcf_genotype_indices}' not parsable for allele counts.")
-                            continue
+            known_table = self.joined_panel('known_variants')
+            rows = self.genotype_index.lookup_rows(known_table['rsid'])
+            for (rsid, genotype, info), row in zip(self._panel_rows('known_variants'), rows):
+                ref_allele_vcf = self.store.refs[row]
+                alt_alleles_vcf_str = self.store.alts[row]
+                # Simplification: report the first ALT allele if multiple are present (e.g., "A,T")
+                alt_allele_vcf = alt_alleles_vcf_str.split(',')[0]
+                vcf_genotype_indices = self.store.gts[row] # e.g., "0/1"
 
-                        relative_risk = effect_size ** risk_allele_count_in_gt
-                        
-                        risk_assessment_vcf = {
-                            'relative_risk': relative_risk,
-                            'interpretation': f"{risk_allele_count_in_gt} risk allele(s) ('{defined_risk_allele}') from VCF. REF={ref_allele_vcf}, ALT={alt_allele_vcf}, GT={vcf_genotype_indices}",
-                            'risk_level': 'Calculated from VCF', 
-                            'effect_category': effect_utils.categorize_or(relative_risk) if relative_risk is not None else 'unknown'
-                        }
-                        # Add CI propagation for VCF path
-                        if (
-                            'ci_95' in info
-                            and info['ci_95']
-                            and len(info['ci_95']) == 2
-                        ):
-                            lower_ci_allele, upper_ci_allele = info['ci_95']
-                            if risk_allele_count_in_gt == 0:
-                                risk_assessment_vcf['relative_risk_ci_95'] = (1.0, 1.0)
-                            elif risk_allele_count_in_gt == 1:
-                                risk_assessment_vcf['relative_risk_ci_95'] = (
-                                    lower_ci_allele,
-                                    upper_ci_allele,
-                                )
-                            elif risk_allele_count_in_gt == 2:  # Assuming homozygous
-                                if effect_size >= 1:
-                                    risk_assessment_vcf['relative_risk_ci_95'] = (
-                                        lower_ci_allele**1.5 if lower_ci_allele > 0 else 0,
-                                        upper_ci_allele**1.5,
-                                    )
-                                else:
-                                    risk_assessment_vcf['relative_risk_ci_95'] = tuple(
-                                        sorted(
-                                            (
-                                                upper_ci_allele**(1 / 1.5)
-                                                if upper_ci_allele > 0
-                                                else 0,
-                                                lower_ci_allele**(1 / 1.5),
-                                            )
-                                        )
+                effect_size = info.get('effect_size')
+                defined_risk_allele = info.get('risk_allele')
+
+                if defined_risk_allele is None or effect_size is None:
+                    # Skip if essential info for risk calculation is missing
+                    print(f"Skipping {rsid} in VCF processing: missing defined risk allele or effect size in known_variants.")
+                    continue
+
+                # GT field can be like "0/1", "1|0", "1/1", or haploid "1"; each
+                # allele index is resolved to its REF/ALT sequence (multi-allelic
+                # sites included) and compared with the risk allele
+                called_alleles = vcf.allele_sequences(ref_allele_vcf, alt_alleles_vcf_str, vcf_genotype_indices)
+                if not called_alleles: # If GT was e.g. "./."
+                    print(f"Skipping {rsid} in VCF processing: GT field '{vcf_genotype_indices}' not parsable for allele counts.")
+                    continue
+                risk_allele_count_in_gt = called_alleles.count(defined_risk_allele)
+
+                relative_risk = effect_size ** risk_allele_count_in_gt
+
+                risk_assessment_vcf = {
+                    'relative_risk': relative_risk,
+                    'interpretation': f"{risk_allele_count_in_gt} risk allele(s) ('{defined_risk_allele}') from VCF. REF={ref_allele_vcf}, ALT={alt_allele_vcf}, GT={vcf_genotype_indices}",
+                    'risk_level': 'Calculated from VCF', 
+                    'effect_category': effect_utils.categorize_or(relative_risk) if relative_risk is not None else 'unknown'
+                }
+                # Add CI propagation for VCF path
+                if (
+                    'ci_95' in info
+                    and info['ci_95']
+                    and len(info['ci_95']) == 2
+                ):
+                    lower_ci_allele, upper_ci_allele = info['ci_95']
+                    if risk_allele_count_in_gt == 0:
+                        risk_assessment_vcf['relative_risk_ci_95'] = (1.0, 1.0)
+                    elif risk_allele_count_in_gt == 1:
+                        risk_assessment_vcf['relative_risk_ci_95'] = (
+                            lower_ci_allele,
+                            upper_ci_allele,
+                        )
+                    elif risk_allele_count_in_gt == 2:  # Assuming homozygous
+                        if effect_size >= 1:
+                            risk_assessment_vcf['relative_risk_ci_95'] = (
+                                lower_ci_allele**1.5 if lower_ci_allele > 0 else 0,
+                                upper_ci_allele**1.5,
+                            )
+                        else:
+                            risk_assessment_vcf['relative_risk_ci_95'] = tuple(
+                                sorted(
+                                    (
+                                        upper_ci_allele**(1 / 1.5)
+                                        if upper_ci_allele > 0
+                                        else 0,
+                                        lower_ci_allele**(1 / 1.5),
                                     )
+                                )
+                            )
 
 
-                        finding = {
-                            'rsid': rsid,
-                            'gene': info.get('gene'),
-                            'trait': info.get('trait'),
-                            'genotype': vcf_genotype_indices, # Store VCF GT string
-                            'relative_risk': relative_risk, # Crucial for validation
-                            'risk_assessment': risk_assessment_vcf,
-                            'mechanism': info.get('mechanism', 'Unknown'),
-                            'pmid': info.get('pmid', 'N/A'),
-                            'maf': info.get('maf', 'N/A')
-                        }
-                        risk_findings_vcf['neurological'].append(finding)
-                        
+                finding = {
+                    'rsid': rsid,
+                    'gene': info.get('gene'),
+                    'trait': info.get('trait'),
+                    'genotype': vcf_genotype_indices, # Store VCF GT string
+                    'relative_risk': relative_risk, # Crucial for validation
+                    'risk_assessment': risk_assessment_vcf,
+                    'mechanism': info.get('mechanism', 'Unknown'),
+                    'pmid': info.get('pmid', 'N/A'),
+                    'maf': info.get('maf', 'N/A')
+                }
+                risk_findings_vcf['neurological'].append(finding)
+
             self.results['disease_risk'] = dict(risk_findings_vcf)
-            import validation # Ensure validation is imported
             self.results['validation_summary_report'] = validation.validate(self.results)
             # Print validation summary for VCF path as well
             print("Validation Summary (VCF Path):")
@@ -1368,50 +1673,46 @@ class AdvancedGeneticAnalyzer:
         
         risk_findings = defaultdict(list)
         
-        for rsid, info in self.known_variants.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
+        for rsid, genotype, info, risk_analysis in self._interpreted_rows('known_variants'):
+            # Risk based on genotype and effect size (_calculate_variant_risk); copied,
+            # since precomputed outcomes are shared by every sample
+            risk_analysis = dict(risk_analysis)
             
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
-                
-                # Calculate risk based on genotype and effect size
-                risk_analysis = self._calculate_variant_risk(genotype, info)
-                
-                finding = {
-                    'rsid': rsid,
-                    'gene': info['gene'],
-                    'trait': info['trait'],
-                    'genotype': genotype,
-                    'relative_risk': risk_analysis.get('relative_risk'),
-                    'risk_assessment': risk_analysis,
-                    'mechanism': info.get('mechanism', 'Unknown'),
-                    'pmid': info.get('pmid', 'N/A'),
-                    'maf': info.get('maf', 'N/A')
-                }
-                
-                # Categorize by disease area
-                if 'alzheimer' in info['trait'].lower() or 'cognitive' in info['trait'].lower():
-                    risk_findings['neurological'].append(finding)
-                elif 'diabetes' in info['trait'].lower() or 'metabolic' in info['trait'].lower():
-                    risk_findings['metabolic'].append(finding)
-                elif 'coronary' in info['trait'].lower() or 'cardiovascular' in info['trait'].lower():
-                    risk_findings['cardiovascular'].append(finding)
-                elif 'cancer' in info['trait'].lower():
-                    risk_findings['oncological'].append(finding)
-                elif 'autoimmune' in info['trait'].lower() or 'arthritis' in info['trait'].lower():
-                    risk_findings['autoimmune'].append(finding)
-                else:
-                    risk_findings['other'].append(finding)
-                
-                # Print significant findings
-                if risk_analysis.get('risk_level') in ['High', 'Moderately High']:
-                    print(f"\n⚠️  {info['gene']} ({rsid}): {genotype}")
-                    print(f"   Trait: {info['trait']}")
-                    print(f"   Risk Level: {risk_analysis['risk_level']}")
-                    if 'relative_risk' in risk_analysis:
-                        print(f"   Relative Risk: {risk_analysis['relative_risk']:.2f}x")
-                    print(f"   Mechanism: {info.get('mechanism', 'Unknown')}")
-                    print(f"   Reference: PMID {info.get('pmid', 'N/A')}")
+            finding = {
+                'rsid': rsid,
+                'gene': info['gene'],
+                'trait': info['trait'],
+                'genotype': genotype,
+                'relative_risk': risk_analysis.get('relative_risk'),
+                'risk_assessment': risk_analysis,
+                'mechanism': info.get('mechanism', 'Unknown'),
+                'pmid': info.get('pmid', 'N/A'),
+                'maf': info.get('maf', 'N/A')
+            }
+            
+            # Categorize by disease area
+            if 'alzheimer' in info['trait'].lower() or 'cognitive' in info['trait'].lower():
+                risk_findings['neurological'].append(finding)
+            elif 'diabetes' in info['trait'].lower() or 'metabolic' in info['trait'].lower():
+                risk_findings['metabolic'].append(finding)
+            elif 'coronary' in info['trait'].lower() or 'cardiovascular' in info['trait'].lower():
+                risk_findings['cardiovascular'].append(finding)
+            elif 'cancer' in info['trait'].lower():
+                risk_findings['oncological'].append(finding)
+            elif 'autoimmune' in info['trait'].lower() or 'arthritis' in info['trait'].lower():
+                risk_findings['autoimmune'].append(finding)
+            else:
+                risk_findings['other'].append(finding)
+            
+            # Print significant findings
+            if risk_analysis.get('risk_level') in ['High', 'Moderately High']:
+                print(f"\n⚠️  {info['gene']} ({rsid}): {genotype}")
+                print(f"   Trait: {info['trait']}")
+                print(f"   Risk Level: {risk_analysis['risk_level']}")
+                if 'relative_risk' in risk_analysis:
+                    print(f"   Relative Risk: {risk_analysis['relative_risk']:.2f}x")
+                print(f"   Mechanism: {info.get('mechanism', 'Unknown')}")
+                print(f"   Reference: PMID {info.get('pmid', 'N/A')}")
         
         self.results['disease_risk'] = dict(risk_findings)
 
@@ -1533,43 +1834,38 @@ class AdvancedGeneticAnalyzer:
         
         trait_findings = defaultdict(list)
         
-        for rsid, info in self.fascinating_traits.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
+        for rsid, genotype, info, phenotype in self._interpreted_rows('fascinating_traits'):
+            finding = {
+                'rsid': rsid,
+                'gene': info['gene'],
+                'trait': info['trait'],
+                'genotype': genotype,
+                'phenotype': phenotype,
+                'fun_fact': info.get('fun_fact', '')
+            }
             
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
-                
-                finding = {
-                    'rsid': rsid,
-                    'gene': info['gene'],
-                    'trait': info['trait'],
-                    'genotype': genotype,
-                    'phenotype': self._interpret_fascinating_trait(genotype, info),
-                    'fun_fact': info.get('fun_fact', '')
-                }
-                
-                # Categorize traits
-                trait_type = 'other'
-                if 'taste' in info['trait'].lower() or 'smell' in info['trait'].lower():
-                    trait_type = 'sensory'
-                elif 'hair' in info['trait'].lower() or 'eye' in info['trait'].lower() or 'skin' in info['trait'].lower():
-                    trait_type = 'appearance'
-                elif 'sleep' in info['trait'].lower() or 'chronotype' in info['trait'].lower():
-                    trait_type = 'circadian'
-                elif 'muscle' in info['trait'].lower() or 'athletic' in info['trait'].lower():
-                    trait_type = 'athletic'
-                elif 'alcohol' in info['trait'].lower() or 'caffeine' in info['trait'].lower():
-                    trait_type = 'metabolism'
-                
-                trait_findings[trait_type].append(finding)
-                
-                # Print interesting findings
-                if finding['phenotype'] != 'Average/Common variant':
-                    print(f"\n🧬 {info['gene']} ({rsid}): {genotype}")
-                    print(f"   Trait: {info['trait']}")
-                    print(f"   Your phenotype: {finding['phenotype']}")
-                    if info.get('fun_fact'):
-                        print(f"   Fun fact: {info['fun_fact']}")
+            # Categorize traits
+            trait_type = 'other'
+            if 'taste' in info['trait'].lower() or 'smell' in info['trait'].lower():
+                trait_type = 'sensory'
+            elif 'hair' in info['trait'].lower() or 'eye' in info['trait'].lower() or 'skin' in info['trait'].lower():
+                trait_type = 'appearance'
+            elif 'sleep' in info['trait'].lower() or 'chronotype' in info['trait'].lower():
+                trait_type = 'circadian'
+            elif 'muscle' in info['trait'].lower() or 'athletic' in info['trait'].lower():
+                trait_type = 'athletic'
+            elif 'alcohol' in info['trait'].lower() or 'caffeine' in info['trait'].lower():
+                trait_type = 'metabolism'
+            
+            trait_findings[trait_type].append(finding)
+            
+            # Print interesting findings
+            if finding['phenotype'] != 'Average/Common variant':
+                print(f"\n🧬 {info['gene']} ({rsid}): {genotype}")
+                print(f"   Trait: {info['trait']}")
+                print(f"   Your phenotype: {finding['phenotype']}")
+                if info.get('fun_fact'):
+                    print(f"   Fun fact: {info['fun_fact']}")
         
         self.results['fascinating_traits'] = dict(trait_findings)
     
@@ -1689,29 +1985,24 @@ class AdvancedGeneticAnalyzer:
         neanderthal_count = 0
         denisovan_count = 0
         
-        for rsid, info in self.ancient_variants.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
-            
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
-                
-                # Check if carries ancient variant
-                if info['source'] in ['Neanderthal', 'Denisovan']:
-                    # Simplified detection - would use proper ancestral allele info
-                    if 'introgression_freq' in info:
-                        ancient_findings.append({
-                            'rsid': rsid,
-                            'gene': info['gene'],
-                            'source': info['source'],
-                            'trait': info['trait'],
-                            'genotype': genotype,
-                            'phenotype': info['phenotype']
-                        })
-                        
-                        if info['source'] == 'Neanderthal':
-                            neanderthal_count += 1
-                        elif info['source'] == 'Denisovan':
-                            denisovan_count += 1
+        for rsid, genotype, info in self._panel_rows('ancient_variants'):
+            # Check if carries ancient variant
+            if info['source'] in ['Neanderthal', 'Denisovan']:
+                # Simplified detection - would use proper ancestral allele info
+                if 'introgression_freq' in info:
+                    ancient_findings.append({
+                        'rsid': rsid,
+                        'gene': info['gene'],
+                        'source': info['source'],
+                        'trait': info['trait'],
+                        'genotype': genotype,
+                        'phenotype': info['phenotype']
+                    })
+                    
+                    if info['source'] == 'Neanderthal':
+                        neanderthal_count += 1
+                    elif info['source'] == 'Denisovan':
+                        denisovan_count += 1
         
         # Estimate Neanderthal ancestry percentage
         # Average person has ~2% Neanderthal DNA (1-4% range)
@@ -1749,27 +2040,21 @@ class AdvancedGeneticAnalyzer:
         longevity_findings = []
         protective_count = 0
         
-        for rsid, info in self.longevity_variants.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
+        for rsid, genotype, info, interpretation in self._interpreted_rows('longevity_variants'):
             
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
-                
-                interpretation = self._interpret_longevity_variant(genotype, info)
-                
-                finding = {
-                    'rsid': rsid,
-                    'gene': info['gene'],
-                    'trait': info['trait'],
-                    'genotype': genotype,
-                    'interpretation': interpretation,
-                    'mechanism': info['mechanism']
-                }
-                
-                longevity_findings.append(finding)
-                
-                if 'protective' in interpretation.lower() or 'favorable' in interpretation.lower():
-                    protective_count += 1
+            finding = {
+                'rsid': rsid,
+                'gene': info['gene'],
+                'trait': info['trait'],
+                'genotype': genotype,
+                'interpretation': interpretation,
+                'mechanism': info['mechanism']
+            }
+            
+            longevity_findings.append(finding)
+            
+            if 'protective' in interpretation.lower() or 'favorable' in interpretation.lower():
+                protective_count += 1
         
         self.results['longevity'] = {
             'findings': longevity_findings,
@@ -1823,24 +2108,18 @@ class AdvancedGeneticAnalyzer:
         
         cognitive_findings = []
         
-        for rsid, info in self.cognitive_variants.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
+        for rsid, genotype, info, interpretation in self._interpreted_rows('cognitive_variants'):
             
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
-                
-                interpretation = self._interpret_cognitive_variant(genotype, info)
-                
-                finding = {
-                    'rsid': rsid,
-                    'gene': info['gene'],
-                    'trait': info['trait'],
-                    'genotype': genotype,
-                    'interpretation': interpretation,
-                    'mechanism': info['mechanism']
-                }
-                
-                cognitive_findings.append(finding)
+            finding = {
+                'rsid': rsid,
+                'gene': info['gene'],
+                'trait': info['trait'],
+                'genotype': genotype,
+                'interpretation': interpretation,
+                'mechanism': info['mechanism']
+            }
+            
+            cognitive_findings.append(finding)
         
         self.results['cognitive'] = cognitive_findings
     
@@ -1894,30 +2173,24 @@ class AdvancedGeneticAnalyzer:
         power_score = 0
         endurance_score = 0
         
-        for rsid, info in self.athletic_variants.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
+        for rsid, genotype, info, interpretation in self._interpreted_rows('athletic_variants'):
             
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
-                
-                interpretation = self._interpret_athletic_variant(genotype, info)
-                
-                finding = {
-                    'rsid': rsid,
-                    'gene': info['gene'],
-                    'trait': info['trait'],
-                    'genotype': genotype,
-                    'interpretation': interpretation,
-                    'elite_info': info.get('elite_frequency', '')
-                }
-                
-                athletic_findings.append(finding)
-                
-                # Calculate power vs endurance scores
-                if 'power' in interpretation.lower():
-                    power_score += 1
-                elif 'endurance' in interpretation.lower():
-                    endurance_score += 1
+            finding = {
+                'rsid': rsid,
+                'gene': info['gene'],
+                'trait': info['trait'],
+                'genotype': genotype,
+                'interpretation': interpretation,
+                'elite_info': info.get('elite_frequency', '')
+            }
+            
+            athletic_findings.append(finding)
+            
+            # Calculate power vs endurance scores
+            if 'power' in interpretation.lower():
+                power_score += 1
+            elif 'endurance' in interpretation.lower():
+                endurance_score += 1
         
         self.results['athletic'] = {
             'findings': athletic_findings,
@@ -1985,33 +2258,26 @@ class AdvancedGeneticAnalyzer:
         
         sensory_findings = defaultdict(list)
         
-        for rsid, info in self.sensory_variants.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
+        for rsid, genotype, info, interpretation in self._interpreted_rows('sensory_variants'):
+            sense_type = 'other'
+            if 'taste' in info['trait'].lower():
+                sense_type = 'taste'
+            elif 'smell' in info['trait'].lower() or 'odor' in info['trait'].lower():
+                sense_type = 'smell'
+            elif 'vision' in info['trait'].lower() or 'color' in info['trait'].lower():
+                sense_type = 'vision'
+            elif 'hearing' in info['trait'].lower() or 'pitch' in info['trait'].lower():
+                sense_type = 'hearing'
+            
+            finding = {
+                'rsid': rsid,
+                'gene': info['gene'],
+                'trait': info['trait'],
+                'genotype': genotype,
+                'interpretation': interpretation
+            }
             
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
-                
-                sense_type = 'other'
-                if 'taste' in info['trait'].lower():
-                    sense_type = 'taste'
-                elif 'smell' in info['trait'].lower() or 'odor' in info['trait'].lower():
-                    sense_type = 'smell'
-                elif 'vision' in info['trait'].lower() or 'color' in info['trait'].lower():
-                    sense_type = 'vision'
-                elif 'hearing' in info['trait'].lower() or 'pitch' in info['trait'].lower():
-                    sense_type = 'hearing'
-                
-                interpretation = self._interpret_sensory_variant(genotype, info)
-                
-                finding = {
-                    'rsid': rsid,
-                    'gene': info['gene'],
-                    'trait': info['trait'],
-                    'genotype': genotype,
-                    'interpretation': interpretation
-                }
-                
-                sensory_findings[sense_type].append(finding)
+            sensory_findings[sense_type].append(finding)
         
         self.results['sensory'] = dict(sensory_findings)
     
@@ -2062,6 +2328,8 @@ class AdvancedGeneticAnalyzer:
         print("\nCalculating polygenic risk scores...")
         
         prs_results = {}
+        # Empirical per-ancestry distributions, when a reference table has been built
+        reference = prs_reference.load_cached(self.prs_reference_path)
         
         for score_name, score_info in self.polygenic_scores.items():
             print(f"\nCalculating {score_info['name']}...")
@@ -2071,76 +2339,40 @@ class AdvancedGeneticAnalyzer:
             variant_details = []
             variance_sum_for_prs = 0.0 # Initialize for PRS CI calculation
             
-            for rsid, variant_info in score_info['variants'].items():
-                variant_data = self.data[self.data['rsid'] == rsid]
+            for rsid, genotype, variant_info in self._panel_rows('polygenic_scores', group=score_name):
+                # Count effect alleles (risk/tall/education allele, see utils.cohort)
+                effect_allele = cohort.effect_allele(variant_info)
+                if effect_allele is None:
+                    continue
+                allele_count = genotype.count(effect_allele)
                 
-                if not variant_data.empty:
-                    genotype = variant_data.iloc[0]['genotype']
-                    
-                    # Count effect alleles
-                    if 'risk_allele' in variant_info:
-                        effect_allele = variant_info['risk_allele']
-                        allele_count = genotype.count(effect_allele)
-                    elif 'tall_allele' in variant_info:
-                        effect_allele = variant_info['tall_allele']
-                        allele_count = genotype.count(effect_allele)
-                    elif 'education_allele' in variant_info:
-                        effect_allele = variant_info['education_allele']
-                        allele_count = genotype.count(effect_allele)
-                    else:
-                        continue
-                    
-                    # Add weighted contribution
-                    contribution = allele_count * variant_info['weight']
-                    score += contribution
-                    variants_found += 1
-                    
-                    variant_details.append({
-                        'rsid': rsid,
-                        'genotype': genotype,
-                        'effect_alleles': allele_count,
-                        'weight': variant_info['weight'],
-                        'contribution': contribution
-                    })
-
-                    # PRS CI Calculation Part:
-                    # Assumes variant_info for PRS SNPs might have 'se_weight' (standard error of the weight)
-                    # or 'ci_95_weight' (95% CI of the weight).
-                    # The formula from checklist: variance_sum as Σ(weight² × allele_count × var_i)
-                    # where var_i = [(upper-lower)/3.92]². This var_i is variance of SNP effect, not weight.
-                    # A more direct approach if SE of weight is known: Σ (allele_count^2 * SE_weight^2)
-                    # Let's try to implement based on 'se_weight' or 'ci_95_weight'.
-                    
-                    var_of_weighted_effect = 0
-                    if 'se_weight' in variant_info and variant_info['se_weight'] is not None:
-                        # Variance of (allele_count * weight) = allele_count^2 * Var(weight)
-                        # Var(weight) = se_weight^2
-                        var_of_weighted_effect = (allele_count**2) * (variant_info['se_weight']**2)
-                    elif 'ci_95_weight' in variant_info and variant_info['ci_95_weight'] and len(variant_info['ci_95_weight']) == 2:
-                        lower_w_ci, upper_w_ci = variant_info['ci_95_weight']
-                        # Estimate SE from 95% CI: SE = (upper - lower) / (2 * 1.96)
-                        se_w_est = (upper_w_ci - lower_w_ci) / 3.92
-                        var_w_est = se_w_est**2
-                        var_of_weighted_effect = (allele_count**2) * var_w_est
-                    
-                    variance_sum_for_prs += var_of_weighted_effect
+                # Add weighted contribution
+                contribution = allele_count * variant_info['weight']
+                score += contribution
+                variants_found += 1
+                
+                variant_details.append({
+                    'rsid': rsid,
+                    'genotype': genotype,
+                    'effect_alleles': allele_count,
+                    'weight': variant_info['weight'],
+                    'contribution': contribution
+                })
 
-            # Normalize score
-            z_score = (score - score_info['population_mean']) / score_info['population_sd']
-            percentile = stats.norm.cdf(z_score) * 100
-            
-            prs_ci_95_raw = None
-            prs_ci_95_zscore = None
+                # PRS CI: Var(allele_count * weight) = allele_count^2 * Var(weight), with
+                # Var(weight) from 'se_weight' or estimated from 'ci_95_weight'
+                variance_sum_for_prs += (allele_count**2) * cohort.weight_variance(variant_info)
 
-            if variance_sum_for_prs > 0:
-                se_prs_raw = math.sqrt(variance_sum_for_prs)
-                prs_ci_95_raw = (score - 1.96 * se_prs_raw, score + 1.96 * se_prs_raw)
-                # Propagate to Z-score CI: (CI_lower - mean)/sd, (CI_upper - mean)/sd
-                if score_info['population_sd'] != 0:
-                    prs_ci_95_zscore = (
-                        (prs_ci_95_raw[0] - score_info['population_mean']) / score_info['population_sd'],
-                        (prs_ci_95_raw[1] - score_info['population_mean']) / score_info['population_sd']
-                    )
+            # Normalize score; the cohort matrix path (utils.cohort) shares this summary
+            summary = cohort.prs_summary(score, variance_sum_for_prs, score_info)
+            empirical = reference.summarise(score_name, self.user_ancestry_flag, score,
+                                            summary['raw_score_ci_95']) if reference else None
+            if empirical:
+                summary.update(empirical)
+            z_score = summary['z_score']
+            percentile = summary['percentile']
+            prs_ci_95_raw = summary['raw_score_ci_95']
+            prs_ci_95_zscore = summary['z_score_ci_95']
 
             prs_results[score_name] = {
                 'name': score_info['name'],
@@ -2154,14 +2386,39 @@ class AdvancedGeneticAnalyzer:
                 'pmid': score_info['pmid'],
                 'variant_details': variant_details
             }
+            if empirical:
+                prs_results[score_name]['reference'] = empirical['reference']
             
             raw_score_ci_str = f" (95% CI: {prs_ci_95_raw[0]:.3f}–{prs_ci_95_raw[1]:.3f})" if prs_ci_95_raw else ""
             z_score_ci_str = f" (95% CI: {prs_ci_95_zscore[0]:.2f}–{prs_ci_95_zscore[1]:.2f})" if prs_ci_95_zscore else ""
             print(f"  Raw Score: {score:.3f}{raw_score_ci_str}")
             print(f"  Z-score: {z_score:.2f}{z_score_ci_str}")
             print(f"  Percentile: {percentile:.1f}%")
+            if empirical:
+                print(f"  Reference: {empirical['reference']}")
             print(f"  Interpretation: {prs_results[score_name]['interpretation']}")
         
+        # External scoring files (catalog scores with up to millions of weights)
+        for prs_file in self.prs_files:
+            print(f"\nStreaming external scoring file {prs_file}...")
+            result = prs_weights.score_file(prs_file, self.store, build=self.metadata.get('build'))
+            empirical = reference.summarise(result['score_id'], self.user_ancestry_flag, result['raw_score'],
+                                            result['raw_score_ci_95']) if reference else None
+            if empirical:
+                result.update(empirical, normalisation=empirical['reference'])
+            if result['z_score'] is not None:
+                result['interpretation'] = self._interpret_prs(result['z_score'], result['percentile'], result['score_id'])
+            else:
+                result['interpretation'] = "Raw score only (no population mean/SD or allele frequencies in the scoring file)"
+            prs_results[result['score_id']] = result
+            
+            print(f"  {result['name']}: raw score {result['raw_score']:.4f} from {result['variants_found']} variants")
+            if result['z_score'] is not None:
+                print(f"  Z-score: {result['z_score']:.2f} ({result['normalisation']})")
+                print(f"  Percentile: {result['percentile']:.1f}%")
+            for warning in result['warnings']:
+                print(f"  Warning: {warning}")
+        
         self.results['polygenic_scores'] = prs_results
     
     def _interpret_prs(self, z_score, percentile, score_type):
@@ -2202,26 +2459,21 @@ class AdvancedGeneticAnalyzer:
             diplotype = []
             variants_found = []
             
-            for rsid, variant_info in gene_info['variants'].items():
-                variant_data = self.data[self.data['rsid'] == rsid]
-                
-                if not variant_data.empty:
-                    genotype = variant_data.iloc[0]['genotype']
+            for rsid, genotype, variant_info in self._panel_rows('pharmacogenomics', group=gene):
+                # Determine alleles present
+                if 'function' in variant_info:
+                    variants_found.append({
+                        'rsid': rsid,
+                        'genotype': genotype,
+                        'star_allele': variant_info['allele'],
+                        'function': variant_info['function']
+                    })
                     
-                    # Determine alleles present
-                    if 'function' in variant_info:
-                        variants_found.append({
-                            'rsid': rsid,
-                            'genotype': genotype,
-                            'star_allele': variant_info['allele'],
-                            'function': variant_info['function']
-                        })
-                        
-                        # Simplified diplotype calling
-                        if gene == 'CYP2D6' and rsid == 'rs3892097' and 'G' not in genotype:
-                            diplotype.append('*4')
-                        elif gene == 'CYP2C19' and rsid == 'rs4244285' and 'A' in genotype:
-                            diplotype.append('*2')
+                    # Simplified diplotype calling
+                    if gene == 'CYP2D6' and rsid == 'rs3892097' and 'G' not in genotype:
+                        diplotype.append('*4')
+                    elif gene == 'CYP2C19' and rsid == 'rs4244285' and 'A' in genotype:
+                        diplotype.append('*2')
             
             # Predict metabolizer phenotype
             if variants_found:
@@ -2291,39 +2543,42 @@ class AdvancedGeneticAnalyzer:
         
         findings = []
         
-        for rsid, info in self.rare_variants.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
+        for rsid, genotype, info in self._panel_rows('rare_variants'):
+            # Determine if variant is present
+            # This is simplified - would need reference alleles
+            is_variant = False
             
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
-                
-                # Determine if variant is present
-                # This is simplified - would need reference alleles
-                is_variant = False
-                
-                # For HFE variants (hemochromatosis)
-                if rsid == 'rs28940279' and 'A' in genotype:  # C282Y
-                    is_variant = True
-                elif rsid == 'rs28940579' and 'G' in genotype:  # H63D
-                    is_variant = True
-                # Add checks for other variants as needed
+            # For HFE variants (hemochromatosis)
+            if rsid == 'rs28940279' and 'A' in genotype:  # C282Y
+                is_variant = True
+            elif rsid == 'rs28940579' and 'G' in genotype:  # H63D
+                is_variant = True
+            # Add checks for other variants as needed
+            
+            if is_variant:
+                finding = {
+                    'rsid': rsid,
+                    'gene': info['gene'],
+                    'genotype': genotype,
+                    'condition': info['condition'],
+                    'inheritance': info['inheritance'],
+                    'pathogenicity': info['pathogenicity'],
+                    'significance': info['clinical_significance']
+                }
                 
-                if is_variant:
-                    finding = {
-                        'rsid': rsid,
-                        'gene': info['gene'],
-                        'genotype': genotype,
-                        'condition': info['condition'],
-                        'inheritance': info['inheritance'],
-                        'pathogenicity': info['pathogenicity'],
-                        'significance': info['clinical_significance']
-                    }
-                    
-                    findings.append(finding)
-                    print(f"\n⚠️  RARE VARIANT DETECTED: {info['gene']} ({rsid})")
-                    print(f"   Condition: {info['condition']}")
-                    print(f"   Inheritance: {info['inheritance']}")
-                    print(f"   Clinical significance: {info['clinical_significance']}")
+                findings.append(finding)
+                print(f"\n⚠️  RARE VARIANT DETECTED: {info['gene']} ({rsid})")
+                print(f"   Condition: {info['condition']}")
+                print(f"   Inheritance: {info['inheritance']}")
+                print(f"   Clinical significance: {info['clinical_significance']}")
+        
+        # With a gene model, record the annotated gene of each finding, and
+        # keep findings of the same gene together for the report
+        annotations = self.genes_for(finding['rsid'] for finding in findings)
+        for finding in findings:
+            if finding['rsid'] in annotations:
+                finding['gene_model_annotation'] = annotations[finding['rsid']]
+        findings.sort(key=lambda finding: finding['gene'])
         
         self.results['rare_variants'] = findings
     
@@ -2355,10 +2610,11 @@ class AdvancedGeneticAnalyzer:
         derived_allele_count = 0
         total_alleles = 0
         
+        genotypes = self.get_genotypes(ancestry_markers)
+        
         for rsid, info in ancestry_markers.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
+            genotype = genotypes.get(rsid)
+            if genotype is not None:
                 
                 ancestral_count = genotype.count(info['ancestral'])
                 derived_count = genotype.count(info['derived'])
@@ -2400,10 +2656,18 @@ class AdvancedGeneticAnalyzer:
         
         trait_results = defaultdict(list)
         
+        # Circadian rhythm
+        clock_variants = {
+            'rs1801260': {'gene': 'CLOCK', 'trait': 'chronotype'},
+            'rs11932595': {'gene': 'CLOCK', 'trait': 'sleep duration'},
+            'rs4753426': {'gene': 'CRY2', 'trait': 'circadian rhythm'}
+        }
+        
+        genotypes = self.get_genotypes(['rs1815739', 'rs1049434', *clock_variants])
+        
         # Athletic performance
-        actn3_data = self.data[self.data['rsid'] == 'rs1815739']
-        if not actn3_data.empty:
-            genotype = actn3_data.iloc[0]['genotype']
+        genotype = genotypes.get('rs1815739')
+        if genotype is not None:
             if genotype == 'CC':
                 interpretation = "Two copies of the 'sprinter' variant (577R) - associated with power/speed sports"
             elif genotype == 'TT':
@@ -2419,9 +2683,8 @@ class AdvancedGeneticAnalyzer:
             })
         
         # Muscle composition and recovery
-        mcm6_data = self.data[self.data['rsid'] == 'rs1049434']
-        if not mcm6_data.empty:
-            genotype = mcm6_data.iloc[0]['genotype']
+        genotype = genotypes.get('rs1049434')
+        if genotype is not None:
             trait_results['muscle_recovery'].append({
                 'gene': 'MCT1',
                 'variant': 'rs1049434',
@@ -2429,17 +2692,9 @@ class AdvancedGeneticAnalyzer:
                 'interpretation': 'Affects lactate transport and exercise recovery'
             })
         
-        # Circadian rhythm
-        clock_variants = {
-            'rs1801260': {'gene': 'CLOCK', 'trait': 'chronotype'},
-            'rs11932595': {'gene': 'CLOCK', 'trait': 'sleep duration'},
-            'rs4753426': {'gene': 'CRY2', 'trait': 'circadian rhythm'}
-        }
-        
         for rsid, info in clock_variants.items():
-            variant_data = self.data[self.data['rsid'] == rsid]
-            if not variant_data.empty:
-                genotype = variant_data.iloc[0]['genotype']
+            genotype = genotypes.get(rsid)
+            if genotype is not None:
                 trait_results['circadian_rhythm'].append({
                     'gene': info['gene'],
                     'variant': rsid,
@@ -2453,11 +2708,15 @@ class AdvancedGeneticAnalyzer:
     def generate_advanced_visualizations(self):
         """Create advanced scientific visualizations."""
         print("\nGenerating advanced visualizations...")
+        _import_plotting()
         
-        os.makedirs('genetic_analysis_plots', exist_ok=True)
+        os.makedirs(self.plots_dir, exist_ok=True)
         
         # 1. Manhattan plot simulation (would use actual p-values in practice)
-        self._create_manhattan_plot()
+        if self.genome_counters is None:
+            self._create_manhattan_plot()
+        else:
+            print("Skipping Manhattan plot: targeted load holds only knowledge-base loci")
         
         # 2. Genetic risk score distributions
         self._create_risk_score_plots()
@@ -2474,22 +2733,23 @@ class AdvancedGeneticAnalyzer:
         # 6. Ancient admixture visualization
         self._create_ancient_admixture_plot()
         
-        print("Advanced visualizations saved to 'genetic_analysis_plots' directory")
+        print(f"Advanced visualizations saved to '{self.plots_dir}' directory")
     
     def _create_manhattan_plot(self):
         """Create a Manhattan-style plot of variants."""
         plt.figure(figsize=(16, 8))
         
         # Group variants by chromosome
+        # (each chromosome is a slice of the sorted-position index, not a mask over the genome)
         chrom_data = []
-        for chrom in sorted(self.data['chromosome'].unique()):
+        for chrom in sorted(self.region_index.chromosomes):
             if chrom.isdigit() or chrom in ['X', 'Y']:
-                chrom_variants = self.data[self.data['chromosome'] == chrom]
+                positions = self.region_index.chromosome(chrom).positions
                 # Simulate -log10(p) values for visualization
-                significance = np.random.exponential(1, len(chrom_variants))
+                significance = np.random.exponential(1, len(positions))
                 chrom_data.append({
                     'chrom': chrom,
-                    'positions': chrom_variants['position'].values,
+                    'positions': positions,
                     'significance': significance
                 })
         
@@ -2513,7 +2773,7 @@ class AdvancedGeneticAnalyzer:
         plt.xticks(chrom_centers, [d['chrom'] for d in chrom_data])
         plt.legend()
         plt.tight_layout()
-        plt.savefig('genetic_analysis_plots/manhattan_plot.png', dpi=300)
+        plt.savefig(os.path.join(self.plots_dir, 'manhattan_plot.png'), dpi=300)
         plt.close()
     
     def _create_risk_score_plots(self):
@@ -2542,8 +2802,11 @@ class AdvancedGeneticAnalyzer:
             y = stats.norm.pdf(x, 0, 1)
             ax.fill_between(x, y, alpha=0.3, color='gray', label='Population distribution')
             
-            # Mark individual's position
+            # Mark individual's position (external scores may have no reference distribution)
             z_score = score_data['z_score']
+            if z_score is None:
+                ax.set_title(f"{score_data['name']} (no reference distribution)")
+                continue
             ax.axvline(x=z_score, color='red', linewidth=2, label=f'Your score (Z={z_score:.2f})')
             
             # Add percentile regions
@@ -2561,7 +2824,7 @@ class AdvancedGeneticAnalyzer:
         
         plt.suptitle('Polygenic Risk Score Distributions')
         plt.tight_layout()
-        plt.savefig('genetic_analysis_plots/polygenic_risk_scores.png', dpi=300)
+        plt.savefig(os.path.join(self.plots_dir, 'polygenic_risk_scores.png'), dpi=300)
         plt.close()
     
     def _create_pharmacogenomics_plot(self):
@@ -2608,7 +2871,7 @@ class AdvancedGeneticAnalyzer:
             plt.text(0.5, i, phenotype, ha='center', va='center', fontweight='bold')
         
         plt.tight_layout()
-        plt.savefig('genetic_analysis_plots/pharmacogenomics_summary.png', dpi=300)
+        plt.savefig(os.path.join(self.plots_dir, 'pharmacogenomics_summary.png'), dpi=300)
         plt.close()
     
     def _create_ancestry_plot(self):
@@ -2653,7 +2916,7 @@ class AdvancedGeneticAnalyzer:
             
             plt.suptitle('Ancestry Marker Analysis')
             plt.tight_layout()
-            plt.savefig('genetic_analysis_plots/ancestry_analysis.png', dpi=300)
+            plt.savefig(os.path.join(self.plots_dir, 'ancestry_analysis.png'), dpi=300)
             plt.close()
     
     def _create_trait_wheel(self):
@@ -2683,7 +2946,7 @@ class AdvancedGeneticAnalyzer:
         
         plt.title('Distribution of Analyzed Genetic Traits', fontsize=16, fontweight='bold')
         plt.tight_layout()
-        plt.savefig('genetic_analysis_plots/trait_wheel.png', dpi=300)
+        plt.savefig(os.path.join(self.plots_dir, 'trait_wheel.png'), dpi=300)
         plt.close()
     
     def _create_ancient_admixture_plot(self):
@@ -2724,7 +2987,7 @@ class AdvancedGeneticAnalyzer:
         
         plt.suptitle('Ancient Human Admixture Analysis', fontsize=16)
         plt.tight_layout()
-        plt.savefig('genetic_analysis_plots/ancient_admixture.png', dpi=300)
+        plt.savefig(os.path.join(self.plots_dir, 'ancient_admixture.png'), dpi=300)
         plt.close()
     
     @safety.safeguard("scientific_report") # Added safeguard
@@ -2732,7 +2995,8 @@ class AdvancedGeneticAnalyzer:
         """Generate a comprehensive scientific report with all findings."""
         print("\nGenerating ultra-comprehensive scientific report...")
         
-        report_filename = f"ultra_comprehensive_genetic_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        os.makedirs(self.output_dir, exist_ok=True)
+        report_filename = os.path.join(self.output_dir, f"ultra_comprehensive_genetic_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
         
         with open(report_filename, 'w', encoding='utf-8') as f:
             # Header
@@ -2874,11 +3138,16 @@ class AdvancedGeneticAnalyzer:
                 raw_score_ci_str = f" (95% CI: {score_data['raw_score_ci_95'][0]:.3f}–{score_data['raw_score_ci_95'][1]:.3f})" if score_data.get('raw_score_ci_95') else ""
                 z_score_ci_str = f" (95% CI: {score_data['z_score_ci_95'][0]:.2f}–{score_data['z_score_ci_95'][1]:.2f})" if score_data.get('z_score_ci_95') else ""
                 f.write(f"Raw Score: {score_data['raw_score']:.3f}{raw_score_ci_str}\n")
-                f.write(f"Z-Score: {score_data['z_score']:.2f}{z_score_ci_str}\n")
-                f.write(f"Percentile: {score_data['percentile']:.1f}%\n")
+                if score_data['z_score'] is not None:
+                    f.write(f"Z-Score: {score_data['z_score']:.2f}{z_score_ci_str}\n")
+                    f.write(f"Percentile: {score_data['percentile']:.1f}%\n")
                 f.write(f"Interpretation: {score_data['interpretation']}\n")
                 f.write(f"Variants Used: {score_data['variants_found']}\n")
                 f.write(f"Reference: PMID {score_data['pmid']}\n")
+                if score_data.get('normalisation') or score_data.get('reference'):
+                    f.write(f"Normalisation: {score_data.get('normalisation') or score_data['reference']}\n")
+                for warning in score_data.get('warnings', []):
+                    f.write(f"Warning: {warning}\n")
                 
                 # Add specific interpretations
                 if 'CAD_PRS' in score_name and score_data['percentile'] > 80:
@@ -2917,10 +3186,20 @@ class AdvancedGeneticAnalyzer:
                 f.write(disclaimers.build_disclaimer(has_rare_disease_findings=True, ancestry_flag=self.user_ancestry_flag) + "\n\n")
                 f.write("Screening for known pathogenic mutations:\n\n")
                 
+                # Findings are grouped by gene (analyze_rare_variants sorts them)
+                gene_counts = Counter(variant['gene'] for variant in self.results['rare_variants'])
+                previous_gene = None
                 for variant in self.results['rare_variants']:
+                    if variant['gene'] != previous_gene:
+                        previous_gene = variant['gene']
+                        f.write(f"\nGene: {variant['gene']} ({gene_counts[variant['gene']]} finding(s))\n")
                     f.write("\n⚠️  RARE VARIANT DETECTED:\n")
                     f.write("-"*40 + "\n")
-                    f.write(f"Gene: {variant['gene']}\n")
+                    annotation = variant.get('gene_model_annotation')
+                    if annotation is not None:
+                        located = (f"within {annotation['gene']}" if annotation['gene'] is not None else
+                                   f"{annotation['distance_bp']:,} bp from {annotation['nearest_gene']}")
+                        f.write(f"Gene model: {located}\n")
                     f.write(f"Variant: {variant['rsid']}\n")
                     f.write(f"Your Genotype: {variant['genotype']}\n")
                     f.write(f"Associated Condition: {variant['condition']}\n")
@@ -3206,7 +3485,7 @@ class AdvancedGeneticAnalyzer:
         print(f"\n✅ Comprehensive scientific report saved as: {report_filename}")
 
         # Dump full results to JSON for provenance checking and other uses
-        results_json_filename = f"ultra_comprehensive_genetic_analysis_RESULTS_{self.provenance.get('analysis_start_time_utc', datetime.now().strftime('%Y%m%dT%H%M%S%fZ')).replace(':', '-')}.json"
+        results_json_filename = os.path.join(self.output_dir, f"ultra_comprehensive_genetic_analysis_RESULTS_{self.provenance.get('analysis_start_time_utc', datetime.now().strftime('%Y%m%dT%H%M%S%fZ')).replace(':', '-')}.json")
         try:
             with open(results_json_filename, 'w', encoding='utf-8') as json_f:
                 # Use a custom serializer for complex objects if json.dumps with default=str is not enough
@@ -3219,28 +3498,21 @@ class AdvancedGeneticAnalyzer:
         return report_filename
     
     def run_complete_analysis(self):
-        """Run the complete advanced analysis pipeline."""
+        """Run the complete advanced analysis pipeline; returns the report path, or None on failure."""
         print("Starting advanced genetic analysis with scientific methods...\n")
+        run_started = time.perf_counter()
+        # tracemalloc is process-wide: only stop it afterwards if this run started it
+        started_tracing = self.profile_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
         
         try:
-            # Load and QC the data
-            self.load_data() 
-            self._perform_pca_for_ancestry() # Call after data is loaded and before other analyses
-            
-            # Run all analyses
-            self.analyze_basic_statistics()
-            self.analyze_disease_risk()
-            self.calculate_polygenic_scores()
-            self.analyze_pharmacogenomics()
-            self.analyze_rare_variants()
-            self.calculate_ancestry_composition()
-            self.analyze_traits_and_characteristics()
-            self.analyze_fascinating_traits()
-            self.analyze_ancient_admixture()
-            self.analyze_longevity_markers()
-            self.analyze_cognitive_traits()
-            self.analyze_athletic_performance()
-            self.analyze_sensory_genetics()
+            # Load and QC the data, infer ancestry, then run all analyses; independent
+            # stages run concurrently and results are merged in serial order
+            stages = [scheduler.Stage(name, getattr(self, name), requires, provides)
+                      for name, requires, provides in self.ANALYSIS_STAGES]
+            scheduler.run_stages(stages, workers=self.stage_workers)
+            self.results = scheduler.ordered_results(self.results, stages)
             
             # Finalize provenance (add hash and end time)
             # Pass self.results to the versioning function
@@ -3248,14 +3520,19 @@ class AdvancedGeneticAnalyzer:
             self.results['provenance_data'] = self.provenance # Add finalized provenance to results for JSON dump
 
             # Generate outputs
-            self.generate_advanced_visualizations()
+            if self.plots:
+                self.generate_advanced_visualizations()
+            # Added after the provenance hash, so timings never change it
+            self.results['performance_profile'] = safety.performance_profile(
+                self.performance_records, time.perf_counter() - run_started)
             report_filename = self.generate_scientific_report()
             
             print("\n" + "="*80)
             print("ADVANCED ANALYSIS COMPLETE!")
             print("="*80)
             print(f"\nYour comprehensive scientific report: {report_filename}")
-            print("Advanced visualization plots saved in: genetic_analysis_plots/")
+            if self.plots:
+                print(f"Advanced visualization plots saved in: {self.plots_dir}/")
             print("\nKey findings summary:")
             print(f"- Analyzed {self.results['advanced_stats']['total_variants']:,} genetic variants")
             print(f"- Calculated {len(self.results.get('polygenic_scores', {}))} polygenic risk scores")
@@ -3298,11 +3575,43 @@ class AdvancedGeneticAnalyzer:
             
             print("\nRemember: This analysis is for research and educational purposes only.")
             print("Always consult healthcare professionals for medical interpretation.")
+            return report_filename
             
         except Exception as e:
             print(f"\nError during analysis: {e}")
             import traceback
             traceback.print_exc()
+            return None
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self._report_performance(time.perf_counter() - run_started)
+
+    def _report_performance(self, total_wall_seconds):
+        """Print the per-stage timing table and append the stage records to the metrics file."""
+        profile = safety.performance_profile(self.performance_records, total_wall_seconds)
+        if not profile['stages']:
+            return
+        print("\n⏱️  Stage performance (slowest first):")
+        for line in safety.format_profile_table(profile):
+            print("  " + line)
+        if profile['memory_profiled']:
+            print("  (* ran alongside other stages; its peak memory includes theirs)")
+
+        if self.metrics_file:
+            try:
+                safety.write_metrics(
+                    self.metrics_file, profile,
+                    run_id=self.provenance.get('analysis_start_time_utc'),
+                    sample=self.filename,
+                    host=platform.node(),
+                    script_version=self.provenance.get('analysis_script_version'),
+                    stage_workers=self.stage_workers,
+                    total_wall_seconds=total_wall_seconds,
+                )
+                print(f"  Stage metrics appended to: {self.metrics_file}")
+            except OSError as e:
+                print(f"  Could not write stage metrics to {self.metrics_file}: {e}")
 
 def main():
     """Main function to run the advanced genetic analysis."""
@@ -3319,12 +3628,120 @@ def main():
     parser.add_argument('--ancestry', type=str, choices=['EU', 'AFR', 'EAS', 'SAS', 'AMR', 'UNKNOWN'],
                         help='Specify ancestry for disclaimer and PRS adjustments (e.g., EU, AFR). Overrides dynamic inference.')
     parser.add_argument('filename', nargs='?', default=r'c:\dna\genome_Ryan_Zimmerman_v5_Full_20241120210748.txt',
-                        help='Path to the 23andMe data file.')
+                        help='Path to the 23andMe data file or VCF (plain, .gz/bgzip or .zip).')
+    parser.add_argument('--cache-dir', type=str, default=None,
+                        help='Directory for a persistent cache of parsed genomes (keyed by file hash). Disabled by default.')
+    parser.add_argument('--targeted', action='store_true',
+                        help='Keep only knowledge-base loci plus genome-wide counters while streaming; with an indexed bgzipped VCF, seek straight to them.')
+    parser.add_argument('--build-index', action='store_true',
+                        help='Build the random-access index (<file>.vidx.npz) for a bgzipped VCF and exit.')
+    parser.add_argument('--build-knowledge-base', action='store_true',
+                        help=f'Compile the variant databases into {knowledge_artifact.DEFAULT_PATH} (versioned; loaded once per process) and exit.')
+    parser.add_argument('--batch', type=str, default=None, metavar='DIR_OR_MANIFEST',
+                        help='Analyse every raw file in a directory, or every path listed in a manifest, on a process pool.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for --batch (default: number of CPUs).')
+    parser.add_argument('--output-root', type=str, default='batch_results',
+                        help='Directory receiving one output sub-directory per sample in --batch mode.')
+    parser.add_argument('--cache-max-mb', type=int, default=genome_cache.DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help='Maximum total size of the genome cache in MB; least recently used entries are evicted.')
+    parser.add_argument('--prs-file', action='append', default=[], metavar='SCORING_FILE',
+                        help='External PRS scoring file (rsid or chr/pos, effect/other allele, weight, optional SE; '
+                             'PGS Catalog format works). Streamed in chunks; may be given several times.')
+    parser.add_argument('--cohort-prs', type=str, default=None, metavar='OUTPUT_TSV',
+                        help='Score every polygenic score for a cohort (the --batch samples, or every sample column of a '
+                             'multi-sample VCF given as filename) as one dosage matrix, write a per-sample table and exit.')
+    parser.add_argument('--stage-workers', type=int, default=None,
+                        help='Threads running independent analysis stages concurrently (default: number of CPUs; 1 = serial).')
+    parser.add_argument('--metrics-file', type=str, default=None, metavar='JSONL',
+                        help='Append one JSON line per analysis stage (wall/CPU time, peak memory, sample, host) to this file.')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Record the peak memory allocated by each stage with tracemalloc (slows the run several-fold).')
+    parser.add_argument('--gene-model', type=str, default=None, metavar='GTF_OR_BED',
+                        help='Local GTF/GFF or BED gene model; every variant is annotated with its overlapping and '
+                             'nearest gene (the compiled index is cached as <file>.index.npz).')
+    parser.add_argument('--no-plots', action='store_true',
+                        help='Skip the visualizations (report and JSON only); matplotlib, seaborn and SciPy are never imported.')
+    parser.add_argument('--prs-reference', type=str, default=prs_reference.DEFAULT_PATH,
+                        help='Empirical PRS reference distributions (.npz) for ancestry-aware percentiles; used if present.')
+    parser.add_argument('--build-prs-reference', type=str, default=None, metavar='OUTPUT_NPZ',
+                        help='Build empirical PRS reference distributions and exit, from --reference-frequencies '
+                             'or from a reference cohort (--reference-cohort, --batch or a multi-sample VCF filename).')
+    parser.add_argument('--reference-frequencies', type=str, default=None, metavar='TSV',
+                        help='Allele frequency table (rsid, allele, one column per ancestry) to simulate reference distributions from.')
+    parser.add_argument('--reference-cohort', type=str, default=None, metavar='SOURCE',
+                        help='Reference cohort: a directory or manifest of raw files, or a multi-sample VCF.')
+    parser.add_argument('--reference-labels', type=str, default=None, metavar='TSV',
+                        help='Sample id <TAB> ancestry (EU, AFR, ...) for the reference cohort.')
     
     args = parser.parse_args()
     filename = args.filename
     cli_ancestry_flag = args.ancestry
 
+    analyzer_options = {
+        'cli_ancestry': cli_ancestry_flag,
+        'cache_dir': args.cache_dir,
+        'cache_max_bytes': args.cache_max_mb * 1024 ** 2,
+        'targeted': args.targeted,
+        'prs_files': args.prs_file,
+        'prs_reference_path': args.prs_reference,
+        'plots': not args.no_plots,
+        'stage_workers': args.stage_workers,
+        'metrics_file': args.metrics_file,
+        'profile_memory': args.profile_memory,
+        'gene_model_path': args.gene_model,
+    }
+
+    if args.build_knowledge_base:
+        compiled = knowledge_artifact.build()
+        entries = sum(len(panel_entries) for panel_entries in compiled.entries.values())
+        print(f"Compiled {len(compiled.panels)} panels ({entries} entries, {len(compiled.union_rsids)} rsids) "
+              f"-> {knowledge_artifact.DEFAULT_PATH}")
+        return
+
+    if args.build_prs_reference:
+        polygenic_scores = AdvancedGeneticAnalyzer(None).polygenic_scores
+        if args.reference_frequencies:
+            print(f"Simulating PRS reference distributions from {args.reference_frequencies}...")
+            frequencies = prs_reference.read_frequency_table(args.reference_frequencies)
+            reference = prs_reference.build_from_frequencies(polygenic_scores, frequencies)
+        else:
+            source = args.reference_cohort or args.batch or filename
+            print(f"Scoring reference cohort {source}...")
+            matrix = cohort.matrix_from_source(source, cohort.score_columns(polygenic_scores))
+            labels = {}
+            if args.reference_labels:
+                labels = dict(pd.read_csv(args.reference_labels, sep='\t', header=None, comment='#',
+                                          dtype=str).iloc[:, :2].itertuples(index=False, name=None))
+            reference = prs_reference.build_from_cohort(matrix, polygenic_scores, labels, source=f"cohort {source}")
+        reference.save(args.build_prs_reference)
+        print(f"Saved {len(reference)} (score, ancestry) distributions -> {args.build_prs_reference}")
+        return
+
+    if args.cohort_prs:
+        polygenic_scores = AdvancedGeneticAnalyzer(None).polygenic_scores
+        source = args.batch or filename
+        print(f"Cohort PRS: scoring every sample of {source}...")
+        matrix = cohort.matrix_from_source(source, cohort.score_columns(polygenic_scores))
+        table = matrix.score_all(polygenic_scores)
+        table.to_csv(args.cohort_prs, sep='\t', float_format='%.6g')
+        print(f"Scored {len(matrix.samples)} samples x {len(polygenic_scores)} scores -> {args.cohort_prs}")
+        return
+
+    if args.batch:
+        samples = batch.discover_samples(args.batch)
+        print(f"Batch mode: {len(samples)} samples on {args.workers or os.cpu_count()} workers -> {args.output_root}")
+        # The process pool already uses every core, so stages run serially per sample by default
+        batch_options = dict(analyzer_options, stage_workers=args.stage_workers or 1)
+        outcomes = batch.run_batch(AdvancedGeneticAnalyzer, samples, args.output_root,
+                                   workers=args.workers, **batch_options)
+        failed = [outcome for outcome in outcomes if outcome['status'] != 'ok']
+        print(f"Completed {len(outcomes) - len(failed)}/{len(outcomes)} samples; "
+              f"summary in {os.path.join(args.output_root, 'batch_summary.json')}")
+        for outcome in failed:
+            print(f"  FAILED {outcome['sample']}: {outcome.get('error', 'see analysis.log in its output directory')}")
+        return
+
     print(f"Using data file: {filename}")
     if cli_ancestry_flag:
         print(f"Ancestry specified via CLI: {cli_ancestry_flag}")
@@ -3338,11 +3755,17 @@ def main():
         directory = os.path.dirname(filename) if os.path.dirname(filename) else '.'
         if os.path.exists(directory):
             print(f"\nFiles in {directory}:")
-            txt_files = [f for f in os.listdir(directory) if f.endswith('.txt')]
+            txt_files = [f for f in os.listdir(directory) if f.endswith(('.txt', '.vcf', '.gz', '.zip'))]
             for f in txt_files[:5]:  # Show first 5 txt files
                 print(f"  - {f}")
         return
     
+    if args.build_index:
+        print(f"\nBuilding random-access index for {filename}...")
+        index = vcf_index.build_index(filename)
+        print(f"Indexed {index.info['records']:,} records -> {vcf_index.index_path(filename)}")
+        return
+    
     # Create analyzer and run analysis
     try:
         print("\nInitializing genetic analyzer...")
@@ -3356,7 +3779,7 @@ def main():
         print("  • Longevity and aging markers")
         print("\nStarting analysis...\n")
         
-        analyzer = AdvancedGeneticAnalyzer(filename, cli_ancestry=cli_ancestry_flag) # Pass CLI ancestry
+        analyzer = AdvancedGeneticAnalyzer(filename, **analyzer_options) # Pass CLI ancestry and loading options
         analyzer.run_complete_analysis()
         
     except Exception as e:
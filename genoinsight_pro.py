@@ -30,6 +30,9 @@ import networkx as nx
 from itertools import combinations
 import requests
 
+from utils import loader
+from utils import region_index
+
 warnings.filterwarnings('ignore')
 
 # Configure plotting style for publication-quality visualizations
@@ -49,6 +52,7 @@ class AdvancedGeneticAnalyzer:
         """Initialize the analyzer with comprehensive variant databases."""
         self.filename = filename
         self.data = None
+        self.region_index = None # chromosome/position range lookup built by load_data
         self.metadata = {}
         self.results = defaultdict(dict)
         
@@ -477,33 +481,11 @@ class AdvancedGeneticAnalyzer:
         print("Loading genetic data with quality control...")
         
         try:
-            # Read the file, skipping comment lines
-            with open(self.filename, 'r') as f:
-                lines = f.readlines()
-            
-            # Extract metadata and data
-            data_lines = []
-            for line in lines:
-                if line.startswith('#'):
-                    if 'generated by 23andMe' in line:
-                        self.metadata['source'] = '23andMe'
-                    elif 'reference human assembly build' in line:
-                        self.metadata['build'] = 'GRCh37/hg19'
-                    elif 'array' in line.lower():
-                        self.metadata['array'] = line.strip()
-                else:
-                    data_lines.append(line.strip())
-            
-            # Parse the genetic data
-            from io import StringIO
-            data_string = '\n'.join(data_lines)
-            self.data = pd.read_csv(StringIO(data_string), sep='\t')
-            
-            # Clean up the data
-            self.data.columns = ['rsid', 'chromosome', 'position', 'genotype']
+            # Parse header metadata and stream the body into the C parser
+            self.data, header_metadata = loader.read_raw_genotypes(self.filename)
+            self.metadata.update(header_metadata)
             
             # Quality control steps
-            self.data['chromosome'] = self.data['chromosome'].astype(str)
             self.data = self.data[self.data['genotype'] != '--']  # Remove no-calls
             self.data = self.data[self.data['genotype'] != 'DD']  # Remove deletions
             self.data = self.data[self.data['genotype'] != 'II']  # Remove insertions
@@ -515,6 +497,9 @@ class AdvancedGeneticAnalyzer:
             # Check for strand consistency
             self.data['genotype_sorted'] = self.data['genotype'].apply(lambda x: ''.join(sorted(x)))
             
+            # Index positions per chromosome for region queries and per-chromosome plots
+            self.region_index = region_index.RegionIndex.from_frame(self.data)
+            
             print(f"Successfully loaded {len(self.data)} genetic variants")
             print(f"Call rate: {self.metadata['call_rate']:.2%}")
             print(f"Chromosomes present: {sorted(self.data['chromosome'].unique())}")
@@ -1048,14 +1033,14 @@ class AdvancedGeneticAnalyzer:
         
         # Group variants by chromosome
         chrom_data = []
-        for chrom in sorted(self.data['chromosome'].unique()):
+        for chrom in sorted(self.region_index.chromosomes):
             if chrom.isdigit() or chrom in ['X', 'Y']:
-                chrom_variants = self.data[self.data['chromosome'] == chrom]
+                positions = self.region_index.chromosome(chrom).positions
                 # Simulate -log10(p) values for visualization
-                significance = np.random.exponential(1, len(chrom_variants))
+                significance = np.random.exponential(1, len(positions))
                 chrom_data.append({
                     'chrom': chrom,
-                    'positions': chrom_variants['position'].values,
+                    'positions': positions,
                     'significance': significance
                 })
         
@@ -0,0 +1,68 @@
+import os
+import pickle
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsClassifier
+
+from utils import ancestry
+
+@pytest.fixture
+def reference(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    centres = {'AFR': 0.0, 'EAS': 3.0, 'EU': 6.0}
+    labels = np.repeat(list(centres), 50)
+    pcs = rng.normal(0, 1.0, (len(labels), 10)) + np.array([centres[label] for label in labels])[:, None]
+    for name, array in (('REF_PATH', pcs), ('LABELS_PATH', labels)):
+        path = tmp_path / f"{name}.npy"
+        np.save(path, array)
+        monkeypatch.setattr(ancestry, name, str(path))
+    monkeypatch.setattr(ancestry, 'INDEX_PATH', str(tmp_path / "index.npz"))
+    monkeypatch.setattr(ancestry, '_model', None)
+    return pcs, labels
+
+def test_batched_inference_matches_knn_classifier(reference):
+    pcs, labels = reference
+    queries = np.random.default_rng(1).normal(3.0, 2.5, (200, 10))
+    expected = KNeighborsClassifier(n_neighbors=7).fit(pcs, labels).predict(queries)
+
+    assert ancestry.infer_superpop_many(queries).tolist() == expected.tolist()
+    assert ancestry.infer_superpop(queries[0]) == expected[0]
+    queries[3, 0] = np.nan
+    assert ancestry.infer_superpop_many(queries)[3] == "UNKNOWN"
+
+def test_index_is_persisted_and_reused(reference, monkeypatch):
+    ancestry.infer_superpop(np.zeros(10))
+    assert ancestry._model['tree'] is not None
+    monkeypatch.setattr(ancestry, '_model', None)
+    np_load = np.load
+    loaded = []
+    monkeypatch.setattr(ancestry.np, 'load', lambda path, *args, **kwargs: loaded.append(path) or np_load(path, *args, **kwargs))
+    assert ancestry.infer_superpop(np.zeros(10)) == 'AFR'
+    assert loaded == [ancestry.INDEX_PATH]
+
+class _Planted:
+    def __reduce__(self):
+        return (os.makedirs, (os.path.join(os.getcwd(), 'pwned'),))
+
+def test_planted_pickle_is_never_executed(reference, tmp_path, monkeypatch):
+    with open(ancestry.INDEX_PATH, 'wb') as f:
+        pickle.dump(_Planted(), f)
+    monkeypatch.chdir(tmp_path)
+    assert ancestry.infer_superpop(np.zeros(10)) == 'AFR'
+    assert not (tmp_path / "pwned").exists()
+
+def test_paths_are_resolved_against_the_repository():
+    for path in (ancestry.REF_PATH, ancestry.LABELS_PATH, ancestry.INDEX_PATH):
+        assert os.path.isabs(path) and path.startswith(ancestry.REPO_DIR)
+
+def test_missing_reference_and_lazy_import(tmp_path, monkeypatch):
+    monkeypatch.setattr(ancestry, 'REF_PATH', str(tmp_path / "absent.npy"))
+    monkeypatch.setattr(ancestry, '_model', None)
+    assert ancestry.infer_superpop(np.zeros(10)) == "UNKNOWN"
+
+    loaded = subprocess.run([sys.executable, '-c', "import sys, utils.ancestry; print('sklearn' in sys.modules)"],
+                            capture_output=True, text=True, check=True).stdout
+    assert loaded.strip() == 'False'
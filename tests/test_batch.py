@@ -0,0 +1,47 @@
+import json
+import os
+
+from utils import batch
+
+class FakeAnalyzer:
+    """Stands in for AdvancedGeneticAnalyzer: fails on files containing 'bad'."""
+
+    def __init__(self, filename, output_dir='.', knowledge_base=None, **kwargs):
+        self.filename = filename
+        self.output_dir = output_dir
+        self.kb = knowledge_base if knowledge_base is not None else {'built_by': os.getpid()}
+
+    def knowledge_base(self):
+        return self.kb
+
+    def run_complete_analysis(self):
+        if 'bad' in open(self.filename).read():
+            raise ValueError("unparseable genome")
+        report = os.path.join(self.output_dir, 'report.txt')
+        with open(report, 'w') as f:
+            f.write(str(self.kb['built_by']))
+        return report
+
+def test_discover_samples_from_directory_and_manifest(tmp_path):
+    (tmp_path / 'a.txt').write_text('')
+    (tmp_path / 'a.vcf.gz').write_text('')
+    (tmp_path / 'notes.md').write_text('')
+    assert batch.discover_samples(tmp_path) == [('a', str(tmp_path / 'a.txt')), ('a_1', str(tmp_path / 'a.vcf.gz'))]
+
+    manifest = tmp_path / 'manifest.tsv'
+    manifest.write_text("# sample\tpath\nS1\ta.txt\na.vcf.gz\n")
+    assert batch.discover_samples(manifest) == [('S1', str(tmp_path / 'a.txt')), ('a', str(tmp_path / 'a.vcf.gz'))]
+
+def test_failures_are_isolated_per_sample(tmp_path):
+    for name, content in (('one', 'ok'), ('two', 'bad'), ('three', 'ok')):
+        (tmp_path / f'{name}.txt').write_text(content)
+    samples = [(name, str(tmp_path / f'{name}.txt')) for name in ('one', 'two', 'three')]
+
+    outcomes = batch.run_batch(FakeAnalyzer, samples, tmp_path / 'out', workers=1)
+
+    assert [o['status'] for o in outcomes] == ['ok', 'failed', 'ok']
+    assert 'unparseable genome' in outcomes[1]['error']
+    # Both samples reused the knowledge base built once by the single worker
+    reports = [open(o['report']).read() for o in outcomes if o['status'] == 'ok']
+    assert reports[0] == reports[1]
+    assert json.loads((tmp_path / 'out' / 'batch_summary.json').read_text())[2]['sample'] == 'three'
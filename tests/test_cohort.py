@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils import cohort
+
+HEADER = "# This data file generated by 23andMe at: Wed Nov 20 21:07:48 2024\n# rsid\tchromosome\tposition\tgenotype\n"
+
+def write_genome(path, calls):
+    lines = [f"{rsid}\t1\t{1000 + i}\t{genotype}\n" for i, (rsid, genotype) in enumerate(calls.items())]
+    path.write_text(HEADER + ''.join(lines))
+    return str(path)
+
+def test_cohort_scores_match_per_genome_scores(tmp_path):
+    genomes = {
+        'S1': {'rs1333049': 'CC', 'rs7903146': 'CT', 'rs11205277': 'AG', 'rs9320913': 'AA', 'rs2179744': '--'},
+        'S2': {'rs1333049': 'GG', 'rs1801282': 'CC', 'rs17511102': 'TT', 'rs75932628': 'CT'},
+    }
+    analyzers = {}
+    for sample, calls in genomes.items():
+        analyzer = AdvancedGeneticAnalyzer(write_genome(tmp_path / f"{sample}.txt", calls))
+        analyzer.load_data()
+        analyzer.calculate_polygenic_scores()
+        analyzers[sample] = analyzer
+
+    scores = analyzers['S1'].polygenic_scores
+    matrix = cohort.DosageMatrix.from_stores({s: a.store for s, a in analyzers.items()},
+                                             cohort.score_columns(scores))
+    assert matrix.dosages.dtype == np.int8
+    table = matrix.score_all(scores)
+
+    for sample, analyzer in analyzers.items():
+        for score_name, expected in analyzer.results['polygenic_scores'].items():
+            row = table.loc[(score_name, sample)]
+            assert row['raw_score'] == pytest.approx(expected['raw_score'])
+            assert row['z_score'] == pytest.approx(expected['z_score'])
+            assert row['percentile'] == pytest.approx(expected['percentile'])
+            assert f"{int(row['variants_found'])}/{len(scores[score_name]['variants'])}" == expected['variants_found']
+
+def test_multi_sample_vcf_dosages_and_confidence_intervals(tmp_path):
+    path = tmp_path / "cohort.vcf"
+    path.write_text(
+        "##fileformat=VCFv4.2\n"
+        "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tA\tB\tC\n"
+        "1\t100\trs1\tC\tT\t.\tPASS\t.\tGT\t0/1\t1/1\t./.\n"
+        "1\t200\trs2\tG\tA\t.\tPASS\t.\tGT:DP\t0|0:9\t1|0:7\t0/1:3\n"
+        "1\t300\trs3\tA\tG\t.\tPASS\t.\tGT\t1/1\t0/0\t0/0\n"
+    )
+    scores = {'TEST': {
+        'population_mean': 0.1, 'population_sd': 0.5,
+        'variants': {
+            'rs1': {'weight': 0.2, 'risk_allele': 'T', 'se_weight': 0.05},
+            'rs2': {'weight': -0.1, 'tall_allele': 'G', 'ci_95_weight': [-0.2, 0.0]},
+            'rs9': {'weight': 0.3, 'risk_allele': 'A'},
+        },
+    }}
+
+    matrix = cohort.DosageMatrix.from_vcf(str(path), cohort.score_columns(scores))
+    assert matrix.samples == ['A', 'B', 'C']
+    assert matrix.dosages.tolist() == [[1, 2, -1], [2, 1, -1], [-1, 1, -1]]
+
+    table = matrix.score(scores['TEST'])
+    expected = cohort.prs_summary(0.2 * 1 - 0.1 * 2, 0.05 ** 2 + 4 * (0.2 / 3.92) ** 2, scores['TEST'])
+    assert table.loc['A', 'raw_score'] == pytest.approx(expected['raw_score'])
+    assert table.loc['A', 'percentile'] == pytest.approx(expected['percentile'])
+    assert (table.loc['A', 'raw_score_ci_95_lower'], table.loc['A', 'raw_score_ci_95_upper']) == \
+        pytest.approx(expected['raw_score_ci_95'])
+    assert table['variants_found'].tolist() == [2, 2, 1]
+
+def test_wide_vcf_only_materialises_panel_records(tmp_path, monkeypatch):
+    n_samples = 3000
+    gts = ['0/0', '0/1', '1/1']
+    lines = ["##fileformat=VCFv4.2\n",
+             "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t"
+             + "\t".join(f"S{i}" for i in range(n_samples)) + "\n"]
+    for record in range(200):
+        samples = "\t".join(gts[(record + i) % 3] for i in range(n_samples))
+        lines.append(f"1\t{100 + record}\trs{record + 1}\tC\tT\t.\tPASS\t.\tGT\t{samples}\n")
+    path = tmp_path / "wide.vcf"
+    path.write_text("".join(lines))
+
+    parsed = []
+    read_panel_records = cohort.read_panel_records
+    monkeypatch.setattr(cohort, 'read_panel_records',
+                        lambda lines, rsids: parsed.append(read_panel_records(lines, rsids)) or parsed[-1])
+
+    scores = {'TEST': {'population_mean': 0.0, 'population_sd': 1.0, 'variants': {
+        'rs5': {'weight': 1.0, 'risk_allele': 'T'},
+        'rs150': {'weight': 1.0, 'risk_allele': 'C'},
+    }}}
+    matrix = cohort.DosageMatrix.from_vcf(str(path), cohort.score_columns(scores))
+
+    # Only the two panel records were split into sample columns
+    assert parsed[0].shape == (2, 9 + n_samples)
+    assert matrix.dosages.shape == (n_samples, 2)
+    # Record r gives sample i gts[(r + i) % 3]; rs150 counts C (= REF)
+    assert matrix.dosages[:3].tolist() == [[1, 0], [2, 2], [0, 1]]
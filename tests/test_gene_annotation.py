@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils import gene_annotation
+from utils.gene_annotation import GeneModel
+
+GTF = (
+    "#!genome-build GRCh37\n"
+    'chr1\tsrc\tgene\t100\t500\t.\t+\t.\tgene_id "G1"; gene_name "ALPHA";\n'
+    'chr1\tsrc\ttranscript\t100\t500\t.\t+\t.\tgene_id "G1"; gene_name "ALPHA";\n'
+    'chr1\tsrc\tgene\t150\t200\t.\t-\t.\tgene_id "G2"; gene_name "BETA";\n'
+    'chr1\tsrc\tgene\t1000\t2000\t.\t+\t.\tgene_id "G3";\n'
+    'chr6\tsrc\tgene\t26087000\t26099000\t.\t+\t.\tgene_id "G4"; gene_name "HFE";\n'
+)
+
+RAW = (
+    "# rsid\tchromosome\tposition\tgenotype\n"
+    "rs1\t1\t120\tAG\n"
+    "rs2\t1\t600\tCC\n"
+    "rs28940279\t6\t26093141\tAG\n"
+    "rs3\tX\t5\tA\n"
+)
+
+
+def brute_force(model, chrom, position):
+    """Overlapping gene (the one reaching furthest) and distance to the nearest gene."""
+    on_chrom = [i for i in range(len(model)) if model.chromosomes[i] == chrom]
+    if not on_chrom:
+        return None, -1
+    covering = [i for i in on_chrom if model.starts[i] <= position <= model.ends[i]]
+    gene = model.names[max(covering, key=lambda i: model.ends[i])] if covering else None
+    distance = min(max(model.starts[i] - position, position - model.ends[i], 0) for i in on_chrom)
+    return gene, distance
+
+
+def test_gtf_and_bed_models_agree(tmp_path):
+    gtf = tmp_path / "genes.gtf"
+    gtf.write_text(GTF)
+    bed = tmp_path / "genes.bed"
+    bed.write_text("track name=genes\nchr1\t99\t500\tALPHA\nchr1\t149\t200\tBETA\nchr1\t999\t2000\tG3\n"
+                   "chr6\t26086999\t26099000\tHFE\n")
+
+    from_gtf, from_bed = GeneModel.read(str(gtf)), GeneModel.read(str(bed))
+    assert from_gtf.names.tolist() == ['ALPHA', 'BETA', 'G3', 'HFE']
+    assert from_gtf.starts.tolist() == from_bed.starts.tolist()
+    assert from_gtf.ends.tolist() == from_bed.ends.tolist()
+
+
+def test_annotation_matches_brute_force():
+    rng = np.random.default_rng(0)
+    starts = rng.integers(1, 100_000, 300)
+    model = GeneModel(rng.choice(['1', 'chr2'], 300), starts, starts + rng.integers(0, 5_000, 300),
+                      [f"G{i}" for i in range(300)])
+    chromosomes = rng.choice(['1', '2', 'MT'], 2_000)
+    positions = rng.integers(1, 110_000, 2_000)
+    annotation = model.annotate(chromosomes, positions)
+
+    genes = annotation.overlapping_genes()
+    for row in range(len(positions)):
+        gene, distance = brute_force(model, chromosomes[row], positions[row])
+        assert genes[row] == gene
+        assert annotation.distance[row] == distance
+
+
+def test_compiled_index_is_cached(tmp_path):
+    gtf = tmp_path / "genes.gtf"
+    gtf.write_text(GTF)
+    model = gene_annotation.load_cached(str(gtf))
+    assert os.path.exists(gene_annotation.index_path(gtf))
+
+    gene_annotation._loaded.clear()
+    reloaded = gene_annotation.load_cached(str(gtf))
+    assert reloaded.names.tolist() == model.names.tolist()
+    assert reloaded.signature == model.signature
+
+
+def test_analyzer_annotates_rare_variant_findings(tmp_path):
+    gtf = tmp_path / "genes.gtf"
+    gtf.write_text(GTF)
+    genome = tmp_path / "raw.txt"
+    genome.write_text(RAW)
+
+    analyzer = AdvancedGeneticAnalyzer(str(genome), output_dir=str(tmp_path), gene_model_path=str(gtf))
+    analyzer.load_data()
+    analyzer.analyze_basic_statistics()
+    analyzer.analyze_rare_variants()
+
+    assert analyzer.genes_for(['rs1', 'rs2']) == {
+        'rs1': {'gene': 'ALPHA', 'nearest_gene': 'ALPHA', 'distance_bp': 0},
+        'rs2': {'gene': None, 'nearest_gene': 'ALPHA', 'distance_bp': 100},
+    }
+    summary = analyzer.results['advanced_stats']['gene_annotation']
+    assert summary['genic_variants'] == 2 and summary['unannotated_variants'] == 1
+    [finding] = analyzer.results['rare_variants']
+    assert finding['gene_model_annotation']['gene'] == 'HFE'
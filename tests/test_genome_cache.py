@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+
+from utils.genome_cache import GenomeCache
+from utils.genome_store import GenotypeStore
+
+def make_store():
+    return GenotypeStore.from_frame(pd.DataFrame({
+        'rsid': ['rs1', 'rs2', 'i3'],
+        'chromosome': ['1', 'X', 'MT'],
+        'position': [10, 20, 30],
+        'genotype': ['AG', 'CC', 'T'],
+    }))
+
+def test_round_trip_is_memory_mapped(tmp_path):
+    raw = tmp_path / "raw.txt"
+    raw.write_text("rs1\t1\t10\tAG\n")
+    cache = GenomeCache(tmp_path / "cache")
+    key = cache.key_for(raw)
+
+    assert cache.load(key) is None
+    cache.save(key, make_store(), {'call_rate': 0.5, 'source': '23andMe'})
+    store, metadata = cache.load(key)
+
+    assert metadata == {'call_rate': 0.5, 'source': '23andMe'}
+    assert store.to_frame()['genotype'].tolist() == ['AG', 'CC', 'T']
+    assert list(store.chromosomes.categories) == ['1', 'MT', 'X']
+    assert store.positions.tolist() == [10, 20, 30]
+
+    # Any edit to the input file changes the key
+    raw.write_text("rs1\t1\t10\tAA\n")
+    assert cache.key_for(raw) != key
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = GenomeCache(tmp_path, max_bytes=10 ** 9)
+    cache.save('old', make_store(), {})
+    cache.save('new', make_store(), {})
+    os.utime(tmp_path / 'old', (0, 0))
+
+    entry_size = sum(p.stat().st_size for p in (tmp_path / 'new').iterdir())
+    cache.max_bytes = entry_size
+    cache.evict()
+
+    assert not (tmp_path / 'old').exists()
+    assert cache.load('new') is not None
+
+def test_damaged_vcf_entry_is_a_miss(tmp_path):
+    store = make_store()
+    vcf = GenotypeStore(store.rsids, store.chromosomes, store.positions, store.genotypes,
+                        refs=['A', 'C', 'T'], alts=['G', '.', '.'], gts=['0/1', '0/0', '0'], dosages=[1, 0, 0])
+    cache = GenomeCache(tmp_path)
+    for key, damaged in (('evicted', 'dosages.npy'), ('truncated', 'gts_codes.npy')):
+        cache.save(key, vcf, {})
+        if key == 'evicted':
+            os.remove(tmp_path / key / damaged)
+        else:
+            (tmp_path / key / damaged).write_bytes(b'\x93NUMPY')
+        assert cache.load(key) is None
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from utils import genome_store
+from utils.genome_store import GenotypeStore
+
+GENOTYPES = ['AG', 'CC', 'TA', 'A', '--', 'DI', 'NN']
+
+def test_encode_decode_round_trip():
+    codes = genome_store.encode_genotypes(GENOTYPES)
+    assert codes.dtype == np.uint8
+    # Unparseable genotypes decode to the empty string
+    assert list(genome_store.decode_genotypes(codes)) == GENOTYPES[:-1] + ['']
+
+def test_vectorized_helpers_match_string_logic():
+    codes = genome_store.encode_genotypes(GENOTYPES)
+    assert genome_store.allele_counts(codes, 'A').tolist() == [g.count('A') for g in GENOTYPES]
+    assert genome_store.is_homozygous(codes).tolist() == [False, True, False, False, True, False, False]
+    assert genome_store.is_heterozygous(codes).tolist() == [True, False, True, False, False, True, False]
+    assert list(genome_store.decode_genotypes(genome_store.complement(codes)))[:4] == ['TC', 'GG', 'AT', 'T']
+    assert list(genome_store.decode_genotypes(genome_store.sort_alleles(codes)))[:6] == [
+        ''.join(sorted(g)) for g in GENOTYPES[:6]
+    ]
+
+def test_store_filter_and_frame_view():
+    data = pd.DataFrame({
+        'rsid': ['rs1', 'rs2', 'i3'],
+        'chromosome': ['1', 'X', 'MT'],
+        'position': [10, 20, 30],
+        'genotype': ['AG', '--', 'C'],
+    })
+    store = GenotypeStore.from_frame(data)
+    called = store.filter(store.genotypes != genome_store.encode_genotypes(['--'])[0])
+
+    frame = called.to_frame()
+    assert frame['rsid'].tolist() == [1, -3]
+    assert frame['position'].dtype == np.int32
+    assert list(frame['chromosome'].cat.categories) == ['1', 'MT']
+    assert frame['genotype'].tolist() == ['AG', 'C']
+
+def test_genotype_summary_matches_per_row_loop():
+    from utils.genome_stats import genotype_summary
+
+    genotypes = ['AG', 'CT', 'AC', 'GG', 'DI', 'A', 'TT', 'GA']
+    chromosomes = ['1', '1', '1', '2', '2', 'X', 'X', 'X']
+    summary = genotype_summary(genotypes, chromosomes, positions=[5, 10, 20, 1, 2, 3, 4, 9],
+                               raw_counts_per_chromosome={'1': 4, '2': 2, 'X': 3})
+
+    # Per-row reference: AG, CT, GA transitions; AC, DI transversions
+    assert (summary['homozygous'], summary['heterozygous']) == (2, 5)
+    assert summary['ti_tv_ratio'] == 3 / 2
+    assert summary['per_chromosome']['1'] == {
+        'count': 3, 'homozygous': 0, 'heterozygous': 3, 'heterozygosity_rate': 1.0,
+        'ti_tv_ratio': 2.0, 'call_rate': 0.75, 'min_position': 5, 'max_position': 20,
+    }
+    assert summary['per_chromosome']['X']['heterozygosity_rate'] == 0.5
+
+def test_unencodable_calls_are_classified_like_the_original_loop():
+    from utils.genome_stats import genotype_summary
+
+    genotypes = ['AA', 'AG', 'NN', 'A', 'DI', '--', 'ag', '00', 'CT']
+    summary = genotype_summary(genotypes, ['1'] * len(genotypes))
+
+    # len == 2 and g[0] == g[1] -> homozygous, any other pair -> heterozygous
+    assert (summary['homozygous'], summary['heterozygous']) == (4, 4)
+    assert (summary['transitions'], summary['transversions']) == (2, 2)
+
+def test_ultra_analyzer_counts_unencodable_calls_like_the_original_loop(tmp_path):
+    from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+
+    genotypes = ['AA', 'AG', 'NN', 'NN', '00', 'ag', 'CT', '--', 'DI', 'A', 'GG']
+    path = tmp_path / "raw.txt"
+    path.write_text("# rsid\tchromosome\tposition\tgenotype\n" + "".join(
+        f"rs{i + 1}\t{1 + i % 2}\t{100 * (i + 1)}\t{genotype}\n" for i, genotype in enumerate(genotypes)))
+
+    # The per-row loop of the original analyze_basic_statistics, after its no-call filter
+    called = [g for g in genotypes if g not in genome_store.NO_CALLS]
+    homozygous = sum(len(g) == 2 and g[0] == g[1] for g in called)
+    heterozygous = sum(len(g) == 2 and g[0] != g[1] for g in called)
+
+    cache_dir = tmp_path / "cache"
+    for options in ({}, {'cache_dir': str(cache_dir)}, {'cache_dir': str(cache_dir)}, {'targeted': True}):
+        analyzer = AdvancedGeneticAnalyzer(str(path), **options)
+        analyzer.load_data()
+        analyzer.analyze_basic_statistics()
+        stats = analyzer.results['advanced_stats']
+        assert (stats['homozygous_variants'], stats['heterozygous_variants']) == (homozygous, heterozygous), options
+        assert stats['heterozygosity_rate'] == heterozygous / (homozygous + heterozygous)
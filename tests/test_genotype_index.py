@@ -0,0 +1,35 @@
+import pandas as pd
+
+from utils.genotype_index import GenotypeIndex, decode_rsid, encode_rsids
+
+def test_encode_rsids_handles_internal_and_missing_ids():
+    keys = encode_rsids(['rs429358', 'i3000001', '.', 'rsXYZ'])
+    assert keys.tolist() == [429358, -3000001, 0, 0]
+    assert [decode_rsid(k) for k in keys[:2]] == ['rs429358', 'i3000001']
+
+def test_get_genotypes_uses_first_occurrence_and_skips_missing():
+    data = pd.DataFrame({
+        'rsid': ['rs7412', 'rs429358', 'rs7412', 'i3000001'],
+        'genotype': ['CC', 'CT', 'TT', 'AG'],
+    })
+    index = GenotypeIndex.from_frame(data)
+
+    genotypes = index.get_genotypes(['rs429358', 'rs7412', 'i3000001', 'rs1'])
+    assert genotypes == {'rs429358': 'CT', 'rs7412': 'CC', 'i3000001': 'AG'}
+    assert index.lookup_rows(['rs1', 'rs7412']).tolist() == [-1, 0]
+
+def test_panel_join_unions_panels_and_rejoins_rebound_panel():
+    from utils.panels import PanelJoin
+
+    data = pd.DataFrame({'rsid': ['rs1', 'rs2', 'rs3'], 'genotype': ['AA', 'AG', 'CT']})
+    index = GenotypeIndex.from_frame(data)
+    traits = {'rs2': {'gene': 'G2'}, 'rs9': {'gene': 'missing'}}
+    scores = {'S1': {'variants': {'rs1': {'weight': 0.1}, 'rs3': {'weight': 0.2}}}}
+    join = PanelJoin(index, {'traits': (traits, False), 'scores': (scores, True)})
+
+    table = join.table('traits', traits)
+    assert table[['rsid', 'genotype']].values.tolist() == [['rs2', 'AG']]
+    assert join.table('scores', scores, nested=True, group='S1')['rsid'].tolist() == ['rs1', 'rs3']
+
+    replacement = {'rs3': {'gene': 'G3'}}
+    assert join.table('traits', replacement)['genotype'].tolist() == ['CT']
@@ -0,0 +1,119 @@
+import os
+import pickle
+
+import pandas as pd
+
+import versioning
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils import knowledge_artifact, panels
+from utils.genotype_index import GenotypeIndex
+
+def test_analyzers_share_one_compiled_knowledge_base():
+    first, second = AdvancedGeneticAnalyzer(None), AdvancedGeneticAnalyzer(None)
+    assert first.known_variants is second.known_variants
+    assert first.knowledge_base() is knowledge_artifact.load_shared()
+    assert first.polygenic_scores == AdvancedGeneticAnalyzer.compile_panels()['polygenic_scores']
+
+def test_artifact_round_trip_and_staleness(tmp_path, monkeypatch):
+    path = tmp_path / "kb" / "knowledge_base.json"
+    built = knowledge_artifact.build(str(path))
+    loaded = knowledge_artifact.KnowledgeBase.load(str(path))
+    assert loaded.is_current() and loaded.tags['db_versions'] == versioning.DB_VERSIONS
+    assert loaded.panels == built.panels and loaded.union_rsids == built.union_rsids
+    assert loaded.outcomes.keys() == built.outcomes.keys()
+
+    assert os.listdir(path.parent) == ["knowledge_base.json"]
+
+    # A database version bump makes the artifact stale: it is compiled in memory, never rewritten
+    monkeypatch.setattr(versioning, 'DB_VERSIONS', dict(versioning.DB_VERSIONS, ClinVar='2099-01-01'))
+    monkeypatch.setattr(knowledge_artifact, '_shared', {})
+    assert not loaded.is_current()
+    written = path.read_bytes()
+    refreshed = knowledge_artifact.load_shared(str(path))
+    assert refreshed.tags['db_versions']['ClinVar'] == '2099-01-01'
+    assert path.read_bytes() == written
+    assert knowledge_artifact.load_shared(str(path)) is refreshed
+
+def test_source_tag_follows_content_not_mtime(tmp_path, monkeypatch):
+    source = open(knowledge_artifact.SOURCE_PATH, 'rb').read()
+    copy, edited = tmp_path / "copy.py", tmp_path / "edited.py"
+    copy.write_bytes(source)
+    os.utime(copy, ns=(0, 0))
+    edited.write_bytes(source + b"\n# edited\n")
+
+    tags = knowledge_artifact.current_tags()
+    monkeypatch.setattr(knowledge_artifact, 'SOURCE_PATH', str(copy))
+    assert knowledge_artifact.current_tags() == tags
+    monkeypatch.setattr(knowledge_artifact, 'SOURCE_PATH', str(edited))
+    assert knowledge_artifact.current_tags() != tags
+
+class _Planted:
+    def __reduce__(self):
+        return (os.makedirs, (os.path.join(os.getcwd(), 'pwned'),))
+
+def test_artifact_is_never_unpickled_or_read_from_the_working_directory(tmp_path, monkeypatch):
+    assert os.path.isabs(knowledge_artifact.DEFAULT_PATH)
+    path = tmp_path / "knowledge_base.json"
+    path.write_bytes(pickle.dumps(_Planted()))
+    monkeypatch.chdir(tmp_path)
+
+    assert knowledge_artifact.KnowledgeBase.load(str(path)) is None
+    path.write_text('{"panels": []}')
+    assert knowledge_artifact.KnowledgeBase.load(str(path)) is None
+    assert not (tmp_path / "pwned").exists()
+
+def test_panel_join_with_prebuilt_indexes_matches_plain_join():
+    compiled = knowledge_artifact.load_shared()
+    rsids = compiled.union_rsids[::3]
+    index = GenotypeIndex.from_frame(pd.DataFrame({'rsid': rsids, 'genotype': ['AG'] * len(rsids)}))
+    spec = {name: (compiled[name], nested) for name, nested in compiled.nested.items()}
+
+    fast = panels.PanelJoin(index, spec, compiled=compiled)
+    plain = panels.PanelJoin(index, spec)
+    for name, (panel, nested) in spec.items():
+        pd.testing.assert_frame_equal(fast.table(name, panel, nested), plain.table(name, panel, nested))
+
+def test_outcome_tables_match_live_interpreters():
+    compiled = knowledge_artifact.load_shared()
+    interpreters = AdvancedGeneticAnalyzer.panel_interpreters()
+    symbols = ['A', 'C', 'G', 'T', 'D', 'I', '-']
+    genotypes = [a + b for a in symbols for b in symbols] + symbols + ['', 'AGT', '0/1']
+
+    for name, interpret in interpreters.items():
+        table = compiled.outcomes[name]
+        codes, exact = table.genotype_codes(genotypes)
+        for entry, (_, rsid, info) in enumerate(compiled.entries[name]):
+            for genotype, code, covered in zip(genotypes, codes, exact):
+                try:
+                    expected = interpret(genotype, info)
+                except Exception:  # noqa: BLE001
+                    continue
+                # None: not representable, or the interpreter raised; analysed live
+                outcome = table.lookup(entry, code) if covered else None
+                assert outcome is None or outcome == expected, (name, rsid, genotype)
+
+            allele = knowledge_artifact.dosage_allele(info)
+            if allele is not None:
+                assert table.dosages[entry, codes[genotypes.index('GA')]] == 'GA'.count(allele)
+
+def test_cohort_outcomes_in_one_lookup():
+    compiled = knowledge_artifact.load_shared()
+    entries = compiled.entries['fascinating_traits']
+    rsids = [rsid for _, rsid, _ in entries]
+
+    from utils.genome_store import GenotypeStore
+    def store(genotypes):
+        frame = pd.DataFrame({'rsid': rsids[:len(genotypes)], 'chromosome': '1',
+                              'position': range(1, len(genotypes) + 1), 'genotype': genotypes})
+        return GenotypeStore.from_frame(frame)
+
+    samples = [store(['AG', 'CC', 'TT']), store(['GA'])]
+    outcomes, dosages = compiled.cohort_outcomes('fascinating_traits', samples)
+    interpret = AdvancedGeneticAnalyzer.panel_interpreters()['fascinating_traits']
+
+    assert outcomes.shape == dosages.shape == (2, len(entries))
+    assert outcomes[0, 0] == outcomes[1, 0] == interpret('AG', entries[0][2])
+    assert outcomes[0, 2] == interpret('TT', entries[2][2])
+    assert outcomes[1, 1] is None and dosages[1, 1] == -1
+    allele = knowledge_artifact.dosage_allele(entries[0][2])
+    assert dosages[0, 0] == 'AG'.count(allele)
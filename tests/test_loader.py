@@ -0,0 +1,46 @@
+from utils import loader
+
+HEADER = """# This data file generated by 23andMe at: Wed Nov 20 21:07:48 2024
+# reference human assembly build 37 (also known as Annotation Release 104)
+"""
+
+def write_raw_file(tmp_path, body, column_header="# rsid\tchromosome\tposition\tgenotype\n"):
+    path = tmp_path / "raw.txt"
+    path.write_text(HEADER + column_header + body)
+    return str(path)
+
+def test_header_metadata_and_dtypes(tmp_path):
+    path = write_raw_file(tmp_path, "rs429358\t19\t45411941\tCT\ni3000001\t1\t123\t--\n")
+    data, metadata = loader.read_raw_genotypes(path)
+
+    assert metadata['source'] == '23andMe'
+    assert metadata['build'] == 'GRCh37/hg19'
+    assert metadata['generation_date'] == 'Wed Nov 20 21:07:48 2024'
+    assert list(data.columns) == ['rsid', 'chromosome', 'position', 'genotype']
+    assert data['position'].dtype == 'int64'
+    assert data['genotype'].tolist() == ['CT', '--']
+
+def test_uncommented_column_header_is_skipped(tmp_path):
+    path = write_raw_file(tmp_path, "rs7412\t19\t45412079\tCC\n",
+                          column_header="rsid\tchromosome\tposition\tgenotype\n")
+    data, _ = loader.read_raw_genotypes(path)
+
+    assert data['rsid'].tolist() == ['rs7412']
+
+def test_gzip_and_zip_inputs_are_streamed(tmp_path):
+    import gzip
+    import zipfile
+
+    text = HEADER + "rs429358\t19\t45411941\tCT\nrs7412\t19\t45412079\tCC\n"
+    gz_path = tmp_path / "raw.txt.gz"
+    with gzip.open(gz_path, 'wt') as f:
+        f.write(text)
+    zip_path = tmp_path / "raw.zip"
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("genome_v5_Full.txt", text)
+
+    for path, compression in ((gz_path, 'gzip'), (zip_path, 'zip')):
+        data, metadata = loader.read_raw_genotypes(str(path))
+        assert metadata['compression'] == compression
+        assert metadata['build'] == 'GRCh37/hg19'
+        assert data['genotype'].tolist() == ['CT', 'CC']
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils import pca_projection
+from utils.genome_store import GenotypeStore
+
+LOADINGS = np.array([[0.5, -0.1], [0.2, 0.3], [-0.4, 0.2], [0.1, 0.1], [0.3, -0.3]])
+MEANS = np.array([1.0, 0.5, 1.5, 0.2, 1.0])
+SCALES = np.array([0.7, 0.5, 0.5, 0.4, 0.0])
+
+def make_panel():
+    return pca_projection.ProjectionPanel(['rs1', 'rs2', 'rs3', 'rs4', 'rs5'], list('AGCAA'), list('GACGG'),
+                                          MEANS, LOADINGS, SCALES)
+
+def make_store(calls):
+    rsids, genotypes = zip(*calls.items())
+    return GenotypeStore.from_frame(pd.DataFrame({
+        'rsid': rsids, 'chromosome': ['1'] * len(rsids), 'position': range(1, len(rsids) + 1), 'genotype': genotypes,
+    }))
+
+def test_default_path_is_resolved_against_the_repository():
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(pca_projection.__file__)))
+    assert pca_projection.DEFAULT_PATH == os.path.join(repo, 'data', '1000g_loadings.npz')
+
+def test_alignment_handles_strand_flips_and_missing_snps(tmp_path):
+    panel = make_panel()
+    panel.save(tmp_path / "panel.npz")
+    panel = pca_projection.ProjectionPanel.load(tmp_path / "panel.npz")
+
+    # rs2 is reported on the opposite strand (CT == GA), rs3 fits neither strand, rs4 is absent
+    store = make_store({'rs1': 'AG', 'rs2': 'CT', 'rs3': 'AT', 'rs5': 'AA'})
+    assert panel.dosages(store).tolist() == [1, 1, -1, -1, 2]
+
+    pcs, coverage = panel.project(store)
+    # Missing SNPs are mean-imputed; rs5 has no reference variance and is ignored
+    expected = (np.array([0.0, 0.5]) / SCALES[:2]) @ LOADINGS[:2]
+    assert pcs[0] == pytest.approx(expected)
+    assert coverage == pytest.approx(3 / 5)
+
+def test_cohort_projection_is_one_batch(tmp_path):
+    panel = make_panel()
+    stores = [make_store({'rs1': 'GG', 'rs3': 'CC'}), make_store({'rs2': 'GG', 'rs4': 'AG'})]
+    pcs, _ = panel.project_many(panel.dosage_matrix(stores))
+    for row, store in zip(pcs, stores):
+        assert row == pytest.approx(panel.project(store)[0][0])
+
+def test_low_coverage_and_analyzer_projection(tmp_path):
+    panel = make_panel()
+    pcs, coverage = panel.project(make_store({'rs99': 'AA'}))
+    assert pcs is None and coverage == 0
+
+    panel.save(tmp_path / "panel.npz")
+    raw = tmp_path / "raw.txt"
+    raw.write_text("# rsid\tchromosome\tposition\tgenotype\nrs1\t1\t100\tAG\nrs2\t1\t200\tCT\n")
+    analyzer = AdvancedGeneticAnalyzer(str(raw), pca_panel_path=str(tmp_path / "panel.npz"))
+    analyzer.load_data()
+    analyzer._perform_pca_for_ancestry()
+    assert analyzer.sample_pcs.shape == (1, 2)
+    assert analyzer.results['pca_projection']['coverage'] == pytest.approx(2 / 5)
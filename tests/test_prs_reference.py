@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils import cohort, prs_reference
+
+SCORES = {'TEST_PRS': {
+    'population_mean': 0, 'population_sd': 1,
+    'variants': {
+        'rs1': {'weight': 0.5, 'risk_allele': 'A'},
+        'rs2': {'weight': 0.25, 'risk_allele': 'G'},
+    },
+}}
+
+def test_normal_cdf_matches_scipy():
+    z = np.linspace(-6, 6, 101)
+    assert cohort.normal_cdf(z) == pytest.approx(stats.norm.cdf(z), abs=1e-15)
+    assert cohort.normal_cdf(1.3) == pytest.approx(stats.norm.cdf(1.3), abs=1e-15)
+
+def test_default_path_is_resolved_against_the_repository():
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(prs_reference.__file__)))
+    assert prs_reference.DEFAULT_PATH == os.path.join(repo, 'data', 'prs_reference.npz')
+
+def test_simulated_distributions_round_trip_and_lookup(tmp_path):
+    freqs = tmp_path / "freqs.tsv"
+    # rs2 is listed for its other allele, so the G frequency is 1 - 0.9
+    freqs.write_text("rsid\tallele\tEU\tAFR\nrs1\tA\t0.5\t0.1\nrs2\tC\t0.9\t0.5\n")
+    reference = prs_reference.build_from_frequencies(SCORES, prs_reference.read_frequency_table(freqs),
+                                                     n_samples=20_000)
+    path = tmp_path / "reference.npz"
+    reference.save(path)
+    loaded = prs_reference.load_cached(str(path))
+    assert loaded is prs_reference.load_cached(str(path))
+
+    eu = loaded.info[('TEST_PRS', 'EU')]
+    assert eu['mean'] == pytest.approx(2 * 0.5 * 0.5 + 2 * 0.1 * 0.25, abs=0.01)
+
+    # The same raw score ranks higher against the lower-scoring AFR distribution
+    eu_pct = loaded.summarise('TEST_PRS', 'EU', 0.5)['percentile']
+    afr_pct = loaded.summarise('TEST_PRS', 'AFR', 0.5)['percentile']
+    assert afr_pct > eu_pct
+    assert 0 <= loaded.summarise('TEST_PRS', 'EU', -1)['percentile'] < loaded.summarise('TEST_PRS', 'EU', 5)['percentile'] <= 100
+    # Unknown ancestries fall back to the pooled distribution
+    assert 'ALL' in loaded.summarise('TEST_PRS', 'SAS', 0.5)['reference']
+    assert loaded.summarise('OTHER_PRS', 'EU', 0.5) is None
+
+def test_analyzer_uses_reference_percentiles(tmp_path):
+    raw = tmp_path / "raw.txt"
+    raw.write_text("# rsid\tchromosome\tposition\tgenotype\nrs1333049\t9\t22125504\tCC\n")
+    analyzer = AdvancedGeneticAnalyzer(str(raw), cli_ancestry='AFR', prs_reference_path=str(tmp_path / "ref.npz"))
+    analyzer.load_data()
+    raw_scores = {'CAD_PRS': np.array([0.0, 0.1, 0.2, 0.3])}
+    prs_reference.ReferenceDistributions.from_scores(
+        {('CAD_PRS', 'AFR'): raw_scores['CAD_PRS']}, 'test').save(tmp_path / "ref.npz")
+
+    analyzer.calculate_polygenic_scores()
+    cad = analyzer.results['polygenic_scores']['CAD_PRS']
+    assert cad['raw_score'] == pytest.approx(0.254)
+    assert cad['percentile'] > 75 and 'AFR' in cad['reference']
+    assert cad['z_score'] == pytest.approx((0.254 - 0.15) / np.std(raw_scores['CAD_PRS'], ddof=1))
+    # Scores without a reference keep the definition's normal approximation
+    assert 'reference' not in analyzer.results['polygenic_scores']['T2D_PRS']
@@ -0,0 +1,71 @@
+import gzip
+import math
+
+import pytest
+
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils import loader, prs_weights
+from utils.genome_store import GenotypeStore
+
+RAW = (
+    "# This data file generated by 23andMe at: Wed Nov 20 21:07:48 2024\n"
+    "# More information on reference human assembly build 37 (a.k.a. Annotation Release 104):\n"
+    "# rsid\tchromosome\tposition\tgenotype\n"
+    "rs1\t1\t1000\tAG\n"
+    "rs2\t1\t2000\tCC\n"
+    "i5\t2\t3000\tAT\n"
+    "rs4\t2\t4000\tGT\n"
+    "rs6\tX\t6000\tA\n"
+)
+
+SCORES = (
+    "###PGS CATALOG SCORING FILE\n"
+    "#pgs_id=PGS999999\n"
+    "#pgs_name=Test score\n"
+    "#genome_build=GRCh37\n"
+    "rsID\tchr_name\tchr_position\teffect_allele\tother_allele\teffect_weight\tallelefrequency_effect\n"
+    "rs1\t1\t1000\tG\tA\t0.5\t0.2\n"      # direct match, one copy
+    "rs2\t1\t2000\tG\tA\t0.25\t0.5\n"     # strand flipped: CC -> GG, two copies
+    "\t2\t3000\tA\tT\t1.0\t0.5\n"         # chr:pos match of a palindromic SNP with EAF 0.5, skipped
+    "rs4\t2\t4000\tA\tG\t9.0\t0.5\n"      # GT fits neither strand
+    "rs6\t23\t6000\tA\tG\t0.1\t0.5\n"     # haploid call
+    "rs7\t3\t7000\tA\tG\t3.0\t0.5\n"      # absent from the genome
+)
+
+def test_score_file_harmonises_and_normalises(tmp_path):
+    genome = tmp_path / "raw.txt"
+    genome.write_text(RAW)
+    data, metadata = loader.read_raw_genotypes(str(genome))
+    store = GenotypeStore.from_frame(data)
+
+    scores = tmp_path / "PGS999999.txt.gz"
+    with gzip.open(scores, 'wt') as f:
+        f.write(SCORES)
+
+    result = prs_weights.score_file(str(scores), store, build=metadata['build'], chunksize=2)
+
+    assert result['score_id'] == 'PGS999999' and result['name'] == 'Test score'
+    assert result['raw_score'] == pytest.approx(0.5 + 0.5 + 0.1)
+    assert result['variants_found'] == '3/6'
+    mean = 2 * (0.2 * 0.5 + 0.5 * 0.25 + 0.5 * 0.1)
+    var = 2 * (0.16 * 0.25 + 0.25 * 0.0625 + 0.25 * 0.01)
+    assert result['z_score'] == pytest.approx((1.1 - mean) / math.sqrt(var))
+    assert result['raw_score_ci_95'] is None
+    assert any('A/T or C/G' in warning for warning in result['warnings'])
+
+def test_build_mismatch_falls_back_to_rsids(tmp_path):
+    genome = tmp_path / "raw.txt"
+    genome.write_text(RAW)
+    scores = tmp_path / "scores.txt"
+    scores.write_text(SCORES.replace("GRCh37", "GRCh38").replace("allelefrequency_effect", "se"))
+
+    analyzer = AdvancedGeneticAnalyzer(str(genome), prs_files=[str(scores)])
+    analyzer.load_data()
+    analyzer.calculate_polygenic_scores()
+
+    result = analyzer.results['polygenic_scores']['PGS999999']
+    assert result['variants_found'] == '3/6'
+    assert result['z_score'] is None and result['warnings']
+    # SEs of rs1, rs2 (two copies) and rs6
+    se = math.sqrt(0.2 ** 2 + 4 * 0.5 ** 2 + 0.5 ** 2)
+    assert result['raw_score_ci_95'] == pytest.approx((1.1 - 1.96 * se, 1.1 + 1.96 * se))
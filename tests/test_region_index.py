@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils.region_index import RegionIndex
+
+RAW = (
+    "# rsid\tchromosome\tposition\tgenotype\n"
+    "rs1\t1\t5000\tAG\n"
+    "rs2\t2\t100\tCC\n"
+    "rs3\t1\t1000\tTT\n"
+    "rs4\t1\t3000\tGT\n"
+    "rs5\tX\t700\tA\n"
+    "rs6\t1\t3000\tAA\n"
+)
+
+
+def test_region_queries_are_sorted_views():
+    data = pd.DataFrame({'chromosome': ['1', '2', '1', '1', 'X', '1'],
+                         'position': [5000, 100, 1000, 3000, 700, 3000]})
+    index = RegionIndex.from_frame(data)
+
+    assert sorted(index.chromosomes) == ['1', '2', 'X']
+    assert index.chromosome('1').positions.tolist() == [1000, 3000, 3000, 5000]
+    # Equal positions keep file order; bounds are inclusive
+    region = index.variants_in_region('1', 1000, 3000)
+    assert region.rows.tolist() == [2, 3, 5]
+    assert np.shares_memory(region.rows, index.chromosome('1').rows)
+    assert index.variants_near('1', 4000, 1000).rows.tolist() == [3, 5, 0]
+    assert len(index.variants_in_region('7', 0, 10 ** 9).rows) == 0
+    assert len(index.variants_in_region('2', 101, 200).rows) == 0
+
+
+def test_analyzer_region_and_window_queries(tmp_path):
+    genome = tmp_path / "raw.txt"
+    genome.write_text(RAW)
+    analyzer = AdvancedGeneticAnalyzer(str(genome))
+    analyzer.load_data()
+
+    assert analyzer.variants_in_region('1', 2000, 6000)['position'].tolist() == [3000, 3000, 5000]
+    assert analyzer.variants_near('rs4', flank=2000)['position'].tolist() == [1000, 3000, 3000, 5000]
+    assert analyzer.variants_near('rs999').empty
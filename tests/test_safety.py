@@ -0,0 +1,62 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils import safety
+
+class Stub:
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.results = {}
+        self.performance_records = []
+
+    @safety.safeguard("busy")
+    def busy(self):
+        time.sleep(0.05)
+        return [0] * 200_000
+
+    @safety.safeguard("broken")
+    def broken(self):
+        raise RuntimeError("boom")
+
+def test_safeguard_records_timing_and_failures(tmp_path):
+    stub = Stub(tmp_path)
+    assert len(stub.busy()) == 200_000
+    with pytest.raises(RuntimeError):
+        stub.broken()
+
+    busy, broken = stub.performance_records
+    assert (busy['stage'], busy['status'], broken['status']) == ('busy', 'ok', 'failed')
+    assert busy['wall_seconds'] >= 0.05 and busy['cpu_seconds'] < busy['wall_seconds']
+    assert busy['peak_memory_bytes'] is None  # tracemalloc was not tracing
+    assert list((tmp_path / "crash_dumps").glob("crash_broken_*.json"))
+
+def test_analysis_profile_metrics_file_and_unchanged_hash(tmp_path, capsys):
+    raw = tmp_path / "raw.txt"
+    raw.write_text("# rsid\tchromosome\tposition\tgenotype\n" + "".join(
+        f"rs{i}\t{1 + i % 22}\t{1000 + i}\t{'ACGT'[i % 4]}{'ACGT'[(i // 3) % 4]}\n" for i in range(1, 300)))
+    metrics = tmp_path / "metrics.jsonl"
+
+    hashes = []
+    for profile_memory in (False, True):
+        np.random.seed(42)
+        analyzer = AdvancedGeneticAnalyzer(str(raw), output_dir=str(tmp_path / "out"), plots=False,
+                                           metrics_file=str(metrics), profile_memory=profile_memory)
+        assert analyzer.run_complete_analysis()
+        hashes.append(analyzer.provenance['reproducibility_hash_sha256'])
+
+    profile = analyzer.results['performance_profile']
+    stages = {stage['stage'] for stage in profile['stages']}
+    assert {'load_data', 'basic_statistics', 'polygenic_scores'} <= stages
+    assert profile['memory_profiled'] and all(stage['peak_memory_bytes'] is not None for stage in profile['stages'])
+    assert hashes[0] == hashes[1]
+    assert "Stage performance" in capsys.readouterr().out
+
+    lines = [json.loads(line) for line in metrics.read_text().splitlines()]
+    # Both runs; the report stage is timed after the JSON dump and only appears here
+    assert len(lines) == 2 * (len(stages) + 1)
+    assert {line['sample'] for line in lines} == {str(raw)}
+    assert all(line['status'] == 'ok' and line['wall_seconds'] >= 0 for line in lines)
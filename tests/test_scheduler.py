@@ -0,0 +1,66 @@
+import threading
+
+import numpy as np
+import pytest
+
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+from utils import scheduler
+
+def make_stages(log, fail=None):
+    gate = threading.Barrier(3, timeout=5)
+
+    def stage(name, wait_for_siblings=False):
+        def run():
+            if wait_for_siblings:
+                gate.wait()  # only passes if the three siblings run at the same time
+            if name == fail:
+                raise RuntimeError(name)
+            print(f"{name} done")
+            log.append(name)
+        return run
+
+    return [
+        scheduler.Stage('load', stage('load'), (), ('data',)),
+        scheduler.Stage('a', stage('a', True), ('data',), ('a',)),
+        scheduler.Stage('b', stage('b', True), ('data',), ('b',)),
+        scheduler.Stage('c', stage('c', True), ('data',), ('c',)),
+        scheduler.Stage('ab', stage('ab'), ('a', 'b'), ('ab',)),
+    ]
+
+def test_independent_stages_run_concurrently_with_serial_output(capsys):
+    log = []
+    scheduler.run_stages(make_stages(log), workers=4)
+    assert log[0] == 'load' and log.index('ab') > max(log.index('a'), log.index('b'))
+    assert capsys.readouterr().out.split() == ['load', 'done', 'a', 'done', 'b', 'done', 'c', 'done', 'ab', 'done']
+
+def test_earliest_failure_is_raised_and_dependants_skipped():
+    log = []
+    with pytest.raises(RuntimeError, match='b'):
+        scheduler.run_stages(make_stages(log, fail='b'), workers=4)
+    assert 'ab' not in log
+
+def test_graph_validation():
+    noop = lambda: None
+    with pytest.raises(ValueError, match='no stage provides'):
+        scheduler.dependencies([scheduler.Stage('x', noop, ('data',), ())])
+    with pytest.raises(ValueError, match='later stage'):
+        scheduler.dependencies([scheduler.Stage('x', noop, ('y',), ()), scheduler.Stage('y', noop, (), ('y',))])
+
+def test_parallel_run_matches_serial_provenance(tmp_path):
+    raw = tmp_path / "raw.txt"
+    raw.write_text("# rsid\tchromosome\tposition\tgenotype\n" + "".join(
+        f"rs{i}\t{1 + i % 22}\t{1000 + i}\t{'ACGT'[i % 4]}{'ACGT'[(i // 3) % 4]}\n" for i in range(1, 400)
+    ) + "rs429358\t19\t45411941\tCT\nrs7412\t19\t45412079\tCC\nrs1333049\t9\t22125504\tCC\n")
+
+    runs = []
+    for workers in (1, 4):
+        np.random.seed(42)
+        analyzer = AdvancedGeneticAnalyzer(str(raw), output_dir=str(tmp_path / str(workers)),
+                                           plots=False, stage_workers=workers)
+        assert analyzer.run_complete_analysis()
+        runs.append(analyzer)
+
+    serial, parallel = runs
+    assert list(parallel.results) == list(serial.results)
+    assert (parallel.provenance['reproducibility_hash_sha256']
+            == serial.provenance['reproducibility_hash_sha256'])
@@ -0,0 +1,53 @@
+import numpy as np
+
+from utils import genome_store, strand
+
+
+def legacy_prs_count(genotype, risk_allele):
+    """The per-variant string logic advanced_genetic_analyzer used before the strand engine."""
+    complement = {'A': 'T', 'T': 'A', 'C': 'G', 'G': 'C'}
+    count = genotype.count(risk_allele)
+    bases = set(genotype)
+    ambiguous = any(bases <= pair and {risk_allele, complement[risk_allele]} & pair
+                    for pair in ({'A', 'T'}, {'C', 'G'}))
+    if count == 0 and ambiguous:
+        flipped = ''.join(complement.get(base, base) for base in genotype)
+        if flipped.count(risk_allele) > 0:
+            return flipped, flipped.count(risk_allele)
+    return genotype, count
+
+
+def test_matches_legacy_palindrome_handling():
+    genotypes = [a + b for a in 'ACGT' for b in 'ACGT'] + list('ACGT')
+    rows = [(genotype, risk) for genotype in genotypes for risk in 'ACGT']
+    result = strand.harmonise([g for g, _ in rows], [r for _, r in rows], flip_absent_palindromes=True)
+
+    expected = [legacy_prs_count(genotype, risk) for genotype, risk in rows]
+    assert result['harmonised_genotype'].tolist() == [genotype for genotype, _ in expected]
+    assert result['effect_count'].tolist() == [count for _, count in expected]
+    assert result['usable'].all()
+
+
+def test_flips_and_ambiguous_sites_with_known_alleles():
+    result = strand.harmonise(
+        ['AG', 'CC', 'AT', 'GT', 'TT', 'TT'],
+        ['G', 'G', 'A', 'A', 'A', 'A'],
+        other=['A', 'A', 'T', 'G', 'T', None],
+    )
+    assert result['genotype_complement'].tolist() == ['TC', 'GG', 'TA', 'CA', 'AA', 'AA']
+    assert result['status'].tolist() == ['direct', 'flipped', 'direct', 'mismatch', 'direct', 'direct']
+    assert result['effect_count'].tolist()[:3] == [1, 2, 1]
+    # A/T and C/G sites are flagged but never flipped without the legacy option
+    assert result['ambiguous'].tolist() == [False, False, True, False, True, True]
+    assert result['effect_count'].tolist()[4:] == [0, 0]
+
+
+def test_frequencies_near_half_leave_ambiguous_sites_unresolved():
+    codes = genome_store.encode_genotypes(['AT', 'AT', 'AG'])
+    effect = genome_store.encode_alleles(['A', 'A', 'A'])
+    other = genome_store.encode_alleles(['T', 'T', 'G'])
+    result = strand.harmonise_codes(codes, effect, other, effect_frequency=[0.45, 0.1, 0.5])
+
+    assert result.unresolved.tolist() == [True, False, False]
+    assert result.usable.tolist() == [False, True, True]
+    assert np.array_equal(result.counts, [1, 1, 1])
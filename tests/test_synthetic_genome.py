@@ -0,0 +1,33 @@
+from benchmarks import run_benchmarks, synthetic_genome
+from utils import loader
+
+PANEL = {'rs429358': ['C', 'T'], 'rs7412': None}
+
+def test_generator_is_deterministic_and_parses(tmp_path):
+    txt = synthetic_genome.write_genome(tmp_path / "a.txt", 5000, seed=3, panel=PANEL)
+    synthetic_genome.write_genome(tmp_path / "b.txt", 5000, seed=3, panel=PANEL)
+    assert (tmp_path / "a.txt").read_bytes() == (tmp_path / "b.txt").read_bytes()
+
+    data, _ = loader.read_raw_genotypes(txt)
+    assert len(data) == 5000
+    assert {'rs429358', 'rs7412'} <= set(data['rsid'])
+    assert set(data.loc[data['rsid'] == 'rs429358', 'genotype'].iloc[0]) <= {'C', 'T'}
+    genotypes = set(data['genotype'])
+    assert '--' in genotypes and genotypes & {'DD', 'DI', 'II'}
+    assert data['rsid'].str.startswith('i').any()
+    assert (data.loc[data['chromosome'] == 'MT', 'genotype'].str.len() == 1).all()
+
+    vcf_data, metadata = loader.read_raw_genotypes(
+        synthetic_genome.write_genome(tmp_path / "a.vcf.gz", 5000, seed=3, panel=PANEL))
+    assert metadata['format'] == 'VCF'
+    assert vcf_data['rsid'].tolist() == data['rsid'].tolist()
+    snvs = ~data['genotype'].isin(['DD', 'DI', 'II'])
+    assert vcf_data['genotype'][snvs].tolist() == data['genotype'][snvs].tolist()
+
+def test_compare_flags_regressions_beyond_tolerance():
+    def result(load, report):
+        return {'environment': {}, 'cases': {'100k/23andme': {'stages': {
+            'load_data': {'median_seconds': load}, 'scientific_report': {'median_seconds': report}}}}}
+
+    _, regressions = run_benchmarks.compare(result(1.0, 0.001), result(1.3, 0.002), tolerance=0.1, min_seconds=0.02)
+    assert regressions == [('100k/23andme', 'load_data')]
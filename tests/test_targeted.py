@@ -0,0 +1,30 @@
+from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+
+RAW = (
+    "# This data file generated by 23andMe at: Wed Nov 20 21:07:48 2024\n"
+    "# rsid\tchromosome\tposition\tgenotype\n"
+    "rs429358\t19\t45411941\tCT\n"
+    "rs7412\t19\t45412079\tCC\n"
+    "rs100\t1\t1000\tAG\n"
+    "rs101\t1\t2000\tCC\n"
+    "rs102\t2\t3000\t--\n"
+    "rs103\tX\t4000\tA\n"
+)
+
+def test_targeted_load_keeps_panel_loci_and_genome_wide_stats(tmp_path):
+    path = tmp_path / "raw.txt"
+    path.write_text(RAW)
+
+    full = AdvancedGeneticAnalyzer(str(path))
+    full.load_data()
+    full.analyze_basic_statistics()
+
+    targeted = AdvancedGeneticAnalyzer(str(path), targeted=True)
+    targeted.load_data()
+    targeted.analyze_basic_statistics()
+
+    assert sorted(targeted.store.genotype_strings()) == ['CC', 'CT']
+    assert targeted.get_genotypes(['rs429358', 'rs100']) == {'rs429358': 'CT'}
+    for key in ('total_variants', 'call_rate', 'variants_per_chromosome', 'heterozygosity_rate',
+                'ti_tv_ratio', 'chromosome_stats'):
+        assert targeted.results['advanced_stats'][key] == full.results['advanced_stats'][key]
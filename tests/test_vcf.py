@@ -0,0 +1,44 @@
+from utils import loader, vcf
+from utils.genome_store import GenotypeStore
+
+VCF = (
+    "##fileformat=VCFv4.2\n"
+    "##reference=GRCh38\n"
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE1\n"
+    "1\t100\trs1\tC\tT\t.\tPASS\t.\tGT:DP\t0/1:35\n"
+    "1\t200\trs2\tA\tG,T\t.\tPASS\t.\tDP:GT\t12:2|1\n"
+    "1\t300\trs3\tAT\tA\t.\tPASS\t.\tGT\t1/1\n"
+    "X\t400\trs4\tG\tA\t.\tPASS\t.\tGT\t1\n"
+    "X\t500\trs5\tG\tA\t.\tPASS\t.\tGT\t./.\n"
+)
+
+def test_vcf_records_resolve_to_genotypes_and_dosages(tmp_path):
+    path = tmp_path / "sample.vcf"
+    path.write_text(VCF)
+    data, metadata = loader.read_raw_genotypes(str(path))
+
+    assert metadata['format'] == 'VCF'
+    assert metadata['build'] == 'GRCh38/hg38'
+    assert metadata['sample'] == 'SAMPLE1'
+    assert data['genotype'].tolist() == ['CT', 'TG', 'DD', 'A', '--']
+    assert data['gt'].tolist() == ['0/1', '2|1', '1/1', '1', './.']
+    assert data['dosage'].tolist() == [1, 2, 2, 1, -1]
+
+    store = GenotypeStore.from_frame(data)
+    assert store.has_vcf_fields
+    assert store.filter(store.dosages >= 0).to_frame()['alt'].tolist() == ['T', 'G,T', 'A', 'A']
+
+def test_allele_sequences_follow_ref_and_alt():
+    assert vcf.allele_sequences('C', 'T', '0/1') == ['C', 'T']
+    assert vcf.allele_sequences('A', 'G,T', '0|2') == ['A', 'T']
+    assert vcf.allele_sequences('A', 'G', './.') == []
+
+def test_streamed_chunks_concatenate_into_one_store(tmp_path):
+    path = tmp_path / "sample.vcf"
+    path.write_text(VCF)
+    chunks = loader.iter_raw_genotypes(str(path), {}, chunksize=2)
+    store = GenotypeStore.concat(GenotypeStore.from_frame(chunk) for chunk in chunks)
+
+    assert len(store) == 5
+    assert store.dosages.tolist() == [1, 2, 2, 1, -1]
+    assert list(store.chromosomes.categories) == ['1', 'X']
@@ -0,0 +1,76 @@
+from utils import bgzf, loader, vcf_index
+
+HEADER = (
+    b"##fileformat=VCFv4.2\n"
+    b"#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE1\n"
+)
+
+def write_vcf_gz(tmp_path, n=6000):
+    # Enough records to span several BGZF blocks, two chromosomes
+    lines = [HEADER]
+    for i in range(n):
+        chrom = '1' if i < n // 2 else '2'
+        gt = ('0/0', '0/1', '1/1', './.')[i % 4]
+        lines.append(f"{chrom}\t{1000 + 10 * i}\trs{i + 1}\tA\tG\t.\tPASS\t.\tGT\t{gt}\n".encode())
+    path = tmp_path / "sample.vcf.gz"
+    bgzf.write_bgzf(path, lines)
+    return str(path)
+
+def test_fetch_by_rsid_and_region_match_full_parse(tmp_path):
+    path = write_vcf_gz(tmp_path)
+    full, metadata = loader.read_raw_genotypes(path)
+    assert metadata['compression'] == 'bgzf'
+
+    index = vcf_index.build_index(path)
+    assert index.info['records'] == 6000 and index.info['sorted']
+
+    index = vcf_index.VcfIndex.load(path)
+    records = index.fetch(['rs5999', 'rs2', 'rs4500', 'rs999999'])
+    assert records['rsid'].tolist() == ['rs2', 'rs4500', 'rs5999']
+    assert records['genotype'].tolist() == ['AG', '--', 'GG']
+
+    region = index.fetch_region('2', 31000, 31500)
+    expected = full[(full['chromosome'] == '2') & full['position'].between(31000, 31500)]
+    assert region['rsid'].tolist() == expected['rsid'].tolist()
+
+def test_counters_cover_the_whole_genome(tmp_path):
+    path = write_vcf_gz(tmp_path)
+    counters = vcf_index.build_index(path).counters
+
+    assert counters.raw_counts == {'1': 3000, '2': 3000}
+    # One record in four is a no-call
+    assert counters.total == 4500
+    assert counters.summary()['heterozygous'] == 1500
+
+def test_stale_index_is_ignored(tmp_path):
+    path = write_vcf_gz(tmp_path, n=10)
+    vcf_index.build_index(path)
+    write_vcf_gz(tmp_path, n=20)
+    assert vcf_index.VcfIndex.load(path) is None
+
+def test_bgzf_reader_seeks_to_virtual_offsets(tmp_path):
+    path = write_vcf_gz(tmp_path)
+    with bgzf.BgzfReader(path) as reader:
+        offsets = []
+        for line in iter(reader.readline, b''):
+            offsets.append((reader.tell(), reader.readline()))
+        voffset, line = offsets[2000]
+        reader.seek(voffset)
+        assert reader.readline() == line
+
+def test_region_start_position_spanning_a_block_boundary(tmp_path):
+    # Split multi-allelic records at one position, the second one opening a new BGZF block
+    def record(pos, rsid, alt, info='.'):
+        return f"1\t{pos}\t{rsid}\tA\t{alt}\t.\tPASS\t{info}\tGT\t0/1\n".encode()
+
+    fillers = [record(100 + i, f"rs{i + 1}", 'G') for i in range(1000)]
+    split = [record(50000, 'rs90001', 'G'), record(50000, 'rs90002', 'T')]
+    used = len(HEADER) + sum(map(len, fillers)) + len(split[0]) - len(record(100 + 999, 'rs1000', 'G', ''))
+    fillers[-1] = record(100 + 999, 'rs1000', 'G', 'X' * (bgzf.MAX_BLOCK_DATA - used))
+    path = tmp_path / "split.vcf.gz"
+    bgzf.write_bgzf(path, [HEADER, *fillers, *split, record(60000, 'rs90003', 'G')])
+
+    index = vcf_index.build_index(str(path))
+    assert 50000 in index._arrays['block_pos'].tolist()
+    region = index.fetch_region('1', 50000, 50000)
+    assert region['rsid'].tolist() == ['rs90001', 'rs90002']
@@ -22,6 +22,9 @@ from datetime import datetime
 import os
 from collections import defaultdict
 import warnings
+
+from utils import loader
+
 warnings.filterwarnings('ignore')
 
 class UltraAdvancedGeneticAnalyzer:
@@ -361,17 +364,7 @@ class UltraAdvancedGeneticAnalyzer:
         """Load genetic data with enhanced quality control."""
         print("Loading genetic data for deep insights analysis...")
         
-        with open(self.filename, 'r') as f:
-            lines = f.readlines()
-        
-        data_lines = []
-        for line in lines:
-            if not line.startswith('#'):
-                data_lines.append(line.strip())
-        
-        from io import StringIO
-        self.data = pd.read_csv(StringIO('\n'.join(data_lines)), sep='\t')
-        self.data.columns = ['rsid', 'chromosome', 'position', 'genotype']
+        self.data, _ = loader.read_raw_genotypes(self.filename)
         
         # Quality filtering
         self.data = self.data[~self.data['genotype'].isin(['--', 'DD', 'II', 'DI', 'ID'])]
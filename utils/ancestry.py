@@ -1,20 +1,122 @@
+import os
+
 import numpy as np
-from sklearn.neighbors import KNeighborsClassifier
-
-# These files would need to be present in the same directory or a specified path
-# For this example, we assume they are in a 'data' subdirectory or accessible path
-# and that the main script handles loading them appropriately.
-# If running this standalone, these paths would need to be adjusted.
-try:
-    REF = np.load("data/1000g_pca.npy")          # (N_ref, 10) PCA coordinates from 1000 Genomes
-    LABELS = np.load("data/1000g_superpop.npy")  # Super-population labels (EU/AFR/EAS/SAS/AMR)
-    KNN = KNeighborsClassifier(n_neighbors=7).fit(REF, LABELS)
-except FileNotFoundError:
-    print("WARNING: Ancestry reference data (1000g_pca.npy, 1000g_superpop.npy) not found. Ancestry inference will be disabled.")
-    KNN = None
-except Exception as e:
-    print(f"WARNING: Error loading ancestry reference data: {e}. Ancestry inference will be disabled.")
-    KNN = None
+
+# Reference panel: 1000 Genomes PCA coordinates and super-population labels.
+# Nothing is read (and scikit-learn is not imported) until the first
+# inference call.  The prepared arrays (coordinates, label codes, classes)
+# are persisted as an .npz beside the .npy files and reused while those are
+# unchanged; the KD-tree is rebuilt from them on load, which takes
+# milliseconds.  Paths are resolved against the repository, never the
+# working directory.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REF_PATH = os.path.join(REPO_DIR, 'data', '1000g_pca.npy')          # (N_ref, 10) PCA coordinates from 1000 Genomes
+LABELS_PATH = os.path.join(REPO_DIR, 'data', '1000g_superpop.npy')  # Super-population labels (EU/AFR/EAS/SAS/AMR)
+INDEX_PATH = os.path.join(REPO_DIR, 'data', '1000g_pca.index.npz')  # Persisted coordinates + label codes
+
+N_NEIGHBORS = 7
+
+# Lazily loaded model: None until first use, False if the reference data is unavailable
+_model = None
+
+
+def _source_signature():
+    """Size and mtime of the reference files, to tell whether a persisted index is stale."""
+    return np.array([(os.path.getsize(path), os.stat(path).st_mtime_ns) for path in (REF_PATH, LABELS_PATH)],
+                    dtype=np.int64)
+
+
+def _read_index(signature):
+    """
+    The persisted reference arrays, if they were prepared from the current files.
+
+    Returns:
+        ``(reference, label_codes, classes)``, or ``None`` if the index is
+        missing, unreadable or stale.
+    """
+    try:
+        with np.load(INDEX_PATH) as archive:
+            if not np.array_equal(archive['signature'], signature):
+                return None
+            return archive['reference'], archive['label_codes'], archive['classes']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _write_index(signature, reference, label_codes, classes):
+    """Persist the prepared reference arrays (a warning is printed if they cannot be written)."""
+    try:
+        np.savez(INDEX_PATH, signature=signature, reference=reference, label_codes=label_codes, classes=classes)
+    except OSError as e:
+        print(f"WARNING: Could not persist ancestry index to {INDEX_PATH}: {e}")
+
+
+def _load_model():
+    """
+    Load the reference arrays (from the persisted index when current) and build the KD-tree.
+
+    Returns:
+        A dict with ``tree``, ``classes`` and ``label_codes``, or ``None`` if
+        the reference data is unavailable.
+    """
+    global _model
+    if _model is not None:
+        return _model or None
+
+    try:
+        signature = _source_signature()
+    except FileNotFoundError:
+        print("WARNING: Ancestry reference data (1000g_pca.npy, 1000g_superpop.npy) not found. Ancestry inference will be disabled.")
+        _model = False
+        return None
+
+    try:
+        from sklearn.neighbors import KDTree
+        persisted = _read_index(signature)
+        if persisted is None:
+            reference = np.asarray(np.load(REF_PATH), dtype=np.float64)
+            classes, label_codes = np.unique(np.load(LABELS_PATH).astype(str), return_inverse=True)
+            _write_index(signature, reference, label_codes, classes)
+        else:
+            reference, label_codes, classes = persisted
+        _model = {'tree': KDTree(reference), 'classes': classes, 'label_codes': label_codes}
+    except Exception as e:
+        print(f"WARNING: Error loading ancestry reference data: {e}. Ancestry inference will be disabled.")
+        _model = False
+        return None
+    return _model
+
+
+def infer_superpop_many(pcs_matrix: np.ndarray) -> np.ndarray:
+    """
+    Infers super-population labels for many samples with one KD-tree query.
+
+    Each sample gets the majority label of its ``N_NEIGHBORS`` nearest
+    reference samples (ties go to the alphabetically first label, as with
+    scikit-learn's ``KNeighborsClassifier``).
+
+    Args:
+        pcs_matrix: A NumPy array of shape (n_samples, n_features) of sample PCs.
+
+    Returns:
+        An array of label strings, "UNKNOWN" for every sample if the reference
+        data is unavailable and for rows containing NaN.
+    """
+    pcs_matrix = np.atleast_2d(np.asarray(pcs_matrix, dtype=np.float64))
+    result = np.full(len(pcs_matrix), "UNKNOWN", dtype=object)
+    model = _load_model()
+    valid = ~np.isnan(pcs_matrix).any(axis=1)
+    if model is None or not valid.any():
+        return result
+
+    k = min(N_NEIGHBORS, len(model['label_codes']))
+    _, neighbours = model['tree'].query(pcs_matrix[valid], k=k)
+    neighbour_codes = model['label_codes'][neighbours]
+    votes = np.zeros((len(neighbour_codes), len(model['classes'])), dtype=np.int64)
+    np.add.at(votes, (np.arange(len(neighbour_codes))[:, None], neighbour_codes), 1)
+    result[valid] = model['classes'][votes.argmax(axis=1)].astype(str)
+    return result
+
 
 def infer_superpop(sample_pcs: np.ndarray) -> str:
     """
@@ -27,9 +129,9 @@ def infer_superpop(sample_pcs: np.ndarray) -> str:
 
     Returns:
         A string representing the inferred super-population, or "UNKNOWN" if
-        inference cannot be performed (e.g., KNN model not loaded).
+        inference cannot be performed (e.g., reference data not available).
     """
-    if KNN is None:
+    if _load_model() is None:
         return "UNKNOWN"
     
     if sample_pcs.ndim == 1:
@@ -40,8 +142,7 @@ def infer_superpop(sample_pcs: np.ndarray) -> str:
         raise ValueError("sample_pcs must be a 1D array or a 2D array with one row.")
 
     try:
-        prediction = KNN.predict(sample_pcs_reshaped)
-        return str(prediction[0])
+        return str(infer_superpop_many(sample_pcs_reshaped)[0])
     except Exception as e:
         print(f"Error during ancestry prediction: {e}")
         return "UNKNOWN"
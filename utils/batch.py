@@ -0,0 +1,143 @@
+"""
+Multi-genome batch runs on a process pool.
+
+Samples come from a directory of raw files or a manifest.  Each worker
+process builds the analyzer's knowledge base once (in the pool initializer)
+and reuses it for every sample it is handed.  Every sample gets its own
+output directory, holding its report, plots, results JSON, crash dumps and
+a log of everything the pipeline printed, so one failing genome cannot
+affect the others.
+"""
+
+import contextlib
+import json
+import os
+import pathlib as pl
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Raw data files picked up when a directory is given
+INPUT_SUFFIXES = ('.txt', '.vcf', '.gz', '.zip')
+
+_STRIP_SUFFIXES = ('.gz', '.zip', '.txt', '.vcf')
+
+# Per-worker state set up by _init_worker
+_worker = {}
+
+
+def sample_name(path):
+    """Sample id derived from a file name, without data/compression suffixes."""
+    name = pl.Path(path).name
+    for suffix in _STRIP_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+def discover_samples(source):
+    """
+    List the samples of a batch.
+
+    Args:
+        source: A directory of raw files, or a manifest with one sample per
+            line: either ``path`` or ``sample_id<TAB>path``.  Relative paths
+            are resolved against the manifest's directory; ``#`` lines are
+            ignored.
+
+    Returns:
+        A list of ``(sample_id, path)`` tuples with unique sample ids.
+    """
+    source = pl.Path(source)
+    if source.is_dir():
+        entries = [(sample_name(p), str(p)) for p in sorted(source.iterdir())
+                   if p.is_file() and p.name.endswith(INPUT_SUFFIXES)]
+    else:
+        entries = []
+        for line in source.read_text().splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            sample_id, _, path = line.rpartition('\t')
+            path = source.parent / path
+            entries.append((sample_id or sample_name(path), str(path)))
+
+    # Keep output directories apart when two files share a stem
+    seen = {}
+    samples = []
+    for sample_id, path in entries:
+        count = seen.get(sample_id, 0)
+        seen[sample_id] = count + 1
+        samples.append((f"{sample_id}_{count}" if count else sample_id, path))
+    return samples
+
+
+def _init_worker(analyzer_cls, analyzer_kwargs):
+    """Pool initializer: build the knowledge base once for this process."""
+    prototype = analyzer_cls(None, **analyzer_kwargs)
+    _worker['analyzer_cls'] = analyzer_cls
+    _worker['analyzer_kwargs'] = analyzer_kwargs
+    _worker['knowledge_base'] = prototype.knowledge_base()
+
+
+def _run_sample(sample_id, path, output_root):
+    """Analyse one sample in its own output directory and report the outcome."""
+    output_dir = pl.Path(output_root) / sample_id
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    outcome = {'sample': sample_id, 'path': path, 'output_dir': str(output_dir)}
+
+    with open(output_dir / 'analysis.log', 'w', encoding='utf-8') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            # Same seed as a single-sample run, so results do not depend on scheduling
+            np.random.seed(42)
+            analyzer = _worker['analyzer_cls'](
+                path, output_dir=str(output_dir), knowledge_base=_worker['knowledge_base'],
+                **_worker['analyzer_kwargs']
+            )
+            report = analyzer.run_complete_analysis()
+            outcome['status'] = 'ok' if report else 'failed'
+            outcome['report'] = report
+        except Exception as e:  # noqa: BLE001 (one sample must not stop the batch)
+            outcome['status'] = 'failed'
+            outcome['error'] = f"{type(e).__name__}: {e}"
+
+    outcome['seconds'] = round(time.perf_counter() - start, 3)
+    return outcome
+
+
+def run_batch(analyzer_cls, samples, output_root, workers=None, **analyzer_kwargs):
+    """
+    Run ``run_complete_analysis`` for every sample on a process pool.
+
+    Args:
+        analyzer_cls: The analyzer class (must accept ``output_dir`` and
+            ``knowledge_base`` keyword arguments).
+        samples: ``(sample_id, path)`` tuples, e.g. from :func:`discover_samples`.
+        output_root: Directory receiving one sub-directory per sample.
+        workers: Number of worker processes (defaults to the CPU count).
+        **analyzer_kwargs: Passed to every analyzer (``cli_ancestry``, ``targeted``, ...).
+
+    Returns:
+        A list with one outcome dict per sample, in input order.  The same
+        list is written to ``batch_summary.json`` under ``output_root``.
+    """
+    output_root = pl.Path(output_root)
+    output_root.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(analyzer_cls, analyzer_kwargs)) as pool:
+        futures = [pool.submit(_run_sample, sample_id, path, str(output_root)) for sample_id, path in samples]
+        outcomes = []
+        for (sample_id, path), future in zip(samples, futures):
+            try:
+                outcomes.append(future.result())
+            except Exception as e:  # noqa: BLE001 (e.g. a worker process died)
+                outcomes.append({'sample': sample_id, 'path': path, 'status': 'failed',
+                                 'error': f"{type(e).__name__}: {e}"})
+
+    (output_root / 'batch_summary.json').write_text(json.dumps(outcomes, indent=2))
+    return outcomes
@@ -0,0 +1,181 @@
+"""
+Minimal BGZF (blocked gzip) reader and writer.
+
+BGZF files, as written by ``bgzip``, are a series of gzip members of at most
+64 KiB each, with the compressed size of every block recorded in a ``BC``
+extra subfield.  That makes random access possible through *virtual
+offsets*: ``coffset << 16 | uoffset``, where ``coffset`` is the file offset
+of a block and ``uoffset`` the offset inside its decompressed data.
+
+Only the standard library (``zlib``/``struct``) is used.
+"""
+
+import struct
+import zlib
+
+# Fixed part of a BGZF block header: ID1 ID2 CM FLG MTIME XFL OS XLEN
+_HEADER = struct.Struct('<4BI2BH')
+_SUBFIELD = struct.Struct('<2BH')
+_TRAILER = struct.Struct('<2I')
+
+# Largest uncompressed payload per block used by bgzip
+MAX_BLOCK_DATA = 0xff00
+
+# The empty block bgzip appends as an end-of-file marker
+EOF_BLOCK = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+
+def make_virtual_offset(coffset, uoffset):
+    """Combine a block file offset and an offset inside the block."""
+    return coffset << 16 | uoffset
+
+
+def split_virtual_offset(voffset):
+    """Split a virtual offset into ``(coffset, uoffset)``."""
+    return voffset >> 16, voffset & 0xffff
+
+
+def read_block(f):
+    """
+    Read and decompress the block at the current position of ``f``.
+
+    Returns:
+        The decompressed bytes and the block's compressed size, or
+        ``(None, 0)`` at end of file.
+
+    Raises:
+        ValueError: If the data is not a BGZF block.
+    """
+    header = f.read(_HEADER.size)
+    if not header:
+        return None, 0
+    if len(header) < _HEADER.size:
+        raise ValueError("Truncated BGZF block header")
+
+    id1, id2, _, flags, _, _, _, xlen = _HEADER.unpack(header)
+    if (id1, id2) != (31, 139) or not flags & 0x04:
+        raise ValueError("Not a BGZF file")
+
+    extra = f.read(xlen)
+    block_size = None
+    pos = 0
+    while pos + _SUBFIELD.size <= len(extra):
+        si1, si2, slen = _SUBFIELD.unpack_from(extra, pos)
+        if (si1, si2) == (66, 67) and slen == 2:
+            block_size = struct.unpack_from('<H', extra, pos + _SUBFIELD.size)[0] + 1
+        pos += _SUBFIELD.size + slen
+    if block_size is None:
+        raise ValueError("BGZF block without a BC subfield")
+
+    payload = f.read(block_size - _HEADER.size - xlen)
+    data = zlib.decompress(payload[:-_TRAILER.size], -15)
+    return data, block_size
+
+
+def iter_blocks(f, start=0):
+    """Yield ``(coffset, data)`` for every block from file offset ``start`` on."""
+    f.seek(start)
+    coffset = start
+    while True:
+        data, size = read_block(f)
+        if data is None:
+            return
+        yield coffset, data
+        coffset += size
+
+
+class BgzfReader:
+    """
+    Line reader over a BGZF file with virtual-offset ``seek``/``tell``.
+
+    Only the current block is held in memory.
+    """
+
+    def __init__(self, filename):
+        self._f = open(filename, 'rb')
+        self._coffset = 0
+        self._next_coffset = 0
+        self._data = b''
+        self._pos = 0
+        self._load_block(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._f.close()
+
+    def _load_block(self, coffset):
+        self._f.seek(coffset)
+        data, size = read_block(self._f)
+        self._coffset = coffset
+        self._next_coffset = coffset + size
+        self._data = data if data is not None else b''
+        self._pos = 0
+        return data is not None
+
+    def _advance(self):
+        """Move to the next non-empty block; False at end of file."""
+        while self._pos >= len(self._data):
+            if not self._load_block(self._next_coffset):
+                return False
+        return True
+
+    def seek(self, voffset):
+        """Position the reader at a virtual offset."""
+        coffset, uoffset = split_virtual_offset(voffset)
+        if coffset != self._coffset or not self._data:
+            self._load_block(coffset)
+        self._pos = uoffset
+
+    def tell(self):
+        """Virtual offset of the next byte to be read."""
+        self._advance()
+        return make_virtual_offset(self._coffset, self._pos)
+
+    def readline(self):
+        """Read one line (including its newline) as bytes; ``b''`` at end of file."""
+        parts = []
+        while self._advance():
+            end = self._data.find(b'\n', self._pos)
+            if end >= 0:
+                parts.append(self._data[self._pos:end + 1])
+                self._pos = end + 1
+                break
+            parts.append(self._data[self._pos:])
+            self._pos = len(self._data)
+        return b''.join(parts)
+
+
+def _compress_block(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    payload = compressor.compress(data) + compressor.flush()
+    block_size = _HEADER.size + _SUBFIELD.size + 2 + len(payload) + _TRAILER.size
+    header = _HEADER.pack(31, 139, 8, 4, 0, 0, 255, _SUBFIELD.size + 2)
+    extra = _SUBFIELD.pack(66, 67, 2) + struct.pack('<H', block_size - 1)
+    trailer = _TRAILER.pack(zlib.crc32(data), len(data))
+    return header + extra + payload + trailer
+
+
+def write_bgzf(filename, chunks, level=6):
+    """
+    Write byte chunks to a BGZF file, as ``bgzip`` would.
+
+    Args:
+        filename: Output path.
+        chunks: An iterable of ``bytes`` (e.g. lines of a VCF).
+        level: zlib compression level.
+    """
+    buffer = bytearray()
+    with open(filename, 'wb') as out:
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= MAX_BLOCK_DATA:
+                out.write(_compress_block(bytes(buffer[:MAX_BLOCK_DATA]), level))
+                del buffer[:MAX_BLOCK_DATA]
+        if buffer:
+            out.write(_compress_block(bytes(buffer), level))
+        out.write(EOF_BLOCK)
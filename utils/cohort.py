@@ -0,0 +1,307 @@
+"""
+Cohort dosage matrix and vectorized polygenic scoring.
+
+Many genomes (loaded genotype stores, or the sample columns of a
+multi-sample VCF) are reduced to one samples x variants int8 matrix of
+effect-allele counts, where each column is an ``(rsid, effect_allele)``
+pair taken from the PRS definitions (``risk_allele``, ``tall_allele`` or
+``education_allele``).  Missing calls are ``-1``.  Every score is then one
+matrix-vector product over the whole cohort, with the same raw score,
+z-score, percentile and confidence intervals as the per-genome
+``calculate_polygenic_scores``.
+"""
+
+import io
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import batch, genome_store, loader, vcf
+from utils.genotype_index import GenotypeIndex, encode_rsids
+
+# Keys naming the effect allele of a PRS variant, in order of precedence
+EFFECT_ALLELE_KEYS = ('risk_allele', 'tall_allele', 'education_allele')
+
+MISSING = -1
+
+_erf = np.frompyfunc(math.erf, 1, 1)
+
+_NO_CALL_CODES = genome_store.encode_genotypes(genome_store.NO_CALLS)
+
+
+def normal_cdf(z):
+    """Standard normal CDF via ``math.erf`` (scalars or arrays), so scoring needs no SciPy."""
+    if np.ndim(z):
+        return 0.5 * (1 + _erf(np.asarray(z, dtype=np.float64) / math.sqrt(2)).astype(np.float64))
+    return 0.5 * (1 + math.erf(z / math.sqrt(2)))
+
+
+def effect_allele(variant_info):
+    """The allele a PRS variant's weight refers to, or ``None`` if it names none."""
+    for key in EFFECT_ALLELE_KEYS:
+        if key in variant_info:
+            return variant_info[key]
+    return None
+
+
+def weight_variance(variant_info):
+    """
+    Variance of a PRS weight, from ``se_weight`` or a ``ci_95_weight`` interval.
+
+    Returns 0 when neither is given.
+    """
+    if variant_info.get('se_weight') is not None:
+        return variant_info['se_weight'] ** 2
+    ci = variant_info.get('ci_95_weight')
+    if ci and len(ci) == 2:
+        # Estimate SE from 95% CI: SE = (upper - lower) / (2 * 1.96)
+        return ((ci[1] - ci[0]) / 3.92) ** 2
+    return 0
+
+
+def prs_summary(score, variance_sum, score_info):
+    """
+    Normalise a raw PRS and derive its confidence intervals.
+
+    Args:
+        score: Sum of ``allele_count * weight``.
+        variance_sum: Sum of ``allele_count**2 * Var(weight)``.
+        score_info: The score definition (``population_mean``/``population_sd``).
+
+    Returns:
+        A dict with ``raw_score``, ``raw_score_ci_95``, ``z_score``,
+        ``z_score_ci_95`` and ``percentile``.
+    """
+    mean, sd = score_info['population_mean'], score_info['population_sd']
+    z_score = (score - mean) / sd
+    percentile = normal_cdf(z_score) * 100
+
+    raw_ci = None
+    z_ci = None
+    if variance_sum > 0:
+        se = math.sqrt(variance_sum)
+        raw_ci = (score - 1.96 * se, score + 1.96 * se)
+        if sd != 0:
+            z_ci = ((raw_ci[0] - mean) / sd, (raw_ci[1] - mean) / sd)
+
+    return {
+        'raw_score': score,
+        'raw_score_ci_95': raw_ci,
+        'z_score': z_score,
+        'z_score_ci_95': z_ci,
+        'percentile': percentile,
+    }
+
+
+def score_columns(polygenic_scores):
+    """
+    The distinct ``(rsid, effect_allele)`` columns used by a set of scores.
+
+    Variants without an effect allele are skipped, as in per-genome scoring.
+    """
+    columns = {}
+    for score_info in polygenic_scores.values():
+        for rsid, variant_info in score_info['variants'].items():
+            allele = effect_allele(variant_info)
+            if allele is not None:
+                columns.setdefault((rsid, allele), None)
+    return list(columns)
+
+
+def _effect_counts(codes, allele_codes):
+    """
+    Effect-allele counts for packed genotypes against a per-column allele code.
+
+    Calls the analyzers drop during QC (``--``, ``DD``, ``II``) count as
+    missing, so a cohort row matches the per-genome score of that sample.
+    """
+    first, second = genome_store.split_alleles(codes)
+    counts = (first == allele_codes).astype(np.int8) + (second == allele_codes).astype(np.int8)
+    counts[np.isin(codes, _NO_CALL_CODES)] = MISSING
+    return counts
+
+
+def read_panel_records(lines, rsids):
+    """
+    Parse the VCF records whose ID is one of ``rsids``.
+
+    The ID of every line is checked before its sample columns are split,
+    so a cohort VCF with thousands of samples only materialises the few
+    records a panel needs.
+
+    Args:
+        lines: An iterable of VCF body lines (e.g. an open text file past the header).
+        rsids: The rsids to keep.
+
+    Returns:
+        A DataFrame of string fields (columns 0..8 and one per sample), empty
+        if nothing matched.
+    """
+    wanted = set(rsids)
+    matched = []
+    for line in lines:
+        fields = line.split('\t', 3)
+        if len(fields) > 2 and fields[2] in wanted:
+            matched.append(line)
+    if not matched:
+        return pd.DataFrame()
+    return pd.read_csv(io.StringIO(''.join(matched)), sep='\t', header=None, dtype=str, na_filter=False,
+                       engine='c')
+
+
+class DosageMatrix:
+    """
+    Samples x variants effect-allele counts.
+
+    Attributes:
+        samples: Sample ids, one per row.
+        columns: ``(rsid, effect_allele)`` pairs, one per column.
+        dosages: int8 array; 0, 1 or 2 effect alleles, ``MISSING`` if not called.
+    """
+
+    def __init__(self, samples, columns, dosages):
+        self.samples = list(samples)
+        self.columns = list(columns)
+        self.dosages = np.asarray(dosages, dtype=np.int8)
+        self._column_index = {column: i for i, column in enumerate(self.columns)}
+
+    @classmethod
+    def from_stores(cls, stores, columns):
+        """
+        Build the matrix from loaded genomes.
+
+        Args:
+            stores: A dict of sample id -> :class:`utils.genome_store.GenotypeStore`.
+            columns: ``(rsid, effect_allele)`` pairs, e.g. from :func:`score_columns`.
+        """
+        columns = list(columns)
+        rsids = [rsid for rsid, _ in columns]
+        allele_codes = genome_store.encode_alleles([allele for _, allele in columns])
+        dosages = np.full((len(stores), len(columns)), MISSING, dtype=np.int8)
+
+        for row, store in enumerate(stores.values()):
+            rows = GenotypeIndex(store.rsids, store.genotypes).lookup_rows(rsids)
+            present = rows >= 0
+            dosages[row, present] = _effect_counts(store.genotypes[rows[present]], allele_codes[present])
+
+        return cls(stores.keys(), columns, dosages)
+
+    @classmethod
+    def from_vcf(cls, filename, columns):
+        """
+        Build the matrix from every sample column of a multi-sample VCF.
+
+        The VCF is streamed once and only records whose ID is one of the
+        columns' rsids are split into fields (see :func:`read_panel_records`);
+        they are resolved sample by sample, with the same GT and REF/ALT
+        handling as the single-sample reader.
+        """
+        columns = list(columns)
+        rsids = [rsid for rsid, _ in columns]
+        allele_codes = genome_store.encode_alleles([allele for _, allele in columns])
+
+        with loader.open_text(filename) as f:
+            line = f.readline()
+            while line.startswith('##'):
+                line = f.readline()
+            header = line.rstrip('\r\n').split('\t')
+            if not header[0].startswith('#CHROM') or len(header) < 10:
+                raise ValueError("Expected a VCF with at least one sample column")
+            samples = header[9:]
+            records = read_panel_records(f, rsids)
+
+        dosages = np.full((len(samples), len(columns)), MISSING, dtype=np.int8)
+        if records.empty:
+            return cls(samples, columns, dosages)
+
+        # First record per rsid, as for single-sample lookups
+        records = records.drop_duplicates(subset=2)
+        rows = GenotypeIndex(encode_rsids(records[2]), np.arange(len(records))).lookup_rows(rsids)
+        present = rows >= 0
+
+        for row, sample_column in enumerate(range(9, 9 + len(samples))):
+            resolved = vcf.resolve_chunk(pd.DataFrame({
+                'chromosome': records[0], 'position': records[1], 'rsid': records[2],
+                'ref': records[3], 'alt': records[4], 'format': records[8],
+                'sample': records[sample_column],
+            }))
+            # Missing GTs resolve to '--' and so come out as MISSING
+            codes = genome_store.encode_genotypes(resolved['genotype'])[rows[present]]
+            dosages[row, present] = _effect_counts(codes, allele_codes[present])
+
+        return cls(samples, columns, dosages)
+
+    def score(self, score_info):
+        """
+        Score every sample for one PRS in a single matrix-vector product.
+
+        Returns:
+            A DataFrame indexed by sample with ``raw_score``, ``z_score``,
+            ``percentile``, ``raw_score_ci_95_lower``/``_upper``,
+            ``z_score_ci_95_lower``/``_upper`` (NaN when no weight has an
+            uncertainty) and ``variants_found``.
+        """
+        weights = np.zeros(len(self.columns))
+        variances = np.zeros(len(self.columns))
+        in_score = np.zeros(len(self.columns), dtype=bool)
+        for rsid, variant_info in score_info['variants'].items():
+            allele = effect_allele(variant_info)
+            column = self._column_index.get((rsid, allele))
+            if column is None:
+                continue
+            weights[column] = variant_info['weight']
+            variances[column] = weight_variance(variant_info)
+            in_score[column] = True
+
+        called = self.dosages >= 0
+        counts = np.where(called, self.dosages, 0).astype(np.float64)
+        raw = counts @ weights
+        variance_sum = (counts ** 2) @ variances
+        found = called.astype(np.int32) @ in_score.astype(np.int32)
+
+        mean, sd = score_info['population_mean'], score_info['population_sd']
+        z_score = (raw - mean) / sd
+        se = np.where(variance_sum > 0, np.sqrt(variance_sum), np.nan)
+        lower, upper = raw - 1.96 * se, raw + 1.96 * se
+
+        return pd.DataFrame({
+            'raw_score': raw,
+            'raw_score_ci_95_lower': lower,
+            'raw_score_ci_95_upper': upper,
+            'z_score': z_score,
+            'z_score_ci_95_lower': (lower - mean) / sd if sd != 0 else np.nan,
+            'z_score_ci_95_upper': (upper - mean) / sd if sd != 0 else np.nan,
+            'percentile': normal_cdf(z_score) * 100,
+            'variants_found': found,
+        }, index=pd.Index(self.samples, name='sample'))
+
+    def score_all(self, polygenic_scores):
+        """Score every PRS; returns a long DataFrame with a ``score`` column."""
+        tables = [self.score(score_info).assign(score=score_name)
+                  for score_name, score_info in polygenic_scores.items()]
+        return pd.concat(tables).reset_index().set_index(['score', 'sample'])
+
+
+def matrix_from_source(source, columns):
+    """
+    Dosage matrix of a cohort given as a multi-sample VCF, a directory of raw
+    files or a batch manifest (see :func:`utils.batch.discover_samples`).
+    """
+    if os.path.isfile(source) and loader.is_vcf(source):
+        return DosageMatrix.from_vcf(source, columns)
+    rsids = [rsid for rsid, _ in columns]
+    stores = {sample_id: load_targeted_store(path, rsids) for sample_id, path in batch.discover_samples(source)}
+    return DosageMatrix.from_stores(stores, columns)
+
+
+def load_targeted_store(filename, rsids, chunksize=loader.TARGETED_CHUNKSIZE):
+    """Stream a raw file, keeping only the given rsids (no-calls dropped as in the analyzer QC)."""
+    target_keys = encode_rsids(list(rsids))
+    kept = []
+    for chunk in loader.iter_raw_genotypes(filename, {}, chunksize=chunksize):
+        store = genome_store.GenotypeStore.from_frame(chunk)
+        keep = np.isin(store.rsids, target_keys) & ~np.isin(store.genotypes, _NO_CALL_CODES)
+        kept.append(store.filter(keep))
+    return genome_store.GenotypeStore.concat(kept)
@@ -0,0 +1,316 @@
+"""
+Gene annotation of a loaded genome from a local GTF or BED gene model.
+
+The knowledge-base panels hard-code a ``gene`` per rsid; everything else
+in a genome is unannotated.  A :class:`GeneModel` turns a gene model file
+into a compact interval index: genes sorted by start within each
+chromosome, their ends, and the running maximum of the ends (the furthest
+any gene starting at or before a given gene reaches).  Annotating a genome
+is then one sweep per chromosome over its sorted positions
+(:class:`utils.region_index.RegionIndex`):
+
+* ``searchsorted`` finds the last gene starting at or before each variant;
+* the running-maximum end tells whether some gene still covers it, and
+  which one (the one reaching furthest, when several overlap);
+* otherwise the nearest gene is the closer of that gene's end and the next
+  gene's start.
+
+The compiled index is cached beside the model as ``<model>.index.npz`` and
+reused while the model file's size and mtime are unchanged.
+
+GTF files (1-based, closed) contribute their ``gene`` records, named by
+``gene_name`` (or ``gene_id``).  BED files (0-based, half-open) contribute
+every record, named by the fourth column when present.  ``chr`` prefixes
+are ignored and ``M`` is read as ``MT``, matching raw-data chromosome names.
+"""
+
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import loader
+from utils.region_index import RegionIndex
+
+FORMAT_VERSION = 1
+
+GTF_SUFFIXES = ('.gtf', '.gtf.gz', '.gff', '.gff.gz', '.gff3', '.gff3.gz')
+
+# Models already compiled or loaded by this process, keyed by (path, mtime)
+_loaded = {}
+
+
+def normalise_chromosomes(chromosomes):
+    """Canonical chromosome labels: no ``chr`` prefix, ``M`` -> ``MT``, 23/24/25 -> X/Y/MT."""
+    names = pd.Series(chromosomes, copy=False).astype(str).str.upper().str.removeprefix('CHR')
+    return names.replace({'M': 'MT', '23': 'X', '24': 'Y', '25': 'MT'}).to_numpy(dtype=object)
+
+
+def index_path(path):
+    """Where the compiled index of a gene model is cached."""
+    return str(path) + '.index.npz'
+
+
+def read_gtf(path, chunksize=500_000):
+    """
+    Gene records of a GTF/GFF file.
+
+    Returns:
+        A DataFrame with ``chromosome``, ``start``, ``end`` (1-based, closed)
+        and ``name`` columns.
+    """
+    genes = []
+    with loader.open_text(path) as f:
+        for chunk in pd.read_csv(f, sep='\t', comment='#', header=None, usecols=[0, 2, 3, 4, 8],
+                                 names=['chromosome', 'feature', 'start', 'end', 'attributes'],
+                                 dtype={'chromosome': str, 'feature': str, 'attributes': str},
+                                 quoting=csv.QUOTE_NONE, chunksize=chunksize):
+            chunk = chunk[chunk['feature'] == 'gene']
+            attributes = chunk['attributes'].fillna('')
+            # GTF writes gene_name "X"; GFF3 writes Name=X
+            name = attributes.str.extract(r'gene_name[ =]"?([^";]+)', expand=False)
+            for fallback in (r'\bName=([^;]+)', r'gene_id[ =]"?([^";]+)', r'\bID=([^;]+)'):
+                name = name.fillna(attributes.str.extract(fallback, expand=False))
+            genes.append(pd.DataFrame({'chromosome': chunk['chromosome'], 'start': chunk['start'],
+                                       'end': chunk['end'], 'name': name}))
+    if not genes:
+        return pd.DataFrame(columns=['chromosome', 'start', 'end', 'name'])
+    return pd.concat(genes, ignore_index=True)
+
+
+def read_bed(path):
+    """
+    Records of a BED file, converted to 1-based closed coordinates.
+
+    Returns:
+        A DataFrame with ``chromosome``, ``start``, ``end`` and ``name`` columns.
+    """
+    # 'track' and 'browser' lines may precede the records
+    header_lines = 0
+    with loader.open_text(path) as f:
+        for line in f:
+            if not line.startswith(('track', 'browser', '#')):
+                break
+            header_lines += 1
+    with loader.open_text(path) as f:
+        bed = pd.read_csv(f, sep='\t', header=None, skiprows=header_lines, comment='#', dtype=str,
+                          quoting=csv.QUOTE_NONE)
+    start = pd.to_numeric(bed[1]) + 1
+    end = pd.to_numeric(bed[2])
+    if bed.shape[1] > 3:
+        name = bed[3]
+    else:
+        name = bed[0] + ':' + start.astype(str) + '-' + end.astype(str)
+    return pd.DataFrame({'chromosome': bed[0], 'start': start, 'end': end, 'name': name})
+
+
+class GeneModel:
+    """Genes of one gene model, indexed for overlap and nearest-gene queries."""
+
+    def __init__(self, chromosomes, starts, ends, names, source=None, signature=None):
+        """
+        Args:
+            chromosomes: Chromosome per gene (normalised with :func:`normalise_chromosomes`).
+            starts: 1-based first position per gene.
+            ends: 1-based last position per gene.
+            names: Gene name per gene.
+            source: Path of the model file, for reports.
+            signature: ``(size, mtime_ns)`` of the source when the index was compiled.
+        """
+        chromosomes = normalise_chromosomes(chromosomes).astype(str)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        order = np.lexsort((ends, starts, chromosomes))
+        self.chromosomes = chromosomes[order]
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.names = np.asarray(names, dtype=object)[order]
+        self.source = source
+        self.signature = signature
+
+        # Per chromosome: its block of genes, and the running maximum of the ends
+        # (with the gene reaching it) over the block's genes in start order
+        self.blocks = {}
+        self.reach_end = np.empty(len(order), dtype=np.int64)
+        self.reach_gene = np.empty(len(order), dtype=np.int64)
+        labels, first = np.unique(self.chromosomes, return_index=True) if len(order) else ([], [])
+        stops = list(first[1:]) + [len(order)]
+        for chrom, lo, hi in zip(labels, first, stops):
+            self.blocks[chrom] = (int(lo), int(hi))
+            ends_block = self.ends[lo:hi]
+            self.reach_end[lo:hi] = np.maximum.accumulate(ends_block)
+            # Index of the first gene attaining each running maximum
+            is_record = np.r_[True, ends_block[1:] > self.reach_end[lo:hi - 1]]
+            self.reach_gene[lo:hi] = lo + np.maximum.accumulate(np.where(is_record, np.arange(hi - lo), 0))
+
+    def __len__(self):
+        return len(self.starts)
+
+    @classmethod
+    def from_frame(cls, genes, source=None, signature=None):
+        """Build a model from a ``chromosome``/``start``/``end``/``name`` DataFrame."""
+        genes = genes.dropna(subset=['chromosome', 'start', 'end'])
+        return cls(genes['chromosome'], genes['start'], genes['end'], genes['name'].fillna('.'),
+                   source=source, signature=signature)
+
+    @classmethod
+    def read(cls, path):
+        """Parse a GTF/GFF or BED gene model file."""
+        is_gtf = str(path).lower().endswith(GTF_SUFFIXES)
+        genes = read_gtf(path) if is_gtf else read_bed(path)
+        return cls.from_frame(genes, source=str(path), signature=_signature(path))
+
+    def save(self, path):
+        """Write the compiled index as a compressed ``.npz``."""
+        np.savez_compressed(
+            path,
+            format_version=FORMAT_VERSION,
+            signature=np.asarray(self.signature if self.signature else (-1, -1), dtype=np.int64),
+            chromosomes=self.chromosomes.astype(str),
+            starts=self.starts,
+            ends=self.ends,
+            names=self.names.astype(str),
+        )
+
+    @classmethod
+    def load(cls, path, source=None):
+        """Read an index written by :meth:`save`."""
+        with np.load(path) as archive:
+            if int(archive['format_version']) != FORMAT_VERSION:
+                raise ValueError(f"{path} has index format {int(archive['format_version'])}, expected {FORMAT_VERSION}")
+            signature = tuple(int(value) for value in archive['signature'])
+            return cls(archive['chromosomes'], archive['starts'], archive['ends'], archive['names'],
+                       source=source, signature=None if signature == (-1, -1) else signature)
+
+    def annotate(self, chromosomes, positions, region_index=None):
+        """
+        Overlapping and nearest gene of every variant, in one sweep per chromosome.
+
+        Args:
+            chromosomes: Chromosome label per variant.
+            positions: 1-based position per variant.
+            region_index: Optional :class:`utils.region_index.RegionIndex`
+                already built over the same rows.
+
+        Returns:
+            A :class:`GeneAnnotation` aligned with the input rows.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        n = len(positions)
+        overlapping = np.full(n, -1, dtype=np.int64)
+        nearest = np.full(n, -1, dtype=np.int64)
+        distance = np.full(n, -1, dtype=np.int64)
+        if region_index is None:
+            region_index = RegionIndex(chromosomes, positions)
+
+        for chrom in region_index.chromosomes:
+            block = self.blocks.get(normalise_chromosomes([chrom])[0])
+            if block is None:
+                continue
+            lo, hi = block
+            region = region_index.chromosome(chrom)
+            query = region.positions
+            # Last gene starting at or before each variant (-1: none), then the next one
+            left = np.searchsorted(self.starts[lo:hi], query, side='right') - 1
+            has_left = left >= 0
+            reach = np.where(has_left, self.reach_end[lo:hi][np.maximum(left, 0)], -1)
+            left_gene = self.reach_gene[lo:hi][np.maximum(left, 0)]
+            has_right = left + 1 < hi - lo
+            right_gene = lo + np.minimum(left + 1, hi - lo - 1)
+
+            left_distance = np.where(has_left, np.maximum(query - reach, 0), np.iinfo(np.int64).max)
+            right_distance = np.where(has_right, self.starts[right_gene] - query, np.iinfo(np.int64).max)
+            covered = has_left & (reach >= query)
+            use_left = left_distance <= right_distance
+
+            overlapping[region.rows] = np.where(covered, left_gene, -1)
+            nearest[region.rows] = np.where(use_left, left_gene, right_gene)
+            distance[region.rows] = np.minimum(left_distance, right_distance)
+
+        return GeneAnnotation(self, overlapping, nearest, distance)
+
+
+class GeneAnnotation:
+    """
+    Per-variant gene annotation produced by :meth:`GeneModel.annotate`.
+
+    ``overlapping`` and ``nearest`` are gene indexes into the model (-1 when
+    there is none); ``distance`` is 0 inside a gene, the distance in bp to
+    the nearest gene otherwise, and -1 on chromosomes without genes.
+    """
+
+    def __init__(self, model, overlapping, nearest, distance):
+        self.model = model
+        self.overlapping = overlapping
+        self.nearest = nearest
+        self.distance = distance
+
+    def __len__(self):
+        return len(self.overlapping)
+
+    def _names(self, genes):
+        return np.where(genes >= 0, self.model.names[np.maximum(genes, 0)], None) if len(self.model) else \
+            np.full(len(genes), None, dtype=object)
+
+    def overlapping_genes(self, rows=None):
+        """Names of the genes covering the given rows (all rows by default); ``None`` if intergenic."""
+        return self._names(self.overlapping if rows is None else self.overlapping[rows])
+
+    def nearest_genes(self, rows=None):
+        """Names of the genes nearest to the given rows (all rows by default)."""
+        return self._names(self.nearest if rows is None else self.nearest[rows])
+
+    def summary(self):
+        """Genome-wide counts: genic/intergenic variants and genes with at least one variant."""
+        genic = self.overlapping >= 0
+        return {
+            'gene_model': self.model.source,
+            'genes_in_model': len(self.model),
+            'genes_with_variants': int(len(np.unique(self.overlapping[genic]))),
+            'genic_variants': int(genic.sum()),
+            'intergenic_variants': int((~genic & (self.nearest >= 0)).sum()),
+            'unannotated_variants': int((self.nearest < 0).sum()),
+        }
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def load_cached(path):
+    """
+    The compiled gene model of ``path``, once per process.
+
+    The ``.index.npz`` beside the model is used while it matches the
+    model's size and mtime; otherwise the model is parsed and the index
+    rewritten (a warning is printed if it cannot be written).
+
+    Returns:
+        A :class:`GeneModel`, or ``None`` if ``path`` is missing.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    signature = _signature(path)
+    key = (os.path.abspath(path), signature)
+    if key in _loaded:
+        return _loaded[key]
+
+    model = None
+    cached = index_path(path)
+    if os.path.exists(cached):
+        try:
+            model = GeneModel.load(cached, source=str(path))
+        except (OSError, ValueError, KeyError):
+            model = None
+        if model is not None and model.signature != signature:
+            model = None
+    if model is None:
+        model = GeneModel.read(path)
+        try:
+            model.save(cached)
+        except OSError as e:
+            print(f"WARNING: Could not write gene index {cached}: {e}")
+    _loaded[key] = model
+    return model
@@ -0,0 +1,152 @@
+"""
+Persistent on-disk cache of parsed, QC-filtered genomes.
+
+Each entry is a directory of ``.npy`` arrays (the columns of a
+:class:`utils.genome_store.GenotypeStore`) plus a small JSON sidecar with the
+chromosome labels (plus REF/ALT/GT labels for VCF genomes) and the analyzer
+metadata.  Entries are keyed by the
+SHA-256 of the raw input file and :data:`LOADER_VERSION`, so editing the
+input or changing the loader/QC logic invalidates them.  Arrays are opened
+with ``mmap_mode='r'``, which makes a warm load a handful of ``open`` calls.
+
+The cache is bounded in size: after each write the least recently used
+entries are evicted until the total is under ``max_bytes``.
+"""
+
+import hashlib
+import json
+import os
+import pathlib as pl
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from utils.genome_store import GenotypeStore
+
+# Bump whenever parsing or QC changes what ends up in the store
+LOADER_VERSION = '3'
+
+ARRAYS = ('rsids', 'chromosome_codes', 'positions', 'genotypes')
+# Extra categorical columns of genomes read from a VCF
+VCF_CATEGORICALS = ('refs', 'alts', 'gts')
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def file_sha256(filename, chunk_size=1 << 20):
+    """SHA-256 hex digest of a file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _dir_size(path):
+    return sum(p.stat().st_size for p in path.iterdir() if p.is_file())
+
+
+class GenomeCache:
+    """
+    Size-bounded directory of cached genomes.
+
+    Args:
+        cache_dir: Directory holding the entries (created if missing).
+        max_bytes: Upper bound on the total size of all entries.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = pl.Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def key_for(self, filename):
+        """Cache key of a raw input file for the current loader version."""
+        return f"{file_sha256(filename)}-v{LOADER_VERSION}"
+
+    def load(self, key):
+        """
+        Load a cached genome.
+
+        Returns:
+            ``(store, metadata)`` with memory-mapped arrays, or ``None`` on a miss.
+        """
+        entry = self.cache_dir / key
+        sidecar = entry / 'meta.json'
+        if not sidecar.exists():
+            return None
+
+        # An entry evicted or truncated by another process is a miss, not an error
+        try:
+            meta = json.loads(sidecar.read_text())
+            arrays = {name: np.load(entry / f"{name}.npy", mmap_mode='r') for name in ARRAYS}
+            unencoded = np.load(entry / 'unencoded.npy', mmap_mode='r') if meta.get('unencoded') else None
+
+            vcf_fields = {}
+            if 'vcf_categories' in meta:
+                vcf_fields = {
+                    attr: pd.Categorical.from_codes(np.load(entry / f"{attr}_codes.npy"), categories=categories)
+                    for attr, categories in meta['vcf_categories'].items()
+                }
+                vcf_fields['dosages'] = np.load(entry / 'dosages.npy', mmap_mode='r')
+
+            # Touch the entry so eviction sees it as recently used
+            os.utime(entry)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable genome cache entry {entry}: {e}")
+            return None
+
+        chromosomes = pd.Categorical.from_codes(np.asarray(arrays['chromosome_codes']),
+                                                categories=meta['chromosomes'])
+        store = GenotypeStore(arrays['rsids'], chromosomes, arrays['positions'], arrays['genotypes'],
+                              unencoded=unencoded, **vcf_fields)
+        return store, meta['metadata']
+
+    def save(self, key, store, metadata):
+        """Write a genome to the cache atomically, then enforce the size bound."""
+        entry = self.cache_dir / key
+        if entry.exists():
+            return
+
+        staging = pl.Path(tempfile.mkdtemp(prefix='.staging-', dir=self.cache_dir))
+        try:
+            np.save(staging / 'rsids.npy', store.rsids)
+            np.save(staging / 'chromosome_codes.npy', store.chromosomes.codes)
+            np.save(staging / 'positions.npy', store.positions)
+            np.save(staging / 'genotypes.npy', store.genotypes)
+            meta = {
+                'loader_version': LOADER_VERSION,
+                'chromosomes': [str(c) for c in store.chromosomes.categories],
+                'metadata': metadata,
+                'unencoded': store.unencoded is not None,
+            }
+            if store.unencoded is not None:
+                np.save(staging / 'unencoded.npy', store.unencoded)
+            if store.has_vcf_fields:
+                meta['vcf_categories'] = {}
+                for attr in VCF_CATEGORICALS:
+                    values = getattr(store, attr)
+                    np.save(staging / f"{attr}_codes.npy", values.codes)
+                    meta['vcf_categories'][attr] = [str(c) for c in values.categories]
+                np.save(staging / 'dosages.npy', store.dosages)
+            (staging / 'meta.json').write_text(json.dumps(meta, default=str))
+            os.replace(staging, entry)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not entry.exists():
+                raise
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in ``max_bytes``."""
+        entries = [p for p in self.cache_dir.iterdir() if p.is_dir() and not p.name.startswith('.')]
+        sizes = {p: _dir_size(p) for p in entries}
+        total = sum(sizes.values())
+
+        for entry in sorted(entries, key=lambda p: p.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= sizes[entry]
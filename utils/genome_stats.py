@@ -0,0 +1,213 @@
+"""
+Vectorized genome-wide genotype statistics.
+
+Homozygous/heterozygous counts and the transition/transversion ratio are
+computed directly on packed genotype codes (see :mod:`utils.genome_store`),
+genome-wide and per chromosome, in a single pass with ``np.bincount``.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils import genome_store
+
+
+def _classify_codes(codes, unencoded=None):
+    first, second = genome_store.split_alleles(codes)
+    homozygous = genome_store.is_homozygous(codes)
+    heterozygous = genome_store.is_heterozygous(codes)
+    # With A=0, C=1, G=2, T=3 the transition pairs are exactly the bases whose codes differ by XOR 2
+    transitions = heterozygous & (first < 4) & (second < 4) & ((first ^ second) == 2)
+    if unencoded is not None:
+        # Unencodable calls pack to the empty genotype, so none of the masks is set for them yet
+        homozygous |= unencoded == genome_store.UNENCODED_HOMOZYGOUS
+        heterozygous |= unencoded == genome_store.UNENCODED_HETEROZYGOUS
+    return {
+        'homozygous': homozygous,
+        'heterozygous': heterozygous,
+        'transitions': transitions,
+        'transversions': heterozygous & ~transitions,
+    }
+
+
+def classify_genotypes(genotypes, unencoded=None):
+    """
+    Classify each call as homozygous, heterozygous, transition or transversion.
+
+    Only two-allele calls are counted.  A heterozygote is a transition when
+    its alleles are {A, G} or {C, T}; every other heterozygote (including
+    D/I mixes) is a transversion, exactly as the original per-row loop did.
+    Two-character strings the packed codes cannot represent (``'NN'``,
+    ``'00'``, lower case, ...) are classified by the same rule as before:
+    homozygous if both characters match, otherwise a heterozygous
+    transversion.  Packed codes no longer hold those strings; pass the
+    store's ``unencoded`` column alongside them.
+
+    Args:
+        genotypes: Packed uint8 codes, or any column of genotype strings.
+        unencoded: With packed codes, the per-row zygosity of unencodable
+            calls (:attr:`utils.genome_store.GenotypeStore.unencoded`).
+
+    Returns:
+        A dict of boolean arrays keyed ``homozygous``, ``heterozygous``,
+        ``transitions`` and ``transversions``.
+    """
+    if isinstance(genotypes, np.ndarray) and genotypes.dtype == np.uint8:
+        return _classify_codes(genotypes, unencoded)
+
+    # Classify the few distinct strings, then broadcast back to the rows
+    rows, uniques = pd.factorize(pd.Series(genotypes, copy=False), use_na_sentinel=False)
+    classes = _classify_codes(*genome_store.pack_genotypes(np.asarray(uniques, dtype=object)))
+    return {name: mask[rows] for name, mask in classes.items()}
+
+
+def _ti_tv(transitions, transversions):
+    return transitions / transversions if transversions > 0 else 0
+
+
+def _het_rate(homozygous, heterozygous):
+    total = homozygous + heterozygous
+    return heterozygous / total if total > 0 else 0
+
+
+class GenomeCounters:
+    """
+    Running per-chromosome genotype counters.
+
+    Chunks of a genome are fed through :meth:`update` as they stream past, so
+    genome-wide statistics are available without keeping the genome in
+    memory.  :meth:`summary` returns exactly what :func:`genotype_summary`
+    returns for the concatenated chunks.
+    """
+
+    FIELDS = ('count', 'homozygous', 'heterozygous', 'transitions', 'transversions')
+
+    def __init__(self):
+        self.per_chromosome = {}
+        self.raw_counts = {}
+        self._has_positions = True
+
+    def add_raw(self, chromosomes):
+        """Count variants per chromosome before QC filtering (for call rates)."""
+        chromosomes = pd.Categorical(chromosomes)
+        counts = np.bincount(chromosomes.codes, minlength=len(chromosomes.categories))
+        for chrom, count in zip(chromosomes.categories, counts):
+            if count:
+                self.raw_counts[str(chrom)] = self.raw_counts.get(str(chrom), 0) + int(count)
+
+    def update(self, genotypes, chromosomes, positions=None, unencoded=None):
+        """
+        Add a chunk of genotypes with their chromosome labels (and optionally positions).
+
+        ``unencoded`` is the store's column of the same rows, when ``genotypes`` are packed codes.
+        """
+        classes = classify_genotypes(genotypes, unencoded)
+        chromosomes = pd.Categorical(chromosomes)
+        chrom_codes = chromosomes.codes
+        n_chrom = len(chromosomes.categories)
+
+        columns = {'count': np.bincount(chrom_codes, minlength=n_chrom)}
+        for name, mask in classes.items():
+            columns[name] = np.bincount(chrom_codes, weights=mask, minlength=n_chrom).astype(np.int64)
+
+        spans = None
+        if positions is None:
+            self._has_positions = False
+        else:
+            spans = pd.Series(np.asarray(positions, dtype=np.int64)).groupby(chrom_codes).agg(['min', 'max'])
+
+        for code, chrom in enumerate(chromosomes.categories):
+            if columns['count'][code] == 0:
+                continue
+            entry = self.per_chromosome.setdefault(str(chrom), dict.fromkeys(self.FIELDS, 0))
+            for field in self.FIELDS:
+                entry[field] += int(columns[field][code])
+            if spans is not None:
+                low, high = int(spans.at[code, 'min']), int(spans.at[code, 'max'])
+                entry['min_position'] = min(entry.get('min_position', low), low)
+                entry['max_position'] = max(entry.get('max_position', high), high)
+
+    @property
+    def total(self):
+        """Number of variants counted by :meth:`update`."""
+        return sum(entry['count'] for entry in self.per_chromosome.values())
+
+    def summary(self, raw_counts_per_chromosome=None):
+        """
+        Genome-wide and per-chromosome statistics of everything counted so far.
+
+        Args:
+            raw_counts_per_chromosome: Pre-QC counts per chromosome; defaults
+                to the counts collected by :meth:`add_raw`, if any.
+        """
+        if raw_counts_per_chromosome is None:
+            raw_counts_per_chromosome = self.raw_counts
+
+        per_chromosome = {}
+        for chrom in sorted(self.per_chromosome):
+            entry = self.per_chromosome[chrom]
+            hom, het = entry['homozygous'], entry['heterozygous']
+            chrom_stats = {
+                'count': entry['count'],
+                'homozygous': hom,
+                'heterozygous': het,
+                'heterozygosity_rate': _het_rate(hom, het),
+                'ti_tv_ratio': _ti_tv(entry['transitions'], entry['transversions']),
+            }
+            if raw_counts_per_chromosome:
+                raw = raw_counts_per_chromosome.get(chrom, 0)
+                chrom_stats['call_rate'] = entry['count'] / raw if raw > 0 else 0
+            if self._has_positions and 'min_position' in entry:
+                chrom_stats['min_position'] = entry['min_position']
+                chrom_stats['max_position'] = entry['max_position']
+            per_chromosome[chrom] = chrom_stats
+
+        totals = {
+            name: sum(entry[name] for entry in self.per_chromosome.values())
+            for name in ('homozygous', 'heterozygous', 'transitions', 'transversions')
+        }
+        return {
+            **totals,
+            'heterozygosity_rate': _het_rate(totals['homozygous'], totals['heterozygous']),
+            'ti_tv_ratio': _ti_tv(totals['transitions'], totals['transversions']),
+            'per_chromosome': per_chromosome,
+        }
+
+    def to_dict(self):
+        """JSON-serialisable state, e.g. for storing in an index."""
+        return {'per_chromosome': self.per_chromosome, 'raw_counts': self.raw_counts,
+                'has_positions': self._has_positions}
+
+    @classmethod
+    def from_dict(cls, state):
+        """Rebuild counters saved with :meth:`to_dict`."""
+        counters = cls()
+        counters.per_chromosome = {chrom: dict(entry) for chrom, entry in state['per_chromosome'].items()}
+        counters.raw_counts = dict(state['raw_counts'])
+        counters._has_positions = state['has_positions']
+        return counters
+
+
+def genotype_summary(genotypes, chromosomes, positions=None, raw_counts_per_chromosome=None, unencoded=None):
+    """
+    Genome-wide and per-chromosome genotype statistics in one pass.
+
+    Args:
+        genotypes: Packed genotype codes or a column of genotype strings.
+        chromosomes: Chromosome label per row (Categorical or strings).
+        positions: Optional positions, used for per-chromosome span.
+        raw_counts_per_chromosome: Optional dict of variant counts per
+            chromosome before QC filtering, used for per-chromosome call rate.
+        unencoded: With packed codes, the store's ``unencoded`` column (see
+            :func:`classify_genotypes`).
+
+    Returns:
+        A dict with genome-wide ``homozygous``, ``heterozygous``,
+        ``transitions``, ``transversions``, ``heterozygosity_rate`` and
+        ``ti_tv_ratio`` plus a ``per_chromosome`` dict of the same metrics,
+        ``count``, ``call_rate`` and (with positions) ``min_position`` /
+        ``max_position``.
+    """
+    counters = GenomeCounters()
+    counters.update(genotypes, chromosomes, positions, unencoded)
+    return counters.summary(raw_counts_per_chromosome or {})
@@ -0,0 +1,365 @@
+"""
+Compact columnar genotype store.
+
+A parsed genome is held as four flat arrays instead of a DataFrame of Python
+strings:
+
+* ``rsids``       - int64 keys (see :func:`utils.genotype_index.encode_rsids`)
+* ``chromosomes`` - a pandas Categorical (int8 codes)
+* ``positions``   - int32 coordinates
+* ``genotypes``   - one uint8 per call, two 3-bit allele codes packed as
+  ``first << 3 | second``
+
+Allele codes 0-3 are A, C, G and T, so the four bases fit in two bits and
+the strand complement of a base is ``3 - code``.  Codes 4-6 are the 23andMe
+symbols D, I and ``-``; code 7 marks "no allele", which encodes haploid
+calls (``'A'`` on chrY/MT) and unparseable genotypes.
+
+Two-character calls the codes cannot represent (``'NN'``, ``'00'``, lower
+case, ...) pack to the empty genotype; ``unencoded`` (int8, or ``None`` when
+there are none) keeps whether each was homozygous or heterozygous, so the
+genome-wide statistics still count them as the string-based analysis did.
+
+Genomes read from a VCF additionally keep ``refs``, ``alts`` and ``gts``
+(Categoricals of the REF, ALT and GT fields) and ``dosages`` (int8 ALT
+allele dosage, -1 for no-calls).
+"""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from utils.genotype_index import encode_rsids
+
+ALLELES = ['A', 'C', 'G', 'T', 'D', 'I', '-', '']
+ALLELE_CODES = {symbol: code for code, symbol in enumerate(ALLELES) if symbol}
+
+NO_ALLELE = 7
+EMPTY_GENOTYPE = NO_ALLELE << 3 | NO_ALLELE
+
+# Zygosity of a two-character call the packed codes cannot represent (0: any other call)
+UNENCODED_HOMOZYGOUS = 1
+UNENCODED_HETEROZYGOUS = 2
+
+# Calls dropped by the ultra analyzer's QC (no-calls, deletions, insertions)
+NO_CALLS = ['--', 'DD', 'II']
+
+# All 64 packed genotype codes rendered as strings; index == code.  A missing
+# first allele never comes out of the encoder, so those codes get a '.' prefix
+# to keep the categories unique.
+GENOTYPE_CATEGORIES = [
+    ('.' if code >> 3 == NO_ALLELE and code != EMPTY_GENOTYPE else ALLELES[code >> 3]) + ALLELES[code & 7]
+    for code in range(64)
+]
+
+# Strand complement per allele code: A<->T, C<->G, everything else unchanged
+_COMPLEMENT = np.array([3, 2, 1, 0, 4, 5, 6, 7], dtype=np.uint8)
+
+# Rank of each allele code in ASCII order, so sorted genotypes match ''.join(sorted(g))
+_ASCII_RANK = np.array([ord(symbol) if symbol else 255 for symbol in ALLELES], dtype=np.uint8)
+
+
+def _encode_genotype_string(genotype):
+    """Pack a single genotype string into its uint8 code."""
+    if not isinstance(genotype, str) or len(genotype) > 2:
+        return EMPTY_GENOTYPE
+    codes = [ALLELE_CODES.get(symbol) for symbol in genotype]
+    if None in codes:
+        return EMPTY_GENOTYPE
+    codes += [NO_ALLELE] * (2 - len(codes))
+    return codes[0] << 3 | codes[1]
+
+
+def _unencoded_zygosity(genotype, code):
+    """:data:`UNENCODED_HOMOZYGOUS`/``HETEROZYGOUS`` for an unencodable two-character call, else 0."""
+    if code != EMPTY_GENOTYPE or not isinstance(genotype, str) or len(genotype) != 2:
+        return 0
+    return UNENCODED_HOMOZYGOUS if genotype[0] == genotype[1] else UNENCODED_HETEROZYGOUS
+
+
+def pack_genotypes(genotypes):
+    """
+    Pack genotype strings, keeping the zygosity of calls the codes cannot hold.
+
+    Returns:
+        ``(codes, unencoded)``: the uint8 codes of :func:`encode_genotypes`
+        and an int8 array of :data:`UNENCODED_HOMOZYGOUS` /
+        :data:`UNENCODED_HETEROZYGOUS` per row, or ``None`` if every
+        two-character call was encodable.
+    """
+    uniques_codes, uniques = pd.factorize(pd.Series(genotypes, copy=False), use_na_sentinel=False)
+    lookup = np.array([_encode_genotype_string(g) for g in uniques], dtype=np.uint8)
+    if not len(lookup):
+        return np.empty(0, dtype=np.uint8), None
+    zygosity = np.array([_unencoded_zygosity(g, code) for g, code in zip(uniques, lookup)], dtype=np.int8)
+    return lookup[uniques_codes], (zygosity[uniques_codes] if zygosity.any() else None)
+
+
+def encode_genotypes(genotypes):
+    """
+    Pack an array of genotype strings into uint8 codes.
+
+    Only the distinct genotype strings (a few dozen at most) are encoded in
+    Python; the per-row work is a single vectorized ``take``.
+    """
+    uniques_codes, uniques = pd.factorize(pd.Series(genotypes, copy=False), use_na_sentinel=False)
+    lookup = np.array([_encode_genotype_string(g) for g in uniques], dtype=np.uint8)
+    return lookup[uniques_codes] if len(lookup) else np.empty(0, dtype=np.uint8)
+
+
+def encode_alleles(alleles):
+    """Map single-base allele strings to allele codes (``NO_ALLELE`` if unknown)."""
+    return np.array([ALLELE_CODES.get(a, NO_ALLELE) for a in alleles], dtype=np.uint8)
+
+
+def decode_genotypes(codes):
+    """Render packed codes as a Categorical of genotype strings (1 byte per row)."""
+    return pd.Categorical.from_codes(np.asarray(codes).astype(np.int8), categories=GENOTYPE_CATEGORIES)
+
+
+def split_alleles(codes):
+    """Unpack genotype codes into ``(first, second)`` allele code arrays."""
+    codes = np.asarray(codes, dtype=np.uint8)
+    return codes >> 3, codes & 7
+
+
+def is_diploid(codes):
+    """True where both alleles are present."""
+    first, second = split_alleles(codes)
+    return (first != NO_ALLELE) & (second != NO_ALLELE)
+
+
+def is_homozygous(codes):
+    """True for diploid calls with identical alleles."""
+    first, second = split_alleles(codes)
+    return (first == second) & (second != NO_ALLELE)
+
+
+def is_heterozygous(codes):
+    """True for diploid calls with different alleles."""
+    first, second = split_alleles(codes)
+    return (first != second) & (first != NO_ALLELE) & (second != NO_ALLELE)
+
+
+def allele_counts(codes, allele):
+    """
+    Count copies of ``allele`` in each genotype.
+
+    Args:
+        codes: Packed genotype codes.
+        allele: An allele symbol (``'A'``, ``'C'``, ...).
+
+    Returns:
+        An int8 array of 0, 1 or 2 per row.
+    """
+    target = ALLELE_CODES.get(allele)
+    first, second = split_alleles(codes)
+    if target is None:
+        return np.zeros(len(first), dtype=np.int8)
+    return (first == target).astype(np.int8) + (second == target).astype(np.int8)
+
+
+def effect_allele_counts(codes, effect):
+    """Like :func:`allele_counts`, but with one allele code per row (``effect``)."""
+    first, second = split_alleles(codes)
+    return (first == effect).astype(np.int8) + (second == effect).astype(np.int8)
+
+
+def complement_alleles(alleles):
+    """Strand-complement allele codes (A<->T, C<->G, others unchanged)."""
+    return _COMPLEMENT[np.asarray(alleles, dtype=np.uint8)]
+
+
+def complement(codes):
+    """Strand-complement packed genotypes (A<->T, C<->G) without changing allele order."""
+    first, second = split_alleles(codes)
+    return _COMPLEMENT[first] << 3 | _COMPLEMENT[second]
+
+
+def strand_matches(codes, effect, other):
+    """
+    Match genotypes to their rows' alleles on either strand.
+
+    A genotype must be made of the row's effect and other alleles; otherwise,
+    for non-palindromic SNPs, the strand-flipped genotype is tried.  Rows
+    whose other allele is unknown (``NO_ALLELE``) match as they are.
+
+    Args:
+        codes: Packed genotype codes.
+        effect: Allele code of the counted allele, per row.
+        other: Allele code of the other allele, per row.
+
+    Returns:
+        ``(direct, flipped)`` masks: genotypes matching as reported, and
+        genotypes matching only once strand-flipped.
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    known_other = other != NO_ALLELE
+
+    def fits(codes):
+        first, second = split_alleles(codes)
+        first_ok = (first == effect) | (first == other)
+        second_ok = (second == effect) | (second == other) | (second == NO_ALLELE)
+        return ~known_other | (first_ok & second_ok)
+
+    direct = fits(codes)
+    # A/T and C/G SNPs read the same on both strands, so they are never flipped
+    palindromic = (effect < 4) & (other == _COMPLEMENT[effect])
+    return direct, ~direct & ~palindromic & fits(complement(codes))
+
+
+def harmonised_allele_counts(codes, effect, other):
+    """
+    Count an effect allele per genotype after strand harmonisation.
+
+    See :func:`strand_matches` for how genotypes are matched to the row's
+    alleles; :func:`utils.strand.harmonise_codes` adds ambiguous-site
+    handling on top.
+
+    Args:
+        codes: Packed genotype codes.
+        effect: Allele code of the counted allele, per row.
+        other: Allele code of the other allele, per row.
+
+    Returns:
+        ``(counts, usable)``: int8 counts and a mask of the genotypes that
+        could be matched to their row's alleles.
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    direct, flipped = strand_matches(codes, effect, other)
+    harmonised = np.where(flipped, complement(codes), codes)
+    counts = effect_allele_counts(harmonised, effect)
+    return counts, (direct | flipped) & (effect != NO_ALLELE)
+
+
+def sort_alleles(codes):
+    """Order the two alleles of each genotype as ``''.join(sorted(genotype))`` would."""
+    first, second = split_alleles(codes)
+    swap = (_ASCII_RANK[first] > _ASCII_RANK[second]) & (second != NO_ALLELE)
+    return np.where(swap, second << 3 | first, first << 3 | second).astype(np.uint8)
+
+
+# Optional VCF fields: store attribute -> frame column
+VCF_FIELDS = {'refs': 'ref', 'alts': 'alt', 'gts': 'gt', 'dosages': 'dosage'}
+
+
+class GenotypeStore:
+    """
+    Columnar, compact in-memory genome.
+
+    Use :meth:`to_frame` to get the DataFrame view the analyzers expose as
+    ``self.data``; its columns are built straight from the store's arrays.
+    """
+
+    def __init__(self, rsids, chromosomes, positions, genotypes,
+                 refs=None, alts=None, gts=None, dosages=None, unencoded=None):
+        self.rsids = np.asarray(rsids, dtype=np.int64)
+        self.chromosomes = pd.Categorical(chromosomes)
+        self.positions = np.asarray(positions, dtype=np.int32)
+        self.genotypes = np.asarray(genotypes, dtype=np.uint8)
+        self.refs = pd.Categorical(refs) if refs is not None else None
+        self.alts = pd.Categorical(alts) if alts is not None else None
+        self.gts = pd.Categorical(gts) if gts is not None else None
+        self.dosages = np.asarray(dosages, dtype=np.int8) if dosages is not None else None
+        self.unencoded = np.asarray(unencoded, dtype=np.int8) if unencoded is not None else None
+
+    @classmethod
+    def from_frame(cls, data):
+        """Build a store from a parsed frame with rsid/chromosome/position/genotype columns."""
+        vcf_fields = {attr: data[column] for attr, column in VCF_FIELDS.items() if column in data.columns}
+        genotypes, unencoded = pack_genotypes(data['genotype'])
+        return cls(
+            encode_rsids(data['rsid']),
+            data['chromosome'].astype(str),
+            data['position'].to_numpy(),
+            genotypes,
+            unencoded=unencoded,
+            **vcf_fields,
+        )
+
+    @classmethod
+    def concat(cls, stores):
+        """Concatenate stores (e.g. parsed chunks) in order."""
+        stores = list(stores)
+        if not stores:
+            return cls([], [], [], [])
+        if len(stores) == 1:
+            return stores[0]
+
+        def union(attr):
+            return union_categoricals([getattr(s, attr) for s in stores], sort_categories=True)
+
+        vcf_fields = {}
+        if all(s.has_vcf_fields for s in stores):
+            vcf_fields = {attr: union(attr) for attr in ('refs', 'alts', 'gts')}
+            vcf_fields['dosages'] = np.concatenate([s.dosages for s in stores])
+
+        unencoded = None
+        if any(s.unencoded is not None for s in stores):
+            unencoded = np.concatenate([s.unencoded if s.unencoded is not None else np.zeros(len(s), dtype=np.int8)
+                                        for s in stores])
+
+        return cls(
+            np.concatenate([s.rsids for s in stores]),
+            union('chromosomes'),
+            np.concatenate([s.positions for s in stores]),
+            np.concatenate([s.genotypes for s in stores]),
+            unencoded=unencoded,
+            **vcf_fields,
+        )
+
+    def __len__(self):
+        return len(self.rsids)
+
+    @property
+    def has_vcf_fields(self):
+        """Whether REF/ALT/GT/dosage columns are present (genomes read from a VCF)."""
+        return self.gts is not None
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the store's arrays."""
+        total = (self.rsids.nbytes + self.chromosomes.codes.nbytes
+                 + self.positions.nbytes + self.genotypes.nbytes)
+        if self.has_vcf_fields:
+            total += self.refs.codes.nbytes + self.alts.codes.nbytes + self.gts.codes.nbytes + self.dosages.nbytes
+        if self.unencoded is not None:
+            total += self.unencoded.nbytes
+        return total
+
+    def filter(self, mask):
+        """Return a new store with only the rows where ``mask`` is True."""
+        vcf_fields = {}
+        if self.has_vcf_fields:
+            vcf_fields = {attr: getattr(self, attr)[mask].remove_unused_categories() for attr in ('refs', 'alts', 'gts')}
+            vcf_fields['dosages'] = self.dosages[mask]
+        return GenotypeStore(
+            self.rsids[mask],
+            self.chromosomes[mask].remove_unused_categories(),
+            self.positions[mask],
+            self.genotypes[mask],
+            unencoded=self.unencoded[mask] if self.unencoded is not None else None,
+            **vcf_fields,
+        )
+
+    def genotype_strings(self):
+        """Genotypes as a Categorical of strings."""
+        return decode_genotypes(self.genotypes)
+
+    def to_frame(self):
+        """
+        DataFrame view with the classic column names.
+
+        ``rsid`` holds the int64 keys, ``chromosome`` and ``genotype`` are
+        categoricals and ``position`` is int32.  VCF genomes also get
+        ``ref``, ``alt``, ``gt`` and ``dosage`` columns.
+        """
+        columns = {
+            'rsid': self.rsids,
+            'chromosome': self.chromosomes,
+            'position': self.positions,
+            'genotype': self.genotype_strings(),
+        }
+        if self.has_vcf_fields:
+            columns.update({column: getattr(self, attr) for attr, column in VCF_FIELDS.items()})
+        return pd.DataFrame(columns, copy=False)
@@ -0,0 +1,123 @@
+"""
+Sorted integer-rsid index over a loaded genome.
+
+Knowledge-base lookups used to run ``data[data['rsid'] == rsid]`` for every
+panel entry, a full scan of the genome per variant.  The index is built once
+after loading: rsids are encoded as integers, argsorted, and batched lookups
+become a single ``np.searchsorted`` call.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def encode_rsids(rsids):
+    """
+    Encode rsid strings as int64 keys.
+
+    ``rs123`` maps to ``123`` and 23andMe internal ids such as ``i3000001``
+    map to ``-3000001``.  Anything else (e.g. ``.`` in a VCF) maps to ``0``,
+    which is never a valid key.
+
+    Args:
+        rsids: An iterable or Series of rsid strings.
+
+    Returns:
+        A NumPy int64 array with one key per input id.
+    """
+    ids = pd.Series(rsids, copy=False).astype(str)
+    keys = np.zeros(len(ids), dtype=np.int64)
+
+    for prefix, sign in (('rs', 1), ('i', -1)):
+        mask = ids.str.startswith(prefix).to_numpy()
+        if mask.any():
+            numbers = pd.to_numeric(ids[mask].str.slice(len(prefix)), errors='coerce')
+            keys[mask] = sign * numbers.fillna(0).to_numpy(dtype=np.int64)
+
+    return keys
+
+
+def decode_rsid(key):
+    """Convert an int64 key produced by :func:`encode_rsids` back to a string."""
+    if key > 0:
+        return f"rs{key}"
+    if key < 0:
+        return f"i{-key}"
+    return '.'
+
+
+class GenotypeIndex:
+    """
+    Batched rsid -> row lookup over a genome.
+
+    Duplicated rsids resolve to their first occurrence in file order, matching
+    the ``variant_data.iloc[0]`` behaviour of the per-variant scans it replaces.
+    """
+
+    def __init__(self, rsid_keys, genotypes):
+        rsid_keys = np.asarray(rsid_keys, dtype=np.int64)
+        self._rows = np.argsort(rsid_keys, kind='stable')
+        self._keys = rsid_keys[self._rows]
+        # Any positionally indexable column works (NumPy array, Categorical)
+        self._genotypes = genotypes
+
+    @classmethod
+    def from_frame(cls, data):
+        """Build an index from a DataFrame with ``rsid`` and ``genotype`` columns."""
+        return cls(encode_rsids(data['rsid']), data['genotype'].to_numpy())
+
+    @classmethod
+    def from_store(cls, store):
+        """Build an index over a :class:`utils.genome_store.GenotypeStore`."""
+        return cls(store.rsids, store.genotype_strings())
+
+    def __len__(self):
+        return len(self._keys)
+
+    def lookup_rows(self, rsids):
+        """
+        Find the row position of each rsid.
+
+        Args:
+            rsids: An iterable of rsid strings.
+
+        Returns:
+            An int64 array of row positions, ``-1`` where the rsid is absent.
+        """
+        return self.lookup_keys(encode_rsids(list(rsids)))
+
+    def lookup_keys(self, keys):
+        """
+        Find the row position of each already-encoded key.
+
+        Args:
+            keys: An int64 array of keys; ``0`` never matches.
+
+        Returns:
+            An int64 array of row positions, ``-1`` where the key is absent.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if not len(self._keys):
+            return rows
+
+        pos = np.minimum(np.searchsorted(self._keys, keys, side='left'), len(self._keys) - 1)
+        found = (self._keys[pos] == keys) & (keys != 0)
+        rows[found] = self._rows[pos[found]]
+        return rows
+
+    def get_genotypes(self, rsids, keys=None):
+        """
+        Look up the genotypes of many rsids at once.
+
+        Args:
+            rsids: An iterable of rsid strings (a panel dict works directly).
+            keys: Optional int64 keys of ``rsids`` already encoded (e.g. by
+                the compiled knowledge base), to skip parsing the strings.
+
+        Returns:
+            A dict mapping each rsid present in the genome to its genotype.
+        """
+        rsids = list(rsids)
+        rows = self.lookup_rows(rsids) if keys is None else self.lookup_keys(keys)
+        return {rsid: self._genotypes[row] for rsid, row in zip(rsids, rows) if row >= 0}
@@ -0,0 +1,352 @@
+"""
+Compiled, versioned knowledge base shared by every analyzer in a process.
+
+The variant panels are authored as the ``_initialize_*`` methods of
+``genetic_analyzer_ultra.AdvancedGeneticAnalyzer``.  A :class:`KnowledgeBase`
+holds:
+
+* the panel dicts themselves;
+* the tags they were built with: ``versioning.ANALYSIS_VERSION``,
+  ``versioning.DB_VERSIONS``, the artifact format and the SHA-256 of the
+  source file (its content, so a checkout or copy does not make it stale);
+* pre-built indexes: every panel flattened to ``(group, rsid, info)``
+  entries, and the union of all panel rsids with its int64 keys, so the
+  per-sample join (:class:`utils.panels.PanelJoin`) does no flattening or
+  rsid parsing;
+* outcome tables (:class:`OutcomeTable`) for the panels with a genotype
+  interpreter: the interpretation of every possible genotype of every
+  entry, computed once by the analyzer's own ``_interpret_*`` functions, so
+  interpreting a sample, or a whole cohort, is an array lookup.
+
+The artifact, ``data/knowledge_base.json`` in the repository, stores only
+the panels and tags as plain JSON; the indexes and outcome tables are
+rebuilt when it is loaded.  Nothing in it is executable, so a planted file
+can at worst fail to parse or carry stale tags.
+
+:func:`load_shared` reads the artifact once per process, or compiles the
+panels in memory when it is missing or its tags no longer match, and every
+analyzer instance then references the same read-only object.  Only
+``genetic_analyzer_ultra.py --build-knowledge-base`` (:func:`build`) writes
+the artifact, through a temporary file and an atomic rename, so analyzers
+and batch workers never see a half-written one.
+"""
+
+import functools
+import json
+import os
+import tempfile
+
+import numpy as np
+
+import versioning
+from utils import genome_store
+from utils.genome_cache import file_sha256
+from utils.genotype_index import GenotypeIndex, encode_rsids
+from utils.panels import flatten_panel
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Resolved against the repository, never the working directory
+DEFAULT_PATH = os.path.join(REPO_DIR, 'data', 'knowledge_base.json')
+
+# Where the panels are defined; its content hash tells whether an artifact is stale
+SOURCE_PATH = os.path.join(REPO_DIR, 'genetic_analyzer_ultra.py')
+
+FORMAT_VERSION = 4
+
+# JSON has no tuples; panels use them (e.g. ``ci_95``) and so do the tags
+_TUPLE_KEY = '__tuple__'
+
+# Genotype codes whose alleles are in canonical (sorted) order; an outcome
+# table has a column for every packed code but only these are looked up
+CANONICAL_CODES = np.flatnonzero(genome_store.sort_alleles(np.arange(64, dtype=np.uint8)) == np.arange(64))
+_CATEGORY_STRINGS = np.array(genome_store.GENOTYPE_CATEGORIES, dtype=object)
+
+# Below this many genotypes, encoding them one by one beats pandas' factorize
+_SMALL_LOOKUP = 256
+
+
+@functools.lru_cache(maxsize=None)
+def _canonical_code(genotype):
+    """``(canonical code, exact)`` of one genotype string, see :meth:`OutcomeTable.genotype_codes`."""
+    code = genome_store.encode_genotypes([genotype])[0]
+    return int(genome_store.sort_alleles([code])[0]), genome_store.GENOTYPE_CATEGORIES[code] == genotype
+
+# Knowledge bases already loaded by this process, keyed by artifact path
+_shared = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _source_digest(path):
+    """SHA-256 of the panel source, read once per process; ``None`` if it is missing."""
+    try:
+        return file_sha256(path)
+    except OSError:
+        return None
+
+
+def current_tags():
+    """The tags an up-to-date artifact must carry."""
+    return {
+        'format_version': FORMAT_VERSION,
+        'analysis_version': versioning.ANALYSIS_VERSION,
+        'db_versions': dict(versioning.DB_VERSIONS),
+        'source_sha256': _source_digest(SOURCE_PATH),
+    }
+
+
+def _encode_tuples(value):
+    """Copy of ``value`` with every tuple wrapped as ``{_TUPLE_KEY: [...]}``, for :func:`json.dump`."""
+    if isinstance(value, tuple):
+        return {_TUPLE_KEY: [_encode_tuples(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode_tuples(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode_tuples(item) for key, item in value.items()}
+    return value
+
+
+def _decode_tuples(obj):
+    """``object_hook`` for :func:`json.load` undoing :func:`_encode_tuples`."""
+    if len(obj) == 1 and _TUPLE_KEY in obj:
+        return tuple(obj[_TUPLE_KEY])
+    return obj
+
+
+def dosage_allele(variant_info):
+    """
+    The allele an outcome table's ``dosages`` count for one entry.
+
+    ``risk_allele`` when present, otherwise the first ``*_allele`` key of the
+    entry (panels list the allele an interpreter counts first, e.g.
+    ``taster_allele`` before ``non_taster_allele``); ``None`` if there is none.
+    """
+    if not isinstance(variant_info, dict):
+        return None
+    if 'risk_allele' in variant_info:
+        return variant_info['risk_allele']
+    return next((value for key, value in variant_info.items() if key.endswith('_allele')), None)
+
+
+class OutcomeTable:
+    """
+    Precomputed ``(entry, genotype) -> outcome`` table of one panel.
+
+    Rows follow the panel's flattened entries; columns are the 64 packed
+    genotype codes of :mod:`utils.genome_store`, filled for the canonical
+    (allele-sorted) ones.  Alongside the interpreter's outcome (a phenotype
+    string, or the risk dict of ``_calculate_variant_risk``) the table holds
+    the dosage of :func:`dosage_allele` and, where the outcome carries them,
+    the relative risk and its 95% CI as float arrays.
+    """
+
+    def __init__(self, entries, interpret):
+        """
+        Args:
+            entries: Flattened ``(group, rsid, info)`` panel entries.
+            interpret: ``interpret(genotype, info)``, the analyzer's interpreter.
+                Cells where it raises are left ``None`` and interpreted live,
+                so the error surfaces at analysis time as before.
+        """
+        shape = (len(entries), 64)
+        self.outcomes = np.full(shape, None, dtype=object)
+        self.dosages = np.full(shape, -1, dtype=np.int8)
+        self.relative_risk = np.full(shape, np.nan)
+        self.ci_low = np.full(shape, np.nan)
+        self.ci_high = np.full(shape, np.nan)
+        for row, (_, _, info) in enumerate(entries):
+            allele = dosage_allele(info)
+            if allele is not None:
+                self.dosages[row] = genome_store.allele_counts(np.arange(64, dtype=np.uint8), allele)
+            for code in CANONICAL_CODES:
+                try:
+                    outcome = interpret(genome_store.GENOTYPE_CATEGORIES[code], info)
+                except Exception:  # noqa: BLE001 (re-raised by the live fallback)
+                    continue
+                self.outcomes[row, code] = outcome
+                if isinstance(outcome, dict):
+                    if outcome.get('relative_risk') is not None:
+                        self.relative_risk[row, code] = outcome['relative_risk']
+                    if outcome.get('relative_risk_ci_95'):
+                        self.ci_low[row, code], self.ci_high[row, code] = outcome['relative_risk_ci_95']
+
+    @staticmethod
+    def genotype_codes(genotypes):
+        """
+        Canonical codes of genotype strings, and which ones the table covers.
+
+        Returns:
+            ``(codes, exact)``: allele-sorted packed codes, and a mask that is
+            False for strings the packed encoding cannot represent exactly
+            (e.g. multi-base VCF alleles), which need a live interpretation.
+        """
+        genotypes = np.asarray(genotypes, dtype=object)
+        if genotypes.size <= _SMALL_LOOKUP:
+            pairs = [_canonical_code(genotype) for genotype in genotypes.ravel()]
+            codes = np.array([code for code, _ in pairs], dtype=np.uint8).reshape(genotypes.shape)
+            return codes, np.array([exact for _, exact in pairs], dtype=bool).reshape(genotypes.shape)
+        raw = genome_store.encode_genotypes(genotypes.ravel()).reshape(genotypes.shape)
+        exact = _CATEGORY_STRINGS[raw] == genotypes
+        return genome_store.sort_alleles(raw.ravel()).reshape(genotypes.shape), exact
+
+    def lookup(self, entries, codes):
+        """
+        Outcomes of many (entry, genotype) pairs in one fancy-indexing step.
+
+        ``entries`` and ``codes`` broadcast against each other: pass two 1-d
+        arrays for one sample's joined panel, or an ``(n_entries,)`` entry
+        array with an ``(n_samples, n_entries)`` code matrix for a cohort.
+
+        Returns:
+            An object array of outcomes (``None`` where not precomputed).
+        """
+        return self.outcomes[np.asarray(entries, dtype=np.int64), np.asarray(codes, dtype=np.int64)]
+
+
+class KnowledgeBase:
+    """Variant panels plus the rsid indexes and outcome tables built from them."""
+
+    def __init__(self, panels, nested, tags, interpreters=None):
+        """
+        Args:
+            panels: A dict of panel name -> panel dict.
+            nested: A dict of panel name -> whether the panel is nested by
+                gene/score (``AdvancedGeneticAnalyzer.KNOWLEDGE_BASE_PANELS``).
+            tags: Version tags, see :func:`current_tags`.
+            interpreters: Optional dict of panel name -> ``interpret(genotype,
+                info)``; an :class:`OutcomeTable` is built for each.
+        """
+        self.panels = panels
+        self.nested = dict(nested)
+        self.tags = tags
+        self.entries = {name: list(flatten_panel(panel, self.nested[name])) for name, panel in panels.items()}
+        self.entry_keys = {name: encode_rsids([rsid for _, rsid, _ in entries]) for name, entries in self.entries.items()}
+        union = sorted({rsid for entries in self.entries.values() for _, rsid, _ in entries})
+        self.union_rsids = union
+        self.union_keys = encode_rsids(union)
+        self.outcomes = {name: OutcomeTable(self.entries[name], interpret)
+                         for name, interpret in (interpreters or {}).items()}
+
+    def __getitem__(self, name):
+        return self.panels[name]
+
+    def __contains__(self, name):
+        return name in self.panels
+
+    def keys(self):
+        return self.panels.keys()
+
+    def is_current(self):
+        return self.tags == current_tags()
+
+    def cohort_outcomes(self, name, stores):
+        """
+        Interpret a panel for a whole cohort with one table lookup.
+
+        Args:
+            name: A panel with an outcome table.
+            stores: :class:`utils.genome_store.GenotypeStore` objects, one per sample.
+
+        Returns:
+            ``(outcomes, dosages)``: ``(n_samples, n_entries)`` arrays in the
+            panel's entry order; outcomes are ``None`` and dosages -1 where the
+            sample lacks the variant.
+        """
+        table = self.outcomes[name]
+        keys = self.entry_keys[name]
+        codes = np.full((len(stores), len(keys)), genome_store.EMPTY_GENOTYPE, dtype=np.uint8)
+        present = np.zeros(codes.shape, dtype=bool)
+        for sample, store in enumerate(stores):
+            rows = GenotypeIndex(store.rsids, store.genotypes).lookup_keys(keys)
+            present[sample] = rows >= 0
+            codes[sample, present[sample]] = store.genotypes[rows[present[sample]]]
+
+        codes = genome_store.sort_alleles(codes.ravel()).reshape(codes.shape)
+        entries = np.arange(len(keys))
+        outcomes = np.where(present, table.lookup(entries, codes), None)
+        dosages = np.where(present, table.dosages[entries, codes], -1).astype(np.int8)
+        return outcomes, dosages
+
+    def save(self, path=DEFAULT_PATH):
+        """
+        Write the artifact (panels and tags) as JSON; indexes are rebuilt on load.
+
+        The file is written beside ``path`` and renamed over it, so readers
+        see either the old artifact or the complete new one.
+        """
+        artifact = {'tags': self.tags, 'nested': self.nested, 'panels': self.panels}
+        fd, staging = tempfile.mkstemp(prefix='.knowledge_base-', suffix='.tmp',
+                                       dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(_encode_tuples(artifact), f)
+            os.replace(staging, path)
+        except BaseException:
+            os.unlink(staging)
+            raise
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        """
+        Read an artifact written by :meth:`save`.
+
+        Returns:
+            The :class:`KnowledgeBase`, or ``None`` if ``path`` is missing or unreadable.
+        """
+        try:
+            with open(path) as f:
+                artifact = json.load(f, object_hook=_decode_tuples)
+            panels, nested, tags = artifact['panels'], artifact['nested'], artifact['tags']
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        if not (isinstance(panels, dict) and isinstance(nested, dict) and isinstance(tags, dict)):
+            return None
+        try:
+            return _from_panels(panels, nested, tags)
+        except (KeyError, TypeError, AttributeError, ValueError):
+            return None
+
+
+def _from_panels(panels, nested, tags):
+    """A :class:`KnowledgeBase` over ``panels`` with the analyzer's interpreters."""
+    from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+    return KnowledgeBase(panels, nested, tags, AdvancedGeneticAnalyzer.panel_interpreters())
+
+
+def compile_knowledge_base():
+    """Build a :class:`KnowledgeBase` from the panel definitions in the analyzer."""
+    from genetic_analyzer_ultra import AdvancedGeneticAnalyzer
+    return _from_panels(AdvancedGeneticAnalyzer.compile_panels(), AdvancedGeneticAnalyzer.KNOWLEDGE_BASE_PANELS,
+                        current_tags())
+
+
+def build(path=DEFAULT_PATH):
+    """Compile the knowledge base and write the artifact to ``path``."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    knowledge_base = compile_knowledge_base()
+    knowledge_base.save(path)
+    _shared[os.path.abspath(path)] = knowledge_base
+    return knowledge_base
+
+
+def load_shared(path=DEFAULT_PATH):
+    """
+    The process-wide knowledge base.
+
+    Loads the artifact at ``path`` on first use.  If it is missing or its
+    tags do not match the current code and database versions, the panels
+    are compiled in memory instead; the artifact is left as it is (rebuild
+    it with :func:`build`).  Later calls return the same object; callers
+    must treat it as read-only.
+    """
+    key = os.path.abspath(path)
+    if key in _shared:
+        return _shared[key]
+
+    knowledge_base = KnowledgeBase.load(path)
+    if knowledge_base is None or not knowledge_base.is_current():
+        knowledge_base = compile_knowledge_base()
+    _shared[key] = knowledge_base
+    return knowledge_base
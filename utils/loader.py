@@ -0,0 +1,190 @@
+"""
+Single-pass loader for raw consumer genotype files (23andMe format or VCF).
+
+The header comment lines are consumed one at a time to collect metadata, and
+the remaining body is handed straight to the pandas C parser from the open
+file handle, so the file is never materialised as a list of lines or a
+joined string before parsing.  VCF bodies go through the streaming reader in
+:mod:`utils.vcf`.
+
+gzip, BGZF (``.vcf.gz``) and single-member zip archives (the 23andMe
+download) are recognised by their magic bytes and decompressed as a stream
+into the same parser, without temporary files.
+"""
+
+import gzip
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from utils import vcf
+
+COLUMNS = ['rsid', 'chromosome', 'position', 'genotype']
+
+# Explicit dtypes keep the C parser from sniffing every column
+DTYPES = {
+    'rsid': str,
+    'chromosome': str,
+    'position': np.int64,
+    'genotype': str,
+}
+
+# Rows per chunk when callers stream the body (e.g. into a GenotypeStore)
+DEFAULT_CHUNKSIZE = 500_000
+# Smaller chunks when each one is filtered down to a few hundred loci
+TARGETED_CHUNKSIZE = 50_000
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+def detect_compression(filename):
+    """
+    Identify the container of a raw data file from its leading bytes.
+
+    Returns:
+        ``'bgzf'``, ``'gzip'``, ``'zip'`` or ``None`` for plain text.
+    """
+    with open(filename, 'rb') as f:
+        head = f.read(16)
+    if head.startswith(GZIP_MAGIC):
+        # BGZF is gzip with a 'BC' extra subfield in every block header
+        has_extra = len(head) > 3 and head[3] & 0x04
+        return 'bgzf' if has_extra and head[12:14] == b'BC' else 'gzip'
+    if head.startswith(ZIP_MAGIC):
+        return 'zip'
+    return None
+
+
+def _zip_member(archive):
+    """The single data file inside a zip archive (macOS resource forks are ignored)."""
+    members = [info for info in archive.infolist()
+               if not info.is_dir() and not info.filename.startswith('__MACOSX/')]
+    if len(members) != 1:
+        raise ValueError(f"Expected one data file in zip archive, found {len(members)}")
+    return members[0]
+
+
+def open_text(filename, compression=None):
+    """
+    Open a raw data file for reading as text, decompressing on the fly.
+
+    Args:
+        filename: Path to a plain, gzip/BGZF-compressed or zipped file.
+        compression: Result of :func:`detect_compression`; detected if omitted.
+
+    Returns:
+        A text file object positioned at the start of the data.
+    """
+    if compression is None:
+        compression = detect_compression(filename)
+
+    if compression in ('gzip', 'bgzf'):
+        # BGZF is a series of gzip members, which GzipFile reads back to back
+        return gzip.open(filename, 'rt')
+    if compression == 'zip':
+        with zipfile.ZipFile(filename) as archive:
+            # The member stream keeps the archive file open after the with block
+            member = archive.open(_zip_member(archive))
+        return io.TextIOWrapper(member)
+    return open(filename, 'r')
+
+
+def is_vcf(filename):
+    """True if the (possibly compressed) file starts with a VCF ``##fileformat`` line."""
+    with open_text(filename) as f:
+        return f.readline().startswith('##fileformat=VCF')
+
+
+def parse_header_line(line, metadata):
+    """
+    Update ``metadata`` in place from a single ``#`` header line.
+
+    Recognises the source (with generation date), reference build and array
+    version lines written by 23andMe.
+    """
+    if 'generated by 23andMe' in line:
+        metadata['source'] = '23andMe'
+        if 'at:' in line:
+            metadata['generation_date'] = line.split('at:', 1)[1].strip()
+    elif 'reference human assembly build' in line:
+        metadata['build'] = 'GRCh38/hg38' if 'build 38' in line.lower() else 'GRCh37/hg19'
+    elif 'array' in line.lower():
+        metadata['array'] = line.strip()
+
+
+def iter_raw_genotypes(filename, metadata, chunksize=None):
+    """
+    Parse a raw genotype file, yielding the body in chunks.
+
+    Args:
+        filename: Path to a 23andMe raw data file or a single-sample VCF,
+            optionally gzip/BGZF-compressed or zipped.
+        metadata: Dict filled with the header fields found; it is complete
+            before the first chunk is yielded.
+        chunksize: Rows per chunk.  ``None`` yields the whole 23andMe body as
+            one frame; VCF bodies are always streamed.
+
+    Yields:
+        DataFrames with the columns ``rsid``, ``chromosome``, ``position`` and
+        ``genotype`` (VCF chunks also carry ``ref``, ``alt``, ``gt`` and
+        ``dosage``, see :mod:`utils.vcf`).
+    """
+    compression = detect_compression(filename)
+    if compression:
+        metadata['compression'] = compression
+
+    with open_text(filename, compression) as f:
+        # Consume the leading comment block, remembering where the body starts
+        body_start = f.tell()
+        line = f.readline()
+        while line.startswith('#'):
+            if line.startswith('##fileformat=VCF'):
+                metadata['format'] = 'VCF'
+            if metadata.get('format') == 'VCF':
+                vcf.parse_header_line(line, metadata)
+            else:
+                parse_header_line(line, metadata)
+            body_start = f.tell()
+            line = f.readline()
+
+        f.seek(body_start)
+        if metadata.get('format') == 'VCF':
+            yield from vcf.read_vcf_body(f, chunksize or vcf.DEFAULT_CHUNKSIZE)
+            return
+
+        metadata.setdefault('format', '23andMe')
+
+        # Some exports carry an uncommented column header line
+        if line.lower().startswith('rsid'):
+            f.readline()
+
+        reader = pd.read_csv(f, sep='\t', header=None, names=COLUMNS,
+                             dtype=DTYPES, na_filter=False, engine='c', chunksize=chunksize)
+        if chunksize is None:
+            yield reader
+        else:
+            yield from reader
+
+
+def read_raw_genotypes(filename):
+    """
+    Read a raw genotype file in one pass.
+
+    Args:
+        filename: Path to a tab-delimited 23andMe raw data file or a VCF,
+            optionally compressed (see :func:`open_text`).
+
+    Returns:
+        A tuple ``(data, metadata)`` where ``data`` is a DataFrame with the
+        columns ``rsid``, ``chromosome``, ``position`` and ``genotype`` and
+        ``metadata`` is a dict of the header fields found.
+    """
+    metadata = {}
+    chunks = list(iter_raw_genotypes(filename, metadata))
+    if not chunks:
+        return pd.DataFrame(columns=vcf.OUTPUT_COLUMNS), metadata
+    data = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    return data, metadata
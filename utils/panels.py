@@ -0,0 +1,107 @@
+"""
+Batched knowledge-base join.
+
+Every knowledge-base panel (``known_variants``, ``fascinating_traits``, the
+pharmacogenomic genes, the PRS definitions, ...) is flattened to
+``(group, rsid, info)`` entries, the rsids of all panels are unioned, and the
+union is looked up against the sample's genotype index once.  Each analysis
+stage then receives a small pre-joined table of the variants it cares about
+instead of doing its own lookups.
+"""
+
+import pandas as pd
+
+# 'entry' is the row's position in the flattened panel (see utils.knowledge_artifact)
+TABLE_COLUMNS = ['group', 'rsid', 'genotype', 'info', 'entry']
+
+
+def flatten_panel(panel, nested=False):
+    """
+    Yield ``(group, rsid, info)`` for every variant of a panel.
+
+    Args:
+        panel: A dict of rsid -> info, or for nested panels a dict of
+            group -> {'variants': {rsid: info}, ...} (pharmacogenomic genes,
+            polygenic scores).
+        nested: Whether ``panel`` is of the nested form.
+    """
+    if nested:
+        for group, group_info in panel.items():
+            for rsid, info in group_info.get('variants', {}).items():
+                yield group, rsid, info
+    else:
+        for rsid, info in panel.items():
+            yield None, rsid, info
+
+
+def _build_table(entries, genotypes):
+    rows = [(group, rsid, genotypes[rsid], info, entry)
+            for entry, (group, rsid, info) in enumerate(entries) if rsid in genotypes]
+    return pd.DataFrame(rows, columns=TABLE_COLUMNS)
+
+
+class PanelJoin:
+    """
+    Knowledge-base panels joined against one sample's genotypes.
+
+    Tables keep the panel's own ordering and hold references to the panel's
+    info dicts.  If a panel attribute is rebound after the join (for example
+    a test swapping in a mock database), the next :meth:`table` call notices
+    the new object and joins just that panel again.
+    """
+
+    def __init__(self, index, panels, compiled=None):
+        """
+        Args:
+            index: A :class:`utils.genotype_index.GenotypeIndex`.
+            panels: A dict of panel name -> ``(panel_dict, nested)``.
+            compiled: Optional :class:`utils.knowledge_artifact.KnowledgeBase`
+                whose pre-flattened entries and pre-encoded rsid keys are used
+                for the panels it holds.
+        """
+        self._index = index
+        self._sources = {}
+        self._tables = {}
+
+        entries = {}
+        for name, (panel, nested) in panels.items():
+            if compiled is not None and name in compiled and compiled[name] is panel:
+                entries[name] = compiled.entries[name]
+            else:
+                entries[name] = list(flatten_panel(panel, nested))
+
+        if index is None:
+            genotypes = {}
+        elif compiled is not None and all(entries[name] is compiled.entries.get(name) for name in entries):
+            genotypes = index.get_genotypes(compiled.union_rsids, compiled.union_keys)
+        else:
+            genotypes = index.get_genotypes({rsid for panel_entries in entries.values() for _, rsid, _ in panel_entries})
+
+        for name, (panel, _) in panels.items():
+            self._sources[name] = panel
+            self._tables[name] = _build_table(entries[name], genotypes)
+
+    def table(self, name, panel, nested=False, group=None):
+        """
+        Pre-joined rows of a panel present in the sample.
+
+        Args:
+            name: Panel name used as the cache key.
+            panel: The panel dict currently in use.
+            nested: Whether ``panel`` is nested by gene/score.
+            group: For nested panels, restrict to one gene or score.
+
+        Returns:
+            A DataFrame with ``group``, ``rsid``, ``genotype``, ``info`` and
+            ``entry`` columns, in panel order.
+        """
+        if self._sources.get(name) is not panel:
+            entries = list(flatten_panel(panel, nested))
+            genotypes = self._index.get_genotypes(rsid for _, rsid, _ in entries) if self._index is not None else {}
+            self._sources[name] = panel
+            self._tables[name] = _build_table(entries, genotypes)
+
+        table = self._tables[name]
+        if group is not None:
+            table = table[table['group'] == group]
+        return table
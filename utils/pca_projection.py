@@ -0,0 +1,154 @@
+"""
+Projection of genomes onto precomputed reference principal components.
+
+A projection panel (``data/1000g_loadings.npz``) holds, for each reference
+SNP, its rsid, the counted and other allele, the reference mean of the
+counted-allele dosage, an optional per-SNP scale (e.g. the
+``sqrt(2p(1-p))`` used when the reference PCA was run on standardised
+genotypes) and one loading per principal component.  The PCs it produces
+live in the same space as ``data/1000g_pca.npy``, which the ancestry
+classifier in :mod:`utils.ancestry` is fitted on.
+
+Projection is ``((dosage - mean) / scale) @ loadings``.  Sample alleles are
+aligned to the panel with strand flips in one vectorized pass, and SNPs the
+sample lacks are mean-imputed (they contribute zero after centring).  A
+cohort is projected with the same single matrix product over a samples x
+SNPs dosage matrix.
+"""
+
+import os
+
+import numpy as np
+
+from utils import genome_store
+from utils.genotype_index import GenotypeIndex, encode_rsids
+
+# Resolved against the repository, so projection does not depend on the working directory
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', '1000g_loadings.npz')
+
+# Fewer observed panel SNPs than this fraction and the projection is not trusted
+MIN_COVERAGE = 0.05
+
+MISSING = -1
+
+# Panels already read by this process, keyed by (path, mtime)
+_loaded = {}
+
+
+class ProjectionPanel:
+    """Reference SNP loadings and allele means for PCA projection."""
+
+    def __init__(self, rsids, alleles, other_alleles, means, loadings, scales=None):
+        """
+        Args:
+            rsids: Panel SNP ids (strings or int64 keys from :func:`encode_rsids`).
+            alleles: Counted allele per SNP (``'A'``, ``'C'``, ...).
+            other_alleles: Other allele per SNP.
+            means: Reference mean of the counted-allele dosage (``2p``).
+            loadings: ``(n_snps, n_pcs)`` SNP loadings.
+            scales: Optional per-SNP divisor applied after centring.
+        """
+        rsids = np.asarray(rsids)
+        self.keys = rsids.astype(np.int64) if rsids.dtype.kind in 'iu' else encode_rsids(rsids)
+        self.alleles = genome_store.encode_alleles(alleles)
+        self.other_alleles = genome_store.encode_alleles(other_alleles)
+        self.means = np.asarray(means, dtype=np.float64)
+        self.loadings = np.asarray(loadings, dtype=np.float64)
+        self.scales = np.ones(len(self.keys)) if scales is None else np.asarray(scales, dtype=np.float64)
+        # Monomorphic reference SNPs carry no information; keep them out of the product
+        self.weights = np.divide(self.loadings, self.scales[:, None], out=np.zeros_like(self.loadings),
+                                 where=self.scales[:, None] > 0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def n_components(self):
+        return self.loadings.shape[1]
+
+    @classmethod
+    def load(cls, path):
+        """Read a panel saved by :meth:`save` (or any ``.npz`` with the same arrays)."""
+        with np.load(path) as archive:
+            scales = archive['scales'] if 'scales' in archive.files else None
+            return cls(archive['rsids'], archive['alleles'], archive['other_alleles'],
+                       archive['means'], archive['loadings'], scales)
+
+    def save(self, path):
+        """Write the panel as a compressed ``.npz``."""
+        np.savez_compressed(
+            path,
+            rsids=self.keys,
+            alleles=np.array(genome_store.ALLELES)[self.alleles],
+            other_alleles=np.array(genome_store.ALLELES)[self.other_alleles],
+            means=self.means,
+            loadings=self.loadings,
+            scales=self.scales,
+        )
+
+    def dosages(self, store):
+        """
+        Counted-allele dosages of one genome in panel order.
+
+        Returns:
+            An int8 array with 0, 1 or 2 per panel SNP, ``MISSING`` where the
+            SNP is absent, a no-call, or not made of the panel's alleles on
+            either strand.
+        """
+        rows = GenotypeIndex(store.rsids, store.genotypes).lookup_keys(self.keys)
+        dosages = np.full(len(self.keys), MISSING, dtype=np.int8)
+        present = rows >= 0
+        counts, usable = genome_store.harmonised_allele_counts(
+            store.genotypes[rows[present]], self.alleles[present], self.other_alleles[present])
+        dosages[np.flatnonzero(present)[usable]] = counts[usable]
+        return dosages
+
+    def dosage_matrix(self, stores):
+        """Samples x panel SNPs int8 dosages for several genomes."""
+        return np.vstack([self.dosages(store) for store in stores]) if stores else \
+            np.empty((0, len(self.keys)), dtype=np.int8)
+
+    def project_many(self, dosages):
+        """
+        Project a samples x SNPs dosage matrix in one matrix product.
+
+        Missing dosages (``MISSING``) are mean-imputed.
+
+        Returns:
+            ``(pcs, coverage)``: an ``(n_samples, n_pcs)`` array, and the
+            fraction of panel SNPs observed per sample.  Rows with coverage
+            below ``MIN_COVERAGE`` are NaN.
+        """
+        dosages = np.atleast_2d(dosages)
+        observed = dosages != MISSING
+        centred = np.where(observed, dosages - self.means, 0.0)
+        pcs = centred @ self.weights
+        coverage = observed.mean(axis=1) if len(self.keys) else np.zeros(len(dosages))
+        pcs[coverage < MIN_COVERAGE] = np.nan
+        return pcs, coverage
+
+    def project(self, store):
+        """
+        Project one genome.
+
+        Returns:
+            ``(pcs, coverage)`` with ``pcs`` of shape ``(1, n_pcs)``, or
+            ``None`` instead of ``pcs`` if too few panel SNPs were observed.
+        """
+        pcs, coverage = self.project_many(self.dosages(store)[None, :])
+        return (None if np.isnan(pcs).any() else pcs), float(coverage[0])
+
+
+def load_cached(path=DEFAULT_PATH):
+    """
+    Load a projection panel once per process.
+
+    Returns:
+        A :class:`ProjectionPanel`, or ``None`` if ``path`` is missing.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _loaded:
+        _loaded[key] = ProjectionPanel.load(path)
+    return _loaded[key]
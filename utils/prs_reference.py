@@ -0,0 +1,211 @@
+"""
+Empirical PRS reference distributions.
+
+``population_mean`` / ``population_sd`` in the PRS definitions assume a
+standardised score, which raw weight sums are not.  This module builds the
+actual distribution of each score, per ancestry, either from a reference
+cohort (a :class:`utils.cohort.DosageMatrix` plus sample ancestry labels) or
+by simulating genotypes under Hardy-Weinberg equilibrium from a table of
+effect allele frequencies.  Each (score, ancestry) distribution is stored as
+``len(LEVELS)`` quantiles plus its mean, SD and size in one compressed
+``.npz``; a percentile is then a binary search over the quantiles.
+
+Frequency tables are tab separated with an ``rsid`` and an ``allele``
+column followed by one column per ancestry (EU, AFR, ...) holding the
+frequency of ``allele``.  If a score's effect allele is not ``allele``, the
+variant is taken as biallelic and ``1 - frequency`` is used.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import cohort
+
+# Resolved against the repository, so percentiles do not depend on the working directory
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'prs_reference.npz')
+
+# Quantile levels stored per distribution (0.1% resolution)
+LEVELS = np.linspace(0.0, 1.0, 1001)
+
+# Pseudo-ancestry holding the pooled distribution, used as a fallback
+ALL_ANCESTRIES = 'ALL'
+
+DEFAULT_SIMULATED_SAMPLES = 100_000
+
+# Distributions already read by this process, keyed by (path, mtime)
+_loaded = {}
+
+
+class ReferenceDistributions:
+    """Quantile tables of raw PRS values per (score, ancestry)."""
+
+    def __init__(self, quantiles, info):
+        """
+        Args:
+            quantiles: A dict of ``(score, ancestry)`` -> quantile array over ``LEVELS``.
+            info: A dict of ``(score, ancestry)`` -> ``{'mean', 'sd', 'n', 'source'}``.
+        """
+        self.quantiles = quantiles
+        self.info = info
+
+    def __len__(self):
+        return len(self.quantiles)
+
+    @classmethod
+    def from_scores(cls, scores, source):
+        """Summarise raw reference scores given as ``(score, ancestry)`` -> array."""
+        quantiles, info = {}, {}
+        for key, values in scores.items():
+            values = np.asarray(values, dtype=np.float64)
+            if not len(values):
+                continue
+            quantiles[key] = np.quantile(values, LEVELS)
+            info[key] = {'mean': float(values.mean()), 'sd': float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+                         'n': int(len(values)), 'source': source}
+        return cls(quantiles, info)
+
+    def save(self, path):
+        """Write all tables to one compressed ``.npz``."""
+        keys = list(self.quantiles)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez_compressed(
+            path,
+            quantiles=np.array([self.quantiles[key] for key in keys]).reshape(len(keys), len(LEVELS)),
+            info=np.array(json.dumps([{'score': score, 'ancestry': ancestry, **self.info[(score, ancestry)]}
+                                      for score, ancestry in keys])),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Read tables written by :meth:`save`."""
+        with np.load(path) as archive:
+            entries = json.loads(str(archive['info']))
+            quantiles = archive['quantiles']
+        keys = [(entry.pop('score'), entry.pop('ancestry')) for entry in entries]
+        return cls(dict(zip(keys, quantiles)), dict(zip(keys, entries)))
+
+    def lookup(self, score, ancestry):
+        """The ``(score, ancestry)`` key to use, falling back to the pooled distribution."""
+        for key in ((score, ancestry), (score, ALL_ANCESTRIES)):
+            if key in self.quantiles and self.info[key]['sd'] > 0:
+                return key
+        return None
+
+    def percentile(self, key, raw_score):
+        """Empirical percentile of a raw score; ties get their mid-rank."""
+        quantiles = self.quantiles[key]
+        rank = (np.searchsorted(quantiles, raw_score, side='left')
+                + np.searchsorted(quantiles, raw_score, side='right')) / 2
+        return float(rank / len(quantiles) * 100)
+
+    def summarise(self, score, ancestry, raw_score, raw_score_ci_95=None):
+        """
+        Normalise a raw score against its reference distribution.
+
+        Returns:
+            A dict with ``z_score``, ``z_score_ci_95``, ``percentile`` and
+            ``reference`` (a description), or ``None`` if there is no
+            distribution for the score.
+        """
+        key = self.lookup(score, ancestry)
+        if key is None:
+            return None
+        info = self.info[key]
+        mean, sd = info['mean'], info['sd']
+        z_ci = None
+        if raw_score_ci_95:
+            z_ci = ((raw_score_ci_95[0] - mean) / sd, (raw_score_ci_95[1] - mean) / sd)
+        return {
+            'z_score': (raw_score - mean) / sd,
+            'z_score_ci_95': z_ci,
+            'percentile': self.percentile(key, raw_score),
+            'reference': f"empirical {key[1]} distribution (n={info['n']:,}, {info['source']})",
+        }
+
+
+def load_cached(path):
+    """
+    Load reference distributions once per process.
+
+    Returns:
+        A :class:`ReferenceDistributions`, or ``None`` if ``path`` is unset or missing.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+    if key not in _loaded:
+        _loaded[key] = ReferenceDistributions.load(path)
+    return _loaded[key]
+
+
+def build_from_cohort(matrix, polygenic_scores, labels=None, source='reference cohort'):
+    """
+    Reference distributions from a scored cohort.
+
+    Args:
+        matrix: A :class:`utils.cohort.DosageMatrix` of the reference samples.
+        polygenic_scores: Score definitions (``self.polygenic_scores`` layout).
+        labels: Optional dict of sample id -> ancestry.  Every sample also
+            counts towards the pooled ``ALL`` distribution.
+    """
+    labels = labels or {}
+    ancestries = pd.Series([labels.get(sample, ALL_ANCESTRIES) for sample in matrix.samples])
+    scores = {}
+    for score_name, score_info in polygenic_scores.items():
+        raw = matrix.score(score_info)['raw_score'].to_numpy()
+        scores[(score_name, ALL_ANCESTRIES)] = raw
+        for ancestry in ancestries.unique():
+            if ancestry != ALL_ANCESTRIES:
+                scores[(score_name, ancestry)] = raw[(ancestries == ancestry).to_numpy()]
+    return ReferenceDistributions.from_scores(scores, source)
+
+
+def read_frequency_table(path):
+    """Read an effect allele frequency table (see the module docstring)."""
+    table = pd.read_csv(path, sep='\t', comment='#', dtype={'rsid': str, 'allele': str})
+    return table.drop_duplicates('rsid').set_index('rsid')
+
+
+def build_from_frequencies(polygenic_scores, frequencies, n_samples=DEFAULT_SIMULATED_SAMPLES, seed=42,
+                           source='simulated from allele frequencies'):
+    """
+    Reference distributions simulated under Hardy-Weinberg equilibrium.
+
+    Each variant's effect allele count is drawn as ``Binomial(2, p)`` for
+    ``n_samples`` individuals per ancestry; variants missing from the table
+    do not contribute, mirroring a sample in which they were not called.
+
+    Args:
+        polygenic_scores: Score definitions (``self.polygenic_scores`` layout).
+        frequencies: DataFrame from :func:`read_frequency_table`.
+        n_samples: Simulated individuals per ancestry.
+        seed: Seed of the simulation, so tables are reproducible.
+    """
+    rng = np.random.default_rng(seed)
+    ancestries = [column for column in frequencies.columns if column != 'allele']
+    scores = {}
+    for score_name, score_info in polygenic_scores.items():
+        rows = []
+        for rsid, variant_info in score_info['variants'].items():
+            allele = cohort.effect_allele(variant_info)
+            if allele is None or rsid not in frequencies.index:
+                continue
+            p = frequencies.loc[rsid, ancestries].to_numpy(dtype=np.float64)
+            if frequencies.loc[rsid, 'allele'] != allele:
+                p = 1 - p
+            rows.append((variant_info['weight'], p))
+        if not rows:
+            continue
+        weights = np.array([weight for weight, _ in rows])
+        allele_frequencies = np.array([p for _, p in rows])  # variants x ancestries
+        pooled = []
+        for column, ancestry in enumerate(ancestries):
+            p = np.nan_to_num(allele_frequencies[:, column])
+            counts = rng.binomial(2, p, size=(n_samples, len(p)))
+            scores[(score_name, ancestry)] = counts @ weights
+            pooled.append(scores[(score_name, ancestry)])
+        scores[(score_name, ALL_ANCESTRIES)] = np.concatenate(pooled)
+    return ReferenceDistributions.from_scores(scores, source)
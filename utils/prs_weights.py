@@ -0,0 +1,265 @@
+"""
+External polygenic score weight files, streamed and scored in chunks.
+
+Catalog scores carry hundreds of thousands to millions of weights, so a
+scoring file is never loaded whole.  It is read in chunks of
+``DEFAULT_CHUNKSIZE`` rows; each chunk is joined against the sample's
+genotype store (by rsid, falling back to chromosome:position) with a single
+``searchsorted`` per key type, and only running sums are kept: the raw
+score, its variance for the confidence interval, coverage and, when the
+file gives effect allele frequencies, the expected mean and variance of the
+score under Hardy-Weinberg equilibrium.
+
+Scoring files are tab separated (PGS Catalog layout works as is).  Leading
+``#key=value`` lines are read as metadata (``pgs_id``, ``pgs_name``,
+``genome_build``, ``pmid`` and, optionally, ``population_mean`` and
+``population_sd`` of the raw score).  Column names are matched
+case-insensitively against ``COLUMN_ALIASES``.
+"""
+
+import math
+import pathlib as pl
+
+import numpy as np
+import pandas as pd
+
+from utils import cohort, genome_store, loader, strand
+from utils.genotype_index import GenotypeIndex, encode_rsids
+
+DEFAULT_CHUNKSIZE = 200_000
+
+# Canonical column -> accepted header names (lower case)
+COLUMN_ALIASES = {
+    'rsid': ('rsid', 'rsid_', 'snp', 'snp_id', 'variant_id', 'id', 'markername'),
+    'chromosome': ('chr_name', 'chr', 'chrom', 'chromosome', 'hm_chr'),
+    'position': ('chr_position', 'pos', 'position', 'bp', 'hm_pos'),
+    'effect_allele': ('effect_allele', 'a1', 'ea'),
+    'other_allele': ('other_allele', 'a2', 'oa', 'reference_allele', 'hm_inferotherallele'),
+    'weight': ('effect_weight', 'weight', 'beta'),
+    'se': ('se', 'se_weight', 'standard_error', 'effect_weight_se'),
+    'effect_allele_frequency': ('allelefrequency_effect', 'eaf', 'effect_allele_frequency'),
+}
+
+REQUIRED_COLUMNS = ('effect_allele', 'weight')
+
+NUMERIC_COLUMNS = ('weight', 'se', 'effect_allele_frequency')
+
+# Chromosome name -> rank used in chromosome:position keys (0 never matches)
+_CHROMOSOME_RANKS = {str(i): i for i in range(1, 23)}
+_CHROMOSOME_RANKS.update({'X': 23, 'Y': 24, 'MT': 25, 'M': 25, '23': 23, '24': 24, '25': 25})
+
+
+def _build_number(build):
+    """``37`` or ``38`` from a build string such as ``GRCh37/hg19`` or ``hg38``."""
+    if not build:
+        return None
+    build = str(build)
+    if '38' in build:
+        return 38
+    if '37' in build or '19' in build:
+        return 37
+    return None
+
+
+def locus_keys(chromosomes, positions):
+    """
+    Encode chromosome:position pairs as int64 keys.
+
+    ``chr`` prefixes are ignored and 23/24/25 alias X/Y/MT; unknown
+    chromosomes map to ``0``, which never matches.
+    """
+    names = pd.Series(chromosomes, copy=False).astype(str).str.upper().str.removeprefix('CHR')
+    ranks = names.map(_CHROMOSOME_RANKS).fillna(0).to_numpy(dtype=np.int64)
+    positions = pd.to_numeric(pd.Series(positions, copy=False), errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    return np.where((ranks > 0) & (positions > 0), ranks << 32 | positions, 0)
+
+
+def _canonical_columns(header):
+    """Map canonical column names to the file's header names."""
+    lowered = {name.strip().lower(): name for name in header}
+    columns = {}
+    for canonical, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                columns[canonical] = lowered[alias]
+                break
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Scoring file lacks required column(s) {missing}; header was {header}")
+    if 'rsid' not in columns and not {'chromosome', 'position'} <= set(columns):
+        raise ValueError("Scoring file needs an rsid column or chromosome and position columns")
+    return columns
+
+
+def iter_weight_chunks(filename, metadata, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream a scoring file as DataFrames with canonical column names.
+
+    Args:
+        filename: Path to the scoring file (plain, gzip/bgzip or zip).
+        metadata: Dict filled with the ``#key=value`` header lines.
+        chunksize: Rows per chunk.
+
+    Yields:
+        DataFrames with the canonical columns present in the file.
+    """
+    with loader.open_text(filename) as f:
+        line = f.readline()
+        while line.startswith('#'):
+            key, sep, value = line.lstrip('#').strip().partition('=')
+            if sep:
+                metadata[key.strip()] = value.strip()
+            line = f.readline()
+        header = line.rstrip('\r\n').split('\t')
+        columns = _canonical_columns(header)
+        renames = {source: canonical for canonical, source in columns.items()}
+
+        dtypes = {source: (np.float64 if canonical in NUMERIC_COLUMNS else str)
+                  for canonical, source in columns.items()}
+        reader = pd.read_csv(f, sep='\t', header=None, names=header, usecols=list(renames),
+                             dtype=dtypes, engine='c', chunksize=chunksize)
+        for chunk in reader:
+            yield chunk.rename(columns=renames)
+
+
+def weight_rsids(filename, chunksize=DEFAULT_CHUNKSIZE):
+    """All rsids named by a scoring file (e.g. to extend a targeted load)."""
+    rsids = []
+    for chunk in iter_weight_chunks(filename, {}, chunksize):
+        if 'rsid' in chunk:
+            rsids.append(chunk['rsid'][chunk['rsid'].str.startswith(('rs', 'i'), na=False)].to_numpy())
+    return np.concatenate(rsids).tolist() if rsids else []
+
+
+class WeightScorer:
+    """Running sums of one external score against one genome."""
+
+    def __init__(self, store, build=None):
+        """
+        Args:
+            store: The sample's :class:`utils.genome_store.GenotypeStore`.
+            build: The sample's reference build (e.g. ``GRCh37/hg19``), used
+                to refuse chromosome:position matches against another build.
+        """
+        self.store = store
+        self.build = _build_number(build)
+        self.rsid_index = GenotypeIndex(store.rsids, store.genotypes)
+        self._locus_index = None
+        self.score = 0.0
+        self.variance = 0.0
+        self.expected_mean = 0.0
+        self.expected_variance = 0.0
+        self.has_frequencies = True
+        self.variants_total = 0
+        self.variants_found = 0
+        self.variants_ambiguous = 0
+        self.warnings = []
+
+    @property
+    def locus_index(self):
+        if self._locus_index is None:
+            self._locus_index = GenotypeIndex(locus_keys(self.store.chromosomes, self.store.positions),
+                                              self.store.genotypes)
+        return self._locus_index
+
+    def add_chunk(self, chunk, use_positions=True):
+        """Join one chunk of weights against the genome and accumulate it."""
+        self.variants_total += len(chunk)
+        rows = np.full(len(chunk), -1, dtype=np.int64)
+        if 'rsid' in chunk:
+            rows = self.rsid_index.lookup_keys(encode_rsids(chunk['rsid']))
+        if use_positions and {'chromosome', 'position'} <= set(chunk.columns):
+            unmatched = rows < 0
+            if unmatched.any():
+                rows[unmatched] = self.locus_index.lookup_keys(
+                    locus_keys(chunk['chromosome'][unmatched], chunk['position'][unmatched]))
+
+        found = (rows >= 0) & chunk['weight'].notna().to_numpy()
+        if not found.any():
+            return
+        effect = genome_store.encode_alleles(chunk['effect_allele'][found])
+        other = (genome_store.encode_alleles(chunk['other_allele'][found]) if 'other_allele' in chunk
+                 else np.full(found.sum(), genome_store.NO_ALLELE, dtype=np.uint8))
+        frequency = chunk['effect_allele_frequency'].to_numpy()[found] if 'effect_allele_frequency' in chunk else None
+        harmonised = strand.harmonise_codes(self.store.genotypes[rows[found]], effect, other, frequency)
+        counts, usable = harmonised.counts, harmonised.usable
+        self.variants_ambiguous += int(harmonised.unresolved.sum())
+
+        counts = counts[usable].astype(np.float64)
+        weights = chunk['weight'].to_numpy()[found][usable]
+        self.score += float(counts @ weights)
+        if 'se' in chunk:
+            se = np.nan_to_num(chunk['se'].to_numpy()[found][usable])
+            self.variance += float((counts ** 2) @ (se ** 2))
+        if frequency is not None:
+            p = frequency[usable]
+            self.has_frequencies &= not np.isnan(p).any()
+            p = np.nan_to_num(p)
+            self.expected_mean += float(2 * p @ weights)
+            self.expected_variance += float((2 * p * (1 - p)) @ (weights ** 2))
+        else:
+            self.has_frequencies = False
+        self.variants_found += int(usable.sum())
+
+
+def score_file(filename, store, build=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Score one genome against an external scoring file.
+
+    The score is normalised with the file's ``population_mean`` /
+    ``population_sd`` metadata when present, else with the mean and SD
+    expected under Hardy-Weinberg equilibrium from the effect allele
+    frequencies of the matched variants.  Without either, only the raw score
+    (and its CI when weights have standard errors) is reported.
+
+    Returns:
+        A dict shaped like the built-in entries of ``results['polygenic_scores']``
+        (``variant_details`` is left empty), plus ``score_id``, ``source``,
+        ``normalisation`` and ``warnings``.
+    """
+    metadata = {}
+    chunks = iter_weight_chunks(filename, metadata, chunksize)
+    scorer = WeightScorer(store, build)
+    use_positions = True
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            # Header metadata is complete once the first chunk is out
+            file_build = _build_number(metadata.get('genome_build') or metadata.get('HmPOS_build'))
+            if file_build and scorer.build and file_build != scorer.build:
+                use_positions = False
+                scorer.warnings.append(
+                    f"Scoring file is on build {file_build} but the genome is on {scorer.build}; "
+                    "variants were matched by rsid only")
+        scorer.add_chunk(chunk, use_positions)
+    if scorer.variants_ambiguous:
+        scorer.warnings.append(
+            f"{scorer.variants_ambiguous} A/T or C/G variant(s) with an effect allele frequency near 0.5 "
+            "could not be strand-resolved and were skipped")
+
+    if 'population_mean' in metadata and 'population_sd' in metadata:
+        mean, sd = float(metadata['population_mean']), float(metadata['population_sd'])
+        normalisation = 'scoring file population mean/SD'
+    elif scorer.has_frequencies and scorer.expected_variance > 0:
+        mean, sd = scorer.expected_mean, math.sqrt(scorer.expected_variance)
+        normalisation = 'Hardy-Weinberg expectation from effect allele frequencies of matched variants'
+    else:
+        mean, sd = None, None
+        normalisation = None
+
+    summary = cohort.prs_summary(scorer.score, scorer.variance,
+                                 {'population_mean': mean or 0.0, 'population_sd': sd or 1.0})
+    if normalisation is None:
+        summary.update(z_score=None, z_score_ci_95=None, percentile=None)
+
+    score_id = metadata.get('pgs_id') or pl.Path(filename).name.split('.')[0]
+    return {
+        'name': metadata.get('pgs_name') or metadata.get('trait_reported') or score_id,
+        **summary,
+        'variants_found': f"{scorer.variants_found}/{scorer.variants_total}",
+        'pmid': metadata.get('pmid') or metadata.get('citation') or 'N/A',
+        'variant_details': [],
+        'score_id': score_id,
+        'source': str(filename),
+        'normalisation': normalisation,
+        'warnings': scorer.warnings,
+    }
@@ -0,0 +1,98 @@
+"""
+Per-chromosome sorted-position index over a loaded genome.
+
+Region questions ("every variant on chromosome 7", "every variant in this
+gene", "everything within 500 kb of rs...") used to be answered with
+``data[data['chromosome'] == chrom]`` masks, a full scan per query.  The
+index is built once after loading: rows are ordered by chromosome and
+position with one stable ``lexsort``, each chromosome owns a contiguous
+block of that order, and a region query is two ``np.searchsorted`` calls
+into the chromosome's block.  Results are views (basic slices) of the
+index arrays, so nothing is copied.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# rows: row numbers into the indexed genome, positions: their coordinates (both ascending by position)
+Region = namedtuple('Region', ['rows', 'positions'])
+
+
+class RegionIndex:
+    """
+    Chromosome/position range lookups over a genome.
+
+    Coordinates are those of the input (1-based for 23andMe and VCF) and
+    regions are closed intervals, ``start <= position <= end``.  Rows with
+    equal positions keep their file order.
+    """
+
+    def __init__(self, chromosomes, positions):
+        """
+        Args:
+            chromosomes: Chromosome label per row (Categorical or strings).
+            positions: Position per row.
+        """
+        chromosomes = pd.Categorical(chromosomes)
+        codes = chromosomes.codes.astype(np.int64)
+        positions = np.asarray(positions, dtype=np.int64)
+
+        self._rows = np.lexsort((positions, codes))
+        self._positions = positions[self._rows]
+        counts = np.bincount(codes[codes >= 0], minlength=len(chromosomes.categories))
+        # Rows with a missing chromosome (code -1) sort first and belong to no block
+        stops = np.cumsum(counts) + np.count_nonzero(codes < 0)
+        self._blocks = {str(chrom): (int(stop - count), int(stop))
+                        for chrom, count, stop in zip(chromosomes.categories, counts, stops) if count}
+
+    @classmethod
+    def from_frame(cls, data):
+        """Build an index from a DataFrame with ``chromosome`` and ``position`` columns."""
+        return cls(data['chromosome'], data['position'])
+
+    @classmethod
+    def from_store(cls, store):
+        """Build an index over a :class:`utils.genome_store.GenotypeStore`."""
+        return cls(store.chromosomes, store.positions)
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def chromosomes(self):
+        """Chromosome labels present in the genome."""
+        return list(self._blocks)
+
+    def chromosome(self, chrom):
+        """
+        Every variant of one chromosome.
+
+        Returns:
+            A :class:`Region` of views; empty if the chromosome is absent.
+        """
+        start, stop = self._blocks.get(str(chrom), (0, 0))
+        return Region(self._rows[start:stop], self._positions[start:stop])
+
+    def variants_in_region(self, chrom, start, end):
+        """
+        Variants of ``chrom`` with ``start <= position <= end``.
+
+        Args:
+            chrom: Chromosome label as in the genome (e.g. ``'7'``, ``'X'``).
+            start: First position of the region.
+            end: Last position of the region.
+
+        Returns:
+            A :class:`Region` of views into the index, in position order.
+        """
+        block_start, block_stop = self._blocks.get(str(chrom), (0, 0))
+        block = self._positions[block_start:block_stop]
+        lo = block_start + int(np.searchsorted(block, start, side='left'))
+        hi = block_start + int(np.searchsorted(block, end, side='right'))
+        return Region(self._rows[lo:hi], self._positions[lo:hi])
+
+    def variants_near(self, chrom, position, flank):
+        """Variants within ``flank`` bp of ``position`` on ``chrom`` (a window query)."""
+        return self.variants_in_region(chrom, position - flank, position + flank)
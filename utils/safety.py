@@ -1,23 +1,92 @@
 import functools
 import json
+import threading
+import time
 import traceback
+import tracemalloc
 import datetime as dt
 import pathlib as pl
 
+try:
+    import resource  # Unix only; max RSS is simply not reported elsewhere
+except ImportError:
+    resource = None
+
+# Stages currently running (several at once under utils.scheduler), guarded by _profile_lock
+_profile_lock = threading.Lock()
+_active_probes = set()
+
+
+class _StageProbe:
+    """Wall/CPU/memory measurements of one running stage."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.overlaps = set()
+        with _profile_lock:
+            # tracemalloc only has a process-wide peak: reset it when no other stage
+            # is running, otherwise the peak below also covers the overlapping stages
+            self.memory = tracemalloc.is_tracing()
+            if self.memory:
+                if not _active_probes:
+                    tracemalloc.reset_peak()
+                self.memory_start = tracemalloc.get_traced_memory()[0]
+            for other in _active_probes:
+                other.overlaps.add(stage)
+                self.overlaps.add(other.stage)
+            _active_probes.add(self)
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+
+    def finish(self, status):
+        """Stop measuring and return the stage's performance record."""
+        wall = time.perf_counter() - self.started
+        cpu = time.thread_time() - self.cpu_started
+        with _profile_lock:
+            _active_probes.discard(self)
+            peak = None
+            if self.memory and tracemalloc.is_tracing():
+                peak = max(0, tracemalloc.get_traced_memory()[1] - self.memory_start)
+        max_rss = None
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return {
+            'stage': self.stage,
+            'status': status,
+            'started_perf_counter': self.started,
+            'wall_seconds': wall,
+            'cpu_seconds': cpu,
+            'peak_memory_bytes': peak,
+            'process_max_rss_bytes': max_rss,
+            'overlapping_stages': sorted(self.overlaps),
+        }
+
+
 def safeguard(stage: str):
     """
     A decorator to catch exceptions in major analysis stages,
     log them, and dump partial results for post-mortem analysis.
+
+    It also measures each call: wall time, CPU time of the calling thread,
+    and (while ``tracemalloc`` is tracing) the peak of newly allocated
+    memory.  The record is appended to ``analyzer_instance.performance_records``
+    when the analyzer has that list, whether the stage succeeds or fails.
     """
     def wrap(fn):
         @functools.wraps(fn)
         def inner(analyzer_instance, *args, **kwargs):
+            probe = _StageProbe(stage)
+            status = 'failed'
             try:
-                return fn(analyzer_instance, *args, **kwargs)
+                result = fn(analyzer_instance, *args, **kwargs)
+                status = 'ok'
+                return result
             except Exception as exc:  # noqa: BLE001 (broad exception catch is intended here)
-                # Ensure the crash_dumps directory exists
-                crash_dump_dir = pl.Path("crash_dumps")
-                crash_dump_dir.mkdir(exist_ok=True)
+                # Ensure the crash_dumps directory exists (under the analyzer's
+                # output directory, so batch samples keep their dumps apart)
+                crash_dump_dir = pl.Path(getattr(analyzer_instance, 'output_dir', '.')) / "crash_dumps"
+                crash_dump_dir.mkdir(parents=True, exist_ok=True)
                 
                 # Prepare data for dumping
                 # Accessing 'self.results' from the passed 'analyzer_instance'
@@ -54,5 +123,70 @@ def safeguard(stage: str):
                 # Re-raise the original exception to halt further execution if desired,
                 # or handle it (e.g., allow other stages to run)
                 raise  # Or: return None / some error indicator
+            finally:
+                record = probe.finish(status)
+                records = getattr(analyzer_instance, 'performance_records', None)
+                if isinstance(records, list):
+                    records.append(record)  # list.append is atomic across threads
         return inner
     return wrap
+
+
+def performance_profile(records, total_wall_seconds=None):
+    """
+    Summarise stage records for ``results['performance_profile']``.
+
+    Args:
+        records: Records appended by :func:`safeguard`.
+        total_wall_seconds: Wall time of the whole run, if known.
+
+    Returns:
+        A dict with the stages in start order (``start_seconds`` relative to
+        the first stage) and the totals.  Peak memory is ``None`` for every
+        stage unless ``tracemalloc`` was tracing.
+    """
+    records = sorted(records, key=lambda record: record['started_perf_counter'])
+    origin = records[0]['started_perf_counter'] if records else 0.0
+    stages = []
+    for record in records:
+        stage = {key: value for key, value in record.items() if key != 'started_perf_counter'}
+        stage['start_seconds'] = record['started_perf_counter'] - origin
+        stages.append(stage)
+    return {
+        'stages': stages,
+        'total_wall_seconds': total_wall_seconds,
+        'stage_cpu_seconds': sum(stage['cpu_seconds'] for stage in stages),
+        'memory_profiled': any(stage['peak_memory_bytes'] is not None for stage in stages),
+    }
+
+
+def format_profile_table(profile):
+    """Lines of a text table of the stages, slowest first."""
+    total = profile.get('total_wall_seconds') or sum(stage['wall_seconds'] for stage in profile['stages'])
+    lines = [f"{'Stage':<26}{'Wall s':>9}{'CPU s':>9}{'Peak MB':>10}{'% wall':>8}  Status"]
+    for stage in sorted(profile['stages'], key=lambda stage: stage['wall_seconds'], reverse=True):
+        peak = stage['peak_memory_bytes']
+        peak = f"{peak / 1024 ** 2:.1f}" if peak is not None else '-'
+        # '*': ran alongside other stages, so its peak memory also covers theirs
+        if stage['overlapping_stages'] and stage['peak_memory_bytes'] is not None:
+            peak += '*'
+        share = 100 * stage['wall_seconds'] / total if total else 0.0
+        lines.append(f"{stage['stage']:<26}{stage['wall_seconds']:>9.3f}{stage['cpu_seconds']:>9.3f}"
+                     f"{peak:>10}{share:>7.1f}%  {stage['status']}")
+    lines.append(f"{'Total (wall)':<26}{total:>9.3f}{profile['stage_cpu_seconds']:>9.3f}")
+    return lines
+
+
+def write_metrics(path, profile, **context):
+    """
+    Append one JSON line per stage to ``path``.
+
+    ``context`` (sample, run id, versions...) is repeated on every line so
+    files from many runs and hosts can be concatenated and grouped by stage.
+    All lines are written with a single append, so concurrent batch workers
+    sharing a metrics file do not interleave partial lines.
+    """
+    lines = [json.dumps({**context, **stage}, default=str) for stage in profile['stages']]
+    pl.Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(line + '\n' for line in lines))
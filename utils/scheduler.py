@@ -0,0 +1,159 @@
+"""
+Dependency-graph scheduler for analysis stages.
+
+Each stage declares the state it ``requires`` and the state it ``provides``
+(result keys or analyzer attributes such as the loaded data or the
+inferred ancestry).  A stage starts as soon as every stage providing one of
+its requirements has finished, so independent stages run concurrently on a
+thread pool and the wall time approaches that of the critical path.
+
+Runs are deterministic as seen from outside:
+
+* what each stage prints is buffered per thread and replayed in declaration
+  order, so logs read exactly as in a serial run;
+* :func:`ordered_results` re-inserts result keys in declaration order, so
+  reports and JSON dumps list sections as a serial run would (the
+  provenance hash sorts keys and is unaffected either way);
+* if stages fail, no further stages are started and the failure of the
+  earliest declared stage is raised, as the first failure would be serially.
+
+Threads rather than processes are used because stages mutate the analyzer
+(``self.results`` and friends) and share its in-memory genome; the heavy
+parts of the stages run in NumPy/pandas, which release the GIL.
+"""
+
+import io
+import os
+import sys
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+Stage = namedtuple('Stage', ['name', 'run', 'requires', 'provides'])
+
+
+class _StageOutput(io.TextIOBase):
+    """``sys.stdout`` stand-in that sends each worker thread's output to its own buffer."""
+
+    def __init__(self, target):
+        self.target = target
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        (buffer if buffer is not None else self.target).write(text)
+        return len(text)
+
+    def flush(self):
+        self.target.flush()
+
+
+def dependencies(stages):
+    """
+    Resolve each stage's requirements to the stages that provide them.
+
+    Returns:
+        A dict of stage name -> set of stage names it must wait for.
+
+    Raises:
+        ValueError: If a requirement has no provider, two stages provide the
+            same key, or a stage depends on a later-declared stage (which
+            would make the serial order invalid).
+    """
+    providers = {}
+    for stage in stages:
+        for key in stage.provides:
+            if key in providers:
+                raise ValueError(f"'{key}' is provided by both {providers[key]} and {stage.name}")
+            providers[key] = stage.name
+
+    order = {stage.name: i for i, stage in enumerate(stages)}
+    graph = {}
+    for stage in stages:
+        missing = [key for key in stage.requires if key not in providers]
+        if missing:
+            raise ValueError(f"Stage {stage.name} requires {missing}, which no stage provides")
+        graph[stage.name] = {providers[key] for key in stage.requires}
+        later = [name for name in graph[stage.name] if order[name] >= order[stage.name]]
+        if later:
+            raise ValueError(f"Stage {stage.name} depends on later stage(s) {later}")
+    return graph
+
+
+def run_stages(stages, workers=None):
+    """
+    Run stages respecting their dependencies.
+
+    Args:
+        stages: :class:`Stage` tuples in serial (declaration) order.
+        workers: Worker threads; ``1`` runs the stages serially in the
+            calling thread.  Defaults to the CPU count.
+    """
+    graph = dependencies(stages)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for stage in stages:
+            stage.run()
+        return
+
+    output = _StageOutput(sys.stdout)
+    buffers = {}
+
+    def run(stage):
+        output.local.buffer = buffers[stage.name] = io.StringIO()
+        try:
+            stage.run()
+        finally:
+            output.local.buffer = None
+
+    pending = list(stages)
+    running = {}
+    finished = set()
+    errors = {}
+    replayed = 0
+    previous_stdout, sys.stdout = sys.stdout, output
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                if not errors:
+                    for stage in [s for s in pending if graph[s.name] <= finished]:
+                        pending.remove(stage)
+                        running[pool.submit(run, stage)] = stage
+                elif not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    if future.exception() is not None:
+                        errors[stage.name] = future.exception()
+                    finished.add(stage.name)
+
+                # Replay output of the finished prefix of the declaration order
+                while replayed < len(stages) and stages[replayed].name in finished:
+                    output.target.write(buffers[stages[replayed].name].getvalue())
+                    replayed += 1
+    finally:
+        sys.stdout = previous_stdout
+        # Anything finished out of order after a failure
+        for stage in stages[replayed:]:
+            if stage.name in buffers and stage.name in finished:
+                previous_stdout.write(buffers[stage.name].getvalue())
+
+    for stage in stages:
+        if stage.name in errors:
+            raise errors[stage.name]
+
+
+def ordered_results(results, stages):
+    """
+    Re-insert ``results`` keys in the order a serial run would create them.
+
+    Keys provided by stages come first, in declaration order; any others
+    keep their relative order at the end.  The same mapping type is returned.
+    """
+    declared = [key for stage in stages for key in stage.provides if key in results]
+    ordered = results.copy()
+    ordered.clear()
+    for key in declared + [key for key in results if key not in declared]:
+        ordered[key] = results[key]
+    return ordered
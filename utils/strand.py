@@ -0,0 +1,139 @@
+"""
+Vectorized strand harmonisation of panel SNPs.
+
+A panel SNP is reported by the array on one strand and described by the
+panel (effect/risk allele, optional other allele) possibly on the other.
+Everything here works on whole joined panel tables at once, over the packed
+genotype codes of :mod:`utils.genome_store`:
+
+* complements are an array translation (A<->T, C<->G), not per-row string
+  building;
+* A/T and C/G sites are flagged ambiguous, since they read the same on
+  both strands;
+* other sites with a known other allele are matched directly or
+  strand-flipped (:func:`genome_store.harmonised_allele_counts`);
+* ambiguous sites whose effect allele frequency is close to 0.5 cannot be
+  oriented by frequency either, so they are unusable when reference
+  frequencies are given; outside that window the reported strand is kept.
+
+:func:`harmonise_codes` is the engine for code arrays (the external scoring
+files of :mod:`utils.prs_weights`); :func:`harmonise` wraps it for tables of
+genotype strings such as the analyzers' joined panels.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils import genome_store
+
+# Ambiguous (A/T, C/G) sites with an effect allele frequency in this window are unresolvable
+AMBIGUOUS_FREQUENCY_WINDOW = (0.4, 0.6)
+
+# Values of the 'status' column of harmonise()
+DIRECT, FLIPPED, AMBIGUOUS_UNRESOLVED, MISMATCH = 'direct', 'flipped', 'ambiguous_unresolved', 'mismatch'
+
+_COMPLEMENT_TABLE = str.maketrans('ACGT', 'TGCA')
+
+Harmonised = namedtuple('Harmonised', ['codes', 'counts', 'usable', 'ambiguous', 'flipped', 'unresolved'])
+
+
+def complement_genotypes(genotypes):
+    """Strand-complement genotype strings (``'AG'`` -> ``'TC'``); other symbols are unchanged."""
+    return pd.Series(genotypes, copy=False).astype(str).str.translate(_COMPLEMENT_TABLE).to_numpy(dtype=object)
+
+
+def harmonise_codes(codes, effect, other=None, effect_frequency=None, flip_absent_palindromes=False):
+    """
+    Harmonise packed genotypes against their rows' effect alleles.
+
+    Args:
+        codes: Packed genotype codes.
+        effect: Allele code of the effect allele, per row.
+        other: Allele code of the other allele per row (``NO_ALLELE`` where
+            unknown), or ``None`` if no row has one.
+        effect_frequency: Optional reference frequency of the effect allele
+            per row (NaN where unknown).
+        flip_absent_palindromes: Read an ambiguous genotype whose other allele
+            is unknown on the opposite strand when it carries no effect allele
+            but its complement does (the long-standing behaviour of
+            ``advanced_genetic_analyzer``).  Off by default: an A/T or C/G
+            genotype alone cannot tell the strand.
+
+    Returns:
+        A :class:`Harmonised` tuple of arrays: the genotype codes on the
+        panel's strand, int8 effect allele counts, and the usable, ambiguous,
+        flipped and unresolved (ambiguous with a frequency near 0.5) masks.
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    effect = np.asarray(effect, dtype=np.uint8)
+    other = (np.full(len(codes), genome_store.NO_ALLELE, dtype=np.uint8) if other is None
+             else np.asarray(other, dtype=np.uint8))
+    known_other = other != genome_store.NO_ALLELE
+    direct, flipped = genome_store.strand_matches(codes, effect, other)
+    usable = (direct | flipped) & (effect != genome_store.NO_ALLELE)
+
+    # Ambiguous: effect/other are complementary or, with the other allele
+    # unknown, every allele of the genotype is the effect allele or its complement
+    pair = genome_store.complement_alleles(effect)
+    first, second = genome_store.split_alleles(codes)
+    in_pair = (((first == effect) | (first == pair))
+               & ((second == effect) | (second == pair) | (second == genome_store.NO_ALLELE)))
+    ambiguous = (effect < 4) & np.where(known_other, other == pair, in_pair)
+
+    complements = genome_store.complement(codes)
+    if flip_absent_palindromes:
+        flipped = flipped | (ambiguous & ~known_other
+                             & (genome_store.effect_allele_counts(codes, effect) == 0)
+                             & (genome_store.effect_allele_counts(complements, effect) > 0))
+    harmonised = np.where(flipped, complements, codes).astype(np.uint8)
+
+    unresolved = np.zeros(len(codes), dtype=bool)
+    if effect_frequency is not None:
+        frequency = np.asarray(effect_frequency, dtype=np.float64)
+        low, high = AMBIGUOUS_FREQUENCY_WINDOW
+        unresolved = usable & ambiguous & (frequency >= low) & (frequency <= high)
+        usable &= ~unresolved
+
+    return Harmonised(harmonised, genome_store.effect_allele_counts(harmonised, effect),
+                      usable, ambiguous, flipped, unresolved)
+
+
+def harmonise(genotypes, effect, other=None, effect_frequency=None, flip_absent_palindromes=False):
+    """
+    Harmonise a table of genotype strings in one pass.
+
+    Args:
+        genotypes: Genotype strings, e.g. the ``genotype`` column of a joined
+            panel table (:class:`utils.panels.PanelJoin`).
+        effect: Effect (risk) allele symbol per row.
+        other: Optional other allele symbol per row (``None`` where unknown).
+        effect_frequency: Optional effect allele frequency per row.
+        flip_absent_palindromes: See :func:`harmonise_codes`.
+
+    Returns:
+        A DataFrame aligned with the input rows: ``genotype_complement``,
+        ``harmonised_genotype`` (the complement where flipped, else the
+        genotype as reported), ``effect_count`` (int8), ``ambiguous``,
+        ``flipped``, ``usable`` and ``status`` (``'direct'``, ``'flipped'``,
+        ``'ambiguous_unresolved'`` or ``'mismatch'``).  Genotypes the packed
+        encoding cannot represent count 0.
+    """
+    genotypes = pd.Series(genotypes, copy=False).astype(str).to_numpy(dtype=object)
+    result = harmonise_codes(genome_store.encode_genotypes(genotypes), genome_store.encode_alleles(effect),
+                             None if other is None else genome_store.encode_alleles(other),
+                             effect_frequency, flip_absent_palindromes)
+
+    status = np.select([result.unresolved, ~result.usable, result.flipped],
+                       [AMBIGUOUS_UNRESOLVED, MISMATCH, FLIPPED], DIRECT).astype(object)
+    complements = complement_genotypes(genotypes)
+    return pd.DataFrame({
+        'genotype_complement': complements,
+        'harmonised_genotype': np.where(result.flipped, complements, genotypes),
+        'effect_count': result.counts,
+        'ambiguous': result.ambiguous,
+        'flipped': result.flipped,
+        'usable': result.usable,
+        'status': status,
+    })
@@ -0,0 +1,218 @@
+"""
+Streaming VCF reader.
+
+The VCF body is read in chunks by the pandas C parser (CHROM, POS, ID, REF,
+ALT, FORMAT and the first sample column only).  For each chunk the GT
+subfield is pulled out of the sample column, and the genotype of every record
+is resolved in two vectorized lookups: one over the distinct GT strings
+(``0/1``, ``1|1``, ``./.``, ...) and one over the distinct REF/ALT pairs.
+Only those distinct values are handled in Python.
+
+Each record ends up with a 23andMe-style genotype string (``'CT'``; indel
+alleles become ``'D'``/``'I'``; missing calls become ``'--'``), its REF, ALT
+and GT fields, and the ALT allele dosage (0, 1 or 2; -1 if not called).
+"""
+
+import io
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils import genome_store
+
+DEFAULT_CHUNKSIZE = 500_000
+
+# CHROM, POS, ID, REF, ALT, FORMAT and the first sample
+USECOLS = [0, 1, 2, 3, 4, 8, 9]
+NAMES = ['chromosome', 'position', 'rsid', 'ref', 'alt', 'format', 'sample']
+DTYPES = {name: str for name in NAMES}
+DTYPES['position'] = np.int64
+
+OUTPUT_COLUMNS = ['rsid', 'chromosome', 'position', 'genotype', 'ref', 'alt', 'gt', 'dosage']
+
+# Allele indices for GT entries that are not numbers
+MISSING = -1   # '.' in a called position
+ABSENT = -2    # second allele of a haploid call
+
+# Allele code used while resolving for REF/ALT alleles that have no genotype symbol
+_UNKNOWN = 255
+_MISSING_CODE = genome_store.ALLELE_CODES['-']
+
+_GT_SEPARATOR = re.compile(r'[/|]')
+
+
+def parse_header_line(line, metadata):
+    """
+    Update ``metadata`` from a VCF ``##`` meta line or the ``#CHROM`` line.
+
+    Raises:
+        ValueError: If the ``#CHROM`` line declares no sample column.
+    """
+    if line.startswith('##reference=') or line.startswith('##assembly='):
+        reference = line.split('=', 1)[1].lower()
+        if 'grch38' in reference or 'hg38' in reference:
+            metadata['build'] = 'GRCh38/hg38'
+        elif 'grch37' in reference or 'hg19' in reference:
+            metadata['build'] = 'GRCh37/hg19'
+    elif line.startswith('#CHROM'):
+        columns = line.rstrip('\r\n').split('\t')
+        if len(columns) < 10:
+            raise ValueError("VCF file has no sample column")
+        metadata['sample'] = columns[9]
+
+
+def gt_allele_indices(gt):
+    """
+    Parse a GT string into a pair of allele indices.
+
+    ``'0/1'`` -> ``(0, 1)``, ``'1|1'`` -> ``(1, 1)``, a haploid ``'1'`` ->
+    ``(1, ABSENT)`` and missing calls (``'./.'``, ``'.'``, ``''``) ->
+    ``(MISSING, MISSING)``.  Only the first two alleles are kept.
+    """
+    parts = [int(p) if p.isdigit() else MISSING for p in _GT_SEPARATOR.split(gt)[:2]]
+    if len(parts) == 1:
+        parts.append(MISSING if parts[0] == MISSING else ABSENT)
+    return parts[0], parts[1]
+
+
+def record_alleles(ref, alt):
+    """The allele sequences of a record, indexed as in GT (REF first, then each ALT)."""
+    alleles = [ref]
+    if alt and alt != '.':
+        alleles += alt.split(',')
+    return alleles
+
+
+def allele_symbols(ref, alt):
+    """
+    Genotype symbol per allele index of a record.
+
+    Single-base SNV alleles keep their base.  For length-changing records
+    the shortest allele is ``'D'`` and the others ``'I'``, following the
+    23andMe convention.  Anything else (MNPs, ``*``, symbolic alleles) has
+    no symbol and is returned as ``''``.
+    """
+    alleles = record_alleles(ref, alt)
+    lengths = [len(a) for a in alleles]
+    if max(lengths) == 1:
+        return [a if a in 'ACGT' else '' for a in alleles]
+    if all(a[0] != '<' and a != '*' for a in alleles) and len(set(lengths)) > 1:
+        shortest = min(lengths)
+        return ['D' if length == shortest else 'I' for length in lengths]
+    return [''] * len(alleles)
+
+
+def allele_sequences(ref, alt, gt):
+    """The allele sequences called by ``gt``, e.g. ``('C', 'T', '0/1')`` -> ``['C', 'T']``."""
+    alleles = record_alleles(ref, alt)
+    return [alleles[i] for i in gt_allele_indices(gt) if 0 <= i < len(alleles)]
+
+
+def extract_gt(formats, samples):
+    """
+    Pull the GT subfield out of the sample column.
+
+    The position of GT is looked up once per distinct FORMAT string rather
+    than once per record.  Records without GT get ``''``.
+    """
+    gt = np.full(len(samples), '', dtype=object)
+    format_codes, format_uniques = pd.factorize(formats)
+
+    for code, fmt in enumerate(format_uniques):
+        keys = fmt.split(':')
+        if 'GT' not in keys:
+            continue
+        pos = keys.index('GT')
+        rows = format_codes == code
+        fields = samples[rows] if len(keys) == 1 else samples[rows].str.split(':', n=pos + 1).str[pos]
+        gt[rows] = fields.fillna('').to_numpy(dtype=object)
+
+    return gt
+
+
+def _allele_table(pairs):
+    """Allele codes per distinct (REF, ALT) pair, plus MISSING/ABSENT/out-of-range columns."""
+    symbols = [allele_symbols(ref, alt) for ref, alt in pairs]
+    width = max((len(s) for s in symbols), default=1)
+
+    table = np.full((len(symbols), width + 3), _UNKNOWN, dtype=np.uint8)
+    for row, row_symbols in enumerate(symbols):
+        table[row, :len(row_symbols)] = [genome_store.ALLELE_CODES.get(s, _UNKNOWN) for s in row_symbols]
+    table[:, width] = _MISSING_CODE
+    table[:, width + 1] = genome_store.NO_ALLELE
+    return table, width
+
+
+def _table_columns(indices, pair_codes, pair_widths, width):
+    """Map allele indices onto columns of the allele table."""
+    columns = np.where(indices >= pair_widths[pair_codes], width + 2, indices)
+    columns = np.where(indices == MISSING, width, columns)
+    return np.where(indices == ABSENT, width + 1, columns)
+
+
+def resolve_chunk(chunk):
+    """
+    Turn a chunk of raw VCF columns into genotype-store columns.
+
+    Args:
+        chunk: A DataFrame with the :data:`NAMES` columns.
+
+    Returns:
+        A DataFrame with the :data:`OUTPUT_COLUMNS` columns.
+    """
+    gt = extract_gt(chunk['format'], chunk['sample'])
+
+    # Allele indices, resolved once per distinct GT string
+    gt_codes, gt_uniques = pd.factorize(gt)
+    gt_indices = np.array([gt_allele_indices(g) for g in gt_uniques], dtype=np.int64).reshape(-1, 2)
+    first_index, second_index = gt_indices[gt_codes].T
+
+    # Allele symbols, resolved once per distinct REF/ALT pair
+    pair_codes, pairs = pd.MultiIndex.from_arrays([chunk['ref'], chunk['alt']]).factorize()
+    table, width = _allele_table(pairs)
+    pair_widths = np.array([len(record_alleles(ref, alt)) for ref, alt in pairs], dtype=np.int64)
+
+    first = table[pair_codes, _table_columns(first_index, pair_codes, pair_widths, width)]
+    second = table[pair_codes, _table_columns(second_index, pair_codes, pair_widths, width)]
+    codes = (first << 3 | second).astype(np.uint8)
+    codes[(first == _UNKNOWN) | (second == _UNKNOWN)] = genome_store.EMPTY_GENOTYPE
+
+    # ALT dosage: called non-REF alleles, -1 when the call is (partly) missing
+    missing = (first_index == MISSING) | (second_index == MISSING)
+    dosage = (first_index > 0).astype(np.int8) + (second_index > 0).astype(np.int8)
+    dosage[missing] = -1
+
+    return pd.DataFrame({
+        'rsid': chunk['rsid'].to_numpy(),
+        'chromosome': chunk['chromosome'].to_numpy(),
+        'position': chunk['position'].to_numpy(),
+        'genotype': genome_store.decode_genotypes(codes),
+        'ref': chunk['ref'].to_numpy(),
+        'alt': chunk['alt'].to_numpy(),
+        'gt': pd.Categorical.from_codes(gt_codes, categories=gt_uniques.astype(str)),
+        'dosage': dosage,
+    })
+
+
+def _read_columns(f, chunksize=None):
+    return pd.read_csv(f, sep='\t', header=None, usecols=USECOLS, names=NAMES,
+                       dtype=DTYPES, na_filter=False, engine='c', chunksize=chunksize)
+
+
+def read_vcf_body(f, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Stream the records of an open VCF positioned after its header.
+
+    Yields:
+        DataFrames with the :data:`OUTPUT_COLUMNS` columns, one per chunk.
+    """
+    for chunk in _read_columns(f, chunksize):
+        yield resolve_chunk(chunk)
+
+
+def parse_records(text):
+    """Parse a block of VCF record lines (``bytes``) into :data:`OUTPUT_COLUMNS`."""
+    if not text.strip():
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+    return resolve_chunk(_read_columns(io.BytesIO(text)))
@@ -0,0 +1,286 @@
+"""
+Tabix-style random-access index over a bgzipped VCF.
+
+:func:`build_index` streams a BGZF-compressed VCF once and writes
+``<file>.vidx.npz`` next to it, holding:
+
+* an rsid index: sorted int64 rsid keys -> virtual offset of the record
+* a linear coordinate index: chromosome and position of the first record
+  starting in each BGZF block -> that record's virtual offset
+* the genome-wide counters (per-chromosome counts, het/hom, Ti/Tv) and
+  header metadata, so summary statistics need no further scan
+
+:class:`VcfIndex` then fetches individual records by rsid or by region,
+decompressing only the one or two blocks each record lives in.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from utils import bgzf, genome_stats, genome_store, vcf
+from utils.genotype_index import encode_rsids
+
+INDEX_SUFFIX = '.vidx.npz'
+INDEX_VERSION = 2
+
+# Decompressed bytes parsed per batch while building
+BATCH_BYTES = 1 << 22
+
+
+def index_path(filename):
+    """Path of the index stored beside ``filename``."""
+    return str(filename) + INDEX_SUFFIX
+
+
+def _source_stamp(filename):
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_header(reader):
+    """
+    Consume the header of a BGZF VCF.
+
+    Returns:
+        ``(metadata, voffset)`` with the header metadata and the virtual
+        offset of the first record.
+
+    Raises:
+        ValueError: If the file is not a VCF.
+    """
+    metadata = {}
+    start = reader.tell()
+    line = reader.readline()
+    while line.startswith(b'#'):
+        text = line.decode()
+        if text.startswith('##fileformat=VCF'):
+            metadata['format'] = 'VCF'
+        vcf.parse_header_line(text, metadata)
+        start = reader.tell()
+        line = reader.readline()
+
+    if metadata.get('format') != 'VCF':
+        raise ValueError("Only VCF files can be indexed")
+    metadata['compression'] = 'bgzf'
+    return metadata, start
+
+
+def _record_batches(filename, start, batch_bytes=BATCH_BYTES):
+    """
+    Yield ``(text, voffsets)`` batches of whole record lines from ``start`` on.
+
+    Line starts are found with a vectorized newline search per block, so the
+    virtual offset of every record comes for free.
+    """
+    first_coffset, skip = bgzf.split_virtual_offset(start)
+    pending, starts = [], []
+    pending_size = 0
+    line_open = False
+
+    with open(filename, 'rb') as f:
+        for coffset, data in bgzf.iter_blocks(f, first_coffset):
+            base = skip
+            data, skip = data[skip:], 0
+            if not data:
+                continue
+
+            local = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10) + 1
+            local = local[local < len(data)]
+            if not line_open:
+                local = np.concatenate(([0], local))
+            starts.append(np.uint64(coffset << 16) + (local + base).astype(np.uint64))
+            pending.append(data)
+            pending_size += len(data)
+            line_open = not data.endswith(b'\n')
+
+            if pending_size >= batch_bytes and not line_open:
+                yield b''.join(pending), np.concatenate(starts)
+                pending, starts = [], []
+                pending_size = 0
+
+    if pending:
+        yield b''.join(pending), np.concatenate(starts)
+
+
+def build_index(filename):
+    """
+    Index a BGZF-compressed VCF and save the index beside it.
+
+    Returns:
+        The new :class:`VcfIndex`.
+    """
+    with bgzf.BgzfReader(filename) as reader:
+        metadata, start = read_header(reader)
+
+    counters = genome_stats.GenomeCounters()
+    no_call_codes = genome_store.encode_genotypes(genome_store.NO_CALLS)
+    chromosomes, positions, rsid_keys, voffsets = [], [], [], []
+
+    for text, starts in _record_batches(filename, start):
+        store = genome_store.GenotypeStore.from_frame(vcf.parse_records(text))
+        if len(store) != len(starts):
+            raise ValueError("VCF body contains blank or malformed lines")
+
+        counters.add_raw(store.chromosomes)
+        called = ~np.isin(store.genotypes, no_call_codes)
+        unencoded = store.unencoded[called] if store.unencoded is not None else None
+        counters.update(store.genotypes[called], store.chromosomes[called], store.positions[called], unencoded)
+
+        chromosomes.append(store.chromosomes)
+        positions.append(store.positions)
+        rsid_keys.append(store.rsids)
+        voffsets.append(starts)
+
+    chromosomes = union_categoricals(chromosomes) if chromosomes else pd.Categorical([])
+    chrom_codes = np.asarray(chromosomes.codes, dtype=np.int16)
+    positions = np.concatenate(positions) if positions else np.empty(0, dtype=np.int32)
+    rsid_keys = np.concatenate(rsid_keys) if rsid_keys else np.empty(0, dtype=np.int64)
+    voffsets = np.concatenate(voffsets) if voffsets else np.empty(0, dtype=np.uint64)
+
+    # Region queries need chromosomes in contiguous runs with ascending positions
+    chrom_change = np.flatnonzero(np.diff(chrom_codes) != 0) + 1
+    run_codes = chrom_codes[np.concatenate(([0], chrom_change))] if len(chrom_codes) else chrom_codes
+    same_chrom = np.diff(chrom_codes) == 0
+    is_sorted = bool(len(set(run_codes.tolist())) == len(run_codes)
+                     and np.all(np.diff(positions.astype(np.int64))[same_chrom] >= 0))
+
+    chrom_first = np.zeros(len(chromosomes.categories), dtype=np.uint64)
+    if len(chrom_codes):
+        firsts = np.concatenate(([0], chrom_change))
+        chrom_first[chrom_codes[firsts]] = voffsets[firsts]
+
+    # Linear index: the first record starting in each block
+    blocks = voffsets >> np.uint64(16)
+    block_first = np.flatnonzero(np.concatenate(([True], blocks[1:] != blocks[:-1]))) if len(blocks) else blocks
+
+    # rsid index, duplicates resolving to their first occurrence
+    order = np.argsort(rsid_keys, kind='stable')
+    order = order[rsid_keys[order] != 0]
+
+    info = {
+        'version': INDEX_VERSION,
+        'source': _source_stamp(filename),
+        'records': int(len(voffsets)),
+        'sorted': is_sorted,
+        'metadata': metadata,
+        'counters': counters.to_dict(),
+    }
+    arrays = {
+        'chromosomes': np.array([str(c) for c in chromosomes.categories], dtype=str),
+        'rsid_keys': rsid_keys[order],
+        'rsid_voffsets': voffsets[order],
+        'block_chrom': chrom_codes[block_first],
+        'block_pos': positions[block_first],
+        'block_voffset': voffsets[block_first],
+        'chrom_first_voffset': chrom_first,
+    }
+    with open(index_path(filename), 'wb') as out:
+        np.savez(out, info=np.array(json.dumps(info)), **arrays)
+
+    return VcfIndex(filename, arrays, info)
+
+
+class VcfIndex:
+    """Random access to the records of an indexed BGZF VCF."""
+
+    def __init__(self, filename, arrays, info):
+        self.filename = filename
+        self._arrays = arrays
+        self.info = info
+        self._chrom_codes = {chrom: code for code, chrom in enumerate(arrays['chromosomes'].tolist())}
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load the index of ``filename``.
+
+        Returns:
+            The index, or ``None`` if there is none or it no longer matches
+            the file (different size or modification time, older version).
+        """
+        path = index_path(filename)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as npz:
+            info = json.loads(str(npz['info']))
+            arrays = {name: npz[name] for name in npz.files if name != 'info'}
+        if info.get('version') != INDEX_VERSION or info.get('source') != _source_stamp(filename):
+            return None
+        return cls(filename, arrays, info)
+
+    @property
+    def metadata(self):
+        """Header metadata of the indexed VCF."""
+        return dict(self.info['metadata'])
+
+    @property
+    def counters(self):
+        """Genome-wide :class:`utils.genome_stats.GenomeCounters` collected while indexing."""
+        return genome_stats.GenomeCounters.from_dict(self.info['counters'])
+
+    def lookup_rsids(self, rsids):
+        """Virtual offsets of the records of the given rsids that are present, in file order."""
+        keys = self._arrays['rsid_keys']
+        if not len(keys):
+            return np.empty(0, dtype=np.uint64)
+        wanted = encode_rsids(list(rsids))
+        pos = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = (keys[pos] == wanted) & (wanted != 0)
+        return np.unique(self._arrays['rsid_voffsets'][pos[found]])
+
+    def _read_lines(self, voffsets):
+        with bgzf.BgzfReader(self.filename) as reader:
+            lines = []
+            for voffset in voffsets:
+                reader.seek(int(voffset))
+                line = reader.readline()
+                lines.append(line if line.endswith(b'\n') else line + b'\n')
+        return b''.join(lines)
+
+    def fetch(self, rsids):
+        """
+        Read the records of the given rsids.
+
+        Returns:
+            A DataFrame with the :data:`utils.vcf.OUTPUT_COLUMNS` columns.
+        """
+        return vcf.parse_records(self._read_lines(self.lookup_rsids(rsids)))
+
+    def fetch_region(self, chromosome, start, end):
+        """
+        Read the records on ``chromosome`` with ``start <= position <= end``.
+
+        Raises:
+            ValueError: If the VCF is not sorted by chromosome and position.
+        """
+        if not self.info['sorted']:
+            raise ValueError("Region queries need a VCF sorted by chromosome and position")
+        code = self._chrom_codes.get(str(chromosome))
+        if code is None:
+            return vcf.parse_records(b'')
+
+        # Start from the last indexed block beginning on this chromosome strictly before
+        # `start`: records at `start` may end the previous block (split multi-allelic lines)
+        candidates = np.flatnonzero((self._arrays['block_chrom'] == code) & (self._arrays['block_pos'] < start))
+        voffset = int(self._arrays['chrom_first_voffset'][code])
+        if len(candidates):
+            voffset = max(voffset, int(self._arrays['block_voffset'][candidates[-1]]))
+
+        chrom = str(chromosome).encode()
+        lines = []
+        with bgzf.BgzfReader(self.filename) as reader:
+            reader.seek(voffset)
+            for line in iter(reader.readline, b''):
+                fields = line.split(b'\t', 2)
+                if fields[0] != chrom:
+                    break
+                position = int(fields[1])
+                if position > end:
+                    break
+                if position >= start:
+                    lines.append(line if line.endswith(b'\n') else line + b'\n')
+        return vcf.parse_records(b''.join(lines))